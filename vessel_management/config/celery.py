@@ -33,4 +33,29 @@ app.conf.beat_schedule = {
         'task': 'vessel_pms.tasks.generate_recurring_tasks',
         'schedule': crontab(hour=0, minute=15),  # Run daily at 00:15
     },
-}
\ No newline at end of file
+    'refresh-reliability-metrics': {
+        'task': 'vessel_pms.tasks.refresh_reliability',
+        'schedule': crontab(minute=30),  # Run hourly, incrementally
+    },
+    'rebuild-reliability-metrics': {
+        'task': 'vessel_pms.tasks.refresh_reliability',
+        'schedule': crontab(hour=1, minute=0),  # Full rebuild daily at 01:00
+        'kwargs': {'full': True},
+    },
+    'forecast-parts-demand': {
+        'task': 'vessel_pms.tasks.forecast_parts_demand',
+        'schedule': crontab(hour=1, minute=30),  # Run daily at 01:30
+    },
+    'evaluate-condition-monitoring': {
+        'task': 'vessel_pms.tasks.evaluate_condition_monitoring',
+        'schedule': crontab(minute='*/15'),  # Run every 15 minutes
+    },
+    'refresh-pms-kpis': {
+        'task': 'vessel_pms.tasks.refresh_pms_kpis',
+        'schedule': crontab(hour=23, minute=50),  # Run daily at 23:50, closing each week on Sunday
+    },
+    'reconcile-certificate-notifications': {
+        'task': 'crew.tasks.reconcile_certificate_notifications',
+        'schedule': crontab(hour=0, minute=5),  # Run daily just after the date rolls over
+    },
+}
@@ -26,6 +26,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     
     # Third-party apps
     'rest_framework',
@@ -53,6 +54,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'crew.middleware.CertificateNotificationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -70,6 +72,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'crew.context_processors.certificate_notifications',
             ],
         },
     },
@@ -192,6 +195,29 @@ SERVER_EMAIL = os.getenv('GMAIL_USER', 'your-email@gmail.com')
 # Email subject prefix
 EMAIL_SUBJECT_PREFIX = '[Vessel Management] '
 
+# Cache shared by the web and Celery processes: the versioned crew caches
+# (notifications, compliance, crew details) are invalidated from either side.
+# An empty CACHE_URL falls back to a per-process cache, where an invalidation
+# only reaches the process making it; use it for tests and single-process
+# development only.
+CACHE_URL = os.getenv('CACHE_URL', 'redis://localhost:6379/1')
+if CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': CACHE_URL,
+            'OPTIONS': {
+                'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            },
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 # File Upload Settings
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10 MB
 ALLOWED_FILE_TYPES = ['pdf', 'jpg', 'jpeg', 'png', 'docx', 'xlsx']
@@ -5,8 +5,14 @@ from django.utils import timezone
 from django.urls import path
 from django.shortcuts import redirect
 from django.contrib import messages
-from .models import Crew, CrewCertificate, CrewAssignment, Vessel, CertificateNotification
+from django.db.models import Count, OuterRef, Q, Subquery
+from datetime import timedelta
+from .models import (
+    Crew, CrewCertificate, CrewAssignment, Vessel, CertificateNotification, RankCertificateRequirement,
+    CrewOnboardingBatch
+)
 from .utils import send_certificate_notification_email
+from .notifications import invalidate_notification_cache
 
 
 class CrewCertificateInline(admin.TabularInline):
@@ -16,7 +22,7 @@ class CrewCertificateInline(admin.TabularInline):
               'issue_date', 'expiry_date', 'issuing_authority', 'document_file')
     
     def get_queryset(self, request):
-        qs = super().get_queryset(request)
+        qs = super().get_queryset(request).select_related('crew')
         return qs.order_by('expiry_date')
 
 
@@ -24,6 +30,16 @@ class CrewAssignmentInline(admin.TabularInline):
     model = CrewAssignment
     extra = 0
     fields = ('vessel', 'rank', 'start_date', 'end_date', 'is_current')
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('vessel', 'crew')
+    
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        formfield = super().formfield_for_foreignkey(db_field, request, **kwargs)
+        if db_field.name == 'vessel':
+            # Evaluate the vessel choices once for all rows instead of once per rendered row
+            formfield.choices = list(formfield.choices)
+        return formfield
 
 
 @admin.register(Crew)
@@ -33,9 +49,25 @@ class CrewAdmin(admin.ModelAdmin):
     search_fields = ('name', 'passport_number', 'seaman_book_number', 'email')
     inlines = [CrewCertificateInline, CrewAssignmentInline]
     
+    def get_queryset(self, request):
+        today = timezone.now().date()
+        current_vessel = CrewAssignment.objects.filter(
+            crew=OuterRef('pk'), is_current=True
+        ).order_by('-start_date').values('vessel__name')[:1]
+        return super().get_queryset(request).annotate(
+            expired_certificate_count=Count(
+                'certificates', filter=Q(certificates__expiry_date__lte=today)
+            ),
+            expiring_certificate_count=Count(
+                'certificates',
+                filter=Q(certificates__expiry_date__gt=today, certificates__expiry_date__lte=today + timedelta(days=30))
+            ),
+            current_vessel_name=Subquery(current_vessel),
+        )
+    
     def certificate_status(self, obj):
-        expired = obj.get_expired_certificates().count()
-        expiring_soon = obj.get_soon_to_expire_certificates(days=30).count()
+        expired = obj.expired_certificate_count
+        expiring_soon = obj.expiring_certificate_count
         
         if expired > 0:
             return format_html(
@@ -48,14 +80,13 @@ class CrewAdmin(admin.ModelAdmin):
         return format_html('<span style="color: green;">✓ Valid</span>')
     
     certificate_status.short_description = "Certificates"
+    certificate_status.admin_order_field = 'expired_certificate_count'
     
     def current_vessel(self, obj):
-        current_assignment = obj.assignments.filter(is_current=True).first()
-        if current_assignment:
-            return current_assignment.vessel.name
-        return "Not assigned"
+        return obj.current_vessel_name or "Not assigned"
     
     current_vessel.short_description = "Current Vessel"
+    current_vessel.admin_order_field = 'current_vessel_name'
 
 
 @admin.register(CrewCertificate)
@@ -128,6 +159,21 @@ class CrewAssignmentAdmin(admin.ModelAdmin):
     vessel_name.short_description = "Vessel"
 
 
+@admin.register(RankCertificateRequirement)
+class RankCertificateRequirementAdmin(admin.ModelAdmin):
+    list_display = ('rank', 'certificate_type', 'vessel_type', 'required')
+    list_filter = ('rank', 'certificate_type', 'vessel_type', 'required')
+    list_editable = ('required',)
+
+
+@admin.register(CrewOnboardingBatch)
+class CrewOnboardingBatchAdmin(admin.ModelAdmin):
+    list_display = ('file_name', 'status', 'rows_imported', 'rows_rejected', 'accounts_created', 'emails_sent',
+                    'created_at', 'completed_at')
+    list_filter = ('status',)
+    readonly_fields = ('crew',)
+
+
 @admin.register(CertificateNotification)
 class CertificateNotificationAdmin(admin.ModelAdmin):
     list_display = ('certificate_info', 'crew_name', 'notification_date', 'days_before_expiry', 'status', 'created_at', 'message_preview', 'send_email_button')
@@ -214,14 +260,17 @@ class CertificateNotificationAdmin(admin.ModelAdmin):
     
     def mark_as_sent(self, request, queryset):
         queryset.update(status='SENT')
+        invalidate_notification_cache()
     mark_as_sent.short_description = "Mark selected notifications as sent"
     
     def mark_as_resolved(self, request, queryset):
         queryset.update(status='RESOLVED')
+        invalidate_notification_cache()
     mark_as_resolved.short_description = "Mark selected notifications as resolved"
     
     def mark_as_acknowledged(self, request, queryset):
         queryset.update(status='ACKNOWLEDGED')
+        invalidate_notification_cache()
     mark_as_acknowledged.short_description = "Mark selected notifications as acknowledged"
     
     def get_queryset(self, request):
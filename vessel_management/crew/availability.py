@@ -0,0 +1,38 @@
+from datetime import timedelta
+
+from django.db.backends.postgresql.psycopg_any import DateRange
+from django.db.models import Exists, OuterRef
+
+from .models import Crew, CrewAssignment, CrewCertificate, assignment_period
+
+
+def requested_window(start, end):
+    """Inclusive [start, end] dates as the half-open daterange assignments are stored in"""
+    return DateRange(start, end + timedelta(days=1), '[)')
+
+
+def overlapping_assignments(start, end):
+    """Assignments covering at least one day of [start, end], matched on the period GiST index"""
+    return CrewAssignment.objects.annotate(period=assignment_period()).filter(
+        period__overlap=requested_window(start, end)
+    )
+
+
+def available_crew(start, end, rank=None, certificate_types=(), queryset=None):
+    """
+    Active crew members free for the whole of [start, end], optionally of a
+    rank and holding a certificate of each of `certificate_types` valid
+    through `end`. Evaluates as a single query: the assignment overlap and
+    certificate checks are correlated EXISTS subqueries.
+    """
+    queryset = Crew.objects.all() if queryset is None else queryset
+    queryset = queryset.filter(is_active=True).exclude(
+        Exists(overlapping_assignments(start, end).filter(crew=OuterRef('pk')))
+    )
+    if rank:
+        queryset = queryset.filter(rank=rank)
+    for certificate_type in certificate_types:
+        queryset = queryset.filter(Exists(CrewCertificate.objects.filter(
+            crew=OuterRef('pk'), certificate_type=certificate_type, expiry_date__gt=end
+        )))
+    return queryset
@@ -0,0 +1,185 @@
+import numpy as np
+from django.contrib.postgres.aggregates import BitOr
+from django.core.cache import cache
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.utils import timezone
+
+from .models import CrewAssignment, CrewCertificate, RankCertificateRequirement
+
+
+CERTIFICATE_TYPES = [certificate_type for certificate_type, _ in CrewCertificate.CERTIFICATE_TYPES]
+# One bit per certificate type, so a set of types is an integer mask
+TYPE_BITS = {certificate_type: 1 << position for position, certificate_type in enumerate(CERTIFICATE_TYPES)}
+
+VERSION_CACHE_KEY = 'crew:compliance-version'
+MATRIX_CACHE_KEY = 'crew:certificate-requirements'
+SCORES_CACHE_KEY = 'crew:compliance-scores'
+CACHE_TIMEOUT = 300
+
+
+def mask_types(mask):
+    """Certificate types of a bitmask, in CERTIFICATE_TYPES order"""
+    return [certificate_type for certificate_type in CERTIFICATE_TYPES if mask & TYPE_BITS[certificate_type]]
+
+
+def normalize_vessel_type(vessel_type):
+    return (vessel_type or '').strip().upper()
+
+
+def compliance_version():
+    """Current version of the cached requirement matrix and scores, bumped on every relevant write"""
+    return cache.get_or_set(VERSION_CACHE_KEY, 1, None)
+
+
+def invalidate_compliance_cache():
+    """Move to a new cache version; entries of the old one simply expire"""
+    try:
+        cache.incr(VERSION_CACHE_KEY)
+    except ValueError:
+        cache.set(VERSION_CACHE_KEY, 1, None)
+
+
+def requirement_matrix():
+    """
+    Required certificate type mask per (rank, normalized vessel type),
+    with '' as the vessel type of each rank's default. Overrides are
+    resolved against the defaults here, so a lookup is one dict access.
+    Cached until a requirement changes.
+    """
+    key = f'{MATRIX_CACHE_KEY}:{compliance_version()}'
+    matrix = cache.get(key)
+    if matrix is None:
+        defaults, overrides = {}, {}
+        for rank, certificate_type, vessel_type, required in RankCertificateRequirement.objects.values_list(
+            'rank', 'certificate_type', 'vessel_type', 'required'
+        ):
+            bit = TYPE_BITS[certificate_type]
+            vessel_type = normalize_vessel_type(vessel_type)
+            if not vessel_type:
+                defaults[rank] = defaults.get(rank, 0) | (bit if required else 0)
+                continue
+            added, waived = overrides.get((rank, vessel_type), (0, 0))
+            overrides[(rank, vessel_type)] = (added | bit, waived) if required else (added, waived | bit)
+        matrix = {(rank, ''): mask for rank, mask in defaults.items()}
+        for (rank, vessel_type), (added, waived) in overrides.items():
+            matrix[(rank, vessel_type)] = (defaults.get(rank, 0) | added) & ~waived
+        cache.set(key, matrix, CACHE_TIMEOUT)
+    return matrix
+
+
+def required_mask(matrix, rank, vessel_type=''):
+    """Required certificate type mask of a rank on a vessel type"""
+    return matrix.get((rank, normalize_vessel_type(vessel_type)), matrix.get((rank, ''), 0))
+
+
+def certificate_mask(prefix='', filter=None):
+    """Aggregate of certificate types (under the relation `prefix`) as a bitmask, 0 without any"""
+    bits = Case(
+        *[When(**{f'{prefix}certificate_type': certificate_type}, then=Value(bit))
+          for certificate_type, bit in TYPE_BITS.items()],
+        output_field=IntegerField(),
+    )
+    return BitOr(bits, filter=filter, default=Value(0))
+
+
+def fleet_compliance(today=None, vessel_ids=None):
+    """
+    Certificate gaps of every current assignment and the resulting manning
+    compliance per vessel.
+
+    The bitmasks of the valid and of all held certificate types of each
+    assigned crew member come from a single query; they are checked against
+    the required mask of the assignment's rank on the vessel's type as
+    NumPy arrays. A required type not held is missing, one only held
+    expired is expired; as everywhere in the crew app, a certificate
+    expiring today counts as expired. A vessel's score is the percentage of
+    its current assignments without gaps.
+    """
+    today = today or timezone.localdate()
+    assignments = CrewAssignment.objects.filter(is_current=True)
+    if vessel_ids:
+        assignments = assignments.filter(vessel_id__in=vessel_ids)
+    rows = list(
+        assignments.values(
+            'id', 'crew_id', 'crew__name', 'rank', 'vessel_id', 'vessel__name', 'vessel__vessel_type'
+        ).annotate(
+            valid_mask=certificate_mask('crew__certificates__', Q(crew__certificates__expiry_date__gt=today)),
+            held_mask=certificate_mask('crew__certificates__'),
+        ).order_by('vessel__name', 'vessel_id', 'rank', 'crew__name')
+    )
+    matrix = requirement_matrix()
+    required = np.array(
+        [required_mask(matrix, row['rank'], row['vessel__vessel_type']) for row in rows], dtype=np.int64
+    )
+    valid = np.array([row['valid_mask'] for row in rows], dtype=np.int64)
+    held = np.array([row['held_mask'] for row in rows], dtype=np.int64)
+    gaps = required & ~valid
+    expired = gaps & held
+    missing = gaps & ~held
+    compliant = gaps == 0
+
+    # Vessels in row order, i.e. by name
+    vessels = list(dict.fromkeys(row['vessel_id'] for row in rows))
+    positions = {vessel_id: position for position, vessel_id in enumerate(vessels)}
+    vessel_index = np.array([positions[row['vessel_id']] for row in rows], dtype=np.int64)
+    crew_counts = np.bincount(vessel_index, minlength=len(vessels))
+    compliant_counts = np.bincount(vessel_index, weights=compliant, minlength=len(vessels))
+    gap_counts = np.bincount(
+        vessel_index, weights=[bin(int(mask)).count('1') for mask in gaps], minlength=len(vessels)
+    )
+    names = {row['vessel_id']: (row['vessel__name'], row['vessel__vessel_type']) for row in rows}
+    return {
+        'date': today,
+        'vessels': [
+            {
+                'vessel': vessel_id,
+                'vessel_name': names[vessel_id][0],
+                'vessel_type': names[vessel_id][1],
+                'crew': int(crew_counts[position]),
+                'compliant': int(compliant_counts[position]),
+                'gaps': int(gap_counts[position]),
+                'score': round(100 * float(compliant_counts[position]) / int(crew_counts[position]), 1),
+            }
+            for position, vessel_id in enumerate(vessels)
+        ],
+        'assignments': [
+            {
+                'assignment': row['id'],
+                'crew': row['crew_id'],
+                'crew_name': row['crew__name'],
+                'rank': row['rank'],
+                'vessel': row['vessel_id'],
+                'required': mask_types(int(required[position])),
+                'missing': mask_types(int(missing[position])),
+                'expired': mask_types(int(expired[position])),
+                'compliant': bool(compliant[position]),
+            }
+            for position, row in enumerate(rows)
+        ],
+    }
+
+
+def vessel_compliance_scores(today=None):
+    """Fleet compliance per vessel id (see fleet_compliance), cached until a certificate, assignment or requirement changes"""
+    today = today or timezone.localdate()
+    key = f'{SCORES_CACHE_KEY}:{compliance_version()}:{today.isoformat()}'
+    scores = cache.get(key)
+    if scores is None:
+        scores = {vessel['vessel']: vessel for vessel in fleet_compliance(today)['vessels']}
+        cache.set(key, scores, CACHE_TIMEOUT)
+    return scores
+
+
+def certificate_gaps(crew, today=None):
+    """
+    Required certificate types a crew member is missing or only holds
+    expired, for their rank on their current vessel's type
+    """
+    today = today or timezone.localdate()
+    current = crew.assignments.filter(is_current=True).select_related('vessel').order_by('-start_date').first()
+    required = required_mask(requirement_matrix(), crew.rank, current.vessel.vessel_type if current else '')
+    masks = crew.certificates.aggregate(
+        valid=certificate_mask(filter=Q(expiry_date__gt=today)), held=certificate_mask()
+    )
+    gaps = required & ~masks['valid']
+    return {'missing': mask_types(gaps & ~masks['held']), 'expired': mask_types(gaps & masks['held'])}
@@ -1,27 +1,25 @@
-from crew.models import CertificateNotification
+from crew.notifications import notification_counts, top_notifications
 
 def certificate_notifications(request):
     """
     Context processor that adds certificate notifications to the template context.
+    
+    Counts come from the notification cache (one aggregate query per cache
+    version) and the list holds only the most urgent pending notifications;
+    it is passed as a callable, so it is only loaded by templates using it.
+    Admin pages get nothing.
     """
     if not request.user.is_authenticated:
         return {}
+    resolver_match = getattr(request, 'resolver_match', None)
+    if resolver_match and resolver_match.app_name == 'admin':
+        return {}
     
-    # Get all pending notifications
-    notifications = CertificateNotification.objects.filter(
-        status='PENDING'
-    ).select_related(
-        'certificate',
-        'certificate__crew'
-    ).order_by('-created_at')
-    
-    # Count notifications by type
-    expired_count = notifications.filter(days_before_expiry=0).count()
-    expiring_count = notifications.filter(days_before_expiry__gt=0).count()
+    counts = getattr(request, 'certificate_notification_counts', None) or notification_counts()
     
     return {
-        'certificate_notifications': notifications,
-        'expired_certificate_count': expired_count,
-        'expiring_certificate_count': expiring_count,
-        'total_certificate_notifications': notifications.count(),
-    } 
\ No newline at end of file
+        'certificate_notifications': top_notifications,
+        'expired_certificate_count': counts['expired'],
+        'expiring_certificate_count': counts['expiring'],
+        'total_certificate_notifications': counts['total'],
+    }
@@ -1,7 +1,9 @@
 # crew/filters.py
 import django_filters
 from django.db.models import Q
+from rest_framework import filters
 from .models import Crew, CrewCertificate, CrewAssignment
+from .search import search
 
 
 class CrewFilter(django_filters.FilterSet):
@@ -67,4 +69,21 @@ class AssignmentFilter(django_filters.FilterSet):
     
     class Meta:
         model = CrewAssignment
-        fields = ['crew', 'vessel', 'rank', 'is_current']
\ No newline at end of file
+        fields = ['crew', 'vessel', 'rank', 'is_current']
+
+
+class TrigramSearchFilter(filters.SearchFilter):
+    """
+    Search filter ranking results by relevance (see crew.search.search).
+    Views list the text fields in `trigram_search_fields` and the document
+    number fields in `exact_search_fields`.
+    """
+    
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        return search(
+            queryset, ' '.join(terms),
+            getattr(view, 'trigram_search_fields', ()), getattr(view, 'exact_search_fields', ())
+        )
@@ -0,0 +1,60 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from crew.onboarding import CrewOnboardingImporter, provision_accounts, read_roster
+from crew.tasks import provision_crew_accounts
+
+
+class Command(BaseCommand):
+    help = 'Onboards the crew of a manning agency roster (CSV or Excel)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help='Path of the roster')
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Validate the roster without writing anything',
+        )
+        parser.add_argument(
+            '--sync',
+            action='store_true',
+            help='Provision the user accounts and send the emails now instead of queueing a task',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Number of crew rows written per bulk query',
+        )
+
+    def handle(self, *args, **options):
+        file_path = options['file']
+        if not os.path.exists(file_path):
+            raise CommandError(f'File not found: {file_path}')
+        started = time.monotonic()
+        roster = read_roster(file_path)
+        self.stdout.write(f'Found {len(roster)} crew rows')
+
+        importer = CrewOnboardingImporter(dry_run=options['dry_run'], chunk_size=options['chunk_size'])
+        report, batch = importer.run(roster, file_name=os.path.basename(file_path))
+        for error in report.errors:
+            row = f"row {error['row']}" if error['row'] is not None else 'file'
+            self.stdout.write(self.style.ERROR(f"{row}: {error['message']}"))
+        created = report.counts.get('crew', {}).get('created', 0)
+        prefix = 'Dry run' if options['dry_run'] else 'Import'
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix} finished in {time.monotonic() - started:.1f}s: {created} crew, {len(report.errors)} errors'
+        ))
+        if batch is None:
+            return
+
+        if options['sync']:
+            result = provision_accounts(batch)
+            self.stdout.write(self.style.SUCCESS(
+                f"{result['accounts_created']} accounts created, {result['emails_sent']} emails sent"
+            ))
+        else:
+            provision_crew_accounts.delay(batch.pk)
+            self.stdout.write(f'Account provisioning queued as onboarding batch {batch.pk}')
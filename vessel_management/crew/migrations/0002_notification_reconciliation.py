@@ -0,0 +1,28 @@
+# Generated by Django 4.2.10 on 2026-10-19 04:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crew', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationReconciliation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('full', models.BooleanField(default=False, help_text='Whether every certificate in the window was checked')),
+                ('certificates_checked', models.PositiveIntegerField(default=0)),
+                ('notifications_created', models.PositiveIntegerField(default=0)),
+                ('notifications_updated', models.PositiveIntegerField(default=0)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-day'],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.10 on 2026-10-19 04:53
+
+from django.db import migrations, models
+
+
+# Keep one notification per certificate and threshold, preferring the most advanced status
+DEDUPLICATE_SQL = """
+DELETE FROM crew_certificatenotification n
+USING (
+    SELECT id, ROW_NUMBER() OVER (
+        PARTITION BY certificate_id, days_before_expiry
+        ORDER BY CASE status
+            WHEN 'RESOLVED' THEN 0 WHEN 'ACKNOWLEDGED' THEN 1 WHEN 'SENT' THEN 2 ELSE 3
+        END, updated_at DESC, id DESC
+    ) AS position
+    FROM crew_certificatenotification
+) ranked
+WHERE n.id = ranked.id AND ranked.position > 1
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crew', '0002_notification_reconciliation'),
+    ]
+
+    operations = [
+        migrations.RunSQL(DEDUPLICATE_SQL, migrations.RunSQL.noop),
+        migrations.AddConstraint(
+            model_name='certificatenotification',
+            constraint=models.UniqueConstraint(fields=('certificate', 'days_before_expiry'), name='crew_notification_threshold'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.10 on 2026-10-19 05:01
+
+from datetime import date
+
+import django.contrib.postgres.constraints
+import django.contrib.postgres.fields.ranges
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+def trim_overlapping_assignments(apps, schema_editor):
+    """
+    End each assignment no later than the next one of the same crew member
+    starts, so the overlap exclusion can be created on existing data
+    """
+    CrewAssignment = apps.get_model('crew', 'CrewAssignment')
+    previous = None
+    for assignment in CrewAssignment.objects.order_by('crew_id', 'start_date', 'id'):
+        if assignment.end_date and assignment.end_date < assignment.start_date:
+            assignment.end_date = assignment.start_date
+            assignment.save(update_fields=['end_date'])
+        if previous and previous.crew_id == assignment.crew_id and (
+            previous.end_date is None or previous.end_date > assignment.start_date
+        ):
+            previous.end_date = assignment.start_date
+            previous.is_current = previous.is_current and previous.end_date > date.today()
+            previous.save(update_fields=['end_date', 'is_current'])
+        previous = assignment
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crew', '0003_notification_threshold_unique'),
+    ]
+
+    operations = [
+        migrations.RunPython(trim_overlapping_assignments, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='crewassignment',
+            index=django.contrib.postgres.indexes.GistIndex(models.Func(models.F('start_date'), models.F('end_date'), models.Value('[)'), function='daterange', output_field=django.contrib.postgres.fields.ranges.DateRangeField()), name='crew_assignment_period'),
+        ),
+        migrations.AddConstraint(
+            model_name='crewassignment',
+            constraint=models.CheckConstraint(check=models.Q(('end_date__isnull', True), ('end_date__gte', models.F('start_date')), _connector='OR'), name='crew_assignment_dates'),
+        ),
+        migrations.AddConstraint(
+            model_name='crewassignment',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(expressions=[(models.Func(models.F('crew'), models.F('crew'), models.Value('[]'), function='int4range', output_field=django.contrib.postgres.fields.ranges.IntegerRangeField()), '&&'), (models.Func(models.F('start_date'), models.F('end_date'), models.Value('[)'), function='daterange', output_field=django.contrib.postgres.fields.ranges.DateRangeField()), '&&')], name='crew_assignment_no_overlap'),
+        ),
+    ]
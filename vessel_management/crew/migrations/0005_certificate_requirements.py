@@ -0,0 +1,56 @@
+# Generated by Django 4.2.10 on 2026-10-19 05:09
+
+from django.db import migrations, models
+
+
+OFFICERS = [
+    'CAPTAIN', 'CHIEF_OFFICER', 'SECOND_OFFICER', 'THIRD_OFFICER',
+    'CHIEF_ENGINEER', 'SECOND_ENGINEER', 'THIRD_ENGINEER',
+]
+RATINGS = ['ELECTRICIAN', 'BOSUN', 'ABLE_SEAMAN', 'COOK', 'STEWARD', 'OILER']
+# Baseline matrix: STCW training and a medical certificate for everyone, a certificate of
+# competency for officers and security training for the ship security officer ranks
+DEFAULT_REQUIREMENTS = (
+    [(rank, certificate_type) for rank in OFFICERS + RATINGS for certificate_type in ('STCW', 'MEDICAL')]
+    + [(rank, 'COC') for rank in OFFICERS]
+    + [(rank, 'SECURITY') for rank in ('CAPTAIN', 'CHIEF_OFFICER')]
+)
+
+
+def add_default_requirements(apps, schema_editor):
+    RankCertificateRequirement = apps.get_model('crew', 'RankCertificateRequirement')
+    RankCertificateRequirement.objects.bulk_create([
+        RankCertificateRequirement(rank=rank, certificate_type=certificate_type)
+        for rank, certificate_type in DEFAULT_REQUIREMENTS
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crew', '0004_assignment_periods'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RankCertificateRequirement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.CharField(choices=[('CAPTAIN', 'Captain'), ('CHIEF_OFFICER', 'Chief Officer'), ('SECOND_OFFICER', 'Second Officer'), ('THIRD_OFFICER', 'Third Officer'), ('CHIEF_ENGINEER', 'Chief Engineer'), ('SECOND_ENGINEER', 'Second Engineer'), ('THIRD_ENGINEER', 'Third Engineer'), ('ELECTRICIAN', 'Electrician'), ('BOSUN', 'Bosun'), ('ABLE_SEAMAN', 'Able Seaman'), ('COOK', 'Cook'), ('STEWARD', 'Steward'), ('OILER', 'Oiler')], max_length=20)),
+                ('certificate_type', models.CharField(choices=[('COC', 'Certificate of Competency'), ('COE', 'Certificate of Endorsement'), ('STCW', 'STCW Certificate'), ('MEDICAL', 'Medical Certificate'), ('SAFETY', 'Safety Training Certificate'), ('SECURITY', 'Security Training Certificate'), ('OTHER', 'Other Certificate')], max_length=20)),
+                ('vessel_type', models.CharField(blank=True, default='', help_text="Leave empty for the rank's default; matched case-insensitively against Vessel.vessel_type", max_length=100)),
+                ('required', models.BooleanField(default=True, help_text='Unset on a vessel type override to waive the requirement')),
+                ('notes', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['rank', 'vessel_type', 'certificate_type'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='rankcertificaterequirement',
+            constraint=models.UniqueConstraint(fields=('rank', 'certificate_type', 'vessel_type'), name='crew_rank_certificate_requirement'),
+        ),
+        migrations.RunPython(add_default_requirements, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.10 on 2026-10-19 05:13
+
+from django.db import migrations, models
+
+
+# GIN trigram indexes behind crew.search. They need pg_trgm, which is only created where the
+# server ships it; elsewhere search falls back to ranked substring matching.
+TRIGRAM_INDEXES = [
+    ('crew_crew_name_trgm', 'crew_crew', 'name'),
+    ('crew_crew_nationality_trgm', 'crew_crew', 'nationality'),
+    ('crew_crew_rank_trgm', 'crew_crew', 'rank'),
+    ('crew_certificate_name_trgm', 'crew_crewcertificate', 'certificate_name'),
+    ('crew_certificate_authority_trgm', 'crew_crewcertificate', 'issuing_authority'),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin ({column} gin_trgm_ops)')
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _, _ in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crew', '0005_certificate_requirements'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='crewcertificate',
+            index=models.Index(fields=['certificate_number'], name='crew_certificate_number'),
+        ),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.10 on 2026-10-19 09:12
+
+from django.db import migrations, models
+
+
+# Existing notifications belong to their certificate's current expiry cycle
+BACKFILL_SQL = """
+UPDATE crew_certificatenotification n
+SET notified_expiry_date = c.expiry_date
+FROM crew_crewcertificate c
+WHERE c.id = n.certificate_id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crew', '0007_onboarding_batches'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='certificatenotification',
+            name='notified_expiry_date',
+            field=models.DateField(null=True, help_text='Certificate expiry date the notification was raised for'),
+        ),
+        migrations.RunSQL(BACKFILL_SQL, migrations.RunSQL.noop),
+        migrations.AlterField(
+            model_name='certificatenotification',
+            name='notified_expiry_date',
+            field=models.DateField(help_text='Certificate expiry date the notification was raised for'),
+        ),
+        migrations.RemoveConstraint(
+            model_name='certificatenotification',
+            name='crew_notification_threshold',
+        ),
+        migrations.AddConstraint(
+            model_name='certificatenotification',
+            constraint=models.UniqueConstraint(
+                fields=('certificate', 'notified_expiry_date', 'days_before_expiry'), name='crew_notification_threshold'
+            ),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.10 on 2026-10-19 09:41
+
+from django.db import migrations
+
+
+# Trigram indexes serving the partial document number matches of crew.search.trigram_search,
+# created only where pg_trgm is installed (see 0006_search_indexes)
+TRIGRAM_INDEXES = [
+    ('crew_crew_passport_trgm', 'crew_crew', 'passport_number'),
+    ('crew_crew_seaman_book_trgm', 'crew_crew', 'seaman_book_number'),
+    ('crew_certificate_number_trgm', 'crew_crewcertificate', 'certificate_number'),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            return
+    for name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin ({column} gin_trgm_ops)')
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _, _ in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crew', '0008_notification_expiry_cycle'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
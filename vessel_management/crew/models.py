@@ -2,6 +2,10 @@
 from django.db import models
 from django.utils import timezone
 from django.core.validators import RegexValidator
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import DateRangeField, IntegerRangeField, RangeOperators
+from django.contrib.postgres.indexes import GistIndex
+from django.db.models import F, Func, Q, Value
 from django.conf import settings
 from core.models import BaseModel, Vessel
 
@@ -69,11 +73,13 @@ class Crew(models.Model):
         )
     
     def is_fully_certified(self):
-        """Check if crew member has all required certificates for their rank"""
-        # This method would contain logic to check if the crew member has all
-        # required certificates for their specific rank
-        # Implementation would depend on specific maritime regulations
-        return True  # Placeholder
+        """
+        Check if crew member holds a valid certificate of every type their
+        rank requires on their current vessel (see RankCertificateRequirement)
+        """
+        from .compliance import certificate_gaps
+        gaps = certificate_gaps(self)
+        return not (gaps['missing'] or gaps['expired'])
 
 
 class CrewCertificate(models.Model):
@@ -118,6 +124,27 @@ class CrewCertificate(models.Model):
     
     class Meta:
         unique_together = ('crew', 'certificate_type', 'certificate_number')
+        indexes = [
+            # Exact certificate number lookups (see crew.search)
+            models.Index(fields=['certificate_number'], name='crew_certificate_number'),
+        ]
+
+
+def assignment_period():
+    """
+    Days an assignment covers as a PostgreSQL daterange: from start_date up
+    to (not including) end_date, open-ended while there is no end date. The
+    relieved member's end date is the relief's start date.
+    """
+    return Func(F('start_date'), F('end_date'), Value('[)'), function='daterange', output_field=DateRangeField())
+
+
+def assignment_crew_key():
+    """
+    The crew member as a one-value range, so the overlap exclusion can
+    compare crew with the range operators GiST supports without btree_gist
+    """
+    return Func(F('crew'), F('crew'), Value('[]'), function='int4range', output_field=IntegerRangeField())
 
 
 class CrewAssignment(models.Model):
@@ -138,6 +165,22 @@ class CrewAssignment(models.Model):
     class Meta:
         unique_together = ['crew', 'vessel', 'start_date']
         ordering = ['-start_date']
+        constraints = [
+            models.CheckConstraint(
+                check=Q(end_date__isnull=True) | Q(end_date__gte=F('start_date')), name='crew_assignment_dates'
+            ),
+            # A crew member cannot be on two assignments on the same day
+            ExclusionConstraint(
+                name='crew_assignment_no_overlap',
+                expressions=[
+                    (assignment_crew_key(), RangeOperators.OVERLAPS),
+                    (assignment_period(), RangeOperators.OVERLAPS),
+                ],
+            ),
+        ]
+        indexes = [
+            GistIndex(assignment_period(), name='crew_assignment_period'),
+        ]
     
     def __str__(self):
         end_info = f" to {self.end_date}" if self.end_date else " (current)"
@@ -164,12 +207,100 @@ class CertificateNotification(BaseModel):
     certificate = models.ForeignKey(CrewCertificate, related_name='notifications', on_delete=models.CASCADE)
     notification_date = models.DateField(auto_now_add=True)
     days_before_expiry = models.IntegerField()
+    notified_expiry_date = models.DateField(help_text="Certificate expiry date the notification was raised for")
     status = models.CharField(max_length=15, choices=STATUS_CHOICES, default='PENDING')
     message = models.TextField()
     sent_to = models.EmailField(blank=True, null=True)
     
     class Meta:
         ordering = ['-created_at']
+        constraints = [
+            # One notification per certificate, expiry cycle and threshold (see crew.notifications)
+            models.UniqueConstraint(
+                fields=['certificate', 'notified_expiry_date', 'days_before_expiry'], name='crew_notification_threshold'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"Notification for {self.certificate.certificate_name} - {self.certificate.crew.name}"
+
+class NotificationReconciliation(models.Model):
+    """
+    Per-day watermark of the certificate notification reconciliation
+    (see crew.notifications.reconcile_notifications).
+    """
+    day = models.DateField(unique=True)
+    full = models.BooleanField(default=False, help_text="Whether every certificate in the window was checked")
+    certificates_checked = models.PositiveIntegerField(default=0)
+    notifications_created = models.PositiveIntegerField(default=0)
+    notifications_updated = models.PositiveIntegerField(default=0)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-day']
+    
+    def __str__(self):
+        return f"Certificate notifications reconciled for {self.day}"
+
+
+class RankCertificateRequirement(models.Model):
+    """
+    Certificate type required for a rank. Entries without a vessel type
+    are the default requirements of the rank; entries with one override
+    the defaults on vessels of that type, adding the certificate type or,
+    with `required` unset, waiving it.
+    """
+    rank = models.CharField(max_length=20, choices=Crew.RANK_CHOICES)
+    certificate_type = models.CharField(max_length=20, choices=CrewCertificate.CERTIFICATE_TYPES)
+    vessel_type = models.CharField(
+        max_length=100, blank=True, default='',
+        help_text="Leave empty for the rank's default; matched case-insensitively against Vessel.vessel_type"
+    )
+    required = models.BooleanField(default=True, help_text="Unset on a vessel type override to waive the requirement")
+    notes = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['rank', 'vessel_type', 'certificate_type']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['rank', 'certificate_type', 'vessel_type'], name='crew_rank_certificate_requirement'
+            ),
+        ]
+    
+    def __str__(self):
+        scope = f" on {self.vessel_type}" if self.vessel_type else ""
+        state = "required" if self.required else "waived"
+        return f"{self.get_rank_display()}: {self.get_certificate_type_display()} {state}{scope}"
+
+
+class CrewOnboardingBatch(BaseModel):
+    """
+    A bulk crew import. The crew rows are created by the import; their user
+    accounts and credential emails are provisioned afterwards in the
+    background (see crew.onboarding).
+    """
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('PROVISIONING', 'Provisioning Accounts'),
+        ('COMPLETED', 'Completed'),
+        ('FAILED', 'Failed'),
+    ]
+    
+    file_name = models.CharField(max_length=255)
+    status = models.CharField(max_length=15, choices=STATUS_CHOICES, default='PENDING')
+    crew = models.ManyToManyField(Crew, related_name='onboarding_batches', blank=True)
+    rows_imported = models.PositiveIntegerField(default=0)
+    rows_rejected = models.PositiveIntegerField(default=0)
+    accounts_created = models.PositiveIntegerField(default=0)
+    emails_sent = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name_plural = "Crew onboarding batches"
     
     def __str__(self):
-        return f"Notification for {self.certificate.certificate_name} - {self.certificate.crew.name}"
\ No newline at end of file
+        return f"Onboarding of {self.file_name} ({self.get_status_display()})"
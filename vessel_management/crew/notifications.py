@@ -0,0 +1,252 @@
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, Count, IntegerField, Max, Q, Value, When
+from django.utils import timezone
+
+from .models import CrewCertificate, CertificateNotification, NotificationReconciliation
+
+
+# Notify at 90, 60 and 30 days before expiry; 0 marks an expired certificate
+THRESHOLDS = (30, 60, 90)
+EXPIRED = 0
+
+VERSION_CACHE_KEY = 'crew:certificate-notification-version'
+COUNTS_CACHE_KEY = 'crew:certificate-notification-counts'
+TOP_CACHE_KEY = 'crew:certificate-notification-top'
+CACHE_TIMEOUT = 300
+TOP_NOTIFICATIONS = 10
+
+
+def expiry_threshold(days_until_expiry):
+    """Notification threshold of a certificate, or None while it is further than 90 days from expiry"""
+    if days_until_expiry < 0:
+        return EXPIRED
+    for threshold in THRESHOLDS:
+        if days_until_expiry <= threshold:
+            return threshold
+    return None
+
+
+def notification_message(certificate, today):
+    """Notification text of a certificate; expects `certificate.crew` to be loaded"""
+    days_until_expiry = (certificate.expiry_date - today).days
+    if days_until_expiry < 0:
+        return (
+            f'⚠️ URGENT: Certificate {certificate.certificate_name} for {certificate.crew.name} '
+            f'has been expired for {-days_until_expiry} days. Please renew immediately!'
+        )
+    threshold = expiry_threshold(days_until_expiry)
+    urgency = "⚠️ URGENT" if threshold == 30 else "⚠️" if threshold == 60 else ""
+    return (
+        f'{urgency} Certificate {certificate.certificate_name} for {certificate.crew.name} '
+        f'will expire in {days_until_expiry} days on {certificate.expiry_date}.'
+    ).strip()
+
+
+def threshold_expression(today):
+    """SQL expression of a certificate's notification threshold on `today` (NULL outside the window)"""
+    whens = [When(expiry_date__lt=today, then=Value(EXPIRED))] + [
+        When(expiry_date__lte=today + timedelta(days=threshold), then=Value(threshold))
+        for threshold in THRESHOLDS
+    ]
+    return Case(*whens, default=Value(None), output_field=IntegerField())
+
+
+def reconcile_certificates(certificates, today=None):
+    """
+    Bring the notifications of `certificates` (a queryset) in line with
+    their current threshold, writing only the difference.
+
+    Notifications belong to an expiry cycle: the expiry date they were
+    raised for. Renewing a certificate starts a new cycle, so the
+    acknowledged and resolved notifications of the previous one never stand
+    in for the alerts of the next. The desired (certificate, expiry date,
+    threshold) keys are computed in SQL and diffed against the existing
+    notifications:
+      - a missing key reuses the certificate's pending notification of an
+        earlier threshold or cycle when there is one, otherwise it is created;
+      - pending notifications at the current threshold get their message
+        refreshed when the day count in it changed;
+      - pending notifications left at a superseded threshold are deleted,
+        and those of certificates back outside the window (renewed) are
+        resolved.
+    Acknowledged and resolved notifications are never touched. Returns the
+    number of certificates checked and notifications created, updated and
+    deleted.
+    """
+    today = today or timezone.localdate()
+    certificate_ids = certificates.values('id')
+    certificates = list(
+        certificates.annotate(threshold=threshold_expression(today))
+        .select_related('crew')
+        .only('id', 'certificate_name', 'expiry_date', 'crew__name', 'crew__email')
+    )
+    existing = {}
+    for notification in CertificateNotification.objects.filter(
+        certificate_id__in=certificate_ids
+    ).order_by('-created_at'):
+        existing.setdefault(notification.certificate_id, []).append(notification)
+
+    system_user_id = get_user_model().objects.filter(is_superuser=True).values_list('id', flat=True).first()
+    created, updated, deleted = [], [], []
+    for certificate in certificates:
+        notifications = existing.get(certificate.id, [])
+        pending = [notification for notification in notifications if notification.status == 'PENDING']
+        if certificate.threshold is None:
+            for notification in pending:
+                notification.status = 'RESOLVED'
+                updated.append(notification)
+            continue
+
+        message = notification_message(certificate, today)
+        key = (certificate.expiry_date, certificate.threshold)
+        current = [n for n in notifications if (n.notified_expiry_date, n.days_before_expiry) == key]
+        stale = [n for n in pending if (n.notified_expiry_date, n.days_before_expiry) != key]
+        if current:
+            if current[0].status == 'PENDING' and current[0].message != message:
+                current[0].message = message
+                updated.append(current[0])
+        elif stale:
+            notification = stale.pop(0)
+            notification.notified_expiry_date = certificate.expiry_date
+            notification.days_before_expiry = certificate.threshold
+            notification.message = message
+            updated.append(notification)
+        else:
+            created.append(CertificateNotification(
+                certificate_id=certificate.id,
+                notified_expiry_date=certificate.expiry_date,
+                days_before_expiry=certificate.threshold,
+                status='PENDING',
+                message=message,
+                sent_to=certificate.crew.email,
+                created_by_id=system_user_id,
+                updated_by_id=system_user_id,
+            ))
+        deleted += [notification.id for notification in stale]
+
+    now = timezone.now()
+    for notification in updated:
+        notification.updated_by_id = system_user_id
+        notification.updated_at = now
+    with transaction.atomic():
+        if deleted:
+            CertificateNotification.objects.filter(id__in=deleted).delete()
+        CertificateNotification.objects.bulk_update(
+            updated, ['notified_expiry_date', 'days_before_expiry', 'status', 'message', 'updated_by', 'updated_at'],
+            batch_size=1000,
+        )
+        # Conflicts are keys inserted by a concurrent run
+        CertificateNotification.objects.bulk_create(created, batch_size=1000, ignore_conflicts=True)
+    if created or updated or deleted:
+        invalidate_notification_cache()
+    return {'checked': len(certificates), 'created': len(created), 'updated': len(updated), 'deleted': len(deleted)}
+
+
+def sync_notifications(today=None):
+    """
+    Full reconciliation: every certificate within the window, plus those
+    with a pending notification so renewed ones are resolved
+    """
+    today = today or timezone.localdate()
+    pending = CertificateNotification.objects.filter(status='PENDING').values('certificate_id')
+    return reconcile_certificates(
+        CrewCertificate.objects.filter(
+            Q(expiry_date__lte=today + timedelta(days=max(THRESHOLDS))) | Q(id__in=pending)
+        ),
+        today,
+    )
+
+
+def crossing_filter(last, today):
+    """
+    Certificates whose threshold changed on a day in (last, today]: those
+    reaching 90, 60 or 30 days before expiry, or expiring, on one of them
+    """
+    windows = [
+        Q(expiry_date__gte=last + timedelta(days=threshold + 1), expiry_date__lte=today + timedelta(days=threshold))
+        for threshold in THRESHOLDS
+    ]
+    windows.append(Q(expiry_date__gte=last, expiry_date__lt=today))
+    return reduce(or_, windows)
+
+
+def reconcile_notifications(today=None):
+    """
+    Daily incremental reconciliation of certificate notifications.
+
+    Only certificates crossing a threshold since the last reconciled day,
+    and those with a pending notification whose day count has to be
+    refreshed, are checked, so a run costs a few indexed queries. The first
+    run (or a run after a gap longer than the window) is a full
+    sync_notifications(). Each day is recorded once as a
+    NotificationReconciliation watermark; returns None when today is
+    already reconciled.
+    """
+    today = today or timezone.localdate()
+    with transaction.atomic():
+        watermark, created = NotificationReconciliation.objects.get_or_create(day=today)
+        if not created:
+            return None
+        last = NotificationReconciliation.objects.filter(day__lt=today).aggregate(day=Max('day'))['day']
+        watermark.full = last is None or (today - last).days > max(THRESHOLDS)
+        if watermark.full:
+            result = sync_notifications(today)
+        else:
+            pending = CertificateNotification.objects.filter(status='PENDING').values('certificate_id')
+            result = reconcile_certificates(
+                CrewCertificate.objects.filter(crossing_filter(last, today) | Q(id__in=pending)), today
+            )
+
+        watermark.certificates_checked = result['checked']
+        watermark.notifications_created = result['created']
+        watermark.notifications_updated = result['updated']
+        watermark.completed_at = timezone.now()
+        watermark.save()
+    return result
+
+
+def cache_version():
+    """Current version of the cached notification summaries, bumped whenever a notification changes"""
+    return cache.get_or_set(VERSION_CACHE_KEY, 1, None)
+
+
+def notification_counts():
+    """Pending notification counts (total, expired and expiring), computed in one query and cached"""
+    key = f'{COUNTS_CACHE_KEY}:{cache_version()}'
+    counts = cache.get(key)
+    if counts is None:
+        counts = CertificateNotification.objects.filter(status='PENDING').aggregate(
+            total=Count('id'),
+            expired=Count('id', filter=Q(days_before_expiry=EXPIRED)),
+            expiring=Count('id', filter=Q(days_before_expiry__gt=EXPIRED)),
+        )
+        cache.set(key, counts, CACHE_TIMEOUT)
+    return counts
+
+
+def top_notifications(limit=TOP_NOTIFICATIONS):
+    """The `limit` most urgent pending notifications (expired first, then closest threshold), cached"""
+    key = f'{TOP_CACHE_KEY}:{limit}:{cache_version()}'
+    notifications = cache.get(key)
+    if notifications is None:
+        notifications = list(
+            CertificateNotification.objects.filter(status='PENDING')
+            .select_related('certificate__crew')
+            .order_by('days_before_expiry', 'certificate__expiry_date', '-created_at')[:limit]
+        )
+        cache.set(key, notifications, CACHE_TIMEOUT)
+    return notifications
+
+
+def invalidate_notification_cache():
+    """Move to a new cache version; entries of the old one simply expire"""
+    try:
+        cache.incr(VERSION_CACHE_KEY)
+    except ValueError:
+        cache.set(VERSION_CACHE_KEY, 1, None)
@@ -0,0 +1,266 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.validators import validate_email
+from django.db import transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+from django.utils.html import strip_tags
+
+from authentication.models import UserProfile
+from vessel_pms.utils import ImportReport
+from .models import Crew, CrewOnboardingBatch
+from .signals import generate_crew_password
+from .utils import crew_credentials_email
+
+
+REQUIRED_COLUMNS = [
+    'name', 'rank', 'nationality', 'date_of_birth', 'passport_number', 'seaman_book_number',
+    'phone_number', 'email', 'address', 'emergency_contact_name', 'emergency_contact_phone',
+]
+OPTIONAL_COLUMNS = ['medical_information', 'notes']
+# Documents and emails identify a crew member: unique within the file and not yet registered
+UNIQUE_COLUMNS = ['passport_number', 'seaman_book_number', 'email']
+PHONE_PATTERN = r'\+?1?\d{9,15}'
+# PBKDF2 runs in OpenSSL with the GIL released, so threads hash in parallel
+HASH_WORKERS = min(8, os.cpu_count() or 1)
+EMAIL_BATCH_SIZE = 100
+
+
+def normalize_header(label):
+    return '_'.join(str(label).strip().lower().split())
+
+
+def read_roster(file, name=None):
+    """Crew roster of a CSV or Excel upload as a dataframe of strings, with normalized headers"""
+    name = (name or getattr(file, 'name', '') or '').lower()
+    if name.endswith(('.xlsx', '.xlsm', '.xls')):
+        df = pd.read_excel(file, dtype=str)
+    else:
+        df = pd.read_csv(file, dtype=str)
+    df.columns = [normalize_header(column) for column in df.columns]
+    return df
+
+
+def is_email(value):
+    try:
+        validate_email(value)
+    except ValidationError:
+        return False
+    return True
+
+
+class CrewOnboardingImporter:
+    """
+    Bulk import of a manning agency crew roster.
+
+    Rows are validated column-wise with pandas, documents and emails are
+    checked against the database with one query per column, and the valid
+    rows are written with bulk_create, so no per-crew signal runs: user
+    accounts and credential emails are left to provision_accounts() on the
+    returned CrewOnboardingBatch. In dry-run mode the transaction is rolled
+    back and no batch is kept.
+    """
+
+    def __init__(self, dry_run=False, chunk_size=500, user=None):
+        self.dry_run = dry_run
+        self.chunk_size = chunk_size
+        self.user = user
+        self.report = ImportReport()
+
+    def reject(self, mask, message, source='crew', offset=2):
+        """Record an error for every row selected by `mask` (spreadsheet row numbers)"""
+        for index in mask[mask].index:
+            self.report.add_error(source, int(index) + offset, message)
+
+    def validate(self, df):
+        """Crew field values of the valid rows of a roster; invalid rows are reported and skipped"""
+        missing = [column for column in REQUIRED_COLUMNS if column not in df]
+        if missing:
+            self.report.add_error('crew', None, f"Missing columns: {', '.join(missing)}")
+            return []
+
+        values = pd.DataFrame({
+            column: df[column].fillna('').astype(str).str.strip() if column in df else ''
+            for column in REQUIRED_COLUMNS + OPTIONAL_COLUMNS
+        }, index=df.index)
+        invalid = pd.Series(False, index=df.index)
+        for column in REQUIRED_COLUMNS:
+            blank = values[column].eq('')
+            self.reject(blank & ~invalid, f'{column} is required')
+            invalid |= blank
+
+        # Ranks by code or label, any case ('CHIEF_OFFICER', 'Chief Officer')
+        ranks = {code.replace('_', ' '): code for code, _ in Crew.RANK_CHOICES}
+        ranks.update({label.upper(): code for code, label in Crew.RANK_CHOICES})
+        values['rank'] = values['rank'].str.upper().str.replace('_', ' ').map(ranks)
+        bad = values['rank'].isna() & ~invalid
+        self.reject(bad, 'Unknown rank')
+        invalid |= bad
+
+        dates = pd.to_datetime(values['date_of_birth'], errors='coerce', format='ISO8601')
+        bad = dates.isna() & ~invalid
+        self.reject(bad, 'date_of_birth must be a date (YYYY-MM-DD)')
+        invalid |= bad
+        values['date_of_birth'] = dates.dt.date
+
+        for column in ('phone_number', 'emergency_contact_phone'):
+            values[column] = values[column].str.replace(r'[\s().-]', '', regex=True)
+            bad = ~values[column].str.fullmatch(PHONE_PATTERN) & ~invalid
+            self.reject(bad, f"{column} must be in the format '+999999999' with up to 15 digits")
+            invalid |= bad
+
+        bad = ~values['email'].map(is_email) & ~invalid
+        self.reject(bad, 'Invalid email address')
+        invalid |= bad
+
+        for column in ('name', 'nationality', 'passport_number', 'seaman_book_number', 'email',
+                       'emergency_contact_name'):
+            max_length = Crew._meta.get_field(column).max_length
+            bad = values[column].str.len().gt(max_length) & ~invalid
+            self.reject(bad, f'{column} is longer than {max_length} characters')
+            invalid |= bad
+
+        keys = {column: values[column].str.lower() if column == 'email' else values[column]
+                for column in UNIQUE_COLUMNS}
+        registered = {
+            'passport_number': set(Crew.objects.filter(
+                passport_number__in=keys['passport_number'][~invalid].tolist()
+            ).values_list('passport_number', flat=True)),
+            'seaman_book_number': set(Crew.objects.filter(
+                seaman_book_number__in=keys['seaman_book_number'][~invalid].tolist()
+            ).values_list('seaman_book_number', flat=True)),
+            'email': set(
+                get_user_model().objects.annotate(email_lower=Lower('email'))
+                .filter(email_lower__in=keys['email'][~invalid].tolist()).values_list('email_lower', flat=True)
+            ) | set(
+                Crew.objects.annotate(email_lower=Lower('email'))
+                .filter(email_lower__in=keys['email'][~invalid].tolist()).values_list('email_lower', flat=True)
+            ),
+        }
+        for column in UNIQUE_COLUMNS:
+            bad = keys[column].isin(registered[column]) & ~invalid
+            self.reject(bad, f'{column} is already registered')
+            invalid |= bad
+            bad = keys[column].where(~invalid).duplicated() & keys[column].where(~invalid).notna()
+            self.reject(bad, f'Duplicate {column}, already used by an earlier row')
+            invalid |= bad
+
+        values['medical_information'] = values['medical_information'].replace('', None)
+        values['notes'] = values['notes'].replace('', None)
+        return values[~invalid].to_dict('records')
+
+    def run(self, df, file_name=''):
+        """Import a roster dataframe; returns the report and the batch to provision (None on a dry run or without rows)"""
+        batch = None
+        with transaction.atomic():
+            records = self.validate(df)
+            crew = Crew.objects.bulk_create([Crew(**values) for values in records], batch_size=self.chunk_size)
+            self.report.count('crew', 'created', len(crew))
+            if self.dry_run:
+                transaction.set_rollback(True)
+            elif crew:
+                batch = CrewOnboardingBatch.objects.create(
+                    file_name=file_name,
+                    rows_imported=len(crew),
+                    rows_rejected=len({error['row'] for error in self.report.errors}),
+                    errors=self.report.errors,
+                    created_by=self.user,
+                    updated_by=self.user,
+                )
+                batch.crew.add(*crew)
+        return self.report, batch
+
+
+def credentials_message(crew, password):
+    """Credentials email of a new crew account as a multipart message"""
+    subject, content = crew_credentials_email(crew, password)
+    message = EmailMultiAlternatives(
+        subject=subject,
+        body=strip_tags(content),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[crew.email],
+    )
+    message.attach_alternative(content, 'text/html')
+    return message
+
+
+def send_batched(messages, errors):
+    """Send `messages` over one mail connection in chunks of EMAIL_BATCH_SIZE; returns the number sent"""
+    sent = 0
+    with get_connection() as connection:
+        for start in range(0, len(messages), EMAIL_BATCH_SIZE):
+            chunk = messages[start:start + EMAIL_BATCH_SIZE]
+            try:
+                sent += connection.send_messages(chunk) or 0
+            except Exception as error:
+                errors.append({'source': 'email', 'row': None, 'message': f'{len(chunk)} emails not sent: {error}'})
+    return sent
+
+
+def provision_accounts(batch, workers=HASH_WORKERS):
+    """
+    Create the user accounts of an onboarding batch and email their credentials.
+
+    Passwords are hashed in a thread pool, users and their profiles are
+    written with bulk_create (skipping the per-user signals, which would
+    save each user twice and send a second welcome email) and the
+    credential emails go out over a single mail connection. Crew members
+    who already have an account are skipped, so running a batch again is
+    harmless. Returns the number of accounts created and emails sent.
+    """
+    User = get_user_model()
+    batch.status = 'PROVISIONING'
+    batch.save(update_fields=['status', 'updated_at'])
+
+    crew = list(batch.crew.order_by('id'))
+    existing = set(
+        User.objects.annotate(email_lower=Lower('email'))
+        .filter(email_lower__in=[member.email.lower() for member in crew]).values_list('email_lower', flat=True)
+    )
+    pending = [member for member in crew if member.email.lower() not in existing]
+    passwords = [generate_crew_password(member) for member in pending]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        hashes = list(pool.map(make_password, passwords))
+
+    users = [
+        User(
+            username=member.email,
+            email=member.email,
+            password=hashed,
+            first_name=member.name.split()[0],
+            last_name=' '.join(member.name.split()[1:]),
+            role=User.Role.CREW_MEMBER,
+            # As authentication.signals does for every new user
+            is_staff=True,
+        )
+        for member, hashed in zip(pending, hashes)
+    ]
+    errors = list(batch.errors)
+    try:
+        with transaction.atomic():
+            User.objects.bulk_create(users, batch_size=500)
+            UserProfile.objects.bulk_create([UserProfile(user=user) for user in users], batch_size=500)
+    except Exception as error:
+        errors.append({'source': 'accounts', 'row': None, 'message': str(error)})
+        batch.status = 'FAILED'
+        batch.errors = errors
+        batch.save(update_fields=['status', 'errors', 'updated_at'])
+        return {'accounts_created': 0, 'emails_sent': 0}
+
+    sent = send_batched(
+        [credentials_message(member, password) for member, password in zip(pending, passwords)], errors
+    )
+    batch.accounts_created += len(users)
+    batch.emails_sent += sent
+    batch.errors = errors
+    batch.status = 'COMPLETED'
+    batch.completed_at = timezone.now()
+    batch.save()
+    return {'accounts_created': len(users), 'emails_sent': sent}
@@ -0,0 +1,293 @@
+from datetime import date, timedelta
+
+import numpy as np
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
+from .compliance import CERTIFICATE_TYPES, mask_types, required_mask, requirement_matrix
+from .models import Crew, CrewAssignment, CrewCertificate
+
+
+DEFAULT_HORIZON_DAYS = 30
+# Days ashore a relief needs after signing off, so members leaving a vessel are not sent straight back
+MIN_REST_DAYS = 14
+# Score caps: beyond these, more experience, rest or certificate margin stops counting
+EXPERIENCE_CAP = 3
+REST_CAP_DAYS = 90
+MARGIN_CAP_DAYS = 365
+WEIGHTS = {'experience': 2.0, 'rest': 1.0, 'margin': 1.0}
+# Above this many changes or candidates in one rank, the O(n²m) Hungarian solver gives way to greedy matching
+HUNGARIAN_MAX_SIZE = 500
+# Assignment cost of an ineligible pair: high enough that a solution never trades a filled change for a better score
+FORBIDDEN = 1e6
+OPEN_END = date.max.toordinal()
+
+
+def hungarian(cost):
+    """
+    Minimum cost assignment of the rows of `cost` to distinct columns
+    (Kuhn-Munkres with potentials, rows <= columns), as a column per row.
+    The scan over the columns in each step is vectorized.
+    """
+    rows, columns = cost.shape
+    u, v = np.zeros(rows + 1), np.zeros(columns + 1)
+    # Column 0 is the virtual start column; match[j] is the 1-based row of column j
+    match = np.zeros(columns + 1, dtype=int)
+    way = np.zeros(columns + 1, dtype=int)
+    for row in range(1, rows + 1):
+        match[0] = row
+        column = 0
+        minv = np.full(columns + 1, np.inf)
+        used = np.zeros(columns + 1, dtype=bool)
+        while match[column]:
+            used[column] = True
+            current = match[column]
+            reduced = cost[current - 1] - u[current] - v[1:]
+            free = ~used[1:]
+            better = free & (reduced < minv[1:])
+            minv[1:][better] = reduced[better]
+            way[1:][better] = column
+            slack = np.where(free, minv[1:], np.inf)
+            following = int(np.argmin(slack)) + 1
+            delta = slack[following - 1]
+            u[match[used]] += delta
+            v[used] -= delta
+            minv[1:][free] -= delta
+            column = following
+        while column:
+            previous = way[column]
+            match[column] = match[previous]
+            column = previous
+    assignment = np.full(rows, -1)
+    matched = np.nonzero(match[1:])[0]
+    assignment[match[1:][matched] - 1] = matched
+    return assignment
+
+
+def greedy(score, eligible):
+    """Pairs taken best score first while both sides are free; a column per row, -1 when unmatched"""
+    rows, columns = np.nonzero(eligible)
+    order = np.argsort(-score[rows, columns], kind='stable')
+    assignment = np.full(score.shape[0], -1)
+    taken = np.zeros(score.shape[1], dtype=bool)
+    for row, column in zip(rows[order], columns[order]):
+        if assignment[row] < 0 and not taken[column]:
+            assignment[row] = column
+            taken[column] = True
+    return assignment
+
+
+def match(score, eligible, method='auto'):
+    """
+    Candidate (column) per change (row) maximizing the total score over
+    eligible pairs, -1 for changes left unfilled. `method` is 'hungarian'
+    (optimal), 'greedy' or 'auto' (Hungarian up to HUNGARIAN_MAX_SIZE).
+    """
+    if not score.size:
+        return np.full(score.shape[0], -1)
+    if method == 'auto':
+        method = 'hungarian' if max(score.shape) <= HUNGARIAN_MAX_SIZE else 'greedy'
+    if method == 'greedy':
+        return greedy(score, eligible)
+    cost = np.where(eligible, -score, FORBIDDEN)
+    if score.shape[0] <= score.shape[1]:
+        assignment = hungarian(cost)
+    else:
+        by_column = hungarian(cost.T)
+        assignment = np.full(score.shape[0], -1)
+        assignment[by_column] = np.arange(len(by_column))
+    rows = np.nonzero(assignment >= 0)[0]
+    assignment[rows[~eligible[rows, assignment[rows]]]] = -1
+    return assignment
+
+
+class ReliefMatcher:
+    """
+    Picks reliefs for every crew change coming up fleet-wide in one batch.
+
+    A change is a current assignment ending within the horizon. Its relief
+    joins on the end date for a contract as long as the relieved one (or
+    `contract_days`), and must have the same rank, be free for the whole
+    contract, have rested MIN_REST_DAYS since signing off, and hold a
+    certificate of each type the rank requires on the vessel (see
+    crew.compliance.requirement_matrix) valid through the contract.
+    Eligible pairs are scored on experience on the vessel, days rested and
+    certificate margin past the contract end.
+
+    Candidates are loaded once as feature arrays (certificate horizons per
+    type, recent assignment periods, vessel experience); eligibility and
+    scores are computed per rank as candidate x change matrices, and since
+    ranks never mix each rank is matched on its own.
+    """
+
+    def __init__(self, today=None, horizon_days=DEFAULT_HORIZON_DAYS, contract_days=None,
+                 min_rest_days=MIN_REST_DAYS, method='auto'):
+        self.today = today or timezone.localdate()
+        self.horizon_days = horizon_days
+        self.contract_days = contract_days
+        self.min_rest_days = min_rest_days
+        self.method = method
+
+    def load_changes(self, vessel_ids=None):
+        """Current assignments ending within the horizon, with the certificate types their relief needs"""
+        assignments = CrewAssignment.objects.filter(
+            is_current=True, end_date__gte=self.today, end_date__lte=self.today + timedelta(days=self.horizon_days)
+        )
+        if vessel_ids:
+            assignments = assignments.filter(vessel_id__in=vessel_ids)
+        changes = list(
+            assignments.order_by('end_date', 'id').values(
+                'id', 'crew_id', 'crew__name', 'vessel_id', 'vessel__name', 'vessel__vessel_type', 'rank',
+                'start_date', 'end_date'
+            )
+        )
+        matrix = requirement_matrix()
+        for change in changes:
+            length = self.contract_days or max((change['end_date'] - change['start_date']).days, 1)
+            change['relief_date'] = change['end_date']
+            change['contract_end'] = change['end_date'] + timedelta(days=length)
+            change['certificate_types'] = mask_types(
+                required_mask(matrix, change['rank'], change['vessel__vessel_type'])
+            )
+        return changes
+
+    def load_candidates(self, ranks, vessel_ids):
+        """
+        Active crew of `ranks` with their features: latest expiry per
+        certificate type, assignments recent enough to matter for rest and
+        availability, and past assignment counts on `vessel_ids`
+        """
+        crew = Crew.objects.filter(is_active=True, rank__in=ranks)
+        candidates = list(crew.order_by('id').values_list('id', 'name', 'rank'))
+        index = {crew_id: position for position, (crew_id, _, _) in enumerate(candidates)}
+
+        horizons = np.zeros((len(candidates), len(CERTIFICATE_TYPES)), dtype=np.int64)
+        type_index = {certificate_type: position for position, certificate_type in enumerate(CERTIFICATE_TYPES)}
+        for crew_id, certificate_type, expiry in (
+            CrewCertificate.objects.filter(crew__in=crew)
+            .values('crew_id', 'certificate_type').annotate(expiry=Max('expiry_date'))
+            .values_list('crew_id', 'certificate_type', 'expiry')
+        ):
+            horizons[index[crew_id], type_index[certificate_type]] = expiry.toordinal()
+
+        lookback = self.today - timedelta(days=max(REST_CAP_DAYS, self.min_rest_days))
+        periods = np.array([
+            (index[crew_id], start.toordinal(), end.toordinal() if end else OPEN_END)
+            for crew_id, start, end in CrewAssignment.objects.filter(crew__in=crew).filter(
+                Q(end_date__isnull=True) | Q(end_date__gte=lookback)
+            ).values_list('crew_id', 'start_date', 'end_date')
+        ], dtype=np.int64).reshape(-1, 3)
+
+        experience = {
+            (index[crew_id], vessel_id): count
+            for crew_id, vessel_id, count in CrewAssignment.objects.filter(crew__in=crew, vessel_id__in=vessel_ids)
+            .values('crew_id', 'vessel_id').annotate(count=Count('id')).values_list('crew_id', 'vessel_id', 'count')
+        }
+        return {
+            'ids': np.array([crew_id for crew_id, _, _ in candidates], dtype=np.int64),
+            'names': [name for _, name, _ in candidates],
+            'ranks': np.array([rank for _, _, rank in candidates], dtype=object),
+            'horizons': horizons,
+            'periods': periods,
+            'experience': experience,
+        }
+
+    def features(self, candidates, members, changes):
+        """Eligibility and score matrices (candidates `members` x `changes`) with the per-pair features"""
+        starts = np.array([change['relief_date'].toordinal() for change in changes], dtype=np.int64)
+        ends = np.array([change['contract_end'].toordinal() for change in changes], dtype=np.int64)
+        local = np.full(len(candidates['ids']), -1)
+        local[members] = np.arange(len(members))
+
+        # Busy: an assignment overlapping [relief date, contract end); rest: days since the last sign-off before it
+        busy = np.zeros((len(members), len(changes)), dtype=bool)
+        last_off = np.full((len(members), len(changes)), np.iinfo(np.int64).min, dtype=np.int64)
+        periods = candidates['periods']
+        periods = periods[local[periods[:, 0]] >= 0]
+        if len(periods):
+            rows = local[periods[:, 0]]
+            period_starts, period_ends = periods[:, 1:2], periods[:, 2:3]
+            np.logical_or.at(busy, rows, (period_starts < ends) & (period_ends > starts))
+            np.maximum.at(last_off, rows, np.where(period_ends <= starts, period_ends, np.iinfo(np.int64).min))
+        rested = np.where(last_off == np.iinfo(np.int64).min, REST_CAP_DAYS, starts - last_off)
+
+        # Certificate margin: days the earliest required certificate stays valid past the contract end
+        required = np.array([
+            [certificate_type in change['certificate_types'] for certificate_type in CERTIFICATE_TYPES]
+            for change in changes
+        ], dtype=bool).reshape(len(changes), len(CERTIFICATE_TYPES))
+        past_end = candidates['horizons'][members][:, None, :] - ends[None, :, None]
+        margin = np.where(required[None, :, :], past_end, MARGIN_CAP_DAYS).min(axis=2)
+
+        experience = np.array([
+            [candidates['experience'].get((member, change['vessel_id']), 0) for change in changes]
+            for member in members
+        ], dtype=np.int64).reshape(len(members), len(changes))
+
+        relieved = np.array([change['crew_id'] for change in changes], dtype=np.int64)
+        eligible = (
+            ~busy & (margin > 0) & (rested >= self.min_rest_days)
+            & (candidates['ids'][members][:, None] != relieved[None, :])
+        )
+        score = (
+            WEIGHTS['experience'] * np.minimum(experience, EXPERIENCE_CAP) / EXPERIENCE_CAP
+            + WEIGHTS['rest'] * np.clip(rested, 0, REST_CAP_DAYS) / REST_CAP_DAYS
+            + WEIGHTS['margin'] * np.clip(margin, 0, MARGIN_CAP_DAYS) / MARGIN_CAP_DAYS
+        )
+        return eligible, score, {'experience': experience, 'rested': rested, 'margin': margin}
+
+    def plan(self, changes, candidates):
+        """Match every change to a relief, rank by rank, and report the plan"""
+        for rank in sorted({change['rank'] for change in changes}):
+            ranked = [change for change in changes if change['rank'] == rank]
+            members = np.nonzero(candidates['ranks'] == rank)[0]
+            eligible, score, features = self.features(candidates, members, ranked)
+            assignment = match(score.T, eligible.T, self.method)
+            for position, change in enumerate(ranked):
+                change['candidates'] = int(eligible[:, position].sum())
+                column = assignment[position]
+                if column < 0:
+                    change['relief'] = None
+                    continue
+                member = members[column]
+                change['relief'] = {
+                    'crew_id': int(candidates['ids'][member]),
+                    'name': candidates['names'][member],
+                    'score': round(float(score[column, position]), 3),
+                    'vessel_experience': int(features['experience'][column, position]),
+                    'rest_days': int(features['rested'][column, position]),
+                    'certificate_margin_days': int(features['margin'][column, position]),
+                }
+        filled = sum(1 for change in changes if change['relief'])
+        return {
+            'date': self.today,
+            'horizon_days': self.horizon_days,
+            'changes': [
+                {
+                    'assignment': change['id'],
+                    'vessel': change['vessel_id'],
+                    'vessel_name': change['vessel__name'],
+                    'rank': change['rank'],
+                    'relieved_crew': change['crew_id'],
+                    'relieved_name': change['crew__name'],
+                    'relief_date': change['relief_date'],
+                    'contract_end': change['contract_end'],
+                    'certificate_types': change['certificate_types'],
+                    'candidates': change['candidates'],
+                    'relief': change['relief'],
+                }
+                for change in changes
+            ],
+            'filled': filled,
+            'unfilled': len(changes) - filled,
+        }
+
+
+def plan_reliefs(vessel_ids=None, **options):
+    """Relief plan for the crew changes coming up on `vessel_ids` (default the whole fleet), see ReliefMatcher"""
+    matcher = ReliefMatcher(**options)
+    changes = matcher.load_changes(vessel_ids)
+    candidates = matcher.load_candidates(
+        {change['rank'] for change in changes}, {change['vessel_id'] for change in changes}
+    )
+    return matcher.plan(changes, candidates)
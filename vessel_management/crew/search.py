@@ -0,0 +1,107 @@
+import functools
+import re
+from functools import reduce
+from operator import or_
+
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connections
+from django.db.models import Case, FloatField, Q, Value, When
+from django.db.models.functions import Greatest
+
+
+# Passport, seaman book and certificate numbers: one token with at least one digit
+DOCUMENT_NUMBER = re.compile(r'^(?=.*\d)[\w/.-]{4,}$')
+
+
+@functools.lru_cache(maxsize=None)
+def trigram_available(using='default'):
+    """Whether the pg_trgm extension is installed in a database; checked once per process"""
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        return cursor.fetchone() is not None
+
+
+def greatest(expressions):
+    return Greatest(*expressions) if len(expressions) > 1 else expressions[0]
+
+
+def exact_filter(term, fields):
+    """Exact match on any of the document number `fields`, as entered or upper-cased (btree index lookups)"""
+    values = sorted({term, term.upper()})
+    return reduce(or_, [Q(**{f'{field}__in': values}) for field in fields])
+
+
+def trigram_search(queryset, term, fields, exact_fields=()):
+    """
+    Rows where the term is word-similar to one of `fields` (the %> operator)
+    or part of one of the document numbers `exact_fields` (ILIKE), both
+    served by gin_trgm_ops indexes, ordered by the best word similarity;
+    tolerates typos and transliteration variants, and finds partial
+    document numbers as the fallback does
+    """
+    condition = reduce(or_, [Q(**{f'{field}__trigram_word_similar': term}) for field in fields])
+    relevance = [TrigramWordSimilarity(term, field) for field in fields]
+    if exact_fields:
+        condition |= reduce(or_, [Q(**{f'{field}__icontains': term}) for field in exact_fields])
+        relevance.append(Case(
+            *[When(**{f'{field}__istartswith': term}, then=Value(0.75)) for field in exact_fields],
+            *[When(**{f'{field}__icontains': term}, then=Value(0.5)) for field in exact_fields],
+            default=Value(0.0),
+            output_field=FloatField(),
+        ))
+    return queryset.filter(condition).annotate(relevance=greatest(relevance)).order_by('-relevance', 'pk')
+
+
+def contains_search(queryset, term, fields):
+    """
+    Fallback without pg_trgm: every word of the term contained in one of
+    `fields`, ranked exact match first, then the term as a whole word
+    (leading ones first), as a prefix, as a word prefix and as a substring
+    """
+    for word in term.split():
+        queryset = queryset.filter(reduce(or_, [Q(**{f'{field}__icontains': word}) for field in fields]))
+    # \m and \M are word boundaries in PostgreSQL regular expressions
+    pattern = re.escape(term)
+    levels = [
+        ('iexact', term, 1.0),
+        ('iregex', rf'^{pattern}\M', 0.9),
+        ('iregex', rf'\m{pattern}\M', 0.75),
+        ('istartswith', term, 0.6),
+        ('iregex', rf'\m{pattern}', 0.5),
+        ('icontains', term, 0.4),
+    ]
+    relevance = greatest([
+        Case(
+            *[When(**{f'{field}__{lookup}': value}, then=Value(level)) for lookup, value, level in levels],
+            default=Value(0.25),
+            output_field=FloatField(),
+        )
+        for field in fields
+    ])
+    return queryset.annotate(relevance=relevance).order_by('-relevance', 'pk')
+
+
+def search(queryset, term, fields, exact_fields=()):
+    """
+    Relevance-ordered search of `term` over the text `fields` and the
+    document number `exact_fields`.
+
+    A term shaped like a document number is first looked up exactly on
+    `exact_fields`; when that finds rows they are the result. Otherwise the
+    text fields are searched by trigram word similarity when pg_trgm is
+    installed, or by ranked substring matching when it is not. Results are
+    annotated with their `relevance`.
+    """
+    term = ' '.join(term.split())
+    if not term:
+        return queryset
+    if exact_fields and DOCUMENT_NUMBER.match(term):
+        exact = queryset.filter(exact_filter(term, exact_fields))
+        if exact.exists():
+            return exact.annotate(relevance=Value(1.0, output_field=FloatField())).order_by('pk')
+    if trigram_available(queryset.db):
+        return trigram_search(queryset, term, fields, exact_fields)
+    return contains_search(queryset, term, list(fields) + list(exact_fields))
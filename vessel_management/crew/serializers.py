@@ -1,6 +1,9 @@
 # crew/serializers.py
 from rest_framework import serializers
-from .models import Crew, CrewCertificate, CrewAssignment, CertificateNotification
+from django.utils import timezone
+from .models import (
+    Crew, CrewCertificate, CrewAssignment, CertificateNotification, RankCertificateRequirement, CrewOnboardingBatch
+)
 from core.models import Vessel
 
 
@@ -17,11 +20,15 @@ class CrewCertificateSerializer(serializers.ModelSerializer):
             'days_until_expiry', 'is_expired', 'created_at', 'updated_at'
         ]
     
+    def reference_date(self):
+        """Date the expiry fields are computed against, fixed for the whole representation"""
+        return self.context.setdefault('today', timezone.now().date())
+    
     def get_days_until_expiry(self, obj):
-        return obj.days_until_expiry()
+        return (obj.expiry_date - self.reference_date()).days
     
     def get_is_expired(self, obj):
-        return obj.is_expired()
+        return obj.expiry_date < self.reference_date()
 
 
 class CrewSerializer(serializers.ModelSerializer):
@@ -54,18 +61,35 @@ class CrewDetailSerializer(serializers.ModelSerializer):
             'current_assignment'
         ]
     
+    def reference_date(self):
+        return self.context.setdefault('today', timezone.now().date())
+    
+    def partitioned_certificates(self, obj):
+        """
+        Active and expired certificates, split in memory from the
+        certificates prefetched by CrewViewSet (or loaded here once)
+        """
+        today = self.reference_date()
+        certificates = list(obj.certificates.all())
+        return (
+            [certificate for certificate in certificates if certificate.expiry_date > today],
+            [certificate for certificate in certificates if certificate.expiry_date <= today],
+        )
+    
     def get_active_certificates(self, obj):
-        active_certs = obj.get_active_certificates()
-        return CrewCertificateSerializer(active_certs, many=True).data
+        active_certs, _ = self.partitioned_certificates(obj)
+        return CrewCertificateSerializer(active_certs, many=True, context=self.context).data
     
     def get_expired_certificates(self, obj):
-        expired_certs = obj.get_expired_certificates()
-        return CrewCertificateSerializer(expired_certs, many=True).data
+        _, expired_certs = self.partitioned_certificates(obj)
+        return CrewCertificateSerializer(expired_certs, many=True, context=self.context).data
     
     def get_current_assignment(self, obj):
-        current_assignments = obj.assignments.filter(is_current=True).first()
+        current_assignments = getattr(obj, 'current_assignments', None)
+        if current_assignments is None:
+            current_assignments = list(obj.assignments.filter(is_current=True).select_related('vessel')[:1])
         if current_assignments:
-            return CrewAssignmentSerializer(current_assignments).data
+            return CrewAssignmentSerializer(current_assignments[0], context=self.context).data
         return None
 
 
@@ -87,6 +111,13 @@ class CrewAssignmentSerializer(serializers.ModelSerializer):
             'rank', 'start_date', 'end_date', 'is_current',
             'notes', 'created_at', 'updated_at'
         ]
+    
+    def validate(self, attrs):
+        start_date = attrs.get('start_date', getattr(self.instance, 'start_date', None))
+        end_date = attrs.get('end_date', getattr(self.instance, 'end_date', None))
+        if start_date and end_date and end_date < start_date:
+            raise serializers.ValidationError({'end_date': 'End date cannot be before the start date.'})
+        return attrs
 
 
 class CertificateNotificationSerializer(serializers.ModelSerializer):
@@ -102,4 +133,33 @@ class CertificateNotificationSerializer(serializers.ModelSerializer):
             'status', 'message', 'sent_to', 'acknowledged_by',
             'acknowledged_at'
         ]
-        read_only_fields = ['notification_date']
\ No newline at end of file
+        read_only_fields = ['notification_date']
+
+
+class RankCertificateRequirementSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = RankCertificateRequirement
+        fields = [
+            'id', 'rank', 'certificate_type', 'vessel_type', 'required',
+            'notes', 'created_at', 'updated_at'
+        ]
+    
+    def validate(self, attrs):
+        vessel_type = attrs.get('vessel_type', getattr(self.instance, 'vessel_type', ''))
+        required = attrs.get('required', getattr(self.instance, 'required', True))
+        if not vessel_type and not required:
+            raise serializers.ValidationError(
+                {'required': 'Only a vessel type override can waive a certificate; delete the default instead.'}
+            )
+        return attrs
+
+
+class CrewOnboardingBatchSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CrewOnboardingBatch
+        fields = [
+            'id', 'file_name', 'status', 'rows_imported', 'rows_rejected',
+            'accounts_created', 'emails_sent', 'errors', 'crew',
+            'created_at', 'completed_at'
+        ]
+        read_only_fields = fields
@@ -1,11 +1,12 @@
 # crew/signals.py
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from django.utils import timezone
 from django.contrib.auth.models import Group
 from django.contrib.auth import get_user_model
-from django.utils.crypto import get_random_string
-from .models import CrewCertificate, CertificateNotification, Crew
+from .models import CrewCertificate, CertificateNotification, Crew, CrewAssignment, RankCertificateRequirement, Vessel
+from .notifications import reconcile_certificates, invalidate_notification_cache
+from .compliance import invalidate_compliance_cache
+from .utils import crew_credentials_email, invalidate_crew_detail
 from utils.email_service import send_email
 import random
 import string
@@ -62,47 +63,33 @@ def assign_crew_to_group(sender, instance, created, **kwargs):
 @receiver(post_save, sender=CrewCertificate)
 def check_certificate_expiry(sender, instance, created, **kwargs):
     """
-    When a certificate is created or updated, check if it's close to expiry
-    and create a single notification at the appropriate threshold.
+    When a certificate is created or updated, reconcile its notifications
+    with its current expiry threshold.
     """
     if kwargs.get('raw', False):
         return  # Skip for raw saves
     
-    today = timezone.now().date()
-    days_until_expiry = (instance.expiry_date - today).days
-    
-    # Delete any existing notifications for this certificate
-    CertificateNotification.objects.filter(certificate=instance).delete()
-    
-    # Handle expired certificates
-    if days_until_expiry < 0:
-        message = f"Certificate '{instance.certificate_name}' for {instance.crew.name} has expired {abs(days_until_expiry)} days ago."
-        CertificateNotification.objects.create(
-            certificate=instance,
-            days_before_expiry=0,
-            message=message,
-            sent_to=instance.crew.email
-        )
-        return
-    
-    # Determine which threshold we're at (90, 60, or 30 days)
-    threshold = None
-    if 0 <= days_until_expiry <= 30:
-        threshold = 30
-    elif 31 <= days_until_expiry <= 60:
-        threshold = 60
-    elif 61 <= days_until_expiry <= 90:
-        threshold = 90
-    
-    if threshold is not None:
-        # Create a new notification for the current threshold
-        message = f"Certificate '{instance.certificate_name}' for {instance.crew.name} will expire in {days_until_expiry} days on {instance.expiry_date}."
-        CertificateNotification.objects.create(
-            certificate=instance,
-            days_before_expiry=threshold,
-            message=message,
-            sent_to=instance.crew.email
-        )
+    reconcile_certificates(CrewCertificate.objects.filter(pk=instance.pk))
+
+@receiver([post_save, post_delete], sender=CertificateNotification)
+def reset_notification_counts(sender, instance, **kwargs):
+    """Invalidate the cached notification summaries when a notification changes"""
+    invalidate_notification_cache()
+
+@receiver([post_save, post_delete], sender=Crew)
+@receiver([post_save, post_delete], sender=CrewCertificate)
+@receiver([post_save, post_delete], sender=CrewAssignment)
+def reset_crew_detail(sender, instance, **kwargs):
+    """Invalidate the cached detail of the crew member a write touched"""
+    invalidate_crew_detail(instance.pk if sender is Crew else instance.crew_id)
+
+@receiver([post_save, post_delete], sender=CrewCertificate)
+@receiver([post_save, post_delete], sender=CrewAssignment)
+@receiver([post_save, post_delete], sender=RankCertificateRequirement)
+@receiver([post_save, post_delete], sender=Vessel)
+def reset_compliance(sender, instance, **kwargs):
+    """Invalidate the cached requirement matrix and manning compliance scores"""
+    invalidate_compliance_cache()
 
 @receiver(post_save, sender=Crew)
 def create_crew_user_account(sender, instance, created, **kwargs):
@@ -127,25 +114,7 @@ def create_crew_user_account(sender, instance, created, **kwargs):
         )
         
         # Send email with credentials
-        subject = "Your Vessel Management System Account"
-        content = f"""
-        <p>Hello {instance.name},</p>
-        <p>Your account has been created in the Vessel Management System.</p>
-        <p>Here are your login credentials:</p>
-        <ul>
-            <li><strong>Email:</strong> {instance.email}</li>
-            <li><strong>Password:</strong> {password}</li>
-        </ul>
-        <p>Your password is generated using your information for easy remembrance:</p>
-        <ul>
-            <li>First letter of your name</li>
-            <li>Last 4 digits of your passport number</li>
-            <li>3 random letters</li>
-        </ul>
-        <p>Please log in and change your password immediately for security reasons.</p>
-        <p>Best regards,<br>Vessel Management Team</p>
-        """
-        
+        subject, content = crew_credentials_email(instance, password)
         send_email(instance.email, subject, content)
         
     except Exception as e:
@@ -1,12 +1,37 @@
 # crew/tests.py
-from django.test import TestCase
-from django.urls import reverse
+import io
+import re
+from unittest import mock
+
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, connection, transaction
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
 from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase
 from datetime import timedelta, date
 
-from .models import Crew, CrewCertificate, Vessel, CrewAssignment, CertificateNotification
+import numpy as np
+
+from .models import (
+    Crew, CrewCertificate, Vessel, CrewAssignment, CertificateNotification, NotificationReconciliation,
+    RankCertificateRequirement
+)
+from .context_processors import certificate_notifications
+from .middleware import CertificateNotificationMiddleware
+from .availability import available_crew
+from .relief import match, plan_reliefs
+from .search import search, trigram_available
+from .onboarding import CrewOnboardingImporter, provision_accounts, read_roster
+from .compliance import fleet_compliance, requirement_matrix, required_mask, mask_types
+from .notifications import (
+    COUNTS_CACHE_KEY, cache_version, notification_counts, reconcile_notifications, sync_notifications
+)
+from .tasks import generate_certificate_notifications
 from .serializers import CrewSerializer, CrewCertificateSerializer
 
 from django.contrib.auth import get_user_model
@@ -421,4 +446,875 @@ class NotificationGenerationTests(APITestCase):
         self.assertEqual(notif_60.days_before_expiry, 60)
         
         notif_90 = CertificateNotification.objects.get(certificate=self.cert_90_days)
-        self.assertEqual(notif_90.days_before_expiry, 90)
\ No newline at end of file
+        self.assertEqual(notif_90.days_before_expiry, 90)
+
+
+class NotificationReconciliationTests(TestCase):
+    """Test cases for the daily certificate notification reconciliation"""
+    
+    def setUp(self):
+        cache.clear()
+        self.today = timezone.now().date()
+        # A rank without a user group, so the crew signals stay out of the way
+        self.crew = Crew.objects.create(
+            name="John Doe",
+            rank="COOK",
+            nationality="USA",
+            date_of_birth=date(1980, 1, 1),
+            passport_number="AB12345",
+            seaman_book_number="SBN12345",
+            phone_number="+12345678901",
+            email="john.doe@example.com",
+            address="123 Marine Drive, Seaport City",
+            emergency_contact_name="Jane Doe",
+            emergency_contact_phone="+12345678902"
+        )
+        self.certificates = {
+            days: self.create_certificate(days) for days in (-5, 10, 31, 61, 95, 200)
+        }
+        # Start from an empty table, as before the first reconciliation
+        CertificateNotification.objects.all().delete()
+    
+    def create_certificate(self, days_until_expiry):
+        return CrewCertificate.objects.create(
+            crew=self.crew,
+            certificate_type="OTHER",
+            certificate_name=f"Certificate {days_until_expiry}",
+            certificate_number=f"CERT{days_until_expiry}",
+            issue_date=self.today - timedelta(days=300),
+            expiry_date=self.today + timedelta(days=days_until_expiry),
+            issuing_authority="Maritime Authority"
+        )
+    
+    def thresholds(self):
+        return dict(CertificateNotification.objects.filter(status='PENDING').values_list(
+            'certificate__certificate_number', 'days_before_expiry'
+        ))
+    
+    def test_first_run_checks_every_certificate_in_window(self):
+        result = reconcile_notifications(self.today)
+        
+        self.assertEqual(result['created'], 4)
+        self.assertEqual(self.thresholds(), {'CERT-5': 0, 'CERT10': 30, 'CERT31': 60, 'CERT61': 90})
+        self.assertTrue(NotificationReconciliation.objects.get(day=self.today).full)
+        # Each day is reconciled once
+        self.assertIsNone(reconcile_notifications(self.today))
+    
+    def test_next_days_only_check_certificates_crossing_a_threshold(self):
+        reconcile_notifications(self.today)
+        CertificateNotification.objects.filter(certificate=self.certificates[10]).update(status='ACKNOWLEDGED')
+        
+        result = reconcile_notifications(self.today + timedelta(days=1))
+        
+        # The 31 and 61 day certificates move to the next threshold and the expired one's
+        # day count is refreshed; certificates without a pending notification are not read
+        self.assertEqual((result['checked'], result['created'], result['updated']), (3, 0, 3))
+        self.assertEqual(self.thresholds(), {'CERT-5': 0, 'CERT31': 30, 'CERT61': 60})
+        self.assertEqual(
+            CertificateNotification.objects.get(certificate=self.certificates[10]).status, 'ACKNOWLEDGED'
+        )
+        
+        # A gap of several days covers every day missed
+        result = reconcile_notifications(self.today + timedelta(days=11))
+        self.assertEqual((result['created'], result['updated']), (2, 3))
+        self.assertEqual(self.thresholds()['CERT95'], 90)
+        self.assertEqual(
+            CertificateNotification.objects.filter(certificate=self.certificates[10], status='PENDING').get()
+            .days_before_expiry, 0
+        )
+    
+    def test_pending_messages_count_down_daily(self):
+        reconcile_notifications(self.today)
+        notification = CertificateNotification.objects.get(certificate=self.certificates[10])
+        self.assertIn('will expire in 10 days', notification.message)
+        
+        reconcile_notifications(self.today + timedelta(days=1))
+        
+        notification.refresh_from_db()
+        self.assertIn('will expire in 9 days', notification.message)
+        self.assertIn(
+            'has been expired for 6 days',
+            CertificateNotification.objects.get(certificate=self.certificates[-5]).message
+        )
+    
+    def test_certificate_changes_reconcile_immediately(self):
+        reconcile_notifications(self.today)
+        certificate = self.certificates[10]
+        
+        certificate.expiry_date = self.today + timedelta(days=50)
+        certificate.save()
+        self.assertEqual(self.thresholds()['CERT10'], 60)
+        
+        certificate.expiry_date = self.today + timedelta(days=400)
+        certificate.save()
+        self.assertNotIn('CERT10', self.thresholds())
+        self.assertEqual(CertificateNotification.objects.get(certificate=certificate).status, 'RESOLVED')
+    
+    def test_requests_read_cached_counts(self):
+        middleware = CertificateNotificationMiddleware(lambda request: None)
+        user = get_user_model().objects.create_user(username='officer', password='testpass123')
+        request = RequestFactory().get('/')
+        request.user = user
+        
+        # Requests never reconcile, they only read the counts
+        middleware(request)
+        self.assertEqual(request.certificate_notification_counts, {'total': 0, 'expired': 0, 'expiring': 0})
+        self.assertFalse(NotificationReconciliation.objects.exists())
+        
+        reconcile_notifications(self.today)
+        middleware(request)
+        self.assertEqual(request.certificate_notification_counts, {'total': 4, 'expired': 1, 'expiring': 3})
+        
+        with self.assertNumQueries(0):
+            middleware(request)
+        
+        # Counts follow notification changes
+        CertificateNotification.objects.filter(days_before_expiry=0).get().delete()
+        self.assertEqual(notification_counts(), {'total': 3, 'expired': 0, 'expiring': 3})
+    
+    def test_sync_writes_only_the_difference(self):
+        self.assertEqual(generate_certificate_notifications()['created'], 4)
+        acknowledged = CertificateNotification.objects.get(certificate=self.certificates[31])
+        acknowledged.status = 'ACKNOWLEDGED'
+        acknowledged.save()
+        ids = set(CertificateNotification.objects.values_list('id', flat=True))
+        
+        # Nothing changed: nothing is written, acknowledgements survive
+        self.assertEqual(sync_notifications(), {'checked': 4, 'created': 0, 'updated': 0, 'deleted': 0})
+        self.assertEqual(set(CertificateNotification.objects.values_list('id', flat=True)), ids)
+        self.assertEqual(CertificateNotification.objects.get(pk=acknowledged.pk).status, 'ACKNOWLEDGED')
+        
+        # Next day: day counts in pending messages are refreshed, the 31 day
+        # certificate gets a 30 day notification next to the acknowledged one
+        result = sync_notifications(self.today + timedelta(days=1))
+        self.assertEqual((result['created'], result['updated'], result['deleted']), (1, 3, 0))
+        self.assertIn('expired for 6 days', CertificateNotification.objects.get(
+            certificate=self.certificates[-5]).message)
+        self.assertEqual(
+            sorted(CertificateNotification.objects.filter(certificate=self.certificates[31])
+                   .values_list('days_before_expiry', 'status')),
+            [(30, 'PENDING'), (60, 'ACKNOWLEDGED')]
+        )
+    
+    def test_sync_removes_superseded_pending_notifications(self):
+        certificate = self.certificates[10]
+        CertificateNotification.objects.bulk_create([
+            CertificateNotification(
+                certificate=certificate, notified_expiry_date=certificate.expiry_date, days_before_expiry=days,
+                status=status, message=str(days)
+            )
+            for days, status in ((30, 'ACKNOWLEDGED'), (60, 'PENDING'), (90, 'PENDING'))
+        ])
+        
+        sync_notifications()
+        
+        self.assertEqual(
+            list(CertificateNotification.objects.filter(certificate=certificate).values_list('days_before_expiry', 'status')),
+            [(30, 'ACKNOWLEDGED')]
+        )
+    
+    def test_renewed_certificate_is_notified_again(self):
+        certificate = self.certificates[10]
+        sync_notifications()
+        certificate.expiry_date = self.today + timedelta(days=400)
+        certificate.save()
+        self.assertEqual(CertificateNotification.objects.get(certificate=certificate).status, 'RESOLVED')
+        
+        # The renewed certificate walks through its thresholds again
+        for days_left, threshold in ((85, 90), (55, 60), (25, 30), (-1, 0)):
+            sync_notifications(certificate.expiry_date - timedelta(days=days_left))
+            self.assertEqual(
+                list(CertificateNotification.objects.filter(certificate=certificate, status='PENDING')
+                     .values_list('notified_expiry_date', 'days_before_expiry')),
+                [(certificate.expiry_date, threshold)]
+            )
+        # The previous cycle's notification is kept as it was
+        self.assertEqual(
+            CertificateNotification.objects.get(certificate=certificate, status='RESOLVED').notified_expiry_date,
+            self.today + timedelta(days=10)
+        )
+    
+    def test_sync_queries_do_not_grow_with_certificates(self):
+        with CaptureQueriesContext(connection) as few:
+            sync_notifications()
+        for days in range(1, 40):
+            CrewCertificate.objects.create(
+                crew=self.crew, certificate_type="SAFETY", certificate_name=f"Extra {days}",
+                certificate_number=f"EXTRA{days}", issue_date=self.today - timedelta(days=300),
+                expiry_date=self.today + timedelta(days=days * 2), issuing_authority="Maritime Authority"
+            )
+        CertificateNotification.objects.all().delete()
+        
+        with CaptureQueriesContext(connection) as many:
+            self.assertEqual(sync_notifications()['created'], 4 + 39)
+        self.assertEqual(len(many), len(few))
+    
+    def test_context_processor_reads_cached_summaries(self):
+        for days in range(1, 15):
+            self.create_certificate(-days - 10)
+        reconcile_notifications(self.today)
+        request = RequestFactory().get('/api/')
+        request.user = get_user_model().objects.create_user(username='officer', password='testpass123')
+        
+        with self.assertNumQueries(1):
+            context = certificate_notifications(request)
+        self.assertEqual(
+            (context['total_certificate_notifications'], context['expired_certificate_count'],
+             context['expiring_certificate_count']),
+            (18, 15, 3)
+        )
+        # The list is bounded, most urgent first, and loaded once when a template asks for it
+        with self.assertNumQueries(1):
+            notifications = context['certificate_notifications']()
+        self.assertEqual(len(notifications), 10)
+        self.assertEqual(notifications[0].certificate.certificate_number, 'CERT-24')
+        with self.assertNumQueries(0):
+            certificate_notifications(request)['certificate_notifications']()
+        
+        # A notification change moves to a new cache version
+        notification = CertificateNotification.objects.filter(days_before_expiry=0).first()
+        notification.status = 'ACKNOWLEDGED'
+        notification.save()
+        self.assertEqual(certificate_notifications(request)['expired_certificate_count'], 14)
+        
+        request.resolver_match = resolve('/admin/')
+        with self.assertNumQueries(0):
+            self.assertEqual(certificate_notifications(request), {})
+    
+    def test_admin_requests_do_not_load_counts(self):
+        middleware = CertificateNotificationMiddleware(certificate_notifications)
+        request = RequestFactory().get('/admin/')
+        request.user = get_user_model().objects.create_user(username='officer', password='testpass123')
+        request.resolver_match = resolve('/admin/')
+        
+        with self.assertNumQueries(0):
+            self.assertEqual(middleware(request), {})
+        self.assertIsNone(cache.get(f'{COUNTS_CACHE_KEY}:{cache_version()}'))
+
+
+class CrewAdminQueryTests(TestCase):
+    """The crew changelist and change form run a fixed number of queries"""
+    
+    def setUp(self):
+        cache.clear()
+        self.admin = get_user_model().objects.create_superuser(
+            username='admin', email='admin@example.com', password='testpass123'
+        )
+        self.client.force_login(self.admin)
+        self.vessels = [
+            Vessel.objects.create(name=f'Tug {n}', imo_number=f'900000{n}', vessel_type='Tug', flag='Morocco',
+                                  build_year=2015, length_overall=32, beam=11, draft=5, gross_tonnage=450)
+            for n in range(3)
+        ]
+        self.today = timezone.now().date()
+        self.add_crew(5)
+    
+    def add_crew(self, count):
+        start = Crew.objects.count()
+        for n in range(start, start + count):
+            crew = Crew.objects.create(
+                name=f"Crew {n}", rank="COOK", nationality="USA", date_of_birth=date(1980, 1, 1),
+                passport_number=f"P{n:05d}", seaman_book_number=f"S{n:05d}", phone_number="+12345678901",
+                email=f"crew{n}@example.com", address="Seaport City", emergency_contact_name="Jane Doe",
+                emergency_contact_phone="+12345678902"
+            )
+            for days in (-10, 20, 200):
+                CrewCertificate.objects.create(
+                    crew=crew, certificate_type="OTHER", certificate_name=f"Certificate {days}",
+                    certificate_number=f"C{n}{days}", issue_date=self.today - timedelta(days=300),
+                    expiry_date=self.today + timedelta(days=days), issuing_authority="Maritime Authority"
+                )
+            for offset, vessel in enumerate(self.vessels):
+                start = self.today - timedelta(days=300 - offset)
+                CrewAssignment.objects.create(
+                    crew=crew, vessel=vessel, rank="COOK", start_date=start,
+                    end_date=None if offset == 2 else start + timedelta(days=1), is_current=offset == 2
+                )
+    
+    def count_queries(self, url):
+        # Warm the notification caches the middleware reads
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+    
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        url = reverse('admin:crew_crew_changelist')
+        few, response = self.count_queries(url)
+        self.assertContains(response, '1 expired', count=5)
+        self.assertContains(response, 'Tug 2', count=5)
+        
+        self.add_crew(20)
+        many, response = self.count_queries(url)
+        self.assertContains(response, '1 expired', count=25)
+        self.assertEqual(many, few)
+        # A fixed budget per page: session, user, counts, filter choices and the annotated rows
+        self.assertEqual(many, 9)
+    
+    def test_change_form_queries_do_not_grow_with_inlines(self):
+        crew = Crew.objects.get(name='Crew 0')
+        url = reverse('admin:crew_crew_change', args=[crew.pk])
+        few, _ = self.count_queries(url)
+        
+        for days in range(1, 11):
+            CrewCertificate.objects.create(
+                crew=crew, certificate_type="SAFETY", certificate_name=f"Extra {days}",
+                certificate_number=f"X{days}", issue_date=self.today - timedelta(days=300),
+                expiry_date=self.today + timedelta(days=400 + days), issuing_authority="Maritime Authority"
+            )
+            start = self.today - timedelta(days=1000 + 2 * days)
+            CrewAssignment.objects.create(
+                crew=crew, vessel=self.vessels[0], rank="COOK", start_date=start,
+                end_date=start + timedelta(days=1), is_current=False
+            )
+        many, _ = self.count_queries(url)
+        self.assertEqual(many, few)
+
+
+class CrewDetailCacheTests(APITestCase):
+    """The crew detail endpoint loads a member in a fixed number of queries and caches it"""
+    
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(username='officer', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.today = timezone.now().date()
+        self.vessel = Vessel.objects.create(
+            name='Tug 1', imo_number='9000001', vessel_type='Tug', flag='Morocco',
+            build_year=2015, length_overall=32, beam=11, draft=5, gross_tonnage=450
+        )
+        self.crew = Crew.objects.create(
+            name="John Doe", rank="COOK", nationality="USA", date_of_birth=date(1980, 1, 1),
+            passport_number="AB12345", seaman_book_number="SBN12345", phone_number="+12345678901",
+            email="john.doe@example.com", address="123 Marine Drive, Seaport City",
+            emergency_contact_name="Jane Doe", emergency_contact_phone="+12345678902"
+        )
+        self.add_certificates(range(-2, 2))
+        CrewAssignment.objects.create(
+            crew=self.crew, vessel=self.vessel, rank="COOK", start_date=self.today - timedelta(days=10)
+        )
+        self.url = reverse('crew:crew-detail', args=[self.crew.pk])
+    
+    def add_certificates(self, offsets):
+        for offset in offsets:
+            CrewCertificate.objects.create(
+                crew=self.crew, certificate_type="OTHER", certificate_name=f"Certificate {offset}",
+                certificate_number=f"CERT{offset}", issue_date=self.today - timedelta(days=300),
+                expiry_date=self.today + timedelta(days=offset * 30), issuing_authority="Maritime Authority"
+            )
+    
+    def test_detail_partitions_prefetched_certificates(self):
+        with CaptureQueriesContext(connection) as few:
+            response = self.client.get(self.url)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['certificates']), 4)
+        # Expiring today counts as expired, as in Crew.get_expired_certificates
+        self.assertEqual(
+            [certificate['certificate_number'] for certificate in response.data['expired_certificates']],
+            ['CERT-2', 'CERT-1', 'CERT0']
+        )
+        self.assertEqual(response.data['active_certificates'][0]['days_until_expiry'], 30)
+        self.assertEqual(response.data['current_assignment']['vessel_name'], 'Tug 1')
+        
+        self.add_certificates(range(2, 12))
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(reverse('crew:crew-crew-detail', args=[self.crew.pk]))
+        self.assertEqual(len(response.data['certificates']), 14)
+        self.assertEqual(len(many), len(few))
+    
+    def test_detail_is_served_from_cache_until_a_write(self):
+        self.client.get(self.url)
+        
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.data['certificates']), 4)
+        
+        certificate = CrewCertificate.objects.get(certificate_number='CERT1')
+        certificate.expiry_date = self.today + timedelta(days=365)
+        certificate.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['active_certificates'][0]['days_until_expiry'], 365)
+        
+        self.client.post(reverse('crew:crewassignment-list'), {
+            'crew': self.crew.pk, 'vessel': self.vessel.pk, 'rank': 'COOK', 'start_date': self.today.isoformat(),
+        }, format='json')
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['current_assignment']['start_date'], self.today.isoformat())
+
+
+class CrewAvailabilityTests(APITestCase):
+    """Assignments are date ranges that cannot overlap, queried for availability"""
+    
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='officer', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.today = timezone.now().date()
+        self.vessel = Vessel.objects.create(
+            name='Tug 1', imo_number='9000001', vessel_type='Tug', flag='Morocco',
+            build_year=2015, length_overall=32, beam=11, draft=5, gross_tonnage=450
+        )
+        self.crew = {
+            name: Crew.objects.create(
+                name=name, rank=rank, nationality="USA", date_of_birth=date(1980, 1, 1),
+                passport_number=f"P{n}", seaman_book_number=f"S{n}", phone_number="+12345678901",
+                email=f"crew{n}@example.com", address="Seaport City", emergency_contact_name="Jane Doe",
+                emergency_contact_phone="+12345678902"
+            )
+            for n, (name, rank) in enumerate([
+                ('Aboard', 'OILER'), ('Joining', 'OILER'), ('Free', 'OILER'), ('Expiring', 'OILER'), ('Cook', 'COOK'),
+            ])
+        }
+        for name in ('Free', 'Expiring', 'Aboard', 'Joining'):
+            CrewCertificate.objects.create(
+                crew=self.crew[name], certificate_type='STCW', certificate_name='Basic Safety Training',
+                certificate_number=f'STCW-{name}', issue_date=self.today - timedelta(days=300),
+                expiry_date=self.today + timedelta(days=20 if name == 'Expiring' else 700),
+                issuing_authority='Maritime Authority'
+            )
+        self.assign('Aboard', self.today - timedelta(days=30), self.today + timedelta(days=30))
+        self.assign('Joining', self.today + timedelta(days=45))
+    
+    def assign(self, name, start, end=None):
+        return CrewAssignment.objects.create(
+            crew=self.crew[name], vessel=self.vessel, rank=self.crew[name].rank, start_date=start, end_date=end
+        )
+    
+    def names(self, queryset):
+        return sorted(crew.name for crew in queryset)
+    
+    def test_overlapping_assignments_are_rejected(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            self.assign('Aboard', self.today + timedelta(days=10))
+        # The relief may start on the day the previous assignment ends
+        self.assign('Aboard', self.today + timedelta(days=30), self.today + timedelta(days=40))
+        
+        response = self.client.post(reverse('crew:crewassignment-list'), {
+            'crew': self.crew['Joining'].pk, 'vessel': self.vessel.pk, 'rank': 'OILER',
+            'start_date': (self.today + timedelta(days=60)).isoformat(),
+            'end_date': (self.today + timedelta(days=50)).isoformat(),
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_new_assignment_closes_the_current_one_on_its_start_date(self):
+        current = self.assign('Free', self.today - timedelta(days=60))
+        relief_start = self.today + timedelta(days=30)
+        
+        response = self.client.post(reverse('crew:crewassignment-list'), {
+            'crew': self.crew['Free'].pk, 'vessel': self.vessel.pk, 'rank': 'OILER',
+            'start_date': relief_start.isoformat(),
+        }, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        current.refresh_from_db()
+        # Still aboard until the new assignment starts
+        self.assertEqual((current.end_date, current.is_current), (relief_start, True))
+        self.assertNotIn('Free', self.names(available_crew(self.today, self.today + timedelta(days=10))))
+    
+    def test_available_crew_combines_dates_rank_and_certificates(self):
+        start, end = self.today + timedelta(days=10), self.today + timedelta(days=40)
+        
+        with self.assertNumQueries(1):
+            self.assertEqual(self.names(available_crew(start, end)), ['Cook', 'Expiring', 'Free', 'Joining'])
+        self.assertEqual(
+            self.names(available_crew(start, end, rank='OILER', certificate_types=['STCW'])), ['Free', 'Joining']
+        )
+        self.assertEqual(
+            self.names(available_crew(start, self.today + timedelta(days=45), rank='OILER')), ['Expiring', 'Free']
+        )
+        self.assertEqual(self.names(available_crew(self.today + timedelta(days=30), self.today + timedelta(days=31))),
+                         ['Aboard', 'Cook', 'Expiring', 'Free', 'Joining'])
+    
+    def test_available_endpoint(self):
+        url = reverse('crew:crew-available')
+        
+        response = self.client.get(url, {
+            'start': (self.today + timedelta(days=50)).isoformat(),
+            'end': (self.today + timedelta(days=60)).isoformat(),
+            'rank': 'OILER', 'certificate_type': 'STCW',
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([crew['name'] for crew in response.data], ['Aboard', 'Free'])
+        
+        # Without dates: free today
+        self.assertEqual(
+            [crew['name'] for crew in self.client.get(url).data], ['Cook', 'Expiring', 'Free', 'Joining']
+        )
+        self.assertEqual(self.client.get(url, {'start': 'soon'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            self.client.get(url, {'start': self.today.isoformat(), 'end': '2000-01-01'}).status_code,
+            status.HTTP_400_BAD_REQUEST
+        )
+
+
+class ReliefMatchingTests(APITestCase):
+    """Reliefs for upcoming crew changes are matched fleet-wide in one batch"""
+    
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(username='manning', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.today = timezone.now().date()
+        self.vessels = [
+            Vessel.objects.create(
+                name=f'Tug {n}', imo_number=f'900010{n}', vessel_type='Tug', flag='Morocco',
+                build_year=2015, length_overall=32, beam=11, draft=5, gross_tonnage=450
+            )
+            for n in range(3)
+        ]
+        self.crew = {
+            name: Crew.objects.create(
+                name=name, rank=rank, nationality="USA", date_of_birth=date(1980, 1, 1),
+                passport_number=f"R{n}", seaman_book_number=f"RS{n}", phone_number="+12345678901",
+                email=f"relief{n}@example.com", address="Seaport City", emergency_contact_name="Jane Doe",
+                emergency_contact_phone="+12345678902"
+            )
+            for n, (name, rank) in enumerate([
+                ('Leaving', 'OILER'), ('Leaving Too', 'OILER'), ('Veteran', 'OILER'), ('Newcomer', 'OILER'),
+                ('Expiring', 'OILER'), ('Busy', 'OILER'), ('Just Off', 'OILER'), ('Cook', 'COOK'),
+                ('Cook Leaving', 'COOK'),
+            ])
+        }
+        for name, types in [
+            ('Leaving', ['STCW', 'MEDICAL', 'OTHER']), ('Leaving Too', ['STCW']), ('Veteran', ['STCW', 'MEDICAL']),
+            ('Newcomer', ['STCW', 'MEDICAL']), ('Expiring', ['STCW', 'MEDICAL']), ('Busy', ['STCW', 'MEDICAL']),
+            ('Just Off', ['STCW', 'MEDICAL']), ('Cook', ['STCW']), ('Cook Leaving', ['MEDICAL']),
+        ]:
+            for certificate_type in types:
+                CrewCertificate.objects.create(
+                    crew=self.crew[name], certificate_type=certificate_type, certificate_name=certificate_type,
+                    certificate_number=f'{certificate_type}-{name}', issue_date=self.today - timedelta(days=300),
+                    expiry_date=self.today + timedelta(days=60 if name == 'Expiring' else 700),
+                    issuing_authority='Maritime Authority'
+                )
+        # Changes: two oilers (120 and 60 day contracts) and a cook nobody can relieve
+        self.assign('Leaving', 0, -110, 10)
+        self.assign('Leaving Too', 1, -40, 20)
+        self.assign('Cook Leaving', 2, -80, 5)
+        self.assign('Veteran', 0, -400, -200)
+        self.assign('Busy', 1, 50)
+        self.assign('Just Off', 2, -30, 0)
+    
+    def assign(self, name, vessel, start, end=None):
+        return CrewAssignment.objects.create(
+            crew=self.crew[name], vessel=self.vessels[vessel], rank=self.crew[name].rank,
+            start_date=self.today + timedelta(days=start),
+            end_date=None if end is None else self.today + timedelta(days=end)
+        )
+    
+    def test_matching_maximizes_the_total_score(self):
+        score = np.array([[10.0, 9.0], [9.0, 1.0]])
+        eligible = np.ones((2, 2), dtype=bool)
+        self.assertEqual(match(score, eligible, 'greedy').tolist(), [0, 1])
+        self.assertEqual(match(score, eligible, 'hungarian').tolist(), [1, 0])
+        # Ineligible pairs are never used, even if it leaves a change unfilled
+        eligible[1, 0] = False
+        self.assertEqual(match(score, eligible, 'hungarian').tolist(), [0, 1])
+        eligible[:, 0] = False
+        self.assertEqual(match(score, eligible, 'hungarian').tolist(), [1, -1])
+        # More changes than candidates
+        self.assertEqual(match(score.T[:, :1], np.ones((2, 1), dtype=bool)).tolist(), [0, -1])
+    
+    def test_plan_matches_rank_availability_certificates_and_experience(self):
+        with self.assertNumQueries(6):
+            plan = plan_reliefs()
+        changes = {change['relieved_name']: change for change in plan['changes']}
+        self.assertEqual([change['relieved_name'] for change in plan['changes']],
+                         ['Cook Leaving', 'Leaving', 'Leaving Too'])
+        self.assertEqual((plan['filled'], plan['unfilled']), (2, 1))
+        
+        leaving = changes['Leaving']
+        # The default requirements of the rank (see the 0005 migration)
+        self.assertEqual(leaving['certificate_types'], ['STCW', 'MEDICAL'])
+        self.assertEqual(leaving['contract_end'], self.today + timedelta(days=130))
+        # Expiring lacks certificate cover, Busy joins another vessel, Just Off has not rested
+        self.assertEqual(leaving['candidates'], 2)
+        self.assertEqual(leaving['relief']['name'], 'Veteran')
+        self.assertEqual(leaving['relief']['vessel_experience'], 1)
+        self.assertEqual(changes['Leaving Too']['relief']['name'], 'Newcomer')
+        self.assertEqual(changes['Leaving Too']['candidates'], 3)
+        self.assertIsNone(changes['Cook Leaving']['relief'])
+        
+        plan = plan_reliefs([self.vessels[1].pk], horizon_days=15)
+        self.assertEqual(plan['changes'], [])
+        plan = plan_reliefs([self.vessels[1].pk], contract_days=10, method='greedy')
+        # A 10 day contract ends before Busy joins the other vessel
+        self.assertEqual(plan['changes'][0]['candidates'], 5)
+    
+    def test_relief_plan_endpoint(self):
+        url = reverse('crew:crewassignment-relief-plan')
+        
+        response = self.client.get(url, {'vessel_id': f'{self.vessels[0].pk},{self.vessels[1].pk}'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [change['relief']['name'] for change in response.data['changes']], ['Veteran', 'Newcomer']
+        )
+        self.assertEqual(self.client.get(url, {'horizon': 'soon'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(url, {'method': 'random'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class CertificateComplianceTests(APITestCase):
+    """Current assignments are checked against the rank certificate requirement matrix"""
+    
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(username='superintendent', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.today = timezone.now().date()
+        self.tug, self.tanker = [
+            Vessel.objects.create(
+                name=name, imo_number=f'900020{n}', vessel_type=vessel_type, flag='Morocco',
+                build_year=2015, length_overall=32, beam=11, draft=5, gross_tonnage=450
+            )
+            for n, (name, vessel_type) in enumerate([('Tug 1', 'Tug'), ('Tanker 1', 'TANKER')])
+        ]
+        RankCertificateRequirement.objects.create(rank='OILER', certificate_type='MEDICAL', vessel_type='Tug', required=False)
+        RankCertificateRequirement.objects.create(rank='OILER', certificate_type='SAFETY', vessel_type='Tanker')
+        self.crew = {}
+        for n, (name, vessel, certificates) in enumerate([
+            ('Complete', self.tug, {'STCW': 700}),
+            ('Lapsed', self.tanker, {'STCW': 700, 'MEDICAL': -5}),
+            ('Covered', self.tanker, {'STCW': 700, 'MEDICAL': 200, 'SAFETY': 100}),
+            ('Ashore', None, {'STCW': 700}),
+        ]):
+            crew = self.crew[name] = Crew.objects.create(
+                name=name, rank='OILER', nationality="USA", date_of_birth=date(1980, 1, 1),
+                passport_number=f"C{n}", seaman_book_number=f"CS{n}", phone_number="+12345678901",
+                email=f"compliance{n}@example.com", address="Seaport City", emergency_contact_name="Jane Doe",
+                emergency_contact_phone="+12345678902"
+            )
+            for certificate_type, days in certificates.items():
+                CrewCertificate.objects.create(
+                    crew=crew, certificate_type=certificate_type, certificate_name=certificate_type,
+                    certificate_number=f'{certificate_type}-{name}', issue_date=self.today - timedelta(days=300),
+                    expiry_date=self.today + timedelta(days=days), issuing_authority='Maritime Authority'
+                )
+            if vessel:
+                CrewAssignment.objects.create(
+                    crew=crew, vessel=vessel, rank='OILER', start_date=self.today - timedelta(days=20)
+                )
+    
+    def test_requirement_overrides_apply_per_vessel_type(self):
+        matrix = requirement_matrix()
+        self.assertEqual(mask_types(required_mask(matrix, 'OILER')), ['STCW', 'MEDICAL'])
+        self.assertEqual(mask_types(required_mask(matrix, 'OILER', 'tug ')), ['STCW'])
+        self.assertEqual(mask_types(required_mask(matrix, 'OILER', 'Tanker')), ['STCW', 'MEDICAL', 'SAFETY'])
+        self.assertEqual(mask_types(required_mask(matrix, 'CAPTAIN', 'Tanker')), ['COC', 'STCW', 'MEDICAL', 'SECURITY'])
+    
+    def test_fleet_compliance_in_one_pass(self):
+        with self.assertNumQueries(2):
+            compliance = fleet_compliance()
+        assignments = {row['crew_name']: row for row in compliance['assignments']}
+        self.assertEqual(sorted(assignments), ['Complete', 'Covered', 'Lapsed'])
+        self.assertTrue(assignments['Complete']['compliant'])
+        self.assertTrue(assignments['Covered']['compliant'])
+        self.assertEqual(assignments['Lapsed']['missing'], ['SAFETY'])
+        self.assertEqual(assignments['Lapsed']['expired'], ['MEDICAL'])
+        self.assertEqual(
+            [(vessel['vessel_name'], vessel['crew'], vessel['gaps'], vessel['score']) for vessel in compliance['vessels']],
+            [('Tanker 1', 2, 2, 50.0), ('Tug 1', 1, 0, 100.0)]
+        )
+        
+        self.assertTrue(self.crew['Complete'].is_fully_certified())
+        self.assertFalse(self.crew['Lapsed'].is_fully_certified())
+        # Ashore, the rank's default requirements apply
+        self.assertFalse(self.crew['Ashore'].is_fully_certified())
+    
+    def test_certificate_expiring_today_is_expired(self):
+        crew = self.crew['Complete']
+        CrewCertificate.objects.filter(crew=crew, certificate_type='STCW').update(expiry_date=self.today)
+        
+        self.assertEqual(list(crew.get_expired_certificates().values_list('certificate_type', flat=True)), ['STCW'])
+        row = next(row for row in fleet_compliance()['assignments'] if row['crew_name'] == 'Complete')
+        self.assertEqual((row['expired'], row['compliant']), (['STCW'], False))
+        self.assertFalse(crew.is_fully_certified())
+    
+    def test_compliance_endpoints(self):
+        response = self.client.get(reverse('crew:vessel-compliance'), {'vessel_id': self.tug.pk})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['crew_name'] for row in response.data['assignments']], ['Complete'])
+        
+        url = reverse('crew:vessel-compliance-score', args=[self.tanker.pk])
+        self.assertEqual(self.client.get(url).data['score'], 50.0)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url).data['score'], 50.0)
+        # Renewals and requirement changes show up in the cached score
+        CrewCertificate.objects.filter(crew=self.crew['Lapsed'], certificate_type='MEDICAL').update(
+            expiry_date=self.today + timedelta(days=100)
+        )
+        CrewCertificate.objects.create(
+            crew=self.crew['Lapsed'], certificate_type='SAFETY', certificate_name='SAFETY', certificate_number='SAFETY-2',
+            issue_date=self.today, expiry_date=self.today + timedelta(days=100), issuing_authority='Maritime Authority'
+        )
+        self.assertEqual(self.client.get(url).data['score'], 100.0)
+        RankCertificateRequirement.objects.create(rank='OILER', certificate_type='SECURITY', vessel_type='Tanker')
+        self.assertEqual(self.client.get(url).data['score'], 0.0)
+        
+        response = self.client.post(reverse('crew:rankcertificaterequirement-list'), {
+            'rank': 'COOK', 'certificate_type': 'MEDICAL', 'required': False,
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class CrewSearchTests(APITestCase):
+    """Crew and certificate search is relevance-ordered with an exact path for document numbers"""
+    
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='clerk', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.today = timezone.now().date()
+        self.crew = {
+            name: Crew.objects.create(
+                name=name, rank=rank, nationality=nationality, date_of_birth=date(1980, 1, 1),
+                passport_number=f"PA{n}4821", seaman_book_number=f"SB-{n}9310", phone_number="+12345678901",
+                email=f"search{n}@example.com", address="Seaport City", emergency_contact_name="Jane Doe",
+                emergency_contact_phone="+12345678902"
+            )
+            for n, (name, rank, nationality) in enumerate([
+                ('Ana Maria Costa', 'COOK', 'Portugal'), ('Mariana Lopez', 'OILER', 'Spain'),
+                ('Maria Santos', 'STEWARD', 'Philippines'), ('Mohammed Alaoui', 'OILER', 'Morocco'),
+            ])
+        }
+        CrewCertificate.objects.create(
+            crew=self.crew['Maria Santos'], certificate_type='MEDICAL', certificate_name='Medical Fitness',
+            certificate_number='MED-77120', issue_date=self.today, expiry_date=self.today + timedelta(days=700),
+            issuing_authority='Maritime Health Office'
+        )
+    
+    def names(self, response):
+        return [crew['name'] for crew in response.data['results']]
+    
+    def test_document_numbers_take_the_exact_path(self):
+        url = reverse('crew:crew-list')
+        self.assertEqual(self.names(self.client.get(url, {'search': 'pa34821'})), ['Mohammed Alaoui'])
+        self.assertEqual(self.names(self.client.get(url, {'search': 'SB-19310'})), ['Mariana Lopez'])
+        
+        response = self.client.get(reverse('crew:crewcertificate-list'), {'search': 'med-77120'})
+        self.assertEqual([certificate['certificate_number'] for certificate in response.data['results']], ['MED-77120'])
+    
+    def test_results_are_ordered_by_relevance(self):
+        if trigram_available():
+            self.skipTest('pg_trgm ranks by word similarity')
+        response = self.client.get(reverse('crew:crew-list'), {'search': 'maria'})
+        self.assertEqual(self.names(response), ['Maria Santos', 'Ana Maria Costa', 'Mariana Lopez'])
+        self.assertEqual(self.names(self.client.get(reverse('crew:crew-list'), {'search': 'second oiler'})), [])
+        self.assertEqual(
+            self.names(self.client.get(reverse('crew:crew-list'), {'search': 'morocco oiler'})), ['Mohammed Alaoui']
+        )
+        # An explicit ordering still wins over relevance
+        response = self.client.get(reverse('crew:crew-list'), {'search': 'maria', 'ordering': 'name'})
+        self.assertEqual(self.names(response), ['Ana Maria Costa', 'Maria Santos', 'Mariana Lopez'])
+    
+    def test_partial_document_numbers_are_found_by_both_backends(self):
+        fields, exact_fields = ['name', 'nationality', 'rank'], ['passport_number', 'seaman_book_number']
+        with mock.patch('crew.search.trigram_available', return_value=True):
+            sql = str(search(Crew.objects.all(), 'PA34', fields, exact_fields).query)
+        self.assertIn('%>', sql)
+        self.assertIn('"crew_crew"."passport_number"::text) LIKE UPPER(', sql)
+        self.assertIn('"crew_crew"."seaman_book_number"::text) LIKE UPPER(', sql)
+        
+        # Runs on whichever backend the database has
+        response = self.client.get(reverse('crew:crew-list'), {'search': 'PA34'})
+        self.assertEqual(self.names(response), ['Mohammed Alaoui'])
+        response = self.client.get(reverse('crew:crewcertificate-list'), {'search': '7712'})
+        self.assertEqual([certificate['certificate_number'] for certificate in response.data['results']], ['MED-77120'])
+    
+    def test_trigram_search_tolerates_spelling_variants(self):
+        if not trigram_available():
+            self.skipTest('pg_trgm is not installed')
+        results = search(Crew.objects.all(), 'Mohamed Alawi', ['name', 'nationality', 'rank'])
+        self.assertEqual([crew.name for crew in results][:1], ['Mohammed Alaoui'])
+
+
+ROSTER = """Name,Rank,Nationality,Date of Birth,Passport Number,Seaman Book Number,Phone Number,Email,Address,Emergency Contact Name,Emergency Contact Phone
+Youssef Amrani,Oiler,Morocco,1990-04-12,PX10001,SB10001,+212 600 000 001,youssef@example.com,Casablanca,Amina Amrani,+212600000101
+Jose Reyes,COOK,Philippines,1985-11-30,PX10002,SB10002,+639170000002,jose@example.com,Manila,Maria Reyes,+639170000102
+Luis Ortega,Purser,Spain,1988-02-01,PX10003,SB10003,+34600000003,luis@example.com,Cadiz,Ana Ortega,+34600000103
+Ivan Petrov,OILER,Bulgaria,31/02/1980,PX10004,SB10004,+359880000004,ivan@example.com,Varna,Olga Petrova,+359880000104
+Karim Haddad,STEWARD,Tunisia,1992-07-19,PX10001,SB10005,+21620000005,karim@example.com,Tunis,Sana Haddad,+21620000105
+Ahmed Benali,BOSUN,Morocco,1979-09-09,PX10006,SB10006,+212600000006,registered@example.com,Tangier,Leila Benali,+212600000106
+"""
+
+
+class CrewOnboardingTests(APITestCase):
+    """Rosters are imported in bulk; accounts and emails are provisioned afterwards in one batch"""
+    
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username='agency', email='registered@example.com', password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        mail.outbox = []
+    
+    def import_roster(self, dry_run=False):
+        return CrewOnboardingImporter(dry_run=dry_run).run(read_roster(io.StringIO(ROSTER)), file_name='roster.csv')
+    
+    def test_roster_rows_are_validated_and_bulk_created_without_accounts(self):
+        users = get_user_model().objects.count()
+        report, batch = self.import_roster()
+        
+        self.assertEqual(report.counts['crew']['created'], 2)
+        self.assertEqual(
+            sorted((error['row'], error['message']) for error in report.errors),
+            [(4, 'Unknown rank'), (5, 'date_of_birth must be a date (YYYY-MM-DD)'),
+             (6, 'Duplicate passport_number, already used by an earlier row'), (7, 'email is already registered')]
+        )
+        self.assertEqual(sorted(batch.crew.values_list('name', flat=True)), ['Jose Reyes', 'Youssef Amrani'])
+        self.assertEqual((batch.status, batch.rows_imported, batch.rows_rejected), ('PENDING', 2, 4))
+        self.assertEqual(Crew.objects.get(passport_number='PX10001').phone_number, '+212600000001')
+        # Accounts and emails are deferred to the batch
+        self.assertEqual(get_user_model().objects.count(), users)
+        self.assertEqual(mail.outbox, [])
+        
+        report, batch = self.import_roster()
+        self.assertIsNone(batch)
+        self.assertEqual(report.counts['crew']['created'], 0)
+    
+    def test_provisioning_creates_accounts_and_sends_credentials_in_one_batch(self):
+        _, batch = self.import_roster()
+        
+        self.assertEqual(provision_accounts(batch, workers=2), {'accounts_created': 2, 'emails_sent': 2})
+        batch.refresh_from_db()
+        self.assertEqual((batch.status, batch.accounts_created, batch.emails_sent), ('COMPLETED', 2, 2))
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), ['jose@example.com', 'youssef@example.com'])
+        
+        message = next(message for message in mail.outbox if message.to == ['jose@example.com'])
+        password = re.search(r'Password:\s*(\S+)', message.body).group(1)
+        user = get_user_model().objects.get(email='jose@example.com')
+        self.assertTrue(user.check_password(password))
+        self.assertEqual((user.first_name, user.last_name, user.role, user.is_staff), ('Jose', 'Reyes', 'CREW', True))
+        self.assertTrue(hasattr(user, 'profile'))
+        
+        # Provisioning again leaves existing accounts alone
+        self.assertEqual(provision_accounts(batch), {'accounts_created': 0, 'emails_sent': 0})
+        self.assertEqual(len(mail.outbox), 2)
+    
+    def test_import_roster_endpoint(self):
+        url = reverse('crew:crew-import-roster')
+        roster = SimpleUploadedFile('roster.csv', ROSTER.encode(), content_type='text/csv')
+        
+        response = self.client.post(url, {'file': roster, 'dry_run': 'true'}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(response.data['batch'])
+        self.assertFalse(Crew.objects.filter(passport_number='PX10001').exists())
+        
+        roster.seek(0)
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(url, {'file': roster}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['counts']['crew']['created'], 2)
+        # Provisioning is queued once the import commits
+        self.assertEqual(len(callbacks), 1)
+        
+        response = self.client.get(reverse('crew:crewonboardingbatch-detail', args=[response.data['batch']]))
+        self.assertEqual(response.data['status'], 'PENDING')
+        self.assertEqual(self.client.post(url, {}, format='multipart').status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_excel_rosters_are_read_like_csv(self):
+        workbook = io.BytesIO()
+        read_roster(io.StringIO(ROSTER)).to_excel(workbook, index=False)
+        workbook.seek(0)
+        roster = read_roster(workbook, name='roster.xlsx')
+        self.assertEqual(list(roster['passport_number'][:2]), ['PX10001', 'PX10002'])
+        self.assertEqual(roster['date_of_birth'][0][:10], '1990-04-12')
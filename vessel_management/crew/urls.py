@@ -3,7 +3,8 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     CrewViewSet, CrewCertificateViewSet, CrewAssignmentViewSet,
-    VesselViewSet, CertificateNotificationViewSet
+    VesselViewSet, CertificateNotificationViewSet, RankCertificateRequirementViewSet,
+    CrewOnboardingBatchViewSet
 )
 
 router = DefaultRouter()
@@ -12,6 +13,8 @@ router.register(r'certificates', CrewCertificateViewSet)
 router.register(r'assignments', CrewAssignmentViewSet)
 router.register(r'vessels', VesselViewSet)
 router.register(r'notifications', CertificateNotificationViewSet)
+router.register(r'certificate-requirements', RankCertificateRequirementViewSet)
+router.register(r'onboarding-batches', CrewOnboardingBatchViewSet)
 
 app_name = 'crew'
 
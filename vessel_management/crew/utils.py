@@ -1,3 +1,4 @@
+from django.core.cache import cache
 from django.core.mail import send_mail
 from django.conf import settings
 from django.template.loader import render_to_string
@@ -34,4 +35,51 @@ def send_certificate_notification_email(notification):
     
     # Update notification status
     notification.status = 'SENT'
-    notification.save() 
\ No newline at end of file
+    notification.save() 
+
+
+def crew_credentials_email(crew, password):
+    """
+    Subject and HTML content of the email sending a crew member the
+    credentials of their new account.
+    """
+    subject = "Your Vessel Management System Account"
+    content = f"""
+        <p>Hello {crew.name},</p>
+        <p>Your account has been created in the Vessel Management System.</p>
+        <p>Here are your login credentials:</p>
+        <ul>
+            <li><strong>Email:</strong> {crew.email}</li>
+            <li><strong>Password:</strong> {password}</li>
+        </ul>
+        <p>Your password is generated using your information for easy remembrance:</p>
+        <ul>
+            <li>First letter of your name</li>
+            <li>Last 4 digits of your passport number</li>
+            <li>3 random letters</li>
+        </ul>
+        <p>Please log in and change your password immediately for security reasons.</p>
+        <p>Best regards,<br>Vessel Management Team</p>
+        """
+    return subject, content
+
+
+CREW_DETAIL_TIMEOUT = 300
+
+
+def crew_detail_cache_key(crew_id, request, today):
+    """
+    Cache key of a crew member's detail representation. It carries the
+    member's cache version, the reference date of the expiry fields and the
+    host the file URLs are built for.
+    """
+    version = cache.get_or_set(f'crew:detail-version:{crew_id}', 1, None)
+    return f'crew:detail:{crew_id}:{version}:{today.isoformat()}:{request.get_host()}'
+
+
+def invalidate_crew_detail(crew_id):
+    """Move a crew member's cached detail to a new version"""
+    try:
+        cache.incr(f'crew:detail-version:{crew_id}')
+    except ValueError:
+        cache.set(f'crew:detail-version:{crew_id}', 1, None)
@@ -1,21 +1,34 @@
 # crew/views.py
-from rest_framework import viewsets, filters, status
+from contextlib import contextmanager
+
+from rest_framework import viewsets, filters, serializers, status
 from rest_framework.decorators import action
+from rest_framework.parsers import FormParser, MultiPartParser
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from django.utils import timezone
-from django.db.models import Q
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch, Q
+from django.utils.dateparse import parse_date
 from datetime import timedelta
 
 from .models import (
     Crew, CrewCertificate, CrewAssignment, 
-    Vessel, CertificateNotification
+    Vessel, CertificateNotification, RankCertificateRequirement, CrewOnboardingBatch
 )
 from .serializers import (
     CrewSerializer, CrewDetailSerializer, CrewCertificateSerializer, 
-    CrewAssignmentSerializer, VesselSerializer, CertificateNotificationSerializer
+    CrewAssignmentSerializer, VesselSerializer, CertificateNotificationSerializer,
+    RankCertificateRequirementSerializer, CrewOnboardingBatchSerializer
 )
-from .filters import CrewFilter, CertificateFilter, AssignmentFilter
+from .filters import CrewFilter, CertificateFilter, AssignmentFilter, TrigramSearchFilter
+from .availability import available_crew
+from .compliance import fleet_compliance, invalidate_compliance_cache, vessel_compliance_scores
+from .onboarding import CrewOnboardingImporter, read_roster
+from .tasks import provision_crew_accounts
+from .relief import DEFAULT_HORIZON_DAYS, MIN_REST_DAYS, plan_reliefs
+from .utils import crew_detail_cache_key, invalidate_crew_detail, CREW_DETAIL_TIMEOUT
 
 
 class CrewViewSet(viewsets.ModelViewSet):
@@ -24,9 +37,11 @@ class CrewViewSet(viewsets.ModelViewSet):
     """
     queryset = Crew.objects.all()
     serializer_class = CrewSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, TrigramSearchFilter, filters.OrderingFilter]
     filterset_class = CrewFilter
     search_fields = ['name', 'passport_number', 'seaman_book_number', 'nationality', 'rank']
+    trigram_search_fields = ['name', 'nationality', 'rank']
+    exact_search_fields = ['passport_number', 'seaman_book_number']
     ordering_fields = ['name', 'rank', 'nationality', 'created_at', 'updated_at']
     
     def get_serializer_class(self):
@@ -34,12 +49,40 @@ class CrewViewSet(viewsets.ModelViewSet):
             return CrewDetailSerializer
         return CrewSerializer
     
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('retrieve', 'crew_detail'):
+            queryset = queryset.prefetch_related(
+                Prefetch('certificates', queryset=CrewCertificate.objects.order_by('expiry_date', 'id')),
+                Prefetch(
+                    'assignments',
+                    queryset=CrewAssignment.objects.filter(is_current=True).select_related('vessel'),
+                    to_attr='current_assignments'
+                ),
+            )
+        return queryset
+    
+    def detail_representation(self):
+        """
+        Detail representation of the requested crew member, cached until the
+        member, one of their certificates or assignments changes (or the day rolls over)
+        """
+        today = timezone.now().date()
+        key = crew_detail_cache_key(self.kwargs[self.lookup_url_kwarg or self.lookup_field], self.request, today)
+        data = cache.get(key)
+        if data is None:
+            context = {**self.get_serializer_context(), 'today': today}
+            data = self.get_serializer(self.get_object(), context=context).data
+            cache.set(key, data, CREW_DETAIL_TIMEOUT)
+        return data
+    
+    def retrieve(self, request, *args, **kwargs):
+        return Response(self.detail_representation())
+    
     @action(detail=True, methods=['get'])
     def crew_detail(self, request, pk=None):
         """Get detailed information about a crew member including certificates and assignments"""
-        crew = self.get_object()
-        serializer = CrewDetailSerializer(crew)
-        return Response(serializer.data)
+        return Response(self.detail_representation())
     
     @action(detail=False, methods=['get'])
     def by_rank(self, request):
@@ -101,14 +144,68 @@ class CrewViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def available(self, request):
-        """Get crew members who are not currently assigned to a vessel"""
-        assigned_crew_ids = CrewAssignment.objects.filter(
-            is_current=True
-        ).values_list('crew_id', flat=True)
+        """
+        Get active crew members free between `start` and `end` (dates,
+        default today), optionally of a `rank` and holding valid
+        certificates of each `certificate_type` (comma-separated)
+        """
+        params = request.query_params
+        try:
+            start = parse_date(params['start']) if params.get('start') else timezone.now().date()
+            end = parse_date(params['end']) if params.get('end') else start
+        except ValueError:
+            start = end = None
+        if start is None or end is None or end < start:
+            return Response(
+                {"error": "start and end must be dates (YYYY-MM-DD) with end on or after start"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        certificate_types = [
+            value for value in request.query_params.get('certificate_type', '').split(',') if value
+        ]
         
-        available_crew = Crew.objects.exclude(id__in=assigned_crew_ids)
-        serializer = self.get_serializer(available_crew, many=True)
+        crew = available_crew(
+            start, end, rank=request.query_params.get('rank'), certificate_types=certificate_types
+        ).order_by('name')
+        serializer = self.get_serializer(crew, many=True)
         return Response(serializer.data)
+    
+    @action(detail=False, methods=['post'], parser_classes=[MultiPartParser, FormParser])
+    def import_roster(self, request):
+        """
+        Onboard the crew of a CSV or Excel roster (`file`). Valid rows are
+        created at once; their user accounts and credential emails are
+        provisioned in the background, tracked by the returned batch.
+        With `dry_run` the roster is only validated.
+        """
+        upload = request.FILES.get('file')
+        if not upload:
+            return Response(
+                {"error": "file is required (CSV or Excel roster)"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        dry_run = str(request.data.get('dry_run', '')).lower() in ('1', 'true', 'yes')
+        try:
+            roster = read_roster(upload)
+        except Exception as error:
+            return Response(
+                {"error": f"Could not read the roster: {error}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        importer = CrewOnboardingImporter(dry_run=dry_run, user=request.user)
+        report, batch = importer.run(roster, file_name=upload.name)
+        if batch:
+            transaction.on_commit(lambda: provision_crew_accounts.delay(batch.pk))
+        response_status = status.HTTP_202_ACCEPTED if batch else (
+            status.HTTP_200_OK if dry_run or not report.errors else status.HTTP_400_BAD_REQUEST
+        )
+        return Response({
+            'batch': batch.pk if batch else None,
+            'dry_run': dry_run,
+            'counts': report.counts,
+            'errors': report.errors,
+        }, status=response_status)
 
 
 class CrewCertificateViewSet(viewsets.ModelViewSet):
@@ -117,9 +214,11 @@ class CrewCertificateViewSet(viewsets.ModelViewSet):
     """
     queryset = CrewCertificate.objects.all()
     serializer_class = CrewCertificateSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, TrigramSearchFilter, filters.OrderingFilter]
     filterset_class = CertificateFilter
     search_fields = ['certificate_name', 'certificate_number', 'issuing_authority']
+    trigram_search_fields = ['certificate_name', 'issuing_authority']
+    exact_search_fields = ['certificate_number']
     ordering_fields = ['issue_date', 'expiry_date', 'created_at', 'updated_at']
     
     @action(detail=False, methods=['get'])
@@ -177,6 +276,7 @@ class CrewCertificateViewSet(viewsets.ModelViewSet):
                 # Check if notification already exists for this certificate and threshold
                 notification_exists = CertificateNotification.objects.filter(
                     certificate=cert,
+                    notified_expiry_date=cert.expiry_date,
                     days_before_expiry=days
                 ).exists()
                 
@@ -185,6 +285,7 @@ class CrewCertificateViewSet(viewsets.ModelViewSet):
                     message = f"Certificate '{cert.certificate_name}' for {cert.crew.name} will expire in {days} days on {cert.expiry_date}."
                     CertificateNotification.objects.create(
                         certificate=cert,
+                        notified_expiry_date=cert.expiry_date,
                         days_before_expiry=days,
                         message=message,
                         sent_to=cert.crew.email
@@ -197,6 +298,20 @@ class CrewCertificateViewSet(viewsets.ModelViewSet):
         })
 
 
+@contextmanager
+def overlap_as_validation_error():
+    """Atomically run assignment writes, reporting the overlap exclusion as a validation error"""
+    try:
+        with transaction.atomic():
+            yield
+    except IntegrityError as error:
+        if 'crew_assignment_no_overlap' not in str(error):
+            raise
+        raise serializers.ValidationError(
+            {'start_date': 'The crew member already has an assignment in this period.'}
+        )
+
+
 class CrewAssignmentViewSet(viewsets.ModelViewSet):
     """
     API endpoint for Crew Assignments management.
@@ -209,14 +324,26 @@ class CrewAssignmentViewSet(viewsets.ModelViewSet):
     ordering_fields = ['start_date', 'end_date', 'created_at', 'updated_at']
     
     def perform_create(self, serializer):
-        # When creating a new assignment, check for and close any current assignments
+        # When creating a new assignment, close any current assignments on its start date
+        # (periods are [start, end), so the two do not overlap); one starting later stays current until then
         crew = serializer.validated_data.get('crew')
-        if crew:
-            CrewAssignment.objects.filter(crew=crew, is_current=True).update(
-                is_current=False,
-                end_date=timezone.now().date()
-            )
-        serializer.save()
+        start_date = serializer.validated_data['start_date']
+        with overlap_as_validation_error():
+            if crew:
+                CrewAssignment.objects.filter(
+                    Q(end_date__isnull=True) | Q(end_date__gt=start_date),
+                    crew=crew, is_current=True, start_date__lt=start_date,
+                ).update(
+                    is_current=start_date > timezone.now().date(),
+                    end_date=start_date
+                )
+                invalidate_crew_detail(crew.pk)
+                invalidate_compliance_cache()
+            serializer.save()
+    
+    def perform_update(self, serializer):
+        with overlap_as_validation_error():
+            serializer.save()
     
     @action(detail=False, methods=['get'])
     def current(self, request):
@@ -255,6 +382,37 @@ class CrewAssignmentViewSet(viewsets.ModelViewSet):
         assignments = CrewAssignment.objects.filter(crew_id=crew_id).order_by('-start_date')
         serializer = self.get_serializer(assignments, many=True)
         return Response(serializer.data)
+    
+    @action(detail=False, methods=['get'])
+    def relief_plan(self, request):
+        """
+        Best relief for every current assignment ending within `horizon`
+        days (default 30), fleet-wide or for the comma-separated
+        `vessel_id`s; `contract_days` and `min_rest_days` override the
+        defaults and `method` is auto, hungarian or greedy
+        """
+        params = request.query_params
+        try:
+            horizon_days = int(params.get('horizon', DEFAULT_HORIZON_DAYS))
+            contract_days = int(params['contract_days']) if params.get('contract_days') else None
+            min_rest_days = int(params.get('min_rest_days', MIN_REST_DAYS))
+            vessel_ids = [int(value) for value in params.get('vessel_id', '').split(',') if value]
+        except ValueError:
+            return Response(
+                {"error": "horizon, contract_days, min_rest_days and vessel_id must be integers"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        method = params.get('method', 'auto')
+        if method not in ('auto', 'hungarian', 'greedy') or horizon_days < 0 or (contract_days or 1) < 1:
+            return Response(
+                {"error": "method must be auto, hungarian or greedy, horizon non-negative and contract_days positive"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response(plan_reliefs(
+            vessel_ids, horizon_days=horizon_days, contract_days=contract_days,
+            min_rest_days=min_rest_days, method=method
+        ))
 
 
 class VesselViewSet(viewsets.ModelViewSet):
@@ -274,6 +432,44 @@ class VesselViewSet(viewsets.ModelViewSet):
         assignments = CrewAssignment.objects.filter(vessel=vessel, is_current=True)
         serializer = CrewAssignmentSerializer(assignments, many=True)
         return Response(serializer.data)
+    
+    @action(detail=False, methods=['get'])
+    def compliance(self, request):
+        """
+        Certificate compliance matrix of the current assignments (required,
+        missing and expired certificate types per crew member) with the
+        manning compliance score of each vessel, optionally for the
+        comma-separated `vessel_id`s
+        """
+        try:
+            vessel_ids = [int(value) for value in request.query_params.get('vessel_id', '').split(',') if value]
+        except ValueError:
+            return Response(
+                {"error": "vessel_id must be a comma-separated list of integers"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(fleet_compliance(vessel_ids=vessel_ids))
+    
+    @action(detail=True, methods=['get'])
+    def compliance_score(self, request, pk=None):
+        """Cached manning compliance score of a vessel (null without current crew)"""
+        vessel = self.get_object()
+        score = vessel_compliance_scores().get(vessel.pk)
+        return Response(score or {
+            'vessel': vessel.pk, 'vessel_name': vessel.name, 'vessel_type': vessel.vessel_type,
+            'crew': 0, 'compliant': 0, 'gaps': 0, 'score': None,
+        })
+
+
+class RankCertificateRequirementViewSet(viewsets.ModelViewSet):
+    """
+    API endpoint for the rank certificate requirement matrix.
+    """
+    queryset = RankCertificateRequirement.objects.all()
+    serializer_class = RankCertificateRequirementSerializer
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_fields = ['rank', 'certificate_type', 'vessel_type', 'required']
+    ordering_fields = ['rank', 'certificate_type', 'vessel_type']
 
 
 class CertificateNotificationViewSet(viewsets.ModelViewSet):
@@ -311,4 +507,15 @@ class CertificateNotificationViewSet(viewsets.ModelViewSet):
         """Get all pending notifications"""
         pending = CertificateNotification.objects.filter(status='PENDING')
         serializer = self.get_serializer(pending, many=True)
-        return Response(serializer.data)
\ No newline at end of file
+        return Response(serializer.data)
+
+
+class CrewOnboardingBatchViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    API endpoint for following crew roster imports.
+    """
+    queryset = CrewOnboardingBatch.objects.all()
+    serializer_class = CrewOnboardingBatchSerializer
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_fields = ['status']
+    ordering_fields = ['created_at', 'completed_at']
@@ -1,13 +1,22 @@
 from django.contrib import admin
-from .models import Equipment, MaintenanceTask, MaintenanceHistory
+from .models import (
+    Equipment, MaintenanceTask, MaintenanceHistory, JobTemplate, EquipmentStatusChange, SparePart, PartConsumption,
+    JobTemplatePart, StockLevel, StockMovement, MonitoringParameter, ConditionAlert,
+    VesselKpiSnapshot, MaintenanceHistoryArchive
+)
+from django.core.paginator import Paginator
+from django.db import connection
+from django.utils.functional import cached_property
 from django.utils.html import format_html
+from django.db.models.functions import Length
 from django.utils import timezone
+from .inventory import record_stock_movements
 
 @admin.register(Equipment)
 class EquipmentAdmin(admin.ModelAdmin):
-    list_display = ('name', 'model', 'serial_number', 'manufacturer', 'status', 'location')
+    list_display = ('sfi_code', 'name', 'model', 'serial_number', 'manufacturer', 'status', 'location')
     list_filter = ('status', 'manufacturer', 'location')
-    search_fields = ('name', 'model', 'serial_number')
+    search_fields = ('name', 'model', 'serial_number', 'sfi_code')
     date_hierarchy = 'installation_date'
     list_per_page = 20
 
@@ -17,6 +26,7 @@ class MaintenanceTaskAdmin(admin.ModelAdmin):
     list_display = ('task_name', 'equipment', 'status', 'colored_next_due_date', 'interval_type', 'responsible_role')
     list_filter = ('status', 'interval_type', 'responsible_role')
     search_fields = ('task_name', 'equipment__name', 'description')
+    raw_id_fields = ('template',)
     date_hierarchy = 'next_due_date'
     list_per_page = 20
 
@@ -45,10 +55,172 @@ class MaintenanceTaskAdmin(admin.ModelAdmin):
     colored_next_due_date.admin_order_field = 'next_due_date'
 
 
+class JobTemplatePartInline(admin.TabularInline):
+    model = JobTemplatePart
+    raw_id_fields = ('part',)
+    extra = 1
+
+
+@admin.register(JobTemplate)
+class JobTemplateAdmin(admin.ModelAdmin):
+    inlines = [JobTemplatePartInline]
+    list_display = ('name', 'job_code', 'manufacturer', 'equipment_model', 'interval_type', 'interval_value', 'is_active')
+    list_filter = ('is_active', 'interval_type', 'manufacturer')
+    search_fields = ('name', 'job_code', 'equipment_model', 'manufacturer')
+    list_per_page = 20
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator using the planner's row estimate for unfiltered changelists,
+    so large tables are not counted on every page
+    """
+    @cached_property
+    def count(self):
+        query = self.object_list.query
+        if not query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [query.model._meta.db_table]
+                )
+                row = cursor.fetchone()
+            # reltuples is -1 until the table has been analyzed
+            if row and row[0] > 0:
+                return row[0]
+        return super().count
+
+
 @admin.register(MaintenanceHistory)
 class MaintenanceHistoryAdmin(admin.ModelAdmin):
     list_display = ('task', 'equipment', 'completed_date', 'completed_by')
     list_filter = ('completed_date', 'equipment')
     search_fields = ('task__task_name', 'equipment__name', 'remarks')
     date_hierarchy = 'completed_date'
-    list_per_page = 20
\ No newline at end of file
+    list_select_related = ('task', 'equipment', 'completed_by')
+    raw_id_fields = ('task', 'equipment', 'completed_by')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 20
+
+
+@admin.register(MaintenanceHistoryArchive)
+class MaintenanceHistoryArchiveAdmin(admin.ModelAdmin):
+    list_display = ('vessel', 'year', 'row_count', 'first_completed', 'last_completed', 'compressed_size', 'archived_at')
+    list_filter = ('vessel', 'year')
+    list_select_related = ('vessel',)
+    exclude = ('payload',)
+    readonly_fields = (
+        'vessel', 'year', 'row_count', 'first_completed', 'last_completed', 'raw_size', 'archived_at'
+    )
+    list_per_page = 20
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer('payload').annotate(payload_size=Length('payload'))
+    
+    def compressed_size(self, obj):
+        return f'{obj.payload_size} of {obj.raw_size} bytes'
+    compressed_size.short_description = 'Compressed size'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(EquipmentStatusChange)
+class EquipmentStatusChangeAdmin(admin.ModelAdmin):
+    list_display = ('equipment', 'from_status', 'to_status', 'changed_at')
+    list_filter = ('to_status',)
+    search_fields = ('equipment__name', 'equipment__serial_number')
+    date_hierarchy = 'changed_at'
+    raw_id_fields = ('equipment',)
+    list_per_page = 20
+
+
+
+@admin.register(SparePart)
+class SparePartAdmin(admin.ModelAdmin):
+    list_display = ('name', 'code', 'part_number', 'manufacturer', 'unit', 'lead_time_days')
+    list_filter = ('manufacturer', 'unit')
+    search_fields = ('name', 'code', 'part_number')
+    list_per_page = 20
+
+
+@admin.register(PartConsumption)
+class PartConsumptionAdmin(admin.ModelAdmin):
+    list_display = ('part', 'quantity', 'vessel', 'consumed_at', 'history')
+    list_filter = ('vessel',)
+    search_fields = ('part__name', 'part__code')
+    date_hierarchy = 'consumed_at'
+    raw_id_fields = ('history', 'part')
+    list_select_related = ('part', 'vessel', 'history__task')
+    list_per_page = 20
+
+
+
+@admin.register(StockLevel)
+class StockLevelAdmin(admin.ModelAdmin):
+    list_display = ('part', 'vessel', 'location', 'quantity', 'updated_at')
+    list_filter = ('vessel', 'location')
+    search_fields = ('part__name', 'part__code', 'location')
+    list_select_related = ('part', 'vessel')
+    # Levels are maintained from the movements ledger
+    readonly_fields = ('quantity',)
+    list_per_page = 20
+
+
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    list_display = ('part', 'vessel', 'location', 'quantity', 'movement_type', 'reference', 'created_at')
+    list_filter = ('movement_type', 'vessel')
+    search_fields = ('part__name', 'part__code', 'reference')
+    date_hierarchy = 'created_at'
+    list_select_related = ('part', 'vessel')
+    raw_id_fields = ('part', 'consumption')
+    list_per_page = 20
+
+    def save_model(self, request, obj, form, change):
+        obj.created_by = request.user
+        record_stock_movements([obj])
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+
+@admin.register(MonitoringParameter)
+class MonitoringParameterAdmin(admin.ModelAdmin):
+    list_display = ('name', 'equipment', 'unit', 'warning_limit', 'alarm_limit', 'is_active', 'last_evaluated_at')
+    list_filter = ('is_active', 'name')
+    search_fields = ('name', 'equipment__name')
+    raw_id_fields = ('equipment',)
+    list_select_related = ('equipment',)
+    list_per_page = 20
+
+
+@admin.register(ConditionAlert)
+class ConditionAlertAdmin(admin.ModelAdmin):
+    list_display = ('parameter', 'level', 'value', 'reading_count', 'recorded_at', 'task', 'acknowledged')
+    list_filter = ('level', 'acknowledged')
+    search_fields = ('parameter__name', 'parameter__equipment__name')
+    date_hierarchy = 'created_at'
+    raw_id_fields = ('parameter', 'task')
+    list_select_related = ('parameter__equipment', 'task__equipment')
+    list_per_page = 20
+
+
+
+@admin.register(VesselKpiSnapshot)
+class VesselKpiSnapshotAdmin(admin.ModelAdmin):
+    list_display = (
+        'vessel', 'week_start', 'open_jobs', 'overdue_jobs', 'backlog_hours', 'completed_jobs',
+        'completed_in_window', 'refreshed_at'
+    )
+    list_filter = ('vessel',)
+    date_hierarchy = 'week_start'
+    list_select_related = ('vessel',)
+    list_per_page = 20
@@ -0,0 +1,242 @@
+import functools
+import json
+import zlib
+from datetime import datetime
+
+from django.db import transaction
+from django.db.models import DateTimeField, F, Max, Sum, prefetch_related_objects
+from django.db.models.functions import ExtractYear
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import MaintenanceHistory, MaintenanceHistoryArchive
+
+
+COMPRESSION_LEVEL = 9
+HISTORY_FIELDS = [field.attname for field in MaintenanceHistory._meta.concrete_fields]
+DATETIME_FIELDS = [
+    field.attname for field in MaintenanceHistory._meta.concrete_fields if isinstance(field, DateTimeField)
+]
+SEARCH_FIELDS = ['remarks', 'parts_used']
+
+
+def encode_value(value):
+    """JSON form of the non-JSON history values; DjangoJSONEncoder would drop the microseconds"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def year_start(year):
+    """Start of a year in the current timezone"""
+    return timezone.make_aware(datetime(year, 1, 1))
+
+
+def archive_cutoff(keep_years=2, today=None):
+    """First instant kept in the hot table: the current year and keep_years - 1 before it stay hot"""
+    today = today or timezone.localdate()
+    return year_start(today.year - keep_years + 1)
+
+
+def archive_boundary():
+    """
+    Start of the year after the last archived year, or None when nothing is
+    archived. Reads from this instant on never need the archive.
+    """
+    last_year = MaintenanceHistoryArchive.objects.aggregate(year=Max('year'))['year']
+    return year_start(last_year + 1) if last_year else None
+
+
+def archive_history(keep_years=2, dry_run=False, progress=None, today=None):
+    """
+    Move the maintenance history of closed years out of the hot table.
+
+    Entries completed before archive_cutoff() are grouped per vessel and
+    year; each group is written as one compressed MaintenanceHistoryArchive
+    batch and deleted from the hot table in the same transaction. Part
+    consumption lines stay in place with their history link cleared, so the
+    parts rollups keep their figures. Entries recorded late for an already
+    archived year go into an additional batch on the next run.
+    Returns batch and row counts with the raw and compressed sizes.
+    """
+    cutoff = archive_cutoff(keep_years, today)
+    groups = (
+        MaintenanceHistory.objects
+        .filter(completed_date__lt=cutoff)
+        .annotate(archive_vessel=F('equipment__vessel_id'), archive_year=ExtractYear('completed_date'))
+        .values_list('archive_vessel', 'archive_year')
+        .distinct()
+        .order_by('archive_year', 'archive_vessel')
+    )
+    result = {'batches': 0, 'rows': 0, 'raw_bytes': 0, 'compressed_bytes': 0}
+    for vessel_id, year in list(groups):
+        with transaction.atomic():
+            entries = MaintenanceHistory.objects.select_for_update().filter(
+                equipment__vessel_id=vessel_id,
+                completed_date__gte=year_start(year),
+                completed_date__lt=min(year_start(year + 1), cutoff),
+            ).order_by('completed_date', 'id')
+            rows = list(entries.values(*HISTORY_FIELDS))
+            if not rows:
+                continue
+            raw = json.dumps(rows, default=encode_value).encode()
+            payload = zlib.compress(raw, COMPRESSION_LEVEL)
+            result['batches'] += 1
+            result['rows'] += len(rows)
+            result['raw_bytes'] += len(raw)
+            result['compressed_bytes'] += len(payload)
+            if not dry_run:
+                MaintenanceHistoryArchive.objects.create(
+                    vessel_id=vessel_id,
+                    year=year,
+                    row_count=len(rows),
+                    first_completed=rows[0]['completed_date'],
+                    last_completed=rows[-1]['completed_date'],
+                    payload=payload,
+                    raw_size=len(raw),
+                )
+                MaintenanceHistory.objects.filter(pk__in=[row['id'] for row in rows]).delete()
+        if progress:
+            progress(vessel_id, year, len(rows))
+    return result
+
+
+@functools.lru_cache(maxsize=64)
+def batch_rows(batch_id):
+    """Decoded rows of an archive batch; batches never change, so they are cached per process"""
+    payload = MaintenanceHistoryArchive.objects.values_list('payload', flat=True).get(pk=batch_id)
+    rows = json.loads(zlib.decompress(payload))
+    for row in rows:
+        for field in DATETIME_FIELDS:
+            if row[field]:
+                row[field] = parse_datetime(row[field])
+    return rows
+
+
+def archive_batches(vessel_ids=None, start=None, end=None):
+    """Archive batches of the given vessels overlapping [start, end]"""
+    batches = MaintenanceHistoryArchive.objects.all()
+    if vessel_ids is not None:
+        batches = batches.filter(vessel_id__in=vessel_ids)
+    if start:
+        batches = batches.filter(last_completed__gte=start)
+    if end:
+        batches = batches.filter(first_completed__lte=end)
+    return batches
+
+
+def archived_history(vessel_ids=None, start=None, end=None, task=None, equipment=None,
+                     completed_by=None, search=None):
+    """
+    History entries of the archive batches matching the filters, as
+    MaintenanceHistory instances (sorted by completion date). Only batches
+    overlapping [start, end] and of the given vessels are decompressed.
+    """
+    batches = archive_batches(vessel_ids, start, end)
+    exact = {'task_id': task, 'equipment_id': equipment, 'completed_by_id': completed_by}
+    exact = {field: int(value) for field, value in exact.items() if value not in (None, '')}
+    terms = search.lower().split() if search else []
+    entries = []
+    for batch_id in batches.order_by('first_completed').values_list('id', flat=True):
+        for row in batch_rows(batch_id):
+            if start and row['completed_date'] < start or end and row['completed_date'] > end:
+                continue
+            if any(row[field] != value for field, value in exact.items()):
+                continue
+            if terms:
+                text = ' '.join((row[field] or '') for field in SEARCH_FIELDS).lower()
+                if not all(term in text for term in terms):
+                    continue
+            entries.append(MaintenanceHistory.from_db('default', HISTORY_FIELDS, [row[f] for f in HISTORY_FIELDS]))
+    entries.sort(key=lambda entry: (entry.completed_date, entry.id))
+    return entries
+
+
+def archived_count(vessel_ids=None, start=None, end=None, **filters):
+    """
+    Number of archived entries archived_history() returns for the same
+    arguments. Batches wholly inside [start, end] are counted from their
+    row_count; only entry filters (task, equipment, completed_by, search)
+    or batches cut by the range need decompressing.
+    """
+    if any(value not in (None, '') for value in filters.values()):
+        return len(archived_history(vessel_ids, start, end, **filters))
+    batches = archive_batches(vessel_ids, start, end)
+    whole = batches
+    if start:
+        whole = whole.filter(first_completed__gte=start)
+    if end:
+        whole = whole.filter(last_completed__lte=end)
+    count = whole.aggregate(rows=Sum('row_count'))['rows'] or 0
+    for batch_id in batches.exclude(pk__in=whole.values('pk')).values_list('id', flat=True):
+        count += sum(
+            1 for row in batch_rows(batch_id)
+            if not (start and row['completed_date'] < start or end and row['completed_date'] > end)
+        )
+    return count
+
+
+class HistoryTimeline:
+    """
+    Hot and archived history as one sequence ordered by completion date,
+    sliceable like a queryset so the regular paginator can page through it.
+
+    `recent` is the hot queryset from the archive boundary on and is only
+    sliced, so pages within it cost one indexed query. `older` is the hot
+    queryset before the boundary and `archived` a callable returning the
+    archived entries; they are merged only when a page reaches past the
+    recent entries, and `archived_count` sizes them without decompressing.
+    """
+    related = ('task', 'equipment', 'completed_by')
+
+    def __init__(self, recent, older, archived, archived_count, descending=True):
+        self.recent = recent
+        self.recent_count = recent.count()
+        self.older_hot = older
+        self.older_count = older.count() + archived_count
+        self.archived = archived
+        self.descending = descending
+        self._older = None
+
+    @property
+    def older(self):
+        if self._older is None:
+            self._older = sorted(
+                list(self.older_hot) + self.archived(),
+                key=lambda entry: (entry.completed_date, entry.id), reverse=self.descending
+            )
+        return self._older
+
+    def count(self):
+        return self.recent_count + self.older_count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        # Newest first reads the recent entries first, oldest first the older ones
+        first_count = self.recent_count if self.descending else self.older_count
+        start = index.start or 0
+        stop = self.count() if index.stop is None else index.stop
+        entries = []
+        if start < first_count:
+            first = self.recent if self.descending else self.older
+            entries += list(first[start:min(stop, first_count)])
+        if stop > first_count:
+            second = self.older if self.descending else self.recent
+            entries += list(second[max(start - first_count, 0):stop - first_count])
+        # Archived entries come without their relations
+        prefetch_related_objects(
+            [entry for entry in entries if not MaintenanceHistory.task.is_cached(entry)], *self.related
+        )
+        return entries
+
+
+def parse_bound(value):
+    """Date or datetime query parameter as an aware datetime, read the way the completed_date filter reads it"""
+    if not value:
+        return None
+    bound = MaintenanceHistory._meta.get_field('completed_date').to_python(value)
+    return timezone.make_aware(bound) if timezone.is_naive(bound) else bound
@@ -0,0 +1,104 @@
+from django.db import transaction
+from django.db.models import Count, Q
+from django.db.models.functions import Substr
+from django.utils import timezone
+
+from .models import Equipment, OPEN_TASK_STATUSES
+from .utils import ImportReport, bulk_upsert, normalize_sfi_code, sfi_code_or_none, sfi_prefix_length
+
+
+def subtree_filter(code, prefix=''):
+    """
+    Q object matching every equipment under an SFI node, the node included.
+
+    Segments are fixed width once normalized, so a plain prefix match is
+    exact and can use the (vessel, sfi_code) pattern index. Raises
+    ValueError for a malformed code (see normalize_sfi_code).
+    """
+    return Q(**{f'{prefix}sfi_code__startswith': normalize_sfi_code(code)})
+
+
+def subtree_rollup(vessel_id, level, code=''):
+    """
+    Equipment and task counts for every node at `level` below `code`.
+
+    Returns one row per node with equipment, task, open and overdue counts,
+    computed in a single grouped query.
+    """
+    now = timezone.now()
+    open_filter = Q(maintenance_tasks__status__in=OPEN_TASK_STATUSES)
+    queryset = Equipment.objects.filter(vessel_id=vessel_id).exclude(sfi_code='')
+    if code:
+        queryset = queryset.filter(subtree_filter(code))
+    return list(
+        queryset
+        .annotate(node=Substr('sfi_code', 1, sfi_prefix_length(level)))
+        .values('node')
+        .annotate(
+            equipment_count=Count('id', distinct=True),
+            task_count=Count('maintenance_tasks'),
+            open_task_count=Count('maintenance_tasks', filter=open_filter),
+            overdue_task_count=Count(
+                'maintenance_tasks',
+                filter=open_filter & Q(maintenance_tasks__next_due_date__lt=now)
+            ),
+        )
+        .order_by('node')
+    )
+
+
+def import_equipment_tree(vessel, nodes, report=None, label='equipment', chunk_size=500, progress=None,
+                          update_existing=True):
+    """
+    Bulk create or update the equipment tree of a vessel from SFI-coded rows.
+
+    `nodes` is an iterable of dicts with at least `code` and `name`; optional
+    keys are `model`, `manufacturer`, `serial_number`, `location` and
+    `installation_date`. Existing equipment is matched on (vessel, sfi_code)
+    with one lookup, then written with bulk_create and bulk_update; with
+    `update_existing` off, matched equipment is left untouched. Rows with
+    a blank or malformed code are skipped.
+    Returns a dict with created/updated/skipped counts.
+    """
+    report = report if report is not None else ImportReport()
+    rows = {}
+    skipped = 0
+    for node in nodes:
+        code = sfi_code_or_none(node.get('code'))
+        if not code or not node.get('name'):
+            skipped += 1
+            continue
+        # Later rows for the same code win, as they would with row-by-row updates
+        rows[code] = node
+
+    today = timezone.now().date()
+    records = [
+        {
+            'vessel_id': vessel.pk,
+            'sfi_code': code,
+            'name': str(node['name'])[:100],
+            'model': node.get('model') or '',
+            'manufacturer': node.get('manufacturer') or '',
+            'serial_number': node.get('serial_number') or f'{vessel.imo_number}-{code}',
+            'location': node.get('location') or '',
+            'installation_date': node.get('installation_date') or today,
+        }
+        for code, node in rows.items()
+    ]
+    existing = Equipment.objects.filter(vessel=vessel, sfi_code__in=rows.keys())
+    before = dict(report.counts.get(label, {'created': 0, 'updated': 0}))
+
+    with transaction.atomic():
+        bulk_upsert(
+            Equipment, existing, records,
+            key_fields=['sfi_code'],
+            update_fields=['name', 'model', 'manufacturer', 'location'] if update_existing else [],
+            report=report, label=label, chunk_size=chunk_size, progress=progress,
+        )
+
+    counts = report.counts[label]
+    return {
+        'created': counts['created'] - before['created'],
+        'updated': counts['updated'] - before['updated'],
+        'skipped': skipped,
+    }
@@ -0,0 +1,321 @@
+import hashlib
+import re
+
+import pandas as pd
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from .hierarchy import import_equipment_tree
+from .models import Equipment, MaintenanceTask
+from .utils import ImportReport, bulk_upsert, sfi_code_or_none
+
+
+# Frequency units used in the job workbooks ("3 Month(s)")
+INTERVAL_UNITS = {
+    'day': 'daily',
+    'week': 'weekly',
+    'month': 'monthly',
+    'year': 'annual',
+    'hour': 'running_hours',
+}
+
+TASK_UPDATE_FIELDS = ['task_name', 'description', 'instructions', 'interval_type', 'interval_value']
+
+MALFORMED_SFI_CODE = 'SFI code segments have at most 3 digits'
+
+
+def sfi_code_column(codes):
+    """Normalized SFI codes, blank for missing cells, and the mask of malformed ones"""
+    codes = codes.map(sfi_code_or_none)
+    malformed = codes.isna()
+    return codes.fillna(''), malformed
+
+
+def text_column(df, column):
+    """Stripped string column with blanks for missing cells"""
+    if column not in df:
+        return pd.Series('', index=df.index)
+    return df[column].fillna('').astype(str).str.strip()
+
+
+def parse_periodicity(label):
+    """
+    Interval of a periodicity header of the maintenance plan workbook.
+
+    '500 H/ 6 mois' -> ('monthly', 6), '20000 H/20 ans' -> ('annual', 20),
+    'Hebdomadaire' -> ('weekly', 1). Conditional columns return None.
+    """
+    label = str(label).strip().lower()
+    if label.startswith('hebdo'):
+        return ('weekly', 1)
+    if label.startswith('journ') or label.startswith('quotid'):
+        return ('daily', 1)
+    match = re.search(r'(\d+)\s*(ans?|mois)\b', label)
+    if not match:
+        return None
+    value, unit = int(match.group(1)), match.group(2)
+    return ('monthly', value) if unit == 'mois' else ('annual', value)
+
+
+def section_serials(prefix, names):
+    """
+    Synthetic serial numbers of maintenance plan sections, '<prefix>-<slug>'.
+    Serials are unique fleet-wide, and names that slugify alike ('Deck Hull',
+    'Deck - Hull') would collide, so a serial already taken in the database or
+    by an earlier name gets a hash of the name as suffix.
+    """
+    taken = set(
+        Equipment.objects.filter(serial_number__startswith=f'{prefix}-').values_list('serial_number', flat=True)
+    )
+    serials = {}
+    for name in names:
+        serial = f'{prefix}-{slugify(name)[:79]}'
+        if serial in taken:
+            serial = f'{prefix}-{slugify(name)[:70]}-{hashlib.sha1(name.encode()).hexdigest()[:8]}'
+        taken.add(serial)
+        serials[name] = serial
+    return serials
+
+
+class RemorqueurImporter:
+    """
+    Bulk import pipeline for the remorqueur PMS workbooks.
+
+    Each sheet is validated column-wise with pandas, existing rows are
+    resolved with one keyed query per model and changes are applied with
+    chunked bulk_create/bulk_update inside a single transaction. In dry-run
+    mode the transaction is rolled back, leaving only the report and diff.
+    """
+
+    def __init__(self, vessel, dry_run=False, chunk_size=500, responsible_role='Chief Engineer',
+                 update_existing=True, progress=None):
+        self.vessel = vessel
+        self.dry_run = dry_run
+        self.update_existing = update_existing
+        self.chunk_size = chunk_size
+        self.responsible_role = responsible_role
+        self.progress = progress
+        self.report = ImportReport()
+        self.now = timezone.now()
+        self._due_dates = {}
+
+    def run(self, equipment=None, component_jobs=None, plan=None):
+        """Import the given dataframes; plan must be read with header=None"""
+        with transaction.atomic():
+            if equipment is not None:
+                self.import_equipment(equipment)
+            if component_jobs is not None:
+                self.import_component_jobs(component_jobs)
+            if plan is not None:
+                self.import_maintenance_plan(plan)
+            if self.dry_run:
+                transaction.set_rollback(True)
+        return self.report
+
+    def reject(self, source, mask, message, offset=2):
+        """Record an error for every row selected by `mask` (Excel row numbers)"""
+        for index in mask[mask].index:
+            self.report.add_error(source, int(index) + offset, message)
+
+    def initial_due_date(self, interval_type, interval_value):
+        """First due date of a newly imported task, computed once per interval"""
+        key = (interval_type, interval_value)
+        if key not in self._due_dates:
+            task = MaintenanceTask(
+                interval_type=interval_type,
+                interval_value=interval_value,
+                last_completed_date=self.now,
+                next_due_date=self.now,
+            )
+            self._due_dates[key] = task.calculate_next_due_date()
+        return self._due_dates[key]
+
+    def task_records(self, df):
+        """MaintenanceTask field values for a validated job dataframe"""
+        return [
+            {
+                'equipment_id': int(row.equipment_id),
+                'job_code': row.job_code,
+                'task_name': row.description[:100],
+                'description': row.description,
+                'instructions': row.description,
+                'interval_type': row.interval_type,
+                'interval_value': int(row.interval_value),
+                'responsible_role': self.responsible_role,
+                'next_due_date': self.initial_due_date(row.interval_type, int(row.interval_value)),
+            }
+            for row in df.itertuples(index=False)
+        ]
+
+    def import_equipment(self, df, source='equipment'):
+        """Equipment workbook: one row per equipment with a 6-digit SFI code"""
+        codes, malformed = sfi_code_column(df.get('code_sfi_6_chiffres', pd.Series(index=df.index, dtype=object)))
+        names = text_column(df, 'nom')
+        self.reject(source, malformed, MALFORMED_SFI_CODE)
+        missing = (codes.eq('') | names.eq('')) & ~malformed
+        self.reject(source, missing, 'Equipment name and SFI code are required')
+        invalid = malformed | missing
+        duplicate = codes.duplicated(keep='last') & ~invalid
+        self.reject(source, duplicate, 'Duplicate SFI code, superseded by a later row')
+
+        valid = ~invalid & ~duplicate
+        nodes = pd.DataFrame({
+            'code': codes,
+            'name': names,
+            'manufacturer': text_column(df, 'marque'),
+            'model': text_column(df, 'type'),
+            'location': text_column(df, 'emplacement'),
+        })[valid]
+        import_equipment_tree(
+            self.vessel, nodes.to_dict('records'),
+            report=self.report, label=source, chunk_size=self.chunk_size, progress=self.progress,
+            update_existing=self.update_existing,
+        )
+
+    def import_component_jobs(self, df, source='component jobs'):
+        """Component jobs workbook: component rows followed by job continuation rows"""
+        codes, malformed = sfi_code_column(df.get('Component No.', pd.Series(index=df.index, dtype=object)).ffill())
+        names = df.get('Name', pd.Series(index=df.index, dtype=object)).ffill().fillna('').astype(str).str.strip()
+        frequency = text_column(df, 'Frequency').str.extract(r'(\d+)\s*([A-Za-z]+)')
+        jobs = pd.DataFrame({
+            'code': codes,
+            'job_code': text_column(df, 'Job Code'),
+            'description': text_column(df, 'Job Description'),
+            'interval_value': pd.to_numeric(frequency[0], errors='coerce'),
+            'interval_type': frequency[1].str.lower().str.rstrip('s').map(INTERVAL_UNITS),
+        })
+
+        checks = [
+            (malformed, MALFORMED_SFI_CODE),
+            (jobs['code'].eq(''), 'Component number is required'),
+            (jobs['description'].eq(''), 'Job description is required'),
+            (jobs['job_code'].eq(''), 'Job code is required'),
+            (jobs['interval_value'].isna() | jobs['interval_value'].le(0) | jobs['interval_type'].isna(),
+             'Frequency must look like "3 Month(s)"'),
+        ]
+        invalid = pd.Series(False, index=df.index)
+        for mask, message in checks:
+            self.reject(source, mask & ~invalid, message)
+            invalid |= mask
+        duplicate = jobs.duplicated(subset=['code', 'job_code'], keep='last') & ~invalid
+        self.reject(source, duplicate, 'Duplicate job for this component, superseded by a later row')
+        jobs = jobs[~invalid & ~duplicate]
+
+        # Components are part of the equipment tree
+        components = pd.DataFrame({'code': codes, 'name': names})[~invalid & ~duplicate]
+        components = components.drop_duplicates(subset='code', keep='first')
+        import_equipment_tree(
+            self.vessel, components.to_dict('records'),
+            report=self.report, label='components', chunk_size=self.chunk_size, progress=self.progress,
+            update_existing=self.update_existing,
+        )
+
+        equipment_ids = dict(
+            Equipment.objects.filter(vessel=self.vessel, sfi_code__in=set(jobs['code']))
+            .values_list('sfi_code', 'id')
+        )
+        jobs = jobs.assign(equipment_id=jobs['code'].map(equipment_ids))
+        unresolved = jobs['equipment_id'].isna()
+        self.reject(source, unresolved, 'Component could not be resolved')
+        jobs = jobs[~unresolved]
+
+        existing = MaintenanceTask.objects.filter(
+            equipment__vessel=self.vessel,
+            job_code__in=set(jobs['job_code'])
+        )
+        bulk_upsert(
+            MaintenanceTask, existing, self.task_records(jobs),
+            key_fields=['equipment_id', 'job_code'],
+            update_fields=TASK_UPDATE_FIELDS if self.update_existing else [],
+            report=self.report, label=source, chunk_size=self.chunk_size, progress=self.progress,
+        )
+
+    def import_maintenance_plan(self, df, source='maintenance plan'):
+        """
+        Yearly plan workbook laid out as a matrix: one column per periodicity
+        ticked with a mark, job designations in the next column and rows
+        without any mark acting as equipment section headers.
+        """
+        first_column = text_column(df, df.columns[0]).str.upper()
+        header_rows = first_column[first_column.str.startswith('PERIODICITE')].index
+        if header_rows.empty:
+            self.report.add_error(source, None, 'PERIODICITE header not found')
+            return
+        header = df.index.get_loc(header_rows[0])
+        designation_column = next(
+            (column for column in df.columns
+             if 'DESIGNATION' in str(df.iloc[header][column]).upper()),
+            None
+        )
+        if designation_column is None:
+            self.report.add_error(source, None, 'DESIGNATION DES TRAVAUX header not found')
+            return
+
+        tick_columns = list(df.columns[:df.columns.get_loc(designation_column)])
+        intervals = {column: parse_periodicity(df.iloc[header + 1][column]) for column in tick_columns}
+        body = df.iloc[header + 2:]
+        marks = body[tick_columns].notna()
+        has_mark = marks.any(axis=1)
+        designation = text_column(body, designation_column)
+
+        section = designation.where(~has_mark & designation.ne('')).ffill().fillna('')
+        rows = has_mark & designation.ne('')
+        # The most frequent ticked periodicity wins (columns run from long to short)
+        interval = marks[rows].iloc[:, ::-1].idxmax(axis=1).map(intervals)
+        jobs = pd.DataFrame({
+            'section': section[rows].str[:100],
+            'description': designation[rows],
+            'interval': interval,
+        })
+
+        no_section = jobs['section'].eq('')
+        self.reject(source, no_section, 'Job listed before any equipment section', offset=1)
+        conditional = jobs['interval'].isna() & ~no_section
+        self.reject(source, conditional, 'Conditional job without a fixed periodicity', offset=1)
+        jobs = jobs[~no_section & ~conditional]
+        duplicate = jobs.duplicated(subset=['section', 'description'], keep='last')
+        self.reject(source, duplicate, 'Duplicate job in this section, superseded by a later row', offset=1)
+        jobs = jobs[~duplicate]
+
+        # Sections map to equipment by name; unknown ones are created
+        today = timezone.now().date()
+        sections = jobs['section'].unique()
+        known = list(Equipment.objects.filter(vessel=self.vessel, name__in=sections))
+        known_names = {item.name for item in known}
+        serials = section_serials(self.vessel.imo_number, [name for name in sections if name not in known_names])
+        equipment = bulk_upsert(
+            Equipment,
+            known,
+            [
+                {
+                    'vessel_id': self.vessel.pk,
+                    'name': name,
+                    'model': '',
+                    'manufacturer': '',
+                    'serial_number': serials.get(name, ''),
+                    'location': '',
+                    'installation_date': today,
+                }
+                for name in sections
+            ],
+            key_fields=['name'], update_fields=[],
+            report=self.report, label='plan sections', chunk_size=self.chunk_size, progress=self.progress,
+        )
+
+        jobs = jobs.assign(
+            equipment_id=jobs['section'].map(lambda name: equipment[(name,)].pk),
+            job_code='',
+            interval_type=jobs['interval'].str[0],
+            interval_value=jobs['interval'].str[1],
+        )
+        existing = MaintenanceTask.objects.filter(
+            equipment_id__in=set(jobs['equipment_id']),
+            task_name__in=set(jobs['description'].str[:100])
+        )
+        bulk_upsert(
+            MaintenanceTask, existing, self.task_records(jobs),
+            key_fields=['equipment_id', 'task_name'],
+            update_fields=TASK_UPDATE_FIELDS if self.update_existing else [],
+            report=self.report, label=source, chunk_size=self.chunk_size, progress=self.progress,
+        )
@@ -0,0 +1,234 @@
+import math
+from collections import defaultdict
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import (
+    JobTemplatePart, MaintenanceTask, OPEN_TASK_STATUSES, PartConsumptionRollup, PartForecast, SparePart,
+    StockLevel, StockMovement
+)
+from .planner import WorkloadPlanner
+
+
+# z-score of the cycle service level used for safety stock (95%)
+SERVICE_LEVEL_Z = 1.65
+# Months of consumption history behind the usage rate
+USAGE_WINDOW_MONTHS = 12
+DAYS_PER_MONTH = 365.25 / 12
+
+
+def record_stock_movements(movements):
+    """
+    Write stock movements to the ledger and apply them to the stock levels.
+
+    Movements are inserted with one bulk_create; each affected stock level
+    is then shifted with a single F() update so concurrent movements on the
+    same part never lose an update.
+    """
+    deltas = defaultdict(Decimal)
+    for movement in movements:
+        deltas[(movement.vessel_id, movement.part_id, movement.location)] += Decimal(movement.quantity)
+
+    now = timezone.now()
+    with transaction.atomic():
+        movements = StockMovement.objects.bulk_create(movements)
+        StockLevel.objects.bulk_create(
+            [StockLevel(vessel_id=vessel, part_id=part, location=location) for vessel, part, location in deltas],
+            ignore_conflicts=True,
+        )
+        for (vessel, part, location), delta in deltas.items():
+            StockLevel.objects.filter(vessel_id=vessel, part_id=part, location=location).update(
+                quantity=F('quantity') + delta, updated_at=now
+            )
+    return movements
+
+
+def consume_from_stock(lines, user=None):
+    """
+    Book consumption lines out of stock.
+
+    Each line is taken from the location holding most of that part on the
+    vessel (resolved with one DISTINCT ON query), or the default location
+    when the part is not stocked yet.
+    """
+    if not lines:
+        return []
+    locations = {
+        (level.vessel_id, level.part_id): level.location
+        for level in StockLevel.objects.filter(
+            vessel_id__in={line.vessel_id for line in lines},
+            part_id__in={line.part_id for line in lines},
+        ).order_by('vessel_id', 'part_id', '-quantity').distinct('vessel_id', 'part_id')
+    }
+    return record_stock_movements([
+        StockMovement(
+            vessel_id=line.vessel_id,
+            part_id=line.part_id,
+            location=locations.get((line.vessel_id, line.part_id), ''),
+            quantity=-line.quantity,
+            movement_type='consumption',
+            reference=f'History #{line.history_id}',
+            consumption=line,
+            created_by=user,
+            created_at=line.consumed_at,
+        )
+        for line in lines
+    ])
+
+
+def restock_consumption(lines, user=None):
+    """
+    Return the stock booked out for consumption lines that are withdrawn.
+
+    Each consumption movement is offset by an opposite movement at the
+    location it was taken from; lines that never left the stock (e.g.
+    backfilled history) have no movement and are skipped.
+    """
+    return record_stock_movements([
+        StockMovement(
+            vessel_id=movement.vessel_id,
+            part_id=movement.part_id,
+            location=movement.location,
+            quantity=-movement.quantity,
+            movement_type='consumption',
+            reference=f'{movement.reference} reversed'[:100],
+            created_by=user,
+        )
+        for movement in StockMovement.objects.filter(consumption__in=[line.pk for line in lines])
+    ])
+
+def scheduled_part_demand(vessel_ids, lead_times, today):
+    """
+    Parts needed by scheduled templated jobs, one row per job occurrence and part.
+
+    Occurrences are projected over the longest lead time; the caller keeps
+    the ones falling within the lead time of each part.
+    """
+    columns = ['vessel_id', 'part_id', 'quantity', 'due_date']
+    requirements = pd.DataFrame.from_records(
+        JobTemplatePart.objects.values('template_id', 'part_id', 'quantity'),
+        columns=['template_id', 'part_id', 'quantity'],
+    )
+    if requirements.empty:
+        return pd.DataFrame(columns=columns)
+
+    tasks = MaintenanceTask.objects.filter(
+        status__in=OPEN_TASK_STATUSES,
+        template_id__in=set(requirements['template_id']),
+    )
+    if vessel_ids:
+        tasks = tasks.filter(equipment__vessel_id__in=vessel_ids)
+    horizon = max(lead_times.values(), default=0)
+    planner = WorkloadPlanner(start=today, weeks=math.ceil(horizon / 7) + 1)
+    occurrences = pd.DataFrame.from_records(
+        [
+            (task['template_id'], task['equipment__vessel_id'], due)
+            for task in tasks.values(
+                'template_id', 'equipment__vessel_id', 'next_due_date', 'interval_type', 'interval_value'
+            )
+            for due in planner.occurrences(task)
+        ],
+        columns=['template_id', 'vessel_id', 'due_date'],
+    )
+    return occurrences.merge(requirements, on='template_id')[columns]
+
+
+def forecast_part_demand(vessel_ids=None):
+    """
+    Recompute the reorder point of every part on every vessel in one pass.
+
+    Demand over a part's lead time is the larger of what scheduled templated
+    jobs will need and what historical consumption predicts; safety stock
+    covers the month-to-month variability of that consumption. Stock on
+    hand, usage and scheduled demand are each loaded with one query and
+    combined with pandas, then written back with a single upsert.
+    Returns the number of forecasts written.
+    """
+    now = timezone.now()
+    today = timezone.localdate(now)
+    keys = ['vessel_id', 'part_id']
+    # Complete months only, so the current month does not dilute the rate
+    current_month = today.replace(day=1)
+    months = [current_month - relativedelta(months=n) for n in range(USAGE_WINDOW_MONTHS, 0, -1)]
+
+    stock = StockLevel.objects.all()
+    rollups = PartConsumptionRollup.objects.filter(period__gte=months[0], period__lt=current_month)
+    if vessel_ids:
+        stock = stock.filter(vessel_id__in=vessel_ids)
+        rollups = rollups.filter(vessel_id__in=vessel_ids)
+    stock = pd.DataFrame.from_records(
+        stock.values(*keys).annotate(on_hand=Sum('quantity')), columns=keys + ['on_hand']
+    ).astype({'on_hand': float})
+    usage = pd.DataFrame.from_records(
+        rollups.values(*keys, 'period', 'quantity'), columns=keys + ['period', 'quantity']
+    ).astype({'quantity': float})
+    lead_times = dict(SparePart.objects.values_list('id', 'lead_time_days'))
+
+    # Part x month consumption matrix, months without consumption counting as zero
+    monthly = usage.pivot_table(index=keys, columns='period', values='quantity', aggfunc='sum') \
+        .reindex(columns=months).fillna(0)
+    usage_stats = pd.DataFrame({
+        'daily_usage': monthly.sum(axis=1) / (USAGE_WINDOW_MONTHS * DAYS_PER_MONTH),
+        'monthly_std': monthly.std(axis=1, ddof=0),
+    }).reset_index()
+
+    scheduled = scheduled_part_demand(vessel_ids, lead_times, today)
+    within_lead_time = pd.to_datetime(scheduled['due_date']) <= pd.Timestamp(today) + pd.to_timedelta(
+        scheduled['part_id'].map(lead_times), unit='D'
+    )
+    scheduled = scheduled[within_lead_time].astype({'quantity': float}) \
+        .groupby(keys, as_index=False)['quantity'].sum() \
+        .rename(columns={'quantity': 'scheduled_demand'})
+
+    forecast = stock.merge(usage_stats, on=keys, how='outer').merge(scheduled, on=keys, how='outer')
+    forecast = forecast.fillna({'on_hand': 0, 'daily_usage': 0, 'monthly_std': 0, 'scheduled_demand': 0})
+    lead_time = forecast['part_id'].map(lead_times).astype(float)
+    forecast['lead_time_demand'] = np.maximum(forecast['daily_usage'] * lead_time, forecast['scheduled_demand'])
+    forecast['safety_stock'] = SERVICE_LEVEL_Z * forecast['monthly_std'] * np.sqrt(lead_time / DAYS_PER_MONTH)
+    forecast['reorder_point'] = forecast['lead_time_demand'] + forecast['safety_stock']
+    forecast['below_reorder_point'] = (forecast['reorder_point'] > 0) & (forecast['on_hand'] <= forecast['reorder_point'])
+
+    rows = [
+        PartForecast(
+            vessel_id=int(row.vessel_id),
+            part_id=int(row.part_id),
+            on_hand=Decimal(str(round(row.on_hand, 2))),
+            scheduled_demand=row.scheduled_demand,
+            daily_usage=row.daily_usage,
+            lead_time_demand=row.lead_time_demand,
+            safety_stock=row.safety_stock,
+            reorder_point=row.reorder_point,
+            below_reorder_point=bool(row.below_reorder_point),
+            computed_at=now,
+        )
+        for row in forecast.itertuples(index=False)
+    ]
+    with transaction.atomic():
+        PartForecast.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['vessel', 'part'],
+            update_fields=[
+                'on_hand', 'scheduled_demand', 'daily_usage', 'lead_time_demand', 'safety_stock',
+                'reorder_point', 'below_reorder_point', 'computed_at',
+            ],
+        )
+        stale = PartForecast.objects.filter(computed_at__lt=now)
+        if vessel_ids:
+            stale = stale.filter(vessel_id__in=vessel_ids)
+        stale.delete()
+    return len(rows)
+
+
+def low_stock_alerts(vessel_id=None):
+    """Parts at or below their reorder point, served by the partial low-stock index"""
+    alerts = PartForecast.objects.filter(below_reorder_point=True).select_related('part', 'vessel')
+    if vessel_id:
+        alerts = alerts.filter(vessel_id=vessel_id)
+    return alerts
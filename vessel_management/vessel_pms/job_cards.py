@@ -0,0 +1,163 @@
+import functools
+from datetime import datetime, time, timedelta
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+from django.db.models import F, Prefetch, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import mm
+from reportlab.platypus import KeepTogether, PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from core.models import Vessel
+from .models import JobTemplatePart, MaintenanceHistory, MaintenanceTask, OPEN_TASK_STATUSES
+
+
+HISTORY_ENTRIES = 3
+DEFAULT_WINDOW_DAYS = 7
+FRAME_WIDTH = A4[0] - 30 * mm
+
+
+@functools.lru_cache(maxsize=None)
+def job_card_styles():
+    """Paragraph and table styles of the job cards, built once per process"""
+    sample = getSampleStyleSheet()
+    grid = [
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('FONTSIZE', (0, 0), (-1, -1), 8),
+    ]
+    return {
+        'title': ParagraphStyle('CardTitle', parent=sample['Heading2'], spaceAfter=2 * mm),
+        'heading': ParagraphStyle('CardHeading', parent=sample['Heading4'], spaceBefore=3 * mm, spaceAfter=1 * mm),
+        'body': ParagraphStyle('CardBody', parent=sample['BodyText'], fontSize=9, leading=11),
+        'cell': ParagraphStyle('CardCell', parent=sample['BodyText'], fontSize=8, leading=10),
+        'details': TableStyle(grid + [('BACKGROUND', (0, 0), (0, -1), colors.whitesmoke)]),
+        'table': TableStyle(grid + [('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey)]),
+    }
+
+
+def job_card_tasks(vessel, start, end, include_overdue=True):
+    """
+    Open tasks of a vessel due between `start` and `end` (dates), with
+    everything a job card shows loaded in a constant number of queries:
+    one for the tasks with their equipment and template, one for their last
+    HISTORY_ENTRIES history entries and one for the template parts.
+    """
+    window_start = timezone.make_aware(datetime.combine(start, time.min))
+    window_end = timezone.make_aware(datetime.combine(end, time.min)) + timedelta(days=1)
+    tasks = MaintenanceTask.objects.filter(
+        equipment__vessel=vessel, status__in=OPEN_TASK_STATUSES, next_due_date__lt=window_end
+    )
+    if not include_overdue:
+        tasks = tasks.filter(next_due_date__gte=window_start)
+
+    recent_history = MaintenanceHistory.objects.annotate(
+        rank=Window(RowNumber(), partition_by=F('task_id'), order_by=F('completed_date').desc())
+    ).filter(rank__lte=HISTORY_ENTRIES).select_related('completed_by').order_by('-completed_date')
+    return tasks.select_related('equipment', 'template').prefetch_related(
+        Prefetch('history', queryset=recent_history, to_attr='recent_history'),
+        Prefetch('template__parts', queryset=JobTemplatePart.objects.select_related('part')),
+    ).order_by('equipment__sfi_code', 'equipment__name', 'next_due_date', 'id')
+
+
+def text(value):
+    """Free text as paragraph markup"""
+    return escape(value or '').replace('\n', '<br/>')
+
+
+def job_card(task, styles):
+    """Flowables of one job card"""
+    equipment = task.equipment
+    details = [
+        ('Equipment', f'{equipment.name} ({equipment.serial_number})'),
+        ('SFI code / location', ' / '.join(filter(None, [equipment.sfi_code, equipment.location]))),
+        ('Job code', task.job_code or '-'),
+        ('Due date', timezone.localtime(task.next_due_date).strftime('%Y-%m-%d')),
+        ('Interval', f'{task.interval_value} {task.get_interval_type_display().lower()}'),
+        ('Responsible', task.responsible_role),
+    ]
+    card = [
+        Paragraph(text(task.task_name), styles['title']),
+        Table(
+            [[label, Paragraph(text(value), styles['cell'])] for label, value in details],
+            colWidths=[40 * mm, FRAME_WIDTH - 40 * mm], style=styles['details'],
+        ),
+        Paragraph('Description', styles['heading']),
+        Paragraph(text(task.effective_description) or '-', styles['body']),
+        Paragraph('Instructions', styles['heading']),
+        Paragraph(text(task.effective_instructions) or '-', styles['body']),
+    ]
+
+    parts = task.template.parts.all() if task.template_id else []
+    if parts:
+        rows = [['Part', 'Part number', 'Quantity']] + [
+            [Paragraph(text(line.part.name), styles['cell']), line.part.part_number or '-',
+             f'{line.quantity.normalize():f} {line.part.unit}']
+            for line in parts
+        ]
+        card += [Paragraph('Parts', styles['heading']), Table(rows, repeatRows=1, style=styles['table'])]
+
+    card.append(Paragraph(f'Last {HISTORY_ENTRIES} completions', styles['heading']))
+    if task.recent_history:
+        rows = [['Completed', 'By', 'Remarks', 'Parts used']] + [
+            [
+                timezone.localtime(entry.completed_date).strftime('%Y-%m-%d'),
+                entry.completed_by.get_username() if entry.completed_by else '-',
+                Paragraph(text(entry.remarks), styles['cell']),
+                Paragraph(text(entry.parts_used), styles['cell']),
+            ]
+            for entry in task.recent_history
+        ]
+        card.append(Table(
+            rows, colWidths=[22 * mm, 28 * mm, None, 45 * mm], repeatRows=1, style=styles['table']
+        ))
+    else:
+        card.append(Paragraph('No completion recorded', styles['body']))
+
+    sign_off = [['Done by', '', 'Date', ''], ['Remarks', '', '', ''], ['Parts used', '', 'Duration', '']]
+    card += [
+        Spacer(1, 4 * mm),
+        KeepTogether([
+            Paragraph('Completion', styles['heading']),
+            Table(sign_off, colWidths=[25 * mm, 70 * mm, 20 * mm, None], rowHeights=10 * mm, style=styles['details']),
+        ]),
+        PageBreak(),
+    ]
+    return card
+
+
+def render_job_cards(vessel, tasks, start, end):
+    """Job cards of `tasks` as a single PDF, one card per page (or more when long)"""
+    styles = job_card_styles()
+    buffer = BytesIO()
+    title = f'{vessel.name} - PMS job cards {start:%Y-%m-%d} to {end:%Y-%m-%d}'
+
+    def footer(canvas, doc):
+        canvas.saveState()
+        canvas.setFont('Helvetica', 7)
+        canvas.drawString(15 * mm, 8 * mm, title)
+        canvas.drawRightString(A4[0] - 15 * mm, 8 * mm, f'Page {doc.page}')
+        canvas.restoreState()
+
+    doc = SimpleDocTemplate(
+        buffer, pagesize=A4, title=title,
+        leftMargin=15 * mm, rightMargin=15 * mm, topMargin=15 * mm, bottomMargin=15 * mm,
+    )
+    flowables = [flowable for task in tasks for flowable in job_card(task, styles)]
+    if not flowables:
+        flowables = [Paragraph('No maintenance due in this window', styles['body'])]
+    doc.build(flowables, onFirstPage=footer, onLaterPages=footer)
+    return buffer.getvalue()
+
+
+def generate_job_card_pack(vessel_id, start=None, end=None, include_overdue=True):
+    """Combined job-card PDF of a vessel's open tasks due between `start` and `end`"""
+    vessel = Vessel.objects.get(pk=vessel_id)
+    start = start or timezone.localdate()
+    end = end or start + timedelta(days=DEFAULT_WINDOW_DAYS - 1)
+    tasks = job_card_tasks(vessel, start, end, include_overdue)
+    return render_job_cards(vessel, tasks, start, end)
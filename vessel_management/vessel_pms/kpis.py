@@ -0,0 +1,160 @@
+from datetime import datetime, time, timedelta
+
+from django.db import connection, transaction
+from django.db.models import FloatField, Sum
+from django.db.models.functions import Cast, NullIf
+from django.utils import timezone
+
+from core.models import Vessel
+from .models import Equipment, MaintenanceHistory, MaintenanceTask, OPEN_TASK_STATUSES, VesselKpiSnapshot
+from .planner import DEFAULT_TASK_HOURS
+
+
+# A job counts as done within its window up to this many days after its due date
+WINDOW_GRACE_DAYS = 7
+
+SNAPSHOT_COUNTS = [
+    'open_jobs', 'overdue_jobs', 'overdue_1_7_days', 'overdue_8_30_days', 'overdue_31_90_days',
+    'overdue_over_90_days', 'completed_jobs', 'scheduled_completions', 'completed_in_window',
+]
+SNAPSHOT_HOURS = ['backlog_hours', 'completed_hours']
+
+REFRESH_SQL = """
+WITH durations AS (
+    SELECT task_id, AVG(duration) / 60.0 AS hours
+    FROM {history}
+    WHERE duration IS NOT NULL
+    GROUP BY task_id
+),
+open_tasks AS (
+    SELECT
+        e.vessel_id,
+        COALESCE(d.hours, %(default_hours)s) AS hours,
+        EXTRACT(EPOCH FROM %(now)s - t.next_due_date) / 86400 AS overdue_days
+    FROM {task} t
+    JOIN {equipment} e ON e.id = t.equipment_id
+    LEFT JOIN durations d ON d.task_id = t.id
+    WHERE t.status = ANY(%(open_statuses)s)
+),
+backlog AS (
+    SELECT
+        vessel_id,
+        COUNT(*) AS open_jobs,
+        COUNT(*) FILTER (WHERE overdue_days > 0) AS overdue_jobs,
+        COALESCE(SUM(hours) FILTER (WHERE overdue_days > 0), 0) AS backlog_hours,
+        COUNT(*) FILTER (WHERE overdue_days > 0 AND overdue_days <= 7) AS overdue_1_7_days,
+        COUNT(*) FILTER (WHERE overdue_days > 7 AND overdue_days <= 30) AS overdue_8_30_days,
+        COUNT(*) FILTER (WHERE overdue_days > 30 AND overdue_days <= 90) AS overdue_31_90_days,
+        COUNT(*) FILTER (WHERE overdue_days > 90) AS overdue_over_90_days
+    FROM open_tasks
+    GROUP BY vessel_id
+),
+completions AS (
+    SELECT
+        e.vessel_id,
+        COUNT(*) AS completed_jobs,
+        COUNT(h.due_date) AS scheduled_completions,
+        COUNT(*) FILTER (WHERE h.completed_date <= h.due_date + %(grace)s) AS completed_in_window,
+        COALESCE(SUM(h.duration), 0) / 60.0 AS completed_hours
+    FROM {history} h
+    JOIN {equipment} e ON e.id = h.equipment_id
+    WHERE h.completed_date >= %(week_start)s AND h.completed_date < %(week_end)s
+    GROUP BY e.vessel_id
+)
+INSERT INTO {snapshot} (
+    vessel_id, week_start, open_jobs, overdue_jobs, backlog_hours, overdue_1_7_days, overdue_8_30_days,
+    overdue_31_90_days, overdue_over_90_days, completed_jobs, scheduled_completions, completed_in_window,
+    completed_hours, refreshed_at
+)
+SELECT
+    v.id, %(week)s,
+    COALESCE(b.open_jobs, 0), COALESCE(b.overdue_jobs, 0), COALESCE(b.backlog_hours, 0),
+    COALESCE(b.overdue_1_7_days, 0), COALESCE(b.overdue_8_30_days, 0),
+    COALESCE(b.overdue_31_90_days, 0), COALESCE(b.overdue_over_90_days, 0),
+    COALESCE(c.completed_jobs, 0), COALESCE(c.scheduled_completions, 0), COALESCE(c.completed_in_window, 0),
+    COALESCE(c.completed_hours, 0), %(now)s
+FROM {vessel} v
+LEFT JOIN backlog b ON b.vessel_id = v.id
+LEFT JOIN completions c ON c.vessel_id = v.id
+ON CONFLICT (vessel_id, week_start) DO UPDATE SET
+    open_jobs = EXCLUDED.open_jobs,
+    overdue_jobs = EXCLUDED.overdue_jobs,
+    backlog_hours = EXCLUDED.backlog_hours,
+    overdue_1_7_days = EXCLUDED.overdue_1_7_days,
+    overdue_8_30_days = EXCLUDED.overdue_8_30_days,
+    overdue_31_90_days = EXCLUDED.overdue_31_90_days,
+    overdue_over_90_days = EXCLUDED.overdue_over_90_days,
+    completed_jobs = EXCLUDED.completed_jobs,
+    scheduled_completions = EXCLUDED.scheduled_completions,
+    completed_in_window = EXCLUDED.completed_in_window,
+    completed_hours = EXCLUDED.completed_hours,
+    refreshed_at = EXCLUDED.refreshed_at
+"""
+
+
+def week_start(day):
+    """Monday of the week of a date"""
+    return day - timedelta(days=day.weekday())
+
+
+def refresh_kpi_snapshots(now=None):
+    """
+    Upsert the current week's KPI snapshot of every vessel in one statement.
+
+    Open tasks and the week's completions are each scanned once and reduced
+    per vessel with conditional aggregates (COUNT/SUM ... FILTER). Backlog
+    hours use the average recorded duration of each task. Run daily: the
+    last refresh of a week freezes its backlog and ageing values.
+    Returns the number of snapshots written.
+    """
+    now = now or timezone.now()
+    week = week_start(timezone.localdate(now))
+    start = timezone.make_aware(datetime.combine(week, time.min))
+    sql = REFRESH_SQL.format(
+        equipment=Equipment._meta.db_table,
+        history=MaintenanceHistory._meta.db_table,
+        snapshot=VesselKpiSnapshot._meta.db_table,
+        task=MaintenanceTask._meta.db_table,
+        vessel=Vessel._meta.db_table,
+    )
+    params = {
+        'now': now,
+        'week': week,
+        'week_start': start,
+        'week_end': start + timedelta(weeks=1),
+        'grace': timedelta(days=WINDOW_GRACE_DAYS),
+        'default_hours': DEFAULT_TASK_HOURS,
+        'open_statuses': OPEN_TASK_STATUSES,
+    }
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+
+def weekly_kpis(queryset=None, weeks=52, by_vessel=True, today=None):
+    """
+    Weekly KPI values over the last `weeks` weeks, in a single query.
+
+    With `by_vessel` off the vessels are summed into fleet values. Schedule
+    compliance is derived from the summed counts so the fleet figure is
+    weighted by the number of completions.
+    """
+    queryset = queryset if queryset is not None else VesselKpiSnapshot.objects.all()
+    first_week = week_start(today or timezone.localdate()) - timedelta(weeks=weeks - 1)
+    fields = ['week_start', 'vessel', 'vessel__name'] if by_vessel else ['week_start']
+    # Aggregates cannot reuse the snapshot column names, so they are prefixed and renamed back
+    rows = (
+        queryset
+        .filter(week_start__gte=first_week)
+        .values(*fields)
+        .annotate(
+            **{f'total_{field}': Sum(field) for field in SNAPSHOT_COUNTS + SNAPSHOT_HOURS},
+            schedule_compliance=100 * Cast(Sum('completed_in_window'), FloatField())
+            / NullIf(Cast(Sum('scheduled_completions'), FloatField()), 0.0),
+        )
+        .order_by(*fields[:2])
+    )
+    return [
+        {key.removeprefix('total_'): value for key, value in row.items()}
+        for row in rows
+    ]
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from vessel_pms.archive import archive_history
+
+
+class Command(BaseCommand):
+    help = 'Moves maintenance history of closed years into compressed per-vessel archive batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep-years',
+            type=int,
+            default=2,
+            help='Number of years kept in the hot table, the current year included',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report what would be archived without moving anything',
+        )
+
+    def report_progress(self, vessel_id, year, rows):
+        self.stdout.write(f'  vessel {vessel_id}, {year}: {rows} history entries')
+
+    def handle(self, *args, **options):
+        if options['keep_years'] < 1:
+            self.stderr.write(self.style.ERROR('--keep-years must be at least 1'))
+            return
+        result = archive_history(
+            keep_years=options['keep_years'], dry_run=options['dry_run'], progress=self.report_progress
+        )
+        ratio = result['compressed_bytes'] / result['raw_bytes'] if result['raw_bytes'] else 0
+        verb = 'would be archived' if options['dry_run'] else 'archived'
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['rows']} history entries in {result['batches']} batches {verb}, "
+            f"{result['raw_bytes']} bytes compressed to {result['compressed_bytes']} ({ratio:.0%})"
+        ))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from vessel_pms.parts import backfill_part_consumption
+
+
+class Command(BaseCommand):
+    help = 'Parses the free-text parts_used of maintenance history into catalogue consumption lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of history entries processed per transaction',
+        )
+
+    def report_progress(self, scanned, created):
+        self.stdout.write(f'  {scanned} history entries scanned, {created} consumption lines created')
+
+    def handle(self, *args, **options):
+        result = backfill_part_consumption(batch_size=options['batch_size'], progress=self.report_progress)
+        self.stdout.write(self.style.SUCCESS(
+            f"Backfill complete: {result['scanned']} history entries scanned, "
+            f"{result['created']} consumption lines created"
+        ))
@@ -0,0 +1,79 @@
+import os
+
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Vessel
+from vessel_pms.hierarchy import import_equipment_tree
+from vessel_pms.utils import sfi_code_or_none
+
+
+DATA_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))),
+    'fichiers remorqueur'
+)
+
+
+class Command(BaseCommand):
+    help = 'Imports the SFI equipment/component tree of a vessel from the remorqueur workbooks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('vessel', help='Vessel id or IMO number')
+        parser.add_argument(
+            '--equipment-file',
+            default=os.path.join(DATA_DIR, 'equipements_bab_almarasa_6chiffres.xlsx'),
+            help='Workbook listing equipment with their 6-digit SFI codes',
+        )
+        parser.add_argument(
+            '--components-file',
+            default=os.path.join(DATA_DIR, 'component_jobs.xlsx'),
+            help='Workbook listing components (Component No. / Name)',
+        )
+
+    def read_equipment(self, file_path):
+        """Equipment rows keyed on the 6-digit SFI code"""
+        df = pd.read_excel(file_path)
+        df = df.dropna(subset=['nom', 'code_sfi_6_chiffres'])
+        return pd.DataFrame({
+            'code': df['code_sfi_6_chiffres'].map(sfi_code_or_none),
+            'name': df['nom'].astype(str).str.strip(),
+            'manufacturer': df.get('marque', pd.Series('', index=df.index)).fillna('').astype(str).str.strip(),
+            'model': df.get('type', pd.Series('', index=df.index)).fillna('').astype(str).str.strip(),
+            'location': df.get('emplacement', pd.Series('', index=df.index)).fillna('').astype(str).str.strip(),
+        })
+
+    def read_components(self, file_path):
+        """Component rows; job continuation lines leave the number blank"""
+        df = pd.read_excel(file_path)
+        df = df.dropna(subset=['Component No.', 'Name'])
+        return pd.DataFrame({
+            'code': df['Component No.'].map(sfi_code_or_none),
+            'name': df['Name'].astype(str).str.strip(),
+        })
+
+    def handle(self, *args, **options):
+        vessel = Vessel.objects.filter(imo_number=options['vessel']).first()
+        if vessel is None and options['vessel'].isdigit():
+            vessel = Vessel.objects.filter(pk=options['vessel']).first()
+        if vessel is None:
+            raise CommandError(f"Vessel not found: {options['vessel']}")
+
+        frames = []
+        for file_path, reader in (
+            (options['equipment_file'], self.read_equipment),
+            (options['components_file'], self.read_components),
+        ):
+            if not os.path.exists(file_path):
+                self.stdout.write(self.style.WARNING(f'File not found: {file_path}'))
+                continue
+            frames.append(reader(file_path))
+
+        if not frames:
+            raise CommandError('No input workbook found')
+
+        nodes = pd.concat(frames, ignore_index=True).drop_duplicates(subset='code', keep='first')
+        result = import_equipment_tree(vessel, nodes.to_dict('records'))
+        self.stdout.write(self.style.SUCCESS(
+            f"Equipment tree import complete for {vessel.name}: "
+            f"{result['created']} created, {result['updated']} updated, {result['skipped']} skipped"
+        ))
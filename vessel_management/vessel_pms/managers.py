@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import BooleanField, DurationField, ExpressionWrapper, F, IntegerField, Q, Value
+from django.db.models.functions import Cast, Extract, Floor
 from django.utils import timezone
 
 
@@ -22,6 +24,25 @@ class MaintenanceTaskManager(models.Manager):
     def by_equipment(self, equipment_id):
         """Filter tasks by equipment"""
         return self.filter(equipment_id=equipment_id)
+    
+    def with_due_info(self, now=None):
+        """
+        Tasks annotated with their equipment and vessel names, the whole days
+        until due (floored like MaintenanceTask.days_until_due) and whether
+        they are overdue, all computed in SQL against a single `now`
+        """
+        now = now or timezone.now()
+        until_due = ExpressionWrapper(F('next_due_date') - Value(now), output_field=DurationField())
+        return self.annotate(
+            equipment_name=F('equipment__name'),
+            vessel_id=F('equipment__vessel_id'),
+            vessel_name=F('equipment__vessel__name'),
+            due_in_days=Cast(Floor(Extract(until_due, 'epoch') / 86400), IntegerField()),
+            overdue=ExpressionWrapper(
+                Q(next_due_date__lt=now) & ~Q(status__in=['completed', 'cancelled']),
+                output_field=BooleanField(),
+            ),
+        )
 
 
 class MaintenanceHistoryManager(models.Manager):
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.10 on 2026-10-19 04:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vessel_pms', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='equipment',
+            index=models.Index(fields=['vessel', 'status'], name='pms_equipment_vessel_status'),
+        ),
+        migrations.AddIndex(
+            model_name='maintenancehistory',
+            index=models.Index(fields=['equipment', '-completed_date'], name='pms_history_equipment_date'),
+        ),
+        migrations.AddIndex(
+            model_name='maintenancehistory',
+            index=models.Index(fields=['task', '-completed_date'], name='pms_history_task_date'),
+        ),
+        migrations.AddIndex(
+            model_name='maintenancehistory',
+            index=models.Index(fields=['-completed_date'], name='pms_history_completed_date'),
+        ),
+        migrations.AddIndex(
+            model_name='maintenancetask',
+            index=models.Index(condition=models.Q(('status__in', ['scheduled', 'in_progress', 'overdue'])), fields=['next_due_date'], name='pms_task_open_due'),
+        ),
+        migrations.AddIndex(
+            model_name='maintenancetask',
+            index=models.Index(fields=['status', 'next_due_date'], name='pms_task_status_due'),
+        ),
+        migrations.AddIndex(
+            model_name='maintenancetask',
+            index=models.Index(fields=['equipment', 'next_due_date'], name='pms_task_equipment_due'),
+        ),
+    ]
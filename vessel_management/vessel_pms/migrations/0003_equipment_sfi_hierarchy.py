@@ -0,0 +1,26 @@
+# Generated by Django 4.2.10 on 2026-10-19 04:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vessel_pms', '0002_pms_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='equipment',
+            name='sfi_code',
+            field=models.CharField(blank=True, default='', help_text='Dotted SFI code (e.g. 411.001.001), used as the materialized path of the equipment tree', max_length=50),
+        ),
+        migrations.AddIndex(
+            model_name='equipment',
+            index=models.Index(fields=['vessel', 'sfi_code'], name='pms_equipment_sfi_path', opclasses=['int8_ops', 'varchar_pattern_ops']),
+        ),
+        migrations.AddConstraint(
+            model_name='equipment',
+            constraint=models.UniqueConstraint(condition=models.Q(('sfi_code', ''), _negated=True), fields=('vessel', 'sfi_code'), name='pms_equipment_unique_sfi_code'),
+        ),
+    ]
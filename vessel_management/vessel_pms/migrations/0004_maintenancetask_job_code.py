@@ -0,0 +1,22 @@
+# Generated by Django 4.2.10 on 2026-10-19 04:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vessel_pms', '0003_equipment_sfi_hierarchy'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='maintenancetask',
+            name='job_code',
+            field=models.CharField(blank=True, default='', help_text='Job code from the PMS plan (e.g. NAV-001)', max_length=20),
+        ),
+        migrations.AddConstraint(
+            model_name='maintenancetask',
+            constraint=models.UniqueConstraint(condition=models.Q(('job_code', ''), _negated=True), fields=('equipment', 'job_code'), name='pms_task_unique_job_code'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.10 on 2026-10-19 04:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vessel_pms', '0004_maintenancetask_job_code'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='maintenancetask',
+            name='description',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AlterField(
+            model_name='maintenancetask',
+            name='instructions',
+            field=models.TextField(blank=True),
+        ),
+        migrations.CreateModel(
+            name='JobTemplate',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=100)),
+                ('job_code', models.CharField(blank=True, default='', max_length=20)),
+                ('equipment_model', models.CharField(blank=True, help_text='Equipment model the job applies to', max_length=100)),
+                ('manufacturer', models.CharField(blank=True, help_text='Equipment manufacturer the job applies to', max_length=100)),
+                ('description', models.TextField()),
+                ('instructions', models.TextField()),
+                ('interval_type', models.CharField(choices=[('daily', 'Daily'), ('weekly', 'Weekly'), ('monthly', 'Monthly'), ('quarterly', 'Quarterly'), ('semi_annual', 'Semi-Annual'), ('annual', 'Annual'), ('running_hours', 'Running Hours'), ('custom_days', 'Custom Days')], max_length=20)),
+                ('interval_value', models.PositiveIntegerField(help_text='Value for interval (days or hours)')),
+                ('responsible_role', models.CharField(max_length=100)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Job Template',
+                'verbose_name_plural': 'Job Templates',
+                'ordering': ['name'],
+                'indexes': [models.Index(fields=['manufacturer', 'equipment_model'], name='pms_template_target')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='jobtemplate',
+            constraint=models.CheckConstraint(check=models.Q(('equipment_model', ''), ('manufacturer', ''), _negated=True), name='pms_template_has_target'),
+        ),
+        migrations.AddField(
+            model_name='maintenancetask',
+            name='template',
+            field=models.ForeignKey(blank=True, help_text='Job template this task was instantiated from; blank text fields fall back to it', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='tasks', to='vessel_pms.jobtemplate'),
+        ),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 4.2.10 on 2026-10-19 04:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vessel_pms', '0005_job_templates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EquipmentReliability',
+            fields=[
+                ('equipment', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='reliability', serialize=False, to='vessel_pms.equipment')),
+                ('operating_hours', models.FloatField(default=0, help_text='Hours in service since installation, repairs excluded')),
+                ('failure_count', models.PositiveIntegerField(default=0)),
+                ('repair_count', models.PositiveIntegerField(default=0)),
+                ('repair_hours', models.FloatField(default=0)),
+                ('mtbf_hours', models.FloatField(blank=True, help_text='Mean time between failures', null=True)),
+                ('mttr_hours', models.FloatField(blank=True, help_text='Mean time to repair', null=True)),
+                ('completion_count', models.PositiveIntegerField(default=0)),
+                ('interval_count', models.PositiveIntegerField(default=0)),
+                ('interval_drift_days', models.FloatField(default=0, help_text='Sum of actual minus nominal completion intervals')),
+                ('mean_interval_drift_days', models.FloatField(blank=True, null=True)),
+                ('lag_count', models.PositiveIntegerField(default=0)),
+                ('lag_days', models.FloatField(default=0, help_text='Sum of completion delays against the planned due date')),
+                ('mean_lag_days', models.FloatField(blank=True, null=True)),
+                ('max_lag_days', models.FloatField(blank=True, null=True)),
+                ('last_failure_at', models.DateTimeField(blank=True, null=True)),
+                ('last_completed_date', models.DateTimeField(blank=True, null=True)),
+                ('computed_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Equipment Reliability',
+                'verbose_name_plural': 'Equipment Reliability',
+            },
+        ),
+        migrations.CreateModel(
+            name='EquipmentStatusChange',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('from_status', models.CharField(blank=True, max_length=20)),
+                ('to_status', models.CharField(choices=[('operational', 'Operational'), ('maintenance', 'Under Maintenance'), ('faulty', 'Faulty'), ('decommissioned', 'Decommissioned')], max_length=20)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Equipment Status Change',
+                'verbose_name_plural': 'Equipment Status Changes',
+                'ordering': ['-changed_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='maintenancehistory',
+            name='due_date',
+            field=models.DateTimeField(blank=True, help_text='Task due date at the time of completion', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='maintenancehistory',
+            index=models.Index(fields=['created_at'], name='pms_history_created_at'),
+        ),
+        migrations.AddField(
+            model_name='equipmentstatuschange',
+            name='equipment',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_changes', to='vessel_pms.equipment'),
+        ),
+        migrations.AddIndex(
+            model_name='equipmentreliability',
+            index=models.Index(fields=['computed_at'], name='pms_reliability_computed_at'),
+        ),
+        migrations.AddIndex(
+            model_name='equipmentstatuschange',
+            index=models.Index(fields=['equipment', 'changed_at'], name='pms_status_equipment_date'),
+        ),
+        migrations.AddIndex(
+            model_name='equipmentstatuschange',
+            index=models.Index(fields=['changed_at'], name='pms_status_changed_at'),
+        ),
+    ]
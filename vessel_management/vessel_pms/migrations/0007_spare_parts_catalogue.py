@@ -0,0 +1,78 @@
+# Generated by Django 4.2.10 on 2026-10-19 04:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        ('vessel_pms', '0006_reliability_metrics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SparePart',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('code', models.SlugField(allow_unicode=True, help_text='Normalized catalogue key, also used to match free-text parts', max_length=100, unique=True)),
+                ('name', models.CharField(max_length=100)),
+                ('part_number', models.CharField(blank=True, help_text='Manufacturer part number', max_length=50)),
+                ('manufacturer', models.CharField(blank=True, max_length=100)),
+                ('unit', models.CharField(default='pcs', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Spare Part',
+                'verbose_name_plural': 'Spare Parts',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PartConsumption',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('consumed_at', models.DateTimeField()),
+                ('quantity', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('history', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='part_lines', to='vessel_pms.maintenancehistory')),
+                ('part', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='consumptions', to='vessel_pms.sparepart')),
+                ('vessel', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='part_consumptions', to='core.vessel')),
+            ],
+            options={
+                'verbose_name': 'Part Consumption',
+                'verbose_name_plural': 'Part Consumption',
+                'ordering': ['-consumed_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PartConsumptionRollup',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('period', models.DateField(help_text='First day of the month')),
+                ('quantity', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('line_count', models.PositiveIntegerField(default=0)),
+                ('part', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='consumption_rollups', to='vessel_pms.sparepart')),
+                ('vessel', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='part_consumption_rollups', to='core.vessel')),
+            ],
+            options={
+                'verbose_name': 'Part Consumption Rollup',
+                'verbose_name_plural': 'Part Consumption Rollups',
+                'ordering': ['-period'],
+                'indexes': [models.Index(fields=['vessel', 'period'], name='pms_rollup_vessel_period'), models.Index(fields=['period', 'part'], name='pms_rollup_period_part')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='partconsumptionrollup',
+            constraint=models.UniqueConstraint(fields=('part', 'vessel', 'period'), name='pms_rollup_unique_part_vessel_period'),
+        ),
+        migrations.AddIndex(
+            model_name='partconsumption',
+            index=models.Index(fields=['part', 'vessel', 'consumed_at'], name='pms_consumption_part_date'),
+        ),
+        migrations.AddIndex(
+            model_name='partconsumption',
+            index=models.Index(fields=['vessel', 'consumed_at'], name='pms_consumption_vessel_date'),
+        ),
+    ]
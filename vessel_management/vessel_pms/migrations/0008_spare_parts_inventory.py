@@ -0,0 +1,110 @@
+# Generated by Django 4.2.10 on 2026-10-19 04:26
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('vessel_pms', '0007_spare_parts_catalogue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sparepart',
+            name='lead_time_days',
+            field=models.PositiveIntegerField(default=30, help_text='Days from order to delivery on board'),
+        ),
+        migrations.CreateModel(
+            name='StockLevel',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('location', models.CharField(blank=True, default='', max_length=100)),
+                ('quantity', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('part', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_levels', to='vessel_pms.sparepart')),
+                ('vessel', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_levels', to='core.vessel')),
+            ],
+            options={
+                'verbose_name': 'Stock Level',
+                'verbose_name_plural': 'Stock Levels',
+                'ordering': ['vessel', 'part', 'location'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PartForecast',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('on_hand', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('scheduled_demand', models.FloatField(default=0, help_text='Demand of scheduled jobs within the lead time')),
+                ('daily_usage', models.FloatField(default=0, help_text='Historical average daily consumption')),
+                ('lead_time_demand', models.FloatField(default=0)),
+                ('safety_stock', models.FloatField(default=0)),
+                ('reorder_point', models.FloatField(default=0)),
+                ('below_reorder_point', models.BooleanField(default=False)),
+                ('computed_at', models.DateTimeField()),
+                ('part', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='forecasts', to='vessel_pms.sparepart')),
+                ('vessel', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='part_forecasts', to='core.vessel')),
+            ],
+            options={
+                'verbose_name': 'Part Forecast',
+                'verbose_name_plural': 'Part Forecasts',
+                'ordering': ['vessel', 'part'],
+            },
+        ),
+        migrations.CreateModel(
+            name='JobTemplatePart',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('quantity', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('part', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='template_requirements', to='vessel_pms.sparepart')),
+                ('template', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='parts', to='vessel_pms.jobtemplate')),
+            ],
+            options={
+                'verbose_name': 'Job Template Part',
+                'verbose_name_plural': 'Job Template Parts',
+            },
+        ),
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('location', models.CharField(blank=True, default='', max_length=100)),
+                ('quantity', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('movement_type', models.CharField(choices=[('receipt', 'Receipt'), ('consumption', 'Consumption'), ('adjustment', 'Adjustment'), ('transfer', 'Transfer')], max_length=20)),
+                ('reference', models.CharField(blank=True, max_length=100)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('consumption', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_movement', to='vessel_pms.partconsumption')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_movements', to=settings.AUTH_USER_MODEL)),
+                ('part', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='stock_movements', to='vessel_pms.sparepart')),
+                ('vessel', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='core.vessel')),
+            ],
+            options={
+                'verbose_name': 'Stock Movement',
+                'verbose_name_plural': 'Stock Movements',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['vessel', 'part', '-created_at'], name='pms_movement_part_date')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='stocklevel',
+            constraint=models.UniqueConstraint(fields=('vessel', 'part', 'location'), name='pms_stock_unique_location'),
+        ),
+        migrations.AddIndex(
+            model_name='partforecast',
+            index=models.Index(condition=models.Q(('below_reorder_point', True)), fields=['vessel', 'part'], name='pms_forecast_low_stock'),
+        ),
+        migrations.AddConstraint(
+            model_name='partforecast',
+            constraint=models.UniqueConstraint(fields=('vessel', 'part'), name='pms_forecast_unique_part'),
+        ),
+        migrations.AddConstraint(
+            model_name='jobtemplatepart',
+            constraint=models.UniqueConstraint(fields=('template', 'part'), name='pms_template_part_unique'),
+        ),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 4.2.10 on 2026-10-19 04:29
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vessel_pms', '0008_spare_parts_inventory'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonitoringParameter',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=50)),
+                ('unit', models.CharField(blank=True, max_length=20)),
+                ('warning_limit', models.FloatField(blank=True, help_text='Readings at or above raise a maintenance task', null=True)),
+                ('alarm_limit', models.FloatField(blank=True, help_text='Readings at or above put the equipment out of service', null=True)),
+                ('rolling_window', models.PositiveIntegerField(default=20, help_text='Number of previous readings in the rolling statistics')),
+                ('z_threshold', models.FloatField(default=3.0, help_text='Standard deviations from the rolling mean flagged as anomalous')),
+                ('responsible_role', models.CharField(default='Chief Engineer', max_length=100)),
+                ('is_active', models.BooleanField(default=True)),
+                ('last_evaluated_at', models.DateTimeField(blank=True, null=True)),
+                ('equipment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monitoring_parameters', to='vessel_pms.equipment')),
+            ],
+            options={
+                'verbose_name': 'Monitoring Parameter',
+                'verbose_name_plural': 'Monitoring Parameters',
+                'ordering': ['equipment', 'name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='EquipmentReading',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('recorded_at', models.DateTimeField()),
+                ('value', models.FloatField()),
+                ('parameter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='readings', to='vessel_pms.monitoringparameter')),
+            ],
+            options={
+                'verbose_name': 'Equipment Reading',
+                'verbose_name_plural': 'Equipment Readings',
+                'ordering': ['-recorded_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ConditionAlert',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('level', models.CharField(choices=[('anomaly', 'Anomaly'), ('warning', 'Warning'), ('alarm', 'Alarm')], max_length=10)),
+                ('recorded_at', models.DateTimeField(help_text='Time of the first offending reading')),
+                ('value', models.FloatField(help_text='Worst reading of the evaluation run')),
+                ('reading_count', models.PositiveIntegerField(default=1, help_text='Offending readings in the evaluation run')),
+                ('rolling_mean', models.FloatField(blank=True, null=True)),
+                ('rolling_std', models.FloatField(blank=True, null=True)),
+                ('acknowledged', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('parameter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alerts', to='vessel_pms.monitoringparameter')),
+                ('task', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='condition_alerts', to='vessel_pms.maintenancetask')),
+            ],
+            options={
+                'verbose_name': 'Condition Alert',
+                'verbose_name_plural': 'Condition Alerts',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='monitoringparameter',
+            constraint=models.UniqueConstraint(fields=('equipment', 'name'), name='pms_parameter_unique_name'),
+        ),
+        migrations.AddIndex(
+            model_name='equipmentreading',
+            index=models.Index(fields=['parameter', 'recorded_at'], name='pms_reading_parameter_time'),
+        ),
+        migrations.AddIndex(
+            model_name='equipmentreading',
+            index=django.contrib.postgres.indexes.BrinIndex(autosummarize=True, fields=['recorded_at'], name='pms_reading_time_brin'),
+        ),
+        migrations.AddIndex(
+            model_name='conditionalert',
+            index=models.Index(fields=['parameter', '-created_at'], name='pms_alert_parameter_date'),
+        ),
+        migrations.AddIndex(
+            model_name='conditionalert',
+            index=models.Index(condition=models.Q(('acknowledged', False)), fields=['-created_at'], name='pms_alert_open'),
+        ),
+    ]
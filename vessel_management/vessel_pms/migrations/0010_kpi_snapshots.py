@@ -0,0 +1,45 @@
+# Generated by Django 4.2.10 on 2026-10-19 04:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        ('vessel_pms', '0009_condition_monitoring'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VesselKpiSnapshot',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('week_start', models.DateField(help_text='Monday of the week')),
+                ('open_jobs', models.PositiveIntegerField(default=0)),
+                ('overdue_jobs', models.PositiveIntegerField(default=0)),
+                ('backlog_hours', models.FloatField(default=0, help_text='Estimated hours of overdue jobs')),
+                ('overdue_1_7_days', models.PositiveIntegerField(default=0)),
+                ('overdue_8_30_days', models.PositiveIntegerField(default=0)),
+                ('overdue_31_90_days', models.PositiveIntegerField(default=0)),
+                ('overdue_over_90_days', models.PositiveIntegerField(default=0)),
+                ('completed_jobs', models.PositiveIntegerField(default=0)),
+                ('scheduled_completions', models.PositiveIntegerField(default=0, help_text='Completions with a known due date')),
+                ('completed_in_window', models.PositiveIntegerField(default=0)),
+                ('completed_hours', models.FloatField(default=0)),
+                ('refreshed_at', models.DateTimeField()),
+                ('vessel', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pms_kpi_snapshots', to='core.vessel')),
+            ],
+            options={
+                'verbose_name': 'Vessel KPI Snapshot',
+                'verbose_name_plural': 'Vessel KPI Snapshots',
+                'ordering': ['-week_start', 'vessel'],
+                'indexes': [models.Index(fields=['week_start'], name='pms_kpi_week')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='vesselkpisnapshot',
+            constraint=models.UniqueConstraint(fields=('vessel', 'week_start'), name='pms_kpi_unique_week'),
+        ),
+    ]
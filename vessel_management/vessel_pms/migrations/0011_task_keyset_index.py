@@ -0,0 +1,17 @@
+# Generated by Django 4.2.10 on 2026-10-19 04:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vessel_pms', '0010_kpi_snapshots'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='maintenancetask',
+            index=models.Index(fields=['next_due_date', 'id'], name='pms_task_due_id'),
+        ),
+    ]
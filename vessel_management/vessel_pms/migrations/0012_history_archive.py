@@ -0,0 +1,45 @@
+# Generated by Django 4.2.10 on 2026-10-19 04:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        ('vessel_pms', '0011_task_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='partconsumption',
+            name='history',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='part_lines', to='vessel_pms.maintenancehistory'),
+        ),
+        migrations.CreateModel(
+            name='MaintenanceHistoryArchive',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('year', models.PositiveSmallIntegerField()),
+                ('row_count', models.PositiveIntegerField()),
+                ('first_completed', models.DateTimeField()),
+                ('last_completed', models.DateTimeField()),
+                ('payload', models.BinaryField(help_text='zlib-compressed JSON list of history rows')),
+                ('raw_size', models.PositiveIntegerField(help_text='Uncompressed payload size in bytes')),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('vessel', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='maintenance_archives', to='core.vessel')),
+            ],
+            options={
+                'verbose_name': 'Maintenance History Archive',
+                'verbose_name_plural': 'Maintenance History Archives',
+                'ordering': ['-year', 'vessel'],
+                'indexes': [models.Index(fields=['vessel', 'year'], name='pms_archive_vessel_year'), models.Index(fields=['last_completed', 'first_completed'], name='pms_archive_range')],
+            },
+        ),
+        # Payloads are compressed already: store them out of line without a second compression pass
+        migrations.RunSQL(
+            'ALTER TABLE vessel_pms_maintenancehistoryarchive ALTER COLUMN payload SET STORAGE EXTERNAL',
+            migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.10 on 2026-10-19 10:05
+
+from django.db import migrations, models
+
+
+# Parameters already evaluated continue after the last reading recorded by their last evaluation
+BACKFILL_SQL = """
+UPDATE vessel_pms_monitoringparameter p
+SET last_evaluated_reading_id = (
+    SELECT MAX(r.id) FROM vessel_pms_equipmentreading r
+    WHERE r.parameter_id = p.id AND r.recorded_at <= p.last_evaluated_at
+)
+WHERE p.last_evaluated_at IS NOT NULL
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vessel_pms', '0012_history_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='monitoringparameter',
+            name='last_evaluated_reading_id',
+            field=models.BigIntegerField(
+                blank=True, help_text='Last reading evaluated; readings are evaluated in ingestion order', null=True
+            ),
+        ),
+        migrations.RunSQL(BACKFILL_SQL, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.10 on 2026-10-19 05:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vessel_pms', '0013_monitoring_reading_watermark'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='equipmentreading',
+            index=models.Index(fields=['parameter', 'id'], name='pms_reading_parameter_id'),
+        ),
+    ]
@@ -1,9 +1,15 @@
 from django.db import models
+from django.contrib.postgres.indexes import BrinIndex
 from django.conf import settings
 from django.utils import timezone
 from datetime import timedelta
 from dateutil.relativedelta import relativedelta
 from core.models import Vessel
+from .managers import MaintenanceTaskManager, MaintenanceHistoryManager
+from .utils import normalize_sfi_code, sfi_ancestors, sfi_level
+
+# Statuses for which a task still has to be carried out
+OPEN_TASK_STATUSES = ['scheduled', 'in_progress', 'overdue']
 
 class Equipment(models.Model):
     """Model for vessel equipment that requires maintenance"""
@@ -22,6 +28,10 @@ class Equipment(models.Model):
     installation_date = models.DateField()
     location = models.CharField(max_length=100)
     vessel = models.ForeignKey(Vessel, on_delete=models.CASCADE, related_name='equipment')
+    sfi_code = models.CharField(
+        max_length=50, blank=True, default='',
+        help_text="Dotted SFI code (e.g. 411.001.001), used as the materialized path of the equipment tree"
+    )
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='operational')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -29,10 +39,91 @@ class Equipment(models.Model):
     def __str__(self):
         return f"{self.name} ({self.serial_number})"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored status so save() can log transitions without a query
+        if 'status' in field_names:
+            instance._loaded_status = instance.status
+        return instance
+    
+    def save(self, *args, **kwargs):
+        self.sfi_code = normalize_sfi_code(self.sfi_code)
+        if self._state.adding:
+            previous_status = ''
+        else:
+            previous_status = getattr(self, '_loaded_status', None)
+        update_fields = kwargs.get('update_fields')
+        super().save(*args, **kwargs)
+        if update_fields is not None and 'status' not in update_fields:
+            return
+        if previous_status is not None and previous_status != self.status:
+            EquipmentStatusChange.objects.create(
+                equipment=self,
+                from_status=previous_status,
+                to_status=self.status
+            )
+        self._loaded_status = self.status
+    
+    @property
+    def level(self):
+        """Depth of this equipment in the SFI tree (0 when it has no code)"""
+        return sfi_level(self.sfi_code)
+    
+    def get_ancestors(self):
+        """Equipment of the same vessel above this one in the SFI tree"""
+        return Equipment.objects.filter(vessel_id=self.vessel_id, sfi_code__in=sfi_ancestors(self.sfi_code))
+    
+    def get_descendants(self, include_self=False):
+        """Equipment of the same vessel below this one in the SFI tree"""
+        if not self.sfi_code:
+            return Equipment.objects.filter(pk=self.pk) if include_self else Equipment.objects.none()
+        queryset = Equipment.objects.filter(vessel_id=self.vessel_id, sfi_code__startswith=self.sfi_code)
+        if not include_self:
+            queryset = queryset.exclude(pk=self.pk)
+        return queryset
+    
     class Meta:
         ordering = ['name']
         verbose_name = 'Equipment'
         verbose_name_plural = 'Equipment'
+        indexes = [
+            models.Index(fields=['vessel', 'status'], name='pms_equipment_vessel_status'),
+            # Prefix (LIKE 'code%') lookups for subtree queries
+            models.Index(
+                fields=['vessel', 'sfi_code'],
+                name='pms_equipment_sfi_path',
+                opclasses=['int8_ops', 'varchar_pattern_ops'],
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['vessel', 'sfi_code'],
+                condition=~models.Q(sfi_code=''),
+                name='pms_equipment_unique_sfi_code',
+            ),
+        ]
+
+
+class EquipmentStatusChange(models.Model):
+    """Log of equipment status transitions, used for failure and repair analytics"""
+    id = models.AutoField(primary_key=True)
+    equipment = models.ForeignKey(Equipment, on_delete=models.CASCADE, related_name='status_changes')
+    from_status = models.CharField(max_length=20, blank=True)
+    to_status = models.CharField(max_length=20, choices=Equipment.STATUS_CHOICES)
+    changed_at = models.DateTimeField(default=timezone.now)
+    
+    def __str__(self):
+        return f"{self.equipment}: {self.from_status or '-'} -> {self.to_status}"
+    
+    class Meta:
+        ordering = ['-changed_at']
+        verbose_name = 'Equipment Status Change'
+        verbose_name_plural = 'Equipment Status Changes'
+        indexes = [
+            models.Index(fields=['equipment', 'changed_at'], name='pms_status_equipment_date'),
+            models.Index(fields=['changed_at'], name='pms_status_changed_at'),
+        ]
 
 
 class MaintenanceTask(models.Model):
@@ -58,22 +149,43 @@ class MaintenanceTask(models.Model):
     
     id = models.AutoField(primary_key=True)
     task_name = models.CharField(max_length=100)
+    job_code = models.CharField(max_length=20, blank=True, default='', help_text="Job code from the PMS plan (e.g. NAV-001)")
     equipment = models.ForeignKey(Equipment, on_delete=models.CASCADE, related_name='maintenance_tasks')
-    description = models.TextField()
+    template = models.ForeignKey(
+        'JobTemplate', on_delete=models.PROTECT, null=True, blank=True, related_name='tasks',
+        help_text="Job template this task was instantiated from; blank text fields fall back to it"
+    )
+    description = models.TextField(blank=True)
     interval_type = models.CharField(max_length=20, choices=INTERVAL_TYPE_CHOICES)
     interval_value = models.PositiveIntegerField(help_text="Value for interval (days or hours)")
     last_completed_date = models.DateTimeField(null=True, blank=True)
     next_due_date = models.DateTimeField()
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='scheduled')
     responsible_role = models.CharField(max_length=100)
-    instructions = models.TextField()
+    instructions = models.TextField(blank=True)
     comments = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = MaintenanceTaskManager()
+    
     def __str__(self):
         return f"{self.task_name} - {self.equipment}"
     
+    @property
+    def effective_description(self):
+        """Task description, falling back to the job template"""
+        if self.description or not self.template_id:
+            return self.description
+        return self.template.description
+    
+    @property
+    def effective_instructions(self):
+        """Task instructions, falling back to the job template"""
+        if self.instructions or not self.template_id:
+            return self.instructions
+        return self.template.instructions
+    
     def calculate_next_due_date(self):
         """Calculate the next due date based on interval settings"""
         if not self.last_completed_date:
@@ -111,6 +223,74 @@ class MaintenanceTask(models.Model):
         ordering = ['next_due_date']
         verbose_name = 'Maintenance Task'
         verbose_name_plural = 'Maintenance Tasks'
+        indexes = [
+            # Due soon / overdue lookups only ever look at open tasks
+            models.Index(
+                fields=['next_due_date'],
+                name='pms_task_open_due',
+                condition=models.Q(status__in=OPEN_TASK_STATUSES),
+            ),
+            models.Index(fields=['status', 'next_due_date'], name='pms_task_status_due'),
+            # Keyset pagination of task lists
+            models.Index(fields=['next_due_date', 'id'], name='pms_task_due_id'),
+            models.Index(fields=['equipment', 'next_due_date'], name='pms_task_equipment_due'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['equipment', 'job_code'],
+                condition=~models.Q(job_code=''),
+                name='pms_task_unique_job_code',
+            ),
+        ]
+
+
+class JobTemplate(models.Model):
+    """
+    Maintenance job shared by every equipment of a given model/manufacturer.
+
+    Tasks instantiated from a template reference it instead of copying its
+    description and instructions, so sister vessels share a single copy.
+    """
+    id = models.AutoField(primary_key=True)
+    name = models.CharField(max_length=100)
+    job_code = models.CharField(max_length=20, blank=True, default='')
+    equipment_model = models.CharField(max_length=100, blank=True, help_text="Equipment model the job applies to")
+    manufacturer = models.CharField(max_length=100, blank=True, help_text="Equipment manufacturer the job applies to")
+    description = models.TextField()
+    instructions = models.TextField()
+    interval_type = models.CharField(max_length=20, choices=MaintenanceTask.INTERVAL_TYPE_CHOICES)
+    interval_value = models.PositiveIntegerField(help_text="Value for interval (days or hours)")
+    responsible_role = models.CharField(max_length=100)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        target = ' '.join(filter(None, [self.manufacturer, self.equipment_model]))
+        return f"{self.name} ({target})" if target else self.name
+    
+    def matching_equipment(self):
+        """Fleet equipment this template applies to"""
+        queryset = Equipment.objects.exclude(status='decommissioned')
+        if self.equipment_model:
+            queryset = queryset.filter(model__iexact=self.equipment_model)
+        if self.manufacturer:
+            queryset = queryset.filter(manufacturer__iexact=self.manufacturer)
+        return queryset
+    
+    class Meta:
+        ordering = ['name']
+        verbose_name = 'Job Template'
+        verbose_name_plural = 'Job Templates'
+        indexes = [
+            models.Index(fields=['manufacturer', 'equipment_model'], name='pms_template_target'),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                check=~models.Q(equipment_model='', manufacturer=''),
+                name='pms_template_has_target',
+            ),
+        ]
 
 
 class MaintenanceHistory(models.Model):
@@ -119,6 +299,7 @@ class MaintenanceHistory(models.Model):
     task = models.ForeignKey(MaintenanceTask, on_delete=models.CASCADE, related_name='history')
     equipment = models.ForeignKey(Equipment, on_delete=models.CASCADE, related_name='maintenance_history')
     completed_date = models.DateTimeField(default=timezone.now)
+    due_date = models.DateTimeField(null=True, blank=True, help_text="Task due date at the time of completion")
     completed_by = models.ForeignKey(
         settings.AUTH_USER_MODEL, 
         on_delete=models.SET_NULL, 
@@ -132,10 +313,418 @@ class MaintenanceHistory(models.Model):
     duration = models.PositiveIntegerField(null=True, blank=True, help_text="Duration in minutes")
     created_at = models.DateTimeField(auto_now_add=True)
     
+    objects = MaintenanceHistoryManager()
+    
     def __str__(self):
         return f"{self.task} - {self.completed_date}"
     
     class Meta:
         ordering = ['-completed_date']
         verbose_name = 'Maintenance History'
-        verbose_name_plural = 'Maintenance History'
\ No newline at end of file
+        verbose_name_plural = 'Maintenance History'
+        indexes = [
+            models.Index(fields=['equipment', '-completed_date'], name='pms_history_equipment_date'),
+            models.Index(fields=['task', '-completed_date'], name='pms_history_task_date'),
+            models.Index(fields=['-completed_date'], name='pms_history_completed_date'),
+            # Incremental refresh of the reliability metrics
+            models.Index(fields=['created_at'], name='pms_history_created_at'),
+        ]
+
+
+class EquipmentReliability(models.Model):
+    """
+    Precomputed reliability metrics of an equipment, refreshed by
+    vessel_pms.reliability.refresh_reliability_metrics.
+
+    Sums are kept next to the derived means so any grouping (manufacturer,
+    vessel, model) can be re-aggregated exactly from this table.
+    """
+    equipment = models.OneToOneField(
+        Equipment, on_delete=models.CASCADE, primary_key=True, related_name='reliability'
+    )
+    operating_hours = models.FloatField(default=0, help_text="Hours in service since installation, repairs excluded")
+    failure_count = models.PositiveIntegerField(default=0)
+    repair_count = models.PositiveIntegerField(default=0)
+    repair_hours = models.FloatField(default=0)
+    mtbf_hours = models.FloatField(null=True, blank=True, help_text="Mean time between failures")
+    mttr_hours = models.FloatField(null=True, blank=True, help_text="Mean time to repair")
+    completion_count = models.PositiveIntegerField(default=0)
+    interval_count = models.PositiveIntegerField(default=0)
+    interval_drift_days = models.FloatField(default=0, help_text="Sum of actual minus nominal completion intervals")
+    mean_interval_drift_days = models.FloatField(null=True, blank=True)
+    lag_count = models.PositiveIntegerField(default=0)
+    lag_days = models.FloatField(default=0, help_text="Sum of completion delays against the planned due date")
+    mean_lag_days = models.FloatField(null=True, blank=True)
+    max_lag_days = models.FloatField(null=True, blank=True)
+    last_failure_at = models.DateTimeField(null=True, blank=True)
+    last_completed_date = models.DateTimeField(null=True, blank=True)
+    computed_at = models.DateTimeField()
+    
+    def __str__(self):
+        return f"Reliability of {self.equipment}"
+    
+    class Meta:
+        verbose_name = 'Equipment Reliability'
+        verbose_name_plural = 'Equipment Reliability'
+        indexes = [
+            models.Index(fields=['computed_at'], name='pms_reliability_computed_at'),
+        ]
+
+class SparePart(models.Model):
+    """Spare parts catalogue entry"""
+    id = models.AutoField(primary_key=True)
+    code = models.SlugField(
+        max_length=100, unique=True, allow_unicode=True,
+        help_text="Normalized catalogue key, also used to match free-text parts"
+    )
+    name = models.CharField(max_length=100)
+    part_number = models.CharField(max_length=50, blank=True, help_text="Manufacturer part number")
+    manufacturer = models.CharField(max_length=100, blank=True)
+    unit = models.CharField(max_length=20, default='pcs')
+    lead_time_days = models.PositiveIntegerField(default=30, help_text="Days from order to delivery on board")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.name} ({self.part_number})" if self.part_number else self.name
+    
+    class Meta:
+        ordering = ['name']
+        verbose_name = 'Spare Part'
+        verbose_name_plural = 'Spare Parts'
+
+
+class PartConsumption(models.Model):
+    """Part consumed by a maintenance history entry"""
+    id = models.AutoField(primary_key=True)
+    # Lines outlive their history entry when it is archived
+    history = models.ForeignKey(
+        MaintenanceHistory, on_delete=models.SET_NULL, null=True, blank=True, related_name='part_lines'
+    )
+    part = models.ForeignKey(SparePart, on_delete=models.PROTECT, related_name='consumptions')
+    # Denormalized from the history entry for the rollups
+    vessel = models.ForeignKey(Vessel, on_delete=models.CASCADE, related_name='part_consumptions')
+    consumed_at = models.DateTimeField()
+    quantity = models.DecimalField(max_digits=10, decimal_places=2)
+    
+    def __str__(self):
+        return f"{self.quantity} x {self.part}"
+    
+    class Meta:
+        ordering = ['-consumed_at']
+        verbose_name = 'Part Consumption'
+        verbose_name_plural = 'Part Consumption'
+        indexes = [
+            models.Index(fields=['part', 'vessel', 'consumed_at'], name='pms_consumption_part_date'),
+            models.Index(fields=['vessel', 'consumed_at'], name='pms_consumption_vessel_date'),
+        ]
+
+
+class PartConsumptionRollup(models.Model):
+    """Monthly consumption per part and vessel, maintained by vessel_pms.parts"""
+    id = models.AutoField(primary_key=True)
+    part = models.ForeignKey(SparePart, on_delete=models.CASCADE, related_name='consumption_rollups')
+    vessel = models.ForeignKey(Vessel, on_delete=models.CASCADE, related_name='part_consumption_rollups')
+    period = models.DateField(help_text="First day of the month")
+    quantity = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    line_count = models.PositiveIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.part} - {self.vessel} - {self.period:%Y-%m}"
+    
+    class Meta:
+        ordering = ['-period']
+        verbose_name = 'Part Consumption Rollup'
+        verbose_name_plural = 'Part Consumption Rollups'
+        constraints = [
+            models.UniqueConstraint(fields=['part', 'vessel', 'period'], name='pms_rollup_unique_part_vessel_period'),
+        ]
+        indexes = [
+            models.Index(fields=['vessel', 'period'], name='pms_rollup_vessel_period'),
+            models.Index(fields=['period', 'part'], name='pms_rollup_period_part'),
+        ]
+
+
+
+class JobTemplatePart(models.Model):
+    """Parts required each time a job template is carried out"""
+    id = models.AutoField(primary_key=True)
+    template = models.ForeignKey(JobTemplate, on_delete=models.CASCADE, related_name='parts')
+    part = models.ForeignKey(SparePart, on_delete=models.PROTECT, related_name='template_requirements')
+    quantity = models.DecimalField(max_digits=10, decimal_places=2)
+    
+    def __str__(self):
+        return f"{self.template}: {self.quantity} x {self.part}"
+    
+    class Meta:
+        verbose_name = 'Job Template Part'
+        verbose_name_plural = 'Job Template Parts'
+        constraints = [
+            models.UniqueConstraint(fields=['template', 'part'], name='pms_template_part_unique'),
+        ]
+
+
+class StockLevel(models.Model):
+    """On-board stock of a part at a storage location, maintained from the movements ledger"""
+    id = models.AutoField(primary_key=True)
+    vessel = models.ForeignKey(Vessel, on_delete=models.CASCADE, related_name='stock_levels')
+    part = models.ForeignKey(SparePart, on_delete=models.CASCADE, related_name='stock_levels')
+    location = models.CharField(max_length=100, blank=True, default='')
+    quantity = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.part} @ {self.vessel} {self.location}: {self.quantity}"
+    
+    class Meta:
+        ordering = ['vessel', 'part', 'location']
+        verbose_name = 'Stock Level'
+        verbose_name_plural = 'Stock Levels'
+        constraints = [
+            models.UniqueConstraint(fields=['vessel', 'part', 'location'], name='pms_stock_unique_location'),
+        ]
+
+
+class StockMovement(models.Model):
+    """Ledger entry changing the stock of a part; quantities are signed"""
+    MOVEMENT_TYPE_CHOICES = (
+        ('receipt', 'Receipt'),
+        ('consumption', 'Consumption'),
+        ('adjustment', 'Adjustment'),
+        ('transfer', 'Transfer'),
+    )
+    
+    id = models.AutoField(primary_key=True)
+    vessel = models.ForeignKey(Vessel, on_delete=models.CASCADE, related_name='stock_movements')
+    part = models.ForeignKey(SparePart, on_delete=models.PROTECT, related_name='stock_movements')
+    location = models.CharField(max_length=100, blank=True, default='')
+    quantity = models.DecimalField(max_digits=12, decimal_places=2)
+    movement_type = models.CharField(max_length=20, choices=MOVEMENT_TYPE_CHOICES)
+    reference = models.CharField(max_length=100, blank=True)
+    consumption = models.OneToOneField(
+        PartConsumption, on_delete=models.SET_NULL, null=True, blank=True, related_name='stock_movement'
+    )
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='stock_movements'
+    )
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    def __str__(self):
+        return f"{self.get_movement_type_display()} {self.quantity} x {self.part} ({self.vessel})"
+    
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Stock Movement'
+        verbose_name_plural = 'Stock Movements'
+        indexes = [
+            models.Index(fields=['vessel', 'part', '-created_at'], name='pms_movement_part_date'),
+        ]
+
+
+class PartForecast(models.Model):
+    """
+    Demand forecast and reorder point of a part on a vessel, recomputed by
+    vessel_pms.inventory.forecast_part_demand.
+    """
+    id = models.AutoField(primary_key=True)
+    vessel = models.ForeignKey(Vessel, on_delete=models.CASCADE, related_name='part_forecasts')
+    part = models.ForeignKey(SparePart, on_delete=models.CASCADE, related_name='forecasts')
+    on_hand = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    scheduled_demand = models.FloatField(default=0, help_text="Demand of scheduled jobs within the lead time")
+    daily_usage = models.FloatField(default=0, help_text="Historical average daily consumption")
+    lead_time_demand = models.FloatField(default=0)
+    safety_stock = models.FloatField(default=0)
+    reorder_point = models.FloatField(default=0)
+    below_reorder_point = models.BooleanField(default=False)
+    computed_at = models.DateTimeField()
+    
+    def __str__(self):
+        return f"{self.part} @ {self.vessel}: {self.on_hand} on hand, reorder at {self.reorder_point:.1f}"
+    
+    class Meta:
+        ordering = ['vessel', 'part']
+        verbose_name = 'Part Forecast'
+        verbose_name_plural = 'Part Forecasts'
+        constraints = [
+            models.UniqueConstraint(fields=['vessel', 'part'], name='pms_forecast_unique_part'),
+        ]
+        indexes = [
+            # Low-stock alerts only ever read the parts below their reorder point
+            models.Index(
+                fields=['vessel', 'part'],
+                name='pms_forecast_low_stock',
+                condition=models.Q(below_reorder_point=True),
+            ),
+        ]
+
+
+
+class MonitoringParameter(models.Model):
+    """Condition-monitoring parameter of an equipment (vibration, bearing temperature...) and its limits"""
+    id = models.AutoField(primary_key=True)
+    equipment = models.ForeignKey(Equipment, on_delete=models.CASCADE, related_name='monitoring_parameters')
+    name = models.CharField(max_length=50)
+    unit = models.CharField(max_length=20, blank=True)
+    warning_limit = models.FloatField(null=True, blank=True, help_text="Readings at or above raise a maintenance task")
+    alarm_limit = models.FloatField(null=True, blank=True, help_text="Readings at or above put the equipment out of service")
+    rolling_window = models.PositiveIntegerField(default=20, help_text="Number of previous readings in the rolling statistics")
+    z_threshold = models.FloatField(default=3.0, help_text="Standard deviations from the rolling mean flagged as anomalous")
+    responsible_role = models.CharField(max_length=100, default='Chief Engineer')
+    is_active = models.BooleanField(default=True)
+    last_evaluated_at = models.DateTimeField(null=True, blank=True)
+    last_evaluated_reading_id = models.BigIntegerField(
+        null=True, blank=True, help_text="Last reading evaluated; readings are evaluated in ingestion order"
+    )
+    
+    def __str__(self):
+        return f"{self.equipment.name} - {self.name}"
+    
+    class Meta:
+        ordering = ['equipment', 'name']
+        verbose_name = 'Monitoring Parameter'
+        verbose_name_plural = 'Monitoring Parameters'
+        constraints = [
+            models.UniqueConstraint(fields=['equipment', 'name'], name='pms_parameter_unique_name'),
+        ]
+
+
+class EquipmentReading(models.Model):
+    """
+    Single condition-monitoring reading. Rows are kept narrow (parameter,
+    timestamp, value) and arrive roughly in time order, so a BRIN index
+    covers time-range scans at a fraction of the size of a B-tree.
+    """
+    id = models.BigAutoField(primary_key=True)
+    parameter = models.ForeignKey(MonitoringParameter, on_delete=models.CASCADE, related_name='readings')
+    recorded_at = models.DateTimeField()
+    value = models.FloatField()
+    
+    def __str__(self):
+        return f"{self.parameter}: {self.value} at {self.recorded_at}"
+    
+    class Meta:
+        ordering = ['-recorded_at']
+        verbose_name = 'Equipment Reading'
+        verbose_name_plural = 'Equipment Readings'
+        indexes = [
+            models.Index(fields=['parameter', 'recorded_at'], name='pms_reading_parameter_time'),
+            # Readings past a parameter's evaluation watermark (see vessel_pms.monitoring)
+            models.Index(fields=['parameter', 'id'], name='pms_reading_parameter_id'),
+            BrinIndex(fields=['recorded_at'], name='pms_reading_time_brin', autosummarize=True),
+        ]
+
+
+class ConditionAlert(models.Model):
+    """Limit breach or statistical anomaly found in the readings of a parameter"""
+    LEVEL_CHOICES = (
+        ('anomaly', 'Anomaly'),
+        ('warning', 'Warning'),
+        ('alarm', 'Alarm'),
+    )
+    
+    id = models.AutoField(primary_key=True)
+    parameter = models.ForeignKey(MonitoringParameter, on_delete=models.CASCADE, related_name='alerts')
+    level = models.CharField(max_length=10, choices=LEVEL_CHOICES)
+    recorded_at = models.DateTimeField(help_text="Time of the first offending reading")
+    value = models.FloatField(help_text="Worst reading of the evaluation run")
+    reading_count = models.PositiveIntegerField(default=1, help_text="Offending readings in the evaluation run")
+    rolling_mean = models.FloatField(null=True, blank=True)
+    rolling_std = models.FloatField(null=True, blank=True)
+    task = models.ForeignKey(
+        MaintenanceTask, on_delete=models.SET_NULL, null=True, blank=True, related_name='condition_alerts'
+    )
+    acknowledged = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.get_level_display()} on {self.parameter}: {self.value}"
+    
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Condition Alert'
+        verbose_name_plural = 'Condition Alerts'
+        indexes = [
+            models.Index(fields=['parameter', '-created_at'], name='pms_alert_parameter_date'),
+            models.Index(
+                fields=['-created_at'],
+                name='pms_alert_open',
+                condition=models.Q(acknowledged=False),
+            ),
+        ]
+
+
+class VesselKpiSnapshot(models.Model):
+    """
+    Weekly PMS KPIs of a vessel, refreshed daily during the week.
+
+    Backlog and overdue ageing are as of the last refresh, so past weeks keep
+    their end-of-week values; completions cover the week to date.
+    """
+    id = models.AutoField(primary_key=True)
+    vessel = models.ForeignKey(Vessel, on_delete=models.CASCADE, related_name='pms_kpi_snapshots')
+    week_start = models.DateField(help_text="Monday of the week")
+    open_jobs = models.PositiveIntegerField(default=0)
+    overdue_jobs = models.PositiveIntegerField(default=0)
+    backlog_hours = models.FloatField(default=0, help_text="Estimated hours of overdue jobs")
+    overdue_1_7_days = models.PositiveIntegerField(default=0)
+    overdue_8_30_days = models.PositiveIntegerField(default=0)
+    overdue_31_90_days = models.PositiveIntegerField(default=0)
+    overdue_over_90_days = models.PositiveIntegerField(default=0)
+    completed_jobs = models.PositiveIntegerField(default=0)
+    scheduled_completions = models.PositiveIntegerField(default=0, help_text="Completions with a known due date")
+    completed_in_window = models.PositiveIntegerField(default=0)
+    completed_hours = models.FloatField(default=0)
+    refreshed_at = models.DateTimeField()
+    
+    def __str__(self):
+        return f"{self.vessel} - week of {self.week_start}"
+    
+    @property
+    def schedule_compliance(self):
+        """Percentage of completions done within their window"""
+        if not self.scheduled_completions:
+            return None
+        return 100.0 * self.completed_in_window / self.scheduled_completions
+    
+    class Meta:
+        ordering = ['-week_start', 'vessel']
+        verbose_name = 'Vessel KPI Snapshot'
+        verbose_name_plural = 'Vessel KPI Snapshots'
+        constraints = [
+            models.UniqueConstraint(fields=['vessel', 'week_start'], name='pms_kpi_unique_week'),
+        ]
+        indexes = [
+            models.Index(fields=['week_start'], name='pms_kpi_week'),
+        ]
+
+
+class MaintenanceHistoryArchive(models.Model):
+    """
+    Maintenance history of a closed year for one vessel, moved out of the
+    hot table as a zlib-compressed batch of JSON rows (see vessel_pms.archive)
+    """
+    id = models.AutoField(primary_key=True)
+    vessel = models.ForeignKey(Vessel, on_delete=models.CASCADE, related_name='maintenance_archives')
+    year = models.PositiveSmallIntegerField()
+    row_count = models.PositiveIntegerField()
+    first_completed = models.DateTimeField()
+    last_completed = models.DateTimeField()
+    payload = models.BinaryField(help_text="zlib-compressed JSON list of history rows")
+    raw_size = models.PositiveIntegerField(help_text="Uncompressed payload size in bytes")
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.vessel} - {self.year} ({self.row_count} entries)"
+    
+    class Meta:
+        ordering = ['-year', 'vessel']
+        verbose_name = 'Maintenance History Archive'
+        verbose_name_plural = 'Maintenance History Archives'
+        indexes = [
+            models.Index(fields=['vessel', 'year'], name='pms_archive_vessel_year'),
+            models.Index(fields=['last_completed', 'first_completed'], name='pms_archive_range'),
+        ]
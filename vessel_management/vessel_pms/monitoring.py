@@ -0,0 +1,263 @@
+from functools import reduce
+from operator import or_
+
+import numpy as np
+import pandas as pd
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import (
+    ConditionAlert, EquipmentReading, MaintenanceTask, MonitoringParameter, OPEN_TASK_STATUSES
+)
+
+
+INGEST_BATCH_SIZE = 5000
+# Corrective tasks raised by alerts come back as a follow-up check after this many days
+FOLLOW_UP_DAYS = 30
+LEVELS = ['anomaly', 'warning', 'alarm']
+
+
+def ingest_readings(records, batch_size=INGEST_BATCH_SIZE):
+    """
+    Validate and bulk insert readings given as dicts with parameter,
+    recorded_at and value.
+
+    Columns are coerced with pandas in one pass; rows with an unknown or
+    inactive parameter, an unparseable timestamp or a non-numeric value are
+    reported by index and skipped. Returns the ingested count and errors.
+    """
+    frame = pd.DataFrame.from_records(records, columns=['parameter', 'recorded_at', 'value'])
+    frame['parameter'] = pd.to_numeric(frame['parameter'], errors='coerce')
+    frame['recorded_at'] = pd.to_datetime(frame['recorded_at'], errors='coerce', utc=True)
+    frame['value'] = pd.to_numeric(frame['value'], errors='coerce')
+
+    known = set(
+        MonitoringParameter.objects.filter(id__in=frame['parameter'].dropna().unique().tolist(), is_active=True)
+        .values_list('id', flat=True)
+    )
+    checks = [
+        (~frame['parameter'].isin(known), 'Unknown or inactive monitoring parameter'),
+        (frame['recorded_at'].isna(), 'recorded_at must be a timestamp'),
+        (frame['value'].isna() | ~np.isfinite(frame['value'].fillna(0)), 'value must be a number'),
+    ]
+    invalid = pd.Series(False, index=frame.index)
+    errors = []
+    for mask, message in checks:
+        errors += [{'index': int(index), 'error': message} for index in frame.index[mask & ~invalid]]
+        invalid |= mask
+
+    valid = frame[~invalid]
+    EquipmentReading.objects.bulk_create(
+        (
+            EquipmentReading(parameter_id=int(row.parameter), recorded_at=row.recorded_at.to_pydatetime(), value=row.value)
+            for row in valid.itertuples(index=False)
+        ),
+        batch_size=batch_size,
+    )
+    return {'ingested': len(valid), 'errors': sorted(errors, key=lambda error: error['index'])}
+
+
+def load_readings(parameters):
+    """
+    Readings ingested since each parameter's last evaluation, preceded by
+    the evaluated readings their rolling windows need.
+
+    New readings are those past the parameter's last evaluated reading id
+    (a range scan of the (parameter, id) index), so buffered readings
+    uploaded late, with a recorded_at before earlier uploads, are still
+    evaluated. Their context is every evaluated reading from the earliest
+    new one on, plus the `rolling_window` readings before it, fetched per
+    parameter newest first with a LIMIT from the (parameter, recorded_at)
+    index.
+    """
+    columns = ['id', 'parameter_id', 'recorded_at', 'value']
+    new = pd.DataFrame.from_records(
+        EquipmentReading.objects.filter(reduce(or_, [
+            Q(parameter_id=pk) if parameter.last_evaluated_reading_id is None
+            else Q(parameter_id=pk, id__gt=parameter.last_evaluated_reading_id)
+            for pk, parameter in parameters.items()
+        ])).values_list(*columns),
+        columns=columns,
+    )
+    firsts = {
+        pk: first for pk, first in new.groupby('parameter_id')['recorded_at'].min().items()
+        if parameters[pk].last_evaluated_reading_id is not None
+    }
+    frames = [new.assign(is_new=True)]
+    if firsts:
+        within = EquipmentReading.objects.filter(reduce(or_, [
+            Q(parameter_id=pk, recorded_at__gte=first, id__lte=parameters[pk].last_evaluated_reading_id)
+            for pk, first in firsts.items()
+        ]))
+        before = [
+            EquipmentReading.objects.filter(parameter_id=pk, recorded_at__lt=first)
+            .order_by('-recorded_at').values_list(*columns)[:parameters[pk].rolling_window]
+            for pk, first in firsts.items()
+        ]
+        before = before[0].union(*before[1:], all=True) if len(before) > 1 else before[0]
+        frames += [
+            pd.DataFrame.from_records(before, columns=columns).assign(is_new=False),
+            pd.DataFrame.from_records(within.values_list(*columns), columns=columns).assign(is_new=False),
+        ]
+    frame = pd.concat(frames, ignore_index=True)
+    return frame.sort_values(['parameter_id', 'recorded_at', 'id'], kind='stable', ignore_index=True)
+
+
+def score_readings(frame, parameters):
+    """
+    Rolling statistics and alert level of every reading.
+
+    Each reading is compared to the mean and standard deviation of the
+    readings before it (its parameter's rolling window), and to the
+    parameter's warning and alarm limits.
+    """
+    settings = pd.DataFrame.from_records(
+        [
+            (parameter.pk, parameter.rolling_window, parameter.z_threshold,
+             parameter.warning_limit, parameter.alarm_limit)
+            for parameter in parameters.values()
+        ],
+        columns=['parameter_id', 'window', 'z_threshold', 'warning_limit', 'alarm_limit'],
+    )
+    frame = frame.merge(settings, on='parameter_id', how='left')
+    values = frame.groupby('parameter_id', sort=False)['value']
+    windows = settings.set_index('parameter_id')['window']
+
+    def rolling(series, statistic):
+        window = int(windows[series.name])
+        stats = series.rolling(window, min_periods=max(3, window // 2))
+        return getattr(stats, statistic)().shift()
+
+    frame['rolling_mean'] = values.transform(rolling, 'mean')
+    frame['rolling_std'] = values.transform(rolling, 'std')
+    z_score = (frame['value'] - frame['rolling_mean']) / frame['rolling_std'].where(frame['rolling_std'] > 0)
+    frame['level'] = np.select(
+        [
+            frame['value'] >= frame['alarm_limit'],
+            frame['value'] >= frame['warning_limit'],
+            z_score.abs() > frame['z_threshold'],
+        ],
+        ['alarm', 'warning', 'anomaly'],
+        default='',
+    )
+    return frame
+
+
+def raise_condition_tasks(parameters, alerts, now):
+    """
+    Open one corrective task per alerted parameter, reusing the task raised
+    by a previous alert (job code CM-<parameter>) when there is one.
+    """
+    job_codes = {pk: f'CM-{pk}' for pk in alerts}
+    tasks = {
+        (task.equipment_id, task.job_code): task
+        for task in MaintenanceTask.objects.filter(
+            equipment_id__in={parameters[pk].equipment_id for pk in alerts},
+            job_code__in=job_codes.values(),
+        )
+    }
+    created, reopened = [], []
+    for pk, alert in alerts.items():
+        parameter = parameters[pk]
+        task = tasks.get((parameter.equipment_id, job_codes[pk]))
+        if task is None:
+            task = MaintenanceTask(
+                equipment_id=parameter.equipment_id,
+                job_code=job_codes[pk],
+                task_name=f'Condition check: {parameter.name}'[:100],
+                description=f'Inspect {parameter.equipment.name} after abnormal {parameter.name} readings',
+                instructions='Check the condition-monitoring alert, inspect the equipment and record the findings',
+                interval_type='custom_days',
+                interval_value=FOLLOW_UP_DAYS,
+                next_due_date=now,
+                responsible_role=parameter.responsible_role,
+            )
+            created.append(task)
+        elif task.status not in OPEN_TASK_STATUSES:
+            task.status = 'scheduled'
+            task.next_due_date = now
+            task.updated_at = now
+            reopened.append(task)
+        alert.task = task
+    MaintenanceTask.objects.bulk_create(created)
+    MaintenanceTask.objects.bulk_update(reopened, ['status', 'next_due_date', 'updated_at'])
+    for alert in alerts.values():
+        alert.task_id = alert.task.pk
+    return len(created) + len(reopened)
+
+
+def evaluate_readings(parameter_ids=None):
+    """
+    Evaluate the readings received since the last run.
+
+    Offending readings are summarized into one alert per parameter and
+    level. Parameters reaching their warning limit, or drifting from their
+    rolling statistics, get a corrective maintenance task; parameters
+    reaching their alarm limit also put the equipment out of service
+    (status 'faulty'). Returns counts of what was done.
+    """
+    now = timezone.now()
+    parameters = MonitoringParameter.objects.filter(is_active=True).select_related('equipment')
+    if parameter_ids:
+        parameters = parameters.filter(id__in=parameter_ids)
+    parameters = {parameter.pk: parameter for parameter in parameters}
+    result = {'readings': 0, 'alerts': 0, 'tasks': 0, 'faulty': 0}
+    if not parameters:
+        return result
+
+    frame = load_readings(parameters)
+    new = frame['is_new']
+    result['readings'] = int(new.sum())
+    if not result['readings']:
+        return result
+
+    frame = score_readings(frame, parameters)
+    offending = frame[new & frame['level'].ne('')]
+    summary = offending.groupby(['parameter_id', 'level'], sort=False).agg(
+        recorded_at=('recorded_at', 'first'),
+        value=('value', 'max'),
+        reading_count=('value', 'size'),
+        rolling_mean=('rolling_mean', 'first'),
+        rolling_std=('rolling_std', 'first'),
+    ).reset_index()
+    alerts = [
+        ConditionAlert(
+            parameter_id=int(row.parameter_id),
+            level=row.level,
+            recorded_at=row.recorded_at,
+            value=row.value,
+            reading_count=int(row.reading_count),
+            rolling_mean=None if pd.isna(row.rolling_mean) else row.rolling_mean,
+            rolling_std=None if pd.isna(row.rolling_std) else row.rolling_std,
+        )
+        for row in summary.itertuples(index=False)
+    ]
+    # The most severe alert of each parameter carries the task
+    worst = {}
+    for alert in sorted(alerts, key=lambda alert: LEVELS.index(alert.level)):
+        worst[alert.parameter_id] = alert
+
+    with transaction.atomic():
+        result['tasks'] = raise_condition_tasks(parameters, worst, now)
+        ConditionAlert.objects.bulk_create(alerts)
+        result['alerts'] = len(alerts)
+
+        faulty = {
+            parameters[pk].equipment for pk, alert in worst.items() if alert.level == 'alarm'
+        }
+        for equipment in faulty:
+            if equipment.status not in ('faulty', 'decommissioned'):
+                # save() records the transition for the reliability metrics
+                equipment.status = 'faulty'
+                equipment.save()
+                result['faulty'] += 1
+
+        last_reading = frame[new].groupby('parameter_id')['id'].max()
+        for pk, reading_id in last_reading.items():
+            parameters[pk].last_evaluated_reading_id = int(reading_id)
+            parameters[pk].last_evaluated_at = now
+        MonitoringParameter.objects.bulk_update(
+            [parameters[pk] for pk in last_reading.index], ['last_evaluated_reading_id', 'last_evaluated_at']
+        )
+    return result
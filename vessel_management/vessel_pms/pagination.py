@@ -0,0 +1,95 @@
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+
+
+class KeysetCursorPagination(CursorPagination):
+    """
+    Cursor pagination seeking on the full ordering key.
+
+    DRF's CursorPagination positions on the first ordering field only and
+    skips ties with an offset; here the cursor carries every field of
+    `ordering` (ending with the primary key), so each page is a range scan
+    of the matching index, as fast on page 1000 as on page 1. All fields
+    must be sorted in the same direction.
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    separator = '|'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        self.fields = [field.lstrip('-') for field in self.ordering]
+        reverse = bool(self.cursor and self.cursor.reverse)
+        descending = self.ordering[0].startswith('-') != reverse
+        queryset = queryset.order_by(*[('-' if descending else '') + field for field in self.fields])
+
+        if self.cursor:
+            values = self.parse_position(queryset.model, self.cursor.position)
+            queryset = queryset.filter(self.seek_filter(values, 'lt' if descending else 'gt'))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+        return self.page
+
+    def seek_filter(self, values, lookup):
+        """
+        Rows after `values` in the ordering.
+
+        Written as `a >= x AND (a > x OR (a = x AND b > y))` so the leading
+        comparison bounds the index scan.
+        """
+        after = Q()
+        for index in reversed(range(len(self.fields))):
+            field, value = self.fields[index], values[index]
+            strictly = Q(**{f'{field}__{lookup}': value})
+            after = strictly if index == len(self.fields) - 1 else strictly | (Q(**{field: value}) & after)
+        return Q(**{f'{self.fields[0]}__{lookup}e': values[0]}) & after
+
+    def parse_position(self, model, position):
+        parts = (position or '').split(self.separator)
+        if len(parts) != len(self.fields):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            return [model._meta.get_field(field).to_python(part) for field, part in zip(self.fields, parts)]
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def position_of(self, instance):
+        values = []
+        for field in self.fields:
+            value = getattr(instance, field)
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else str(value))
+        return self.separator.join(values)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=self.position_of(self.page[-1])))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=self.position_of(self.page[0])))
+
+
+class MaintenanceTaskCursorPagination(KeysetCursorPagination):
+    """Tasks by due date, served by the (next_due_date, id) index"""
+    ordering = ('next_due_date', 'id')
+
+
+class MaintenanceHistoryCursorPagination(KeysetCursorPagination):
+    """History entries, latest completion first"""
+    ordering = ('-completed_date', '-id')
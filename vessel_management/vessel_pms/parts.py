@@ -0,0 +1,218 @@
+from collections import defaultdict
+from datetime import datetime, time
+from decimal import Decimal
+
+from dateutil.relativedelta import relativedelta
+from django.db import transaction
+from django.db.models import Count, DateField, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import Equipment, MaintenanceHistory, PartConsumption, PartConsumptionRollup, SparePart, StockMovement
+from .inventory import consume_from_stock, restock_consumption
+from .utils import normalize_part_name, parse_parts_used
+
+
+def month_start(moment):
+    """First day of the (local) month of a datetime"""
+    return timezone.localtime(moment).date().replace(day=1)
+
+
+def resolve_parts(names):
+    """
+    Catalogue entries for free-text part names, keyed by catalogue code.
+
+    Unknown parts are added to the catalogue with a single bulk insert.
+    """
+    names_by_code = {}
+    for name in names:
+        names_by_code.setdefault(normalize_part_name(name), name)
+    names_by_code.pop('', None)
+    parts = SparePart.objects.in_bulk(names_by_code, field_name='code')
+    missing = [
+        SparePart(code=code, name=name.strip()[:100])
+        for code, name in names_by_code.items() if code not in parts
+    ]
+    if missing:
+        SparePart.objects.bulk_create(missing, ignore_conflicts=True)
+        parts = SparePart.objects.in_bulk(names_by_code, field_name='code')
+    return parts
+
+
+def record_part_consumption(history_rows, deduct_stock=True):
+    """
+    Turn the free-text parts_used of saved history entries into consumption lines.
+
+    Quantities of the same part within one entry are summed. The monthly
+    rollups touched by the new lines are refreshed and, unless `deduct_stock`
+    is off, the parts are booked out of the vessel's stock. Returns the
+    number of lines created.
+    """
+    parsed = [(history, parse_parts_used(history.parts_used)) for history in history_rows if history.parts_used]
+    parsed = [(history, items) for history, items in parsed if items]
+    if not parsed:
+        return 0
+
+    parts = resolve_parts(name for _, items in parsed for name, _ in items)
+    vessels = dict(
+        Equipment.objects.filter(id__in={history.equipment_id for history, _ in parsed})
+        .values_list('id', 'vessel_id')
+    )
+    lines = []
+    for history, items in parsed:
+        quantities = defaultdict(Decimal)
+        for name, quantity in items:
+            quantities[parts[normalize_part_name(name)].pk] += Decimal(str(quantity))
+        lines.extend(
+            PartConsumption(
+                history_id=history.pk,
+                part_id=part_id,
+                vessel_id=vessels[history.equipment_id],
+                consumed_at=history.completed_date,
+                quantity=quantity,
+            )
+            for part_id, quantity in quantities.items()
+        )
+
+    with transaction.atomic():
+        PartConsumption.objects.bulk_create(lines)
+        if deduct_stock:
+            consume_from_stock(lines)
+        refresh_consumption_rollups(
+            {(line.part_id, line.vessel_id, month_start(line.consumed_at)) for line in lines}
+        )
+    return len(lines)
+
+
+def remove_part_consumption(history_ids, user=None):
+    """
+    Withdraw the consumption lines of history entries being edited or deleted.
+
+    The stock booked out for the lines is returned, the lines are deleted
+    and the monthly rollups they counted towards are refreshed. Archived
+    entries keep their lines (see vessel_pms.archive). Returns the number
+    of lines removed.
+    """
+    lines = list(PartConsumption.objects.filter(history_id__in=history_ids))
+    if not lines:
+        return 0
+    with transaction.atomic():
+        restock_consumption(lines, user=user)
+        PartConsumption.objects.filter(id__in=[line.pk for line in lines]).delete()
+        refresh_consumption_rollups(
+            {(line.part_id, line.vessel_id, month_start(line.consumed_at)) for line in lines}
+        )
+    return len(lines)
+
+
+def rewrite_part_consumption(history, user=None):
+    """
+    Replace the consumption lines of an edited history entry.
+
+    The new lines are booked out of stock unless the old ones were not
+    (backfilled entries), so an edit never changes how an entry is
+    accounted for. Returns the number of lines created.
+    """
+    had_lines = PartConsumption.objects.filter(history=history).exists()
+    booked = StockMovement.objects.filter(consumption__history=history).exists()
+    with transaction.atomic():
+        remove_part_consumption([history.pk], user=user)
+        return record_part_consumption([history], deduct_stock=booked or not had_lines)
+
+def refresh_consumption_rollups(keys):
+    """
+    Recompute the monthly rollup rows for the given (part, vessel, period) keys.
+
+    The lines are aggregated with one grouped query and written back with a
+    single upsert; keys without lines left are reset to zero.
+    """
+    keys = set(keys)
+    if not keys:
+        return 0
+    periods = {period for _, _, period in keys}
+    start = timezone.make_aware(datetime.combine(min(periods), time.min))
+    end = timezone.make_aware(datetime.combine(max(periods) + relativedelta(months=1), time.min))
+    totals = {
+        (row['part_id'], row['vessel_id'], row['period']): row
+        for row in PartConsumption.objects.filter(
+            part_id__in={part for part, _, _ in keys},
+            vessel_id__in={vessel for _, vessel, _ in keys},
+            consumed_at__gte=start,
+            consumed_at__lt=end,
+        )
+        .annotate(period=TruncMonth('consumed_at', output_field=DateField()))
+        .values('part_id', 'vessel_id', 'period')
+        .annotate(total=Sum('quantity'), lines=Count('id'))
+    }
+    rollups = [
+        PartConsumptionRollup(
+            part_id=part,
+            vessel_id=vessel,
+            period=period,
+            quantity=totals.get((part, vessel, period), {}).get('total') or 0,
+            line_count=totals.get((part, vessel, period), {}).get('lines') or 0,
+        )
+        for part, vessel, period in keys
+    ]
+    PartConsumptionRollup.objects.bulk_create(
+        rollups,
+        update_conflicts=True,
+        unique_fields=['part', 'vessel', 'period'],
+        update_fields=['quantity', 'line_count'],
+    )
+    return len(rollups)
+
+
+def backfill_part_consumption(batch_size=1000, progress=None):
+    """
+    One-off parse of the existing parts_used free text.
+
+    History entries without consumption lines are walked in primary key
+    order, one batch per transaction, so the backfill can be interrupted
+    and resumed. Past consumption is not booked out of the current stock.
+    Returns the number of entries scanned and lines created.
+    """
+    queryset = MaintenanceHistory.objects.exclude(parts_used='').filter(part_lines__isnull=True).order_by('id')
+    scanned = created = 0
+    last_id = 0
+    while True:
+        batch = list(
+            queryset.filter(id__gt=last_id)
+            .only('id', 'equipment_id', 'completed_date', 'parts_used')[:batch_size]
+        )
+        if not batch:
+            break
+        created += record_part_consumption(batch, deduct_stock=False)
+        scanned += len(batch)
+        last_id = batch[-1].id
+        if progress:
+            progress(scanned, created)
+    return {'scanned': scanned, 'created': created}
+
+
+def consumption_summary(queryset=None, group_by=('part',), start=None, end=None):
+    """
+    Consumption totals from the monthly rollups.
+
+    `group_by` is any combination of 'part', 'vessel' and 'period'; `start`
+    and `end` are dates, matched against the rollup months they fall in.
+    """
+    queryset = queryset if queryset is not None else PartConsumptionRollup.objects.all()
+    if start:
+        queryset = queryset.filter(period__gte=start.replace(day=1))
+    if end:
+        queryset = queryset.filter(period__lte=end)
+
+    fields = []
+    for group in group_by:
+        fields.append(group)
+        if group == 'part':
+            fields += ['part__name', 'part__unit']
+        elif group == 'vessel':
+            fields.append('vessel__name')
+    return list(
+        queryset
+        .values(*fields)
+        .annotate(quantity=Sum('quantity'), line_count=Sum('line_count'))
+        .order_by(*group_by)
+    )
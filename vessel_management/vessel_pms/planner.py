@@ -0,0 +1,185 @@
+from datetime import datetime, time, timedelta
+
+import numpy as np
+from django.db.models import Avg
+from django.utils import timezone
+
+from .models import MaintenanceTask, MaintenanceHistory, OPEN_TASK_STATUSES
+
+
+DEFAULT_WEEKLY_CAPACITY_HOURS = 20.0
+# Used when neither the task nor any task with the same name has a recorded duration
+DEFAULT_TASK_HOURS = 1.0
+
+
+class WorkloadPlanner:
+    """
+    Levels PMS jobs over weekly buckets against per-role crew capacity.
+
+    Open tasks are expanded into their occurrences over the horizon and
+    jobs due the same week on the same equipment for the same role are
+    grouped into work packages. Packages are then placed earliest deadline
+    first, each in the least loaded week of its window (from `window_weeks`
+    before its due week up to the due week), so work is pulled forward into
+    quiet weeks instead of piling up. Overdue packages go into the first week.
+    """
+
+    def __init__(self, start=None, weeks=52, window_weeks=2, capacity=None,
+                 default_capacity=DEFAULT_WEEKLY_CAPACITY_HOURS):
+        start = start or timezone.localdate()
+        self.start = start - timedelta(days=start.weekday())
+        self.weeks = weeks
+        self.window_weeks = window_weeks
+        # Capacity in hours per week, keyed by role (applies to every vessel)
+        self.capacity = capacity or {}
+        self.default_capacity = default_capacity
+
+    @property
+    def end(self):
+        return self.start + timedelta(weeks=self.weeks)
+
+    def week_of(self, day):
+        """Week index of a date, clamped to the horizon start"""
+        return max((day - self.start).days // 7, 0)
+
+    def task_hours(self, tasks):
+        """Estimated hours per task id, learned from recorded completion durations"""
+        with_duration = MaintenanceHistory.objects.filter(duration__isnull=False)
+        by_task = dict(
+            with_duration.filter(task__in=[task['id'] for task in tasks])
+            .values('task').annotate(minutes=Avg('duration')).values_list('task', 'minutes')
+        )
+        by_name = dict(
+            with_duration.filter(task__task_name__in={task['task_name'] for task in tasks})
+            .values('task__task_name').annotate(minutes=Avg('duration')).values_list('task__task_name', 'minutes')
+        )
+        hours = {}
+        for task in tasks:
+            minutes = by_task.get(task['id']) or by_name.get(task['task_name'])
+            hours[task['id']] = minutes / 60 if minutes else DEFAULT_TASK_HOURS
+        return hours
+
+    def occurrences(self, task):
+        """Due dates of a task within the horizon, following its interval"""
+        due = timezone.localdate(task['next_due_date'])
+        yield due
+        schedule = MaintenanceTask(
+            interval_type=task['interval_type'],
+            interval_value=task['interval_value'],
+            next_due_date=task['next_due_date'],
+        )
+        # Overdue tasks are assumed done at the start of the horizon
+        current = max(task['next_due_date'], timezone.make_aware(datetime.combine(self.start, time.min)))
+        while True:
+            schedule.last_completed_date = current
+            following = schedule.calculate_next_due_date()
+            # Running hours tasks cannot be projected on the calendar
+            if following <= current:
+                return
+            current = following
+            due = timezone.localdate(current)
+            if due >= self.end:
+                return
+            yield due
+
+    def load_jobs(self, queryset=None):
+        """Job occurrences of the open tasks in `queryset` over the horizon"""
+        queryset = queryset if queryset is not None else MaintenanceTask.objects.all()
+        end = timezone.make_aware(datetime.combine(self.end, time.min))
+        tasks = list(
+            queryset.filter(status__in=OPEN_TASK_STATUSES, next_due_date__lt=end)
+            .values('id', 'task_name', 'responsible_role', 'next_due_date', 'interval_type', 'interval_value',
+                    'equipment_id', 'equipment__name', 'equipment__vessel_id')
+        )
+        hours = self.task_hours(tasks)
+        return [
+            {
+                'task': task['id'],
+                'vessel': task['equipment__vessel_id'],
+                'role': task['responsible_role'],
+                'equipment': task['equipment_id'],
+                'equipment_name': task['equipment__name'],
+                'due_date': due,
+                'hours': hours[task['id']],
+            }
+            for task in tasks
+            for due in self.occurrences(task)
+        ]
+
+    def build_packages(self, jobs):
+        """Group jobs on the same equipment, for the same role, due the same week"""
+        packages = {}
+        for job in jobs:
+            key = (job['vessel'], job['role'], job['equipment'], self.week_of(job['due_date']))
+            package = packages.get(key)
+            if package is None:
+                package = packages[key] = {
+                    'vessel': job['vessel'],
+                    'role': job['role'],
+                    'equipment': job['equipment'],
+                    'equipment_name': job['equipment_name'],
+                    'due_date': job['due_date'],
+                    'tasks': [],
+                    'hours': 0.0,
+                }
+            package['tasks'].append(job['task'])
+            package['hours'] += job['hours']
+            package['due_date'] = min(package['due_date'], job['due_date'])
+        return list(packages.values())
+
+    def plan(self, jobs):
+        """Assign every job to a week and report the load per vessel and role"""
+        packages = self.build_packages(jobs)
+        crews = sorted({(package['vessel'], package['role']) for package in packages})
+        crew_index = {crew: index for index, crew in enumerate(crews)}
+        load = np.zeros((len(crews), self.weeks))
+        capacity = np.array([self.capacity.get(role, self.default_capacity) for _, role in crews])
+
+        # Earliest deadline first; longer packages first within a week so they get the emptiest slots
+        packages.sort(key=lambda package: (package['due_date'], -package['hours']))
+        today = timezone.localdate()
+        for package in packages:
+            row = crew_index[(package['vessel'], package['role'])]
+            latest = min(self.week_of(package['due_date']), self.weeks - 1)
+            earliest = max(latest - self.window_weeks, self.week_of(today))
+            earliest = min(earliest, latest)
+            # Least loaded week of the window, the latest one on ties
+            window = load[row, earliest:latest + 1]
+            week = latest - int(np.argmin(window[::-1]))
+            load[row, week] += package['hours']
+            package['week'] = week
+            package['week_start'] = self.start + timedelta(weeks=week)
+            package['overdue'] = package['due_date'] < today
+
+        overloaded = [
+            {
+                'vessel': crews[row][0],
+                'role': crews[row][1],
+                'week_start': self.start + timedelta(weeks=int(week)),
+                'hours': round(float(load[row, week]), 2),
+                'capacity': float(capacity[row]),
+            }
+            for row, week in zip(*np.nonzero(load > capacity[:, None]))
+        ]
+        packages.sort(key=lambda package: (package['week'], package['vessel'], package['role'], package['equipment']))
+        return {
+            'start': self.start,
+            'weeks': self.weeks,
+            'packages': packages,
+            'load': [
+                {
+                    'vessel': vessel,
+                    'role': role,
+                    'capacity': float(capacity[row]),
+                    'hours': [round(float(hours), 2) for hours in load[row]],
+                }
+                for row, (vessel, role) in enumerate(crews)
+            ],
+            'overloaded': overloaded,
+        }
+
+
+def plan_workload(queryset=None, **options):
+    """Levelled weekly plan for the open tasks in `queryset`, see WorkloadPlanner"""
+    planner = WorkloadPlanner(**options)
+    return planner.plan(planner.load_jobs(queryset))
@@ -0,0 +1,208 @@
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Count, F, FloatField, Max, Sum
+from django.db.models.functions import Cast, NullIf
+from django.utils import timezone
+
+from .models import (
+    Equipment, EquipmentReliability, EquipmentStatusChange, MaintenanceHistory, MaintenanceTask
+)
+
+
+# Rows committed by transactions that started before the previous refresh
+# may carry an older created_at, so incremental refreshes look back a bit.
+REFRESH_OVERLAP = timedelta(minutes=5)
+
+REFRESH_SQL = """
+WITH dirty AS (
+    SELECT e.id AS equipment_id
+    FROM {equipment} e
+    LEFT JOIN {reliability} r ON r.equipment_id = e.id
+    WHERE %(full)s OR r.equipment_id IS NULL
+    UNION
+    SELECT equipment_id FROM {history} WHERE created_at > %(since)s
+    UNION
+    SELECT equipment_id FROM {status_change} WHERE changed_at > %(since)s
+),
+completions AS (
+    SELECT
+        h.equipment_id,
+        h.completed_date,
+        h.due_date,
+        LAG(h.completed_date) OVER (PARTITION BY h.task_id ORDER BY h.completed_date) AS previous_completed,
+        CASE t.interval_type
+            WHEN 'daily' THEN make_interval(days => t.interval_value)
+            WHEN 'custom_days' THEN make_interval(days => t.interval_value)
+            WHEN 'weekly' THEN make_interval(weeks => t.interval_value)
+            WHEN 'monthly' THEN make_interval(months => t.interval_value)
+            WHEN 'quarterly' THEN make_interval(months => 3 * t.interval_value)
+            WHEN 'semi_annual' THEN make_interval(months => 6 * t.interval_value)
+            WHEN 'annual' THEN make_interval(years => t.interval_value)
+        END AS nominal_interval
+    FROM {history} h
+    JOIN {task} t ON t.id = h.task_id
+    WHERE h.equipment_id IN (SELECT equipment_id FROM dirty)
+),
+schedule AS (
+    SELECT
+        equipment_id,
+        COUNT(*) AS completion_count,
+        MAX(completed_date) AS last_completed_date,
+        COUNT(*) FILTER (WHERE previous_completed IS NOT NULL AND nominal_interval IS NOT NULL) AS interval_count,
+        COALESCE(SUM(
+            EXTRACT(EPOCH FROM completed_date - (previous_completed + nominal_interval)) / 86400
+        ), 0) AS interval_drift_days,
+        COUNT(planned_date) AS lag_count,
+        COALESCE(SUM(EXTRACT(EPOCH FROM completed_date - planned_date) / 86400), 0) AS lag_days,
+        MAX(EXTRACT(EPOCH FROM completed_date - planned_date) / 86400) AS max_lag_days
+    FROM (
+        SELECT *, COALESCE(due_date, previous_completed + nominal_interval) AS planned_date
+        FROM completions
+    ) planned
+    GROUP BY equipment_id
+),
+transitions AS (
+    SELECT
+        s.equipment_id,
+        s.to_status,
+        s.changed_at,
+        MIN(CASE WHEN s.to_status = 'operational' THEN s.changed_at END) OVER following AS restored_at,
+        MIN(CASE WHEN s.to_status = 'faulty' THEN s.changed_at END) OVER following AS next_failure_at
+    FROM {status_change} s
+    WHERE s.equipment_id IN (SELECT equipment_id FROM dirty)
+    WINDOW following AS (
+        PARTITION BY s.equipment_id ORDER BY s.changed_at
+        ROWS BETWEEN 1 FOLLOWING AND UNBOUNDED FOLLOWING
+    )
+),
+failures AS (
+    SELECT
+        equipment_id,
+        COUNT(*) AS failure_count,
+        MAX(changed_at) AS last_failure_at,
+        COUNT(*) FILTER (WHERE repaired) AS repair_count,
+        COALESCE(SUM(EXTRACT(EPOCH FROM restored_at - changed_at) / 3600) FILTER (WHERE repaired), 0) AS repair_hours
+    FROM (
+        -- A repair ends at the next return to service, unless the equipment failed again first
+        SELECT *, restored_at IS NOT NULL
+                  AND (next_failure_at IS NULL OR restored_at < next_failure_at) AS repaired
+        FROM transitions
+        WHERE to_status = 'faulty'
+    ) faults
+    GROUP BY equipment_id
+),
+metrics AS (
+    SELECT
+        e.id AS equipment_id,
+        GREATEST(
+            EXTRACT(EPOCH FROM %(now)s - e.installation_date::timestamptz) / 3600
+            - COALESCE(f.repair_hours, 0),
+            0
+        ) AS operating_hours,
+        COALESCE(f.failure_count, 0) AS failure_count,
+        COALESCE(f.repair_count, 0) AS repair_count,
+        COALESCE(f.repair_hours, 0) AS repair_hours,
+        f.last_failure_at,
+        COALESCE(c.completion_count, 0) AS completion_count,
+        COALESCE(c.interval_count, 0) AS interval_count,
+        COALESCE(c.interval_drift_days, 0) AS interval_drift_days,
+        COALESCE(c.lag_count, 0) AS lag_count,
+        COALESCE(c.lag_days, 0) AS lag_days,
+        c.max_lag_days,
+        c.last_completed_date
+    FROM {equipment} e
+    JOIN dirty d ON d.equipment_id = e.id
+    LEFT JOIN schedule c ON c.equipment_id = e.id
+    LEFT JOIN failures f ON f.equipment_id = e.id
+)
+INSERT INTO {reliability} (
+    equipment_id, operating_hours, failure_count, repair_count, repair_hours, mtbf_hours, mttr_hours,
+    completion_count, interval_count, interval_drift_days, mean_interval_drift_days,
+    lag_count, lag_days, mean_lag_days, max_lag_days, last_failure_at, last_completed_date, computed_at
+)
+SELECT
+    equipment_id, operating_hours, failure_count, repair_count, repair_hours,
+    operating_hours / NULLIF(failure_count, 0),
+    repair_hours / NULLIF(repair_count, 0),
+    completion_count, interval_count, interval_drift_days,
+    interval_drift_days / NULLIF(interval_count, 0),
+    lag_count, lag_days,
+    lag_days / NULLIF(lag_count, 0),
+    max_lag_days, last_failure_at, last_completed_date, %(now)s
+FROM metrics
+ON CONFLICT (equipment_id) DO UPDATE SET
+    operating_hours = EXCLUDED.operating_hours,
+    failure_count = EXCLUDED.failure_count,
+    repair_count = EXCLUDED.repair_count,
+    repair_hours = EXCLUDED.repair_hours,
+    mtbf_hours = EXCLUDED.mtbf_hours,
+    mttr_hours = EXCLUDED.mttr_hours,
+    completion_count = EXCLUDED.completion_count,
+    interval_count = EXCLUDED.interval_count,
+    interval_drift_days = EXCLUDED.interval_drift_days,
+    mean_interval_drift_days = EXCLUDED.mean_interval_drift_days,
+    lag_count = EXCLUDED.lag_count,
+    lag_days = EXCLUDED.lag_days,
+    mean_lag_days = EXCLUDED.mean_lag_days,
+    max_lag_days = EXCLUDED.max_lag_days,
+    last_failure_at = EXCLUDED.last_failure_at,
+    last_completed_date = EXCLUDED.last_completed_date,
+    computed_at = EXCLUDED.computed_at
+"""
+
+
+def refresh_reliability_metrics(full=False):
+    """
+    Recompute EquipmentReliability rows in a single INSERT ... ON CONFLICT.
+
+    Incremental refreshes only touch equipment with maintenance history or
+    status changes recorded since the previous refresh, plus equipment that
+    has no row yet. A full refresh recomputes everything, which also rolls
+    operating hours forward and picks up edited history rows.
+    Returns the number of equipment refreshed.
+    """
+    now = timezone.now()
+    last_refresh = EquipmentReliability.objects.aggregate(last=Max('computed_at'))['last']
+    since = last_refresh - REFRESH_OVERLAP if last_refresh else now - timedelta(days=365 * 100)
+    sql = REFRESH_SQL.format(
+        equipment=Equipment._meta.db_table,
+        reliability=EquipmentReliability._meta.db_table,
+        history=MaintenanceHistory._meta.db_table,
+        task=MaintenanceTask._meta.db_table,
+        status_change=EquipmentStatusChange._meta.db_table,
+    )
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(sql, {'full': full or last_refresh is None, 'since': since, 'now': now})
+        return cursor.rowcount
+
+
+def reliability_summary(queryset=None, group_by='equipment__manufacturer'):
+    """
+    Fleet reliability re-aggregated from the precomputed table.
+
+    Means are derived from the stored sums (e.g. total operating hours over
+    total failures) so groups are weighted correctly. Returns one dict per
+    value of `group_by`; keys are prefixed (total_, avg_) to stay clear of
+    the per-equipment column names.
+    """
+    queryset = queryset if queryset is not None else EquipmentReliability.objects.all()
+
+    def ratio(numerator, denominator):
+        return Cast(Sum(numerator), FloatField()) / NullIf(Cast(Sum(denominator), FloatField()), 0.0)
+
+    return list(
+        queryset
+        .values(group=F(group_by))
+        .annotate(
+            equipment_count=Count('equipment'),
+            total_failures=Sum('failure_count'),
+            total_completions=Sum('completion_count'),
+            avg_mtbf_hours=ratio('operating_hours', 'failure_count'),
+            avg_mttr_hours=ratio('repair_hours', 'repair_count'),
+            avg_interval_drift_days=ratio('interval_drift_days', 'interval_count'),
+            avg_lag_days=ratio('lag_days', 'lag_count'),
+            worst_lag_days=Max('max_lag_days'),
+        )
+        .order_by('group')
+    )
@@ -0,0 +1,288 @@
+import hashlib
+import json
+
+import numpy as np
+import pandas as pd
+from django.core.cache import cache
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Equipment, EquipmentStatusChange, MaintenanceHistory, MaintenanceTask, OPEN_TASK_STATUSES
+from .utils import calculate_due_date
+
+
+# Weibull shape used until the fleet has enough failures to fit one (mild wear-out)
+DEFAULT_SHAPE = 1.5
+MIN_FAILURES_FOR_SHAPE = 5
+SHAPE_GRID = np.linspace(0.5, 5.0, 91)
+# Failure count assumed for equipment that never failed, so its scale stays finite
+ZERO_FAILURE_COUNT = 0.5
+MIN_AGE_DAYS = 1 / 24
+# Trial x equipment cells simulated at once, bounding memory on large fleets
+MAX_BLOCK_CELLS = 2_000_000
+CACHE_TIMEOUT = 60 * 60
+CACHE_PREFIX = 'pms-risk'
+
+
+def renewal_jobs(equipment_ids, now):
+    """
+    The job restoring each equipment to as-good-as-new: its open calendar
+    task with the longest interval, with days until due and interval in days.
+    """
+    jobs = {}
+    tasks = MaintenanceTask.objects.filter(
+        equipment_id__in=equipment_ids, status__in=OPEN_TASK_STATUSES
+    ).exclude(interval_type='running_hours').values(
+        'id', 'equipment_id', 'interval_type', 'interval_value', 'next_due_date'
+    )
+    for task in tasks:
+        interval = (calculate_due_date(now, task['interval_type'], task['interval_value']) - now).total_seconds() / 86400
+        if interval <= 0:
+            continue
+        current = jobs.get(task['equipment_id'])
+        if current is None or interval > current['interval']:
+            jobs[task['equipment_id']] = {
+                'task': task['id'],
+                'interval': interval,
+                'due_in': max((task['next_due_date'] - now).total_seconds() / 86400, 0),
+            }
+    return jobs
+
+
+def failure_intervals(equipment, jobs, now):
+    """
+    Operating intervals of each equipment, in days, ending in a failure or censored.
+
+    Intervals run between renewals (installation, completion of the renewal
+    job, return to service) and failures (switch to 'faulty'); time spent
+    under repair after a failure is left out, and so is the status logged
+    when the equipment was created. The interval still running now is
+    censored.
+    """
+    installed = pd.DataFrame.from_records(
+        [(pk, pd.Timestamp(installed).tz_localize('UTC'), 'installed') for pk, installed in equipment],
+        columns=['equipment_id', 'at', 'kind'],
+    )
+    completed = pd.DataFrame.from_records(
+        MaintenanceHistory.objects.filter(task_id__in=[job['task'] for job in jobs.values()])
+        .values_list('equipment_id', 'completed_date'),
+        columns=['equipment_id', 'at'],
+    ).assign(kind='completed')
+    changes = pd.DataFrame.from_records(
+        EquipmentStatusChange.objects.filter(
+            equipment_id__in=installed['equipment_id'].tolist(), to_status__in=['faulty', 'operational']
+        ).exclude(from_status='', to_status='operational').values_list('equipment_id', 'changed_at', 'to_status'),
+        columns=['equipment_id', 'at', 'kind'],
+    ).replace({'kind': {'faulty': 'failure', 'operational': 'restored'}})
+
+    events = pd.concat([installed] + [frame for frame in (completed, changes) if len(frame)], ignore_index=True)
+    events['at'] = pd.to_datetime(events['at'], utc=True)
+    events = events.sort_values(['equipment_id', 'at'], kind='stable', ignore_index=True)
+    grouped = events.groupby('equipment_id', sort=False)
+    events['previous_at'] = grouped['at'].shift()
+    events['previous_kind'] = grouped['kind'].shift()
+
+    closed = events[events['previous_at'].notna() & events['previous_kind'].ne('failure')]
+    intervals = pd.DataFrame({
+        'equipment_id': closed['equipment_id'],
+        'days': (closed['at'] - closed['previous_at']) / pd.Timedelta(days=1),
+        'failed': closed['kind'].eq('failure'),
+    })
+    last = grouped.tail(1)
+    running = pd.DataFrame({
+        'equipment_id': last['equipment_id'],
+        'days': (pd.Timestamp(now) - last['at']) / pd.Timedelta(days=1),
+        'failed': False,
+    })
+    intervals = pd.concat([intervals, running], ignore_index=True)
+    intervals['days'] = intervals['days'].clip(lower=MIN_AGE_DAYS)
+    return intervals, running.set_index('equipment_id')['days'].clip(lower=0)
+
+
+def fit_shape(codes, days, failed, count):
+    """
+    Fleet-wide Weibull shape by profile likelihood over SHAPE_GRID.
+
+    Each equipment keeps its own scale (profiled out in closed form), so the
+    shape pools evidence from every failure in the fleet.
+    """
+    failures = np.bincount(codes, weights=failed, minlength=count)
+    if failures.sum() < MIN_FAILURES_FOR_SHAPE:
+        return DEFAULT_SHAPE
+    has_failures = failures > 0
+    log_failure_days = np.bincount(codes, weights=np.log(days) * failed, minlength=count)
+    likelihood = []
+    for shape in SHAPE_GRID:
+        exposure = np.bincount(codes, weights=days ** shape, minlength=count)
+        likelihood.append(np.sum(
+            failures * np.log(shape)
+            - failures * np.log(np.where(has_failures, exposure / np.maximum(failures, 1), 1))
+            + (shape - 1) * log_failure_days
+            - failures
+        ))
+    return float(SHAPE_GRID[int(np.argmax(likelihood))])
+
+
+def fit_failure_models(equipment, now=None):
+    """
+    Per-equipment Weibull failure model fitted from maintenance and status history.
+
+    Returns a frame indexed by equipment id with the fitted shape and scale
+    (days), the current age since the last renewal, the failure count and
+    the renewal job schedule (days until due and interval, infinite when the
+    equipment has no calendar job).
+    """
+    now = now or timezone.now()
+    equipment = list(equipment.values_list('id', 'installation_date'))
+    ids = [pk for pk, _ in equipment]
+    jobs = renewal_jobs(ids, now)
+    intervals, age = failure_intervals(equipment, jobs, now)
+
+    codes = pd.Categorical(intervals['equipment_id'], categories=ids).codes
+    days = intervals['days'].to_numpy(dtype=float)
+    failed = intervals['failed'].to_numpy(dtype=float)
+    shape = fit_shape(codes, days, failed, len(ids))
+    failures = np.bincount(codes, weights=failed, minlength=len(ids))
+    exposure = np.bincount(codes, weights=days ** shape, minlength=len(ids))
+
+    models = pd.DataFrame({
+        'shape': shape,
+        'scale': (exposure / np.maximum(failures, ZERO_FAILURE_COUNT)) ** (1 / shape),
+        'failures': failures.astype(int),
+        'age': age.reindex(ids).to_numpy(),
+        'due_in': [jobs[pk]['due_in'] if pk in jobs else np.inf for pk in ids],
+        'interval': [jobs[pk]['interval'] if pk in jobs else np.inf for pk in ids],
+    }, index=pd.Index(ids, name='equipment_id'))
+    return models
+
+
+def simulate_first_failures(models, defer_days, horizon_days, trials, rng):
+    """
+    Day of the first failure of each equipment in each trial (inf when none).
+
+    All trials of all equipment advance together: every pass samples the time
+    to failure of the still running cells from their conditional Weibull
+    distribution, then either records the failure or renews the equipment at
+    its (deferred) job and carries on until the horizon.
+    """
+    count = len(models)
+    shape = np.tile(models['shape'].to_numpy(dtype=float), trials)
+    scale = np.tile(models['scale'].to_numpy(dtype=float), trials)
+    interval = np.tile(models['interval'].to_numpy(dtype=float), trials)
+    age = np.tile(models['age'].to_numpy(dtype=float), trials)
+    renewal = np.tile(models['due_in'].to_numpy(dtype=float) + defer_days, trials)
+    clock = np.zeros(count * trials)
+    first = np.full(count * trials, np.inf)
+
+    cells = np.arange(count * trials)
+    while cells.size:
+        k, lam, current_age = shape[cells], scale[cells], age[cells]
+        # Inverse CDF of the remaining life given survival to current_age
+        remaining = lam * ((current_age / lam) ** k - np.log1p(-rng.random(cells.size))) ** (1 / k) - current_age
+        failure_at = clock[cells] + remaining
+        failed = failure_at < np.minimum(renewal[cells], horizon_days)
+        first[cells[failed]] = failure_at[failed]
+
+        cells = cells[~failed & (renewal[cells] < horizon_days)]
+        clock[cells] = renewal[cells]
+        age[cells] = 0
+        renewal[cells] += interval[cells]
+    return first.reshape(trials, count)
+
+
+def deferral_risk_curves(models, defer_weeks, horizon_weeks, trials, seed):
+    """
+    Weekly cumulative failure probabilities for one deferral scenario.
+
+    Trials are simulated in blocks of at most MAX_BLOCK_CELLS cells and
+    reduced to per-week failure counts as they go. Every scenario reuses the
+    same seed, so differences between scenarios come from the deferral and
+    not from sampling noise.
+    """
+    count = len(models)
+    if not count:
+        return np.zeros((0, horizon_weeks)), np.zeros(horizon_weeks)
+    rng = np.random.default_rng(seed)
+    block = max(MAX_BLOCK_CELLS // max(count, 1), 1)
+    weekly = np.zeros((count, horizon_weeks + 1))
+    fleet = np.zeros(horizon_weeks + 1)
+    done = 0
+    while done < trials:
+        size = min(block, trials - done)
+        first = simulate_first_failures(models, defer_weeks * 7, horizon_weeks * 7, size, rng)
+        # Week index of the failure, the extra bucket collecting trials without one
+        weeks = np.minimum(np.floor(first / 7), horizon_weeks).astype(int)
+        np.add.at(weekly, (np.tile(np.arange(count), size), weeks.ravel()), 1)
+        fleet += np.bincount(weeks.min(axis=1), minlength=horizon_weeks + 1)
+        done += size
+    return (
+        np.cumsum(weekly[:, :horizon_weeks], axis=1) / trials,
+        np.cumsum(fleet[:horizon_weeks]) / trials,
+    )
+
+
+def risk_cache_key(equipment_ids, scenario, now):
+    """Cache key of a scenario, bound to the day and to the data it was fitted on"""
+    data_version = {
+        'day': timezone.localdate(now),
+        'history': MaintenanceHistory.objects.aggregate(last=Max('id'))['last'],
+        'status': EquipmentStatusChange.objects.aggregate(last=Max('id'))['last'],
+        'tasks': MaintenanceTask.objects.filter(equipment_id__in=equipment_ids)
+        .aggregate(last=Max('updated_at'))['last'],
+    }
+    payload = json.dumps(
+        {'equipment': sorted(equipment_ids), 'scenario': scenario, 'data': data_version},
+        sort_keys=True, default=str,
+    )
+    return f'{CACHE_PREFIX}:{hashlib.sha256(payload.encode()).hexdigest()}'
+
+
+def simulate_deferral_risk(equipment=None, defer_weeks=(0, 2, 4, 8), horizon_weeks=26, trials=2000, seed=0):
+    """
+    Monte Carlo failure risk of deferring PMS jobs by each of `defer_weeks`.
+
+    Failure models are fitted for the operational equipment in `equipment`
+    (see fit_failure_models), then each scenario returns the probability
+    that each equipment, and any of them, fails by the end of every week of
+    the horizon. Results are cached per scenario hash.
+    """
+    now = timezone.now()
+    equipment = equipment if equipment is not None else Equipment.objects.all()
+    equipment = equipment.filter(status__in=['operational', 'maintenance']).order_by('id')
+    ids = list(equipment.values_list('id', flat=True))
+    scenario = {
+        'defer_weeks': sorted(set(defer_weeks)), 'horizon_weeks': horizon_weeks, 'trials': trials, 'seed': seed,
+    }
+    key = risk_cache_key(ids, scenario, now)
+    result = cache.get(key)
+    if result is not None:
+        return result
+
+    models = fit_failure_models(equipment, now)
+    names = dict(equipment.values_list('id', 'name'))
+    result = {
+        **scenario,
+        'shape': float(models['shape'].iloc[0]) if len(models) else DEFAULT_SHAPE,
+        'equipment_count': len(models),
+        'scenarios': [],
+    }
+    for weeks in scenario['defer_weeks']:
+        curves, fleet = deferral_risk_curves(models, weeks, horizon_weeks, trials, seed)
+        result['scenarios'].append({
+            'defer_weeks': weeks,
+            'fleet_failure_probability': np.round(fleet, 4).tolist(),
+            'expected_failures': round(float(curves[:, -1].sum()), 4),
+            'equipment': [
+                {
+                    'equipment': pk,
+                    'name': names[pk],
+                    'failures': int(model.failures),
+                    'scale_days': round(float(model.scale), 1),
+                    'age_days': round(float(model.age), 1),
+                    'failure_probability': np.round(curve, 4).tolist(),
+                }
+                for pk, model, curve in zip(models.index, models.itertuples(index=False), curves)
+            ],
+        })
+    cache.set(key, result, CACHE_TIMEOUT)
+    return result
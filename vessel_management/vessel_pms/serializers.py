@@ -1,29 +1,67 @@
 from rest_framework import serializers
-from .models import Equipment, MaintenanceTask, MaintenanceHistory
+from .models import (
+    Equipment, MaintenanceTask, MaintenanceHistory, JobTemplate, EquipmentReliability, SparePart,
+    JobTemplatePart, StockLevel, StockMovement, PartForecast, MonitoringParameter, EquipmentReading,
+    ConditionAlert, VesselKpiSnapshot
+)
+from django.db import transaction
 from django.utils import timezone
+from .parts import record_part_consumption, rewrite_part_consumption
+from .utils import normalize_part_name, normalize_sfi_code
 
 class EquipmentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Equipment
         fields = '__all__'
         read_only_fields = ['id', 'created_at', 'updated_at']
+    
+    def validate_sfi_code(self, value):
+        try:
+            return normalize_sfi_code(value)
+        except ValueError:
+            raise serializers.ValidationError("SFI code segments have at most 3 digits")
 
 
-class MaintenanceTaskSerializer(serializers.ModelSerializer):
+class MaintenanceTaskDueInfoMixin(serializers.Serializer):
+    """
+    Equipment/vessel names, days until due and overdue flag, read from the
+    SQL annotations of MaintenanceTask.objects.with_due_info() when present
+    """
+    equipment_name = serializers.SerializerMethodField()
+    vessel_name = serializers.SerializerMethodField()
     days_until_due = serializers.SerializerMethodField()
-    equipment_name = serializers.CharField(source='equipment.name', read_only=True)
     is_overdue = serializers.SerializerMethodField()
     
-    class Meta:
-        model = MaintenanceTask
-        fields = '__all__'
-        read_only_fields = ['id', 'created_at', 'updated_at', 'days_until_due', 'equipment_name', 'is_overdue']
+    def get_equipment_name(self, obj):
+        if hasattr(obj, 'equipment_name'):
+            return obj.equipment_name
+        return obj.equipment.name
+    
+    def get_vessel_name(self, obj):
+        if hasattr(obj, 'vessel_name'):
+            return obj.vessel_name
+        return obj.equipment.vessel.name
     
     def get_days_until_due(self, obj):
+        if hasattr(obj, 'due_in_days'):
+            return obj.due_in_days
         return obj.days_until_due()
     
     def get_is_overdue(self, obj):
+        if hasattr(obj, 'overdue'):
+            return obj.overdue
         return obj.is_overdue()
+
+
+class MaintenanceTaskSerializer(MaintenanceTaskDueInfoMixin, serializers.ModelSerializer):
+    effective_description = serializers.CharField(read_only=True)
+    effective_instructions = serializers.CharField(read_only=True)
+    
+    class Meta:
+        model = MaintenanceTask
+        fields = '__all__'
+        read_only_fields = ['id', 'created_at', 'updated_at', 'days_until_due', 'equipment_name', 'vessel_name',
+                            'is_overdue', 'effective_description', 'effective_instructions']
     
     def validate(self, data):
         """
@@ -35,6 +73,11 @@ class MaintenanceTaskSerializer(serializers.ModelSerializer):
         if 'interval_type' in data and data['interval_type'] == 'running_hours' and data.get('interval_value', 0) <= 0:
             raise serializers.ValidationError("Running hours interval must be greater than zero")
         
+        template = data.get('template', getattr(self.instance, 'template', None))
+        for field in ('description', 'instructions'):
+            if not template and not data.get(field, getattr(self.instance, field, '')):
+                raise serializers.ValidationError({field: "This field is required for tasks without a job template"})
+        
         return data
 
 
@@ -53,8 +96,13 @@ class MaintenanceHistorySerializer(serializers.ModelSerializer):
         if 'task' in validated_data and 'equipment' not in validated_data:
             validated_data['equipment'] = validated_data['task'].equipment
         
+        # Keep the planned date for planned-versus-actual analytics
+        if 'task' in validated_data:
+            validated_data.setdefault('due_date', validated_data['task'].next_due_date)
+        
         # Create the history record
         history = MaintenanceHistory.objects.create(**validated_data)
+        record_part_consumption([history])
         
         # Update the related task's last_completed_date and next_due_date
         task = history.task
@@ -64,17 +112,188 @@ class MaintenanceHistorySerializer(serializers.ModelSerializer):
         task.save()
         
         return history
+    
+    def update(self, instance, validated_data):
+        # Consumption lines follow the parts, date and equipment of the entry
+        with transaction.atomic():
+            history = super().update(instance, validated_data)
+            if validated_data.keys() & {'parts_used', 'completed_date', 'equipment'}:
+                request = self.context.get('request')
+                rewrite_part_consumption(history, user=getattr(request, 'user', None))
+        return history
 
 
-class MaintenanceTaskListSerializer(serializers.ModelSerializer):
-    """Lightweight serializer for list views"""
+class JobTemplatePartSerializer(serializers.ModelSerializer):
+    part_name = serializers.CharField(source='part.name', read_only=True)
+    
+    class Meta:
+        model = JobTemplatePart
+        fields = ['id', 'part', 'part_name', 'quantity']
+
+
+class JobTemplateSerializer(serializers.ModelSerializer):
+    task_count = serializers.IntegerField(read_only=True)
+    parts = JobTemplatePartSerializer(many=True, read_only=True)
+    
+    class Meta:
+        model = JobTemplate
+        fields = '__all__'
+        read_only_fields = ['id', 'created_at', 'updated_at', 'task_count']
+    
+    def validate(self, data):
+        model = data.get('equipment_model', getattr(self.instance, 'equipment_model', ''))
+        manufacturer = data.get('manufacturer', getattr(self.instance, 'manufacturer', ''))
+        if not model and not manufacturer:
+            raise serializers.ValidationError("An equipment model or manufacturer is required")
+        return data
+
+
+class EquipmentReliabilitySerializer(serializers.ModelSerializer):
     equipment_name = serializers.CharField(source='equipment.name', read_only=True)
-    days_until_due = serializers.SerializerMethodField()
+    manufacturer = serializers.CharField(source='equipment.manufacturer', read_only=True)
+    vessel = serializers.IntegerField(source='equipment.vessel_id', read_only=True)
+    
+    class Meta:
+        model = EquipmentReliability
+        fields = '__all__'
+
+
+class SparePartSerializer(serializers.ModelSerializer):
+    code = serializers.SlugField(required=False, allow_unicode=True)
+    
+    class Meta:
+        model = SparePart
+        fields = '__all__'
+        read_only_fields = ['id', 'created_at', 'updated_at']
+    
+    def validate(self, data):
+        if not data.get('code') and 'name' in data:
+            data['code'] = normalize_part_name(data['name'])
+        return data
+
+
+class MaintenanceTaskListSerializer(MaintenanceTaskDueInfoMixin, serializers.ModelSerializer):
+    """Lightweight serializer for list views"""
+    vessel_id = serializers.SerializerMethodField()
     
     class Meta:
         model = MaintenanceTask
-        fields = ['id', 'task_name', 'equipment_id', 'equipment_name', 'next_due_date', 
-                  'status', 'days_until_due', 'responsible_role']
+        fields = ['id', 'task_name', 'equipment_id', 'equipment_name', 'vessel_id', 'vessel_name', 'next_due_date', 
+                  'status', 'days_until_due', 'is_overdue', 'responsible_role']
     
-    def get_days_until_due(self, obj):
-        return obj.days_until_due()
\ No newline at end of file
+    def get_vessel_id(self, obj):
+        if hasattr(obj, 'vessel_id'):
+            return obj.vessel_id
+        return obj.equipment.vessel_id
+
+class MaintenanceCompletionSerializer(serializers.Serializer):
+    """Validates a single item of a bulk task completion upload"""
+    task = serializers.IntegerField()
+    completed_date = serializers.DateTimeField(required=False)
+    remarks = serializers.CharField(required=False, allow_blank=True, default='')
+    running_hours = serializers.IntegerField(required=False, allow_null=True, min_value=0)
+    parts_used = serializers.CharField(required=False, allow_blank=True, default='')
+    duration = serializers.IntegerField(required=False, allow_null=True, min_value=0)
+    
+    def validate_completed_date(self, value):
+        if value > timezone.now():
+            raise serializers.ValidationError("Completion date cannot be in the future")
+        return value
+
+
+class WorkloadPlanSerializer(serializers.Serializer):
+    """Parameters of a workload planning run"""
+    vessel = serializers.IntegerField(required=False)
+    start = serializers.DateField(required=False)
+    weeks = serializers.IntegerField(required=False, default=52, min_value=1, max_value=104)
+    window_weeks = serializers.IntegerField(required=False, default=2, min_value=0, max_value=12)
+    capacity = serializers.DictField(child=serializers.FloatField(min_value=0), required=False, default=dict)
+    default_capacity = serializers.FloatField(required=False, min_value=0)
+
+
+class DeferralRiskSerializer(serializers.Serializer):
+    """Parameters of a deferral risk simulation"""
+    vessel = serializers.IntegerField(required=False)
+    equipment = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    defer_weeks = serializers.ListField(
+        child=serializers.IntegerField(min_value=0, max_value=52), required=False, default=[0, 2, 4, 8],
+        allow_empty=False, max_length=12
+    )
+    horizon_weeks = serializers.IntegerField(required=False, default=26, min_value=1, max_value=104)
+    trials = serializers.IntegerField(required=False, default=2000, min_value=100, max_value=20000)
+    seed = serializers.IntegerField(required=False, default=0, min_value=0)
+
+
+class StockLevelSerializer(serializers.ModelSerializer):
+    part_name = serializers.CharField(source='part.name', read_only=True)
+    
+    class Meta:
+        model = StockLevel
+        fields = '__all__'
+
+
+class StockMovementSerializer(serializers.ModelSerializer):
+    part_name = serializers.CharField(source='part.name', read_only=True)
+    
+    class Meta:
+        model = StockMovement
+        fields = '__all__'
+        read_only_fields = ['id', 'consumption', 'created_by', 'created_at', 'part_name']
+    
+    def validate(self, data):
+        if data['quantity'] == 0:
+            raise serializers.ValidationError("Quantity cannot be zero")
+        if data['movement_type'] == 'receipt' and data['quantity'] < 0:
+            raise serializers.ValidationError("Receipts must have a positive quantity")
+        if data['movement_type'] == 'consumption' and data['quantity'] > 0:
+            raise serializers.ValidationError("Consumption must have a negative quantity")
+        return data
+
+
+class PartForecastSerializer(serializers.ModelSerializer):
+    part_name = serializers.CharField(source='part.name', read_only=True)
+    vessel_name = serializers.CharField(source='vessel.name', read_only=True)
+    
+    class Meta:
+        model = PartForecast
+        fields = '__all__'
+
+
+class MonitoringParameterSerializer(serializers.ModelSerializer):
+    equipment_name = serializers.CharField(source='equipment.name', read_only=True)
+    
+    class Meta:
+        model = MonitoringParameter
+        fields = '__all__'
+        read_only_fields = ['id', 'last_evaluated_at', 'last_evaluated_reading_id', 'equipment_name']
+    
+    def validate(self, data):
+        warning = data.get('warning_limit', getattr(self.instance, 'warning_limit', None))
+        alarm = data.get('alarm_limit', getattr(self.instance, 'alarm_limit', None))
+        if warning is not None and alarm is not None and warning > alarm:
+            raise serializers.ValidationError("Warning limit cannot be above the alarm limit")
+        return data
+
+
+class EquipmentReadingSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = EquipmentReading
+        fields = ['recorded_at', 'value']
+
+
+class ConditionAlertSerializer(serializers.ModelSerializer):
+    parameter_name = serializers.CharField(source='parameter.name', read_only=True)
+    equipment = serializers.IntegerField(source='parameter.equipment_id', read_only=True)
+    
+    class Meta:
+        model = ConditionAlert
+        fields = '__all__'
+
+
+class VesselKpiSnapshotSerializer(serializers.ModelSerializer):
+    vessel_name = serializers.CharField(source='vessel.name', read_only=True)
+    schedule_compliance = serializers.FloatField(read_only=True)
+    
+    class Meta:
+        model = VesselKpiSnapshot
+        fields = '__all__'
@@ -0,0 +1,192 @@
+from django.db import transaction
+from django.utils import timezone
+from .models import MaintenanceTask, MaintenanceHistory, OPEN_TASK_STATUSES
+from .serializers import MaintenanceCompletionSerializer
+from .parts import record_part_consumption
+
+
+def bulk_complete_tasks(completions, user):
+    """
+    Complete many maintenance tasks in one transaction.
+
+    Every item is validated on its own; invalid items are reported back by
+    index and skipped. Valid items are written with a single bulk_create for
+    the history rows and a single bulk_update for the tasks, so no post_save
+    signal fires per row.
+    """
+    errors = []
+    valid = []
+    for index, item in enumerate(completions):
+        serializer = MaintenanceCompletionSerializer(data=item)
+        if serializer.is_valid():
+            valid.append((index, serializer.validated_data))
+        else:
+            errors.append({'index': index, 'errors': serializer.errors})
+
+    # Resolve all referenced tasks with one query
+    tasks = MaintenanceTask.objects.in_bulk({data['task'] for _, data in valid})
+
+    entries = []
+    for index, data in valid:
+        task = tasks.get(data['task'])
+        if task is None:
+            errors.append({'index': index, 'errors': {'task': ['Maintenance task not found.']}})
+            continue
+        if task.status == 'cancelled':
+            errors.append({'index': index, 'errors': {'task': ['Cancelled tasks cannot be completed.']}})
+            continue
+        entries.append((index, task, data))
+
+    if not entries:
+        return {'completed': 0, 'results': [], 'errors': sorted(errors, key=lambda e: e['index'])}
+
+    now = timezone.now()
+    history_rows = [
+        MaintenanceHistory(
+            task=task,
+            equipment_id=task.equipment_id,
+            completed_date=data.get('completed_date') or now,
+            due_date=task.next_due_date,
+            completed_by=user,
+            remarks=data.get('remarks', ''),
+            running_hours=data.get('running_hours'),
+            parts_used=data.get('parts_used', ''),
+            duration=data.get('duration'),
+        )
+        for _, task, data in entries
+    ]
+
+    # Recompute next due dates in one pass, keeping the latest completion per task
+    touched = {}
+    for history in history_rows:
+        task = history.task
+        if task.last_completed_date is None or history.completed_date >= task.last_completed_date:
+            task.last_completed_date = history.completed_date
+        touched[task.pk] = task
+    for task in touched.values():
+        task.next_due_date = task.calculate_next_due_date()
+        # Mirror the update_task_status signal, which bulk_update does not trigger
+        task.status = 'overdue' if task.next_due_date < now else 'scheduled'
+        task.updated_at = now
+
+    with transaction.atomic():
+        MaintenanceHistory.objects.bulk_create(history_rows)
+        record_part_consumption(history_rows)
+        MaintenanceTask.objects.bulk_update(
+            touched.values(),
+            ['last_completed_date', 'next_due_date', 'status', 'updated_at']
+        )
+
+    results = [
+        {
+            'index': index,
+            'task': task.pk,
+            'history': history.pk,
+            'next_due_date': task.next_due_date,
+            'status': task.status,
+        }
+        for (index, task, _), history in zip(entries, history_rows)
+    ]
+    return {
+        'completed': len(results),
+        'results': results,
+        'errors': sorted(errors, key=lambda e: e['index']),
+    }
+
+
+def apply_job_template(template, vessel_ids=None, chunk_size=500):
+    """
+    Instantiate a job template on every matching equipment of the fleet.
+
+    Equipment that already has a task from the template is skipped. Existing
+    tasks carrying the template's job code are linked to it instead of being
+    duplicated, and text identical to the template is cleared so it is only
+    stored once. Job codes are unique per equipment but not per template, so
+    equipment whose task with the job code belongs to another template is
+    left alone and reported under `conflicts`. New tasks are written with a
+    single chunked bulk_create and keep blank description/instructions,
+    resolved from the template on read. Returns created/linked/skipped
+    counts and the conflicting equipment ids.
+    """
+    equipment = template.matching_equipment()
+    if vessel_ids:
+        equipment = equipment.filter(vessel_id__in=vessel_ids)
+    equipment_ids = set(equipment.values_list('id', flat=True))
+
+    already = set(
+        MaintenanceTask.objects.filter(template=template, equipment_id__in=equipment_ids)
+        .values_list('equipment_id', flat=True)
+    )
+    linked = 0
+    conflicts = set()
+    with transaction.atomic():
+        if template.job_code:
+            matches = MaintenanceTask.objects.filter(
+                equipment_id__in=equipment_ids - already,
+                job_code=template.job_code,
+                template__isnull=True,
+            )
+            linked_ids = set(matches.values_list('equipment_id', flat=True))
+            linked = matches.update(template=template)
+            MaintenanceTask.objects.filter(
+                template=template, description=template.description
+            ).update(description='')
+            MaintenanceTask.objects.filter(
+                template=template, instructions=template.instructions
+            ).update(instructions='')
+            already |= linked_ids
+            conflicts = set(
+                MaintenanceTask.objects.filter(equipment_id__in=equipment_ids - already, job_code=template.job_code)
+                .values_list('equipment_id', flat=True)
+            )
+
+        now = timezone.now()
+        first_due = MaintenanceTask(
+            interval_type=template.interval_type,
+            interval_value=template.interval_value,
+            last_completed_date=now,
+            next_due_date=now,
+        ).calculate_next_due_date()
+        tasks = MaintenanceTask.objects.bulk_create(
+            [
+                MaintenanceTask(
+                    equipment_id=equipment_id,
+                    template=template,
+                    task_name=template.name,
+                    job_code=template.job_code,
+                    interval_type=template.interval_type,
+                    interval_value=template.interval_value,
+                    next_due_date=first_due,
+                    responsible_role=template.responsible_role,
+                )
+                for equipment_id in sorted(equipment_ids - already - conflicts)
+            ],
+            batch_size=chunk_size,
+        )
+
+    return {
+        'created': len(tasks),
+        'linked': linked,
+        'skipped': len(already) - linked,
+        'conflicts': sorted(conflicts),
+    }
+
+
+def sync_template_tasks(template):
+    """
+    Propagate a template edit to its open tasks with one UPDATE.
+
+    Description and instructions are read through the template and need no
+    rewrite; only the schedule and naming fields copied on each task are
+    updated. Next due dates pick up a new interval at the next completion.
+    """
+    return MaintenanceTask.objects.filter(
+        template=template,
+        status__in=OPEN_TASK_STATUSES,
+    ).update(
+        task_name=template.name,
+        interval_type=template.interval_type,
+        interval_value=template.interval_value,
+        responsible_role=template.responsible_role,
+        updated_at=timezone.now(),
+    )
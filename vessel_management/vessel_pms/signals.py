@@ -1,6 +1,7 @@
 from django.db.models.signals import post_save
 from django.dispatch import receiver
-from .models import MaintenanceTask
+from .models import MaintenanceTask, JobTemplate
+from .services import sync_template_tasks
 from django.utils import timezone
 
 
@@ -17,4 +18,15 @@ def update_task_status(sender, instance, created, **kwargs):
     if instance.next_due_date < timezone.now() and instance.status not in ['completed', 'cancelled', 'overdue']:
         instance.status = 'overdue'
         # Use update to avoid triggering this signal again
-        MaintenanceTask.objects.filter(pk=instance.pk).update(status='overdue')
\ No newline at end of file
+        MaintenanceTask.objects.filter(pk=instance.pk).update(status='overdue')
+
+
+@receiver(post_save, sender=JobTemplate)
+def propagate_template_changes(sender, instance, created, **kwargs):
+    """
+    Signal to push job template edits to the tasks instantiated from it
+    """
+    if created:
+        return
+    
+    sync_template_tasks(instance)
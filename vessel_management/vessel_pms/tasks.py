@@ -1,5 +1,14 @@
+from celery import shared_task
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils.dateparse import parse_date
 from django.utils import timezone
 from .models import MaintenanceTask
+from .reliability import refresh_reliability_metrics
+from .inventory import forecast_part_demand
+from .monitoring import evaluate_readings
+from .kpis import refresh_kpi_snapshots
+from .job_cards import generate_job_card_pack
 
 
 def update_overdue_tasks():
@@ -47,4 +56,56 @@ def generate_recurring_tasks():
         completed_task.save(update_fields=['status', 'next_due_date'])
         created_count += 1
     
-    return created_count
\ No newline at end of file
+    return created_count
+
+
+@shared_task
+def refresh_reliability(full=False):
+    """
+    Refresh the precomputed reliability metrics
+    Runs incrementally every hour and in full nightly (see config/celery.py)
+    """
+    return refresh_reliability_metrics(full=full)
+
+
+
+@shared_task
+def forecast_parts_demand():
+    """
+    Recompute part reorder points from the PMS schedule and consumption history
+    Should be run daily via a scheduler (e.g., Celery)
+    """
+    return forecast_part_demand()
+
+
+
+@shared_task
+def evaluate_condition_monitoring():
+    """
+    Evaluate new condition-monitoring readings against limits and rolling statistics
+    Should be run every few minutes via a scheduler (e.g., Celery)
+    """
+    return evaluate_readings()
+
+
+
+@shared_task
+def refresh_pms_kpis():
+    """
+    Refresh the current week's PMS KPI snapshot of every vessel
+    Should be run daily, late in the day, via a scheduler (e.g., Celery)
+    """
+    return refresh_kpi_snapshots()
+
+
+
+@shared_task
+def generate_job_cards(vessel_id, file_name, start=None, end=None, include_overdue=True):
+    """
+    Render the job-card pack of a vessel and store it under job_cards/
+    Dates are ISO strings; returns the stored file name
+    """
+    pdf = generate_job_card_pack(
+        vessel_id, parse_date(start) if start else None, parse_date(end) if end else None, include_overdue
+    )
+    return default_storage.save(f'job_cards/{file_name}', ContentFile(pdf))
@@ -0,0 +1,1387 @@
+import re
+import warnings
+from unittest import mock
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from core.models import Vessel
+from .models import (
+    Equipment, MaintenanceTask, MaintenanceHistory, JobTemplate, EquipmentReliability, EquipmentStatusChange,
+    SparePart, PartConsumption, PartConsumptionRollup, JobTemplatePart, StockLevel, StockMovement, PartForecast,
+    MonitoringParameter, EquipmentReading, ConditionAlert, VesselKpiSnapshot, MaintenanceHistoryArchive
+)
+from .hierarchy import import_equipment_tree, subtree_rollup
+from .importers import MALFORMED_SFI_CODE, RemorqueurImporter, parse_periodicity
+from .services import apply_job_template
+from .reliability import refresh_reliability_metrics, reliability_summary
+from .planner import WorkloadPlanner
+from .parts import backfill_part_consumption
+from .inventory import forecast_part_demand, record_stock_movements
+from .monitoring import evaluate_readings, load_readings
+from .risk import DEFAULT_SHAPE, fit_failure_models, simulate_deferral_risk
+from .kpis import refresh_kpi_snapshots, week_start, weekly_kpis
+from .job_cards import HISTORY_ENTRIES, generate_job_card_pack, job_card_tasks
+from .archive import archive_history, archived_history, batch_rows
+from .utils import normalize_sfi_code, sfi_ancestors, parse_parts_used
+
+
+User = get_user_model()
+
+
+class PMSTestDataMixin:
+    """Shared fixtures for vessel_pms tests"""
+
+    @classmethod
+    def create_vessel(cls, name='Bab Almarsa', imo_number='9000001'):
+        return Vessel.objects.create(
+            name=name,
+            imo_number=imo_number,
+            vessel_type='Tug',
+            flag='Morocco',
+            build_year=2015,
+            length_overall=32,
+            beam=11,
+            draft=5,
+            gross_tonnage=450
+        )
+
+    @classmethod
+    def create_equipment(cls, vessel, serial_number='ME-001', **kwargs):
+        defaults = {
+            'name': 'Main Engine',
+            'model': 'CAT 3516',
+            'manufacturer': 'Caterpillar',
+            'installation_date': date(2015, 1, 1),
+            'location': 'Engine Room',
+        }
+        defaults.update(kwargs)
+        return Equipment.objects.create(vessel=vessel, serial_number=serial_number, **defaults)
+
+    @classmethod
+    def create_task(cls, equipment, **kwargs):
+        defaults = {
+            'task_name': 'Oil change',
+            'description': 'Change lube oil',
+            'interval_type': 'monthly',
+            'interval_value': 1,
+            'next_due_date': timezone.now() + timedelta(days=3),
+            'responsible_role': 'Chief Engineer',
+            'instructions': 'Drain and refill',
+        }
+        defaults.update(kwargs)
+        return MaintenanceTask.objects.create(equipment=equipment, **defaults)
+
+
+class BulkCompleteTaskAPITests(PMSTestDataMixin, APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='engineer',
+            email='engineer@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.vessel = self.create_vessel()
+        self.equipment = self.create_equipment(self.vessel)
+        self.task = self.create_task(self.equipment)
+        self.other_task = self.create_task(self.equipment, task_name='Filter change', interval_type='weekly')
+        self.url = reverse('maintenancetask-bulk-complete')
+
+    def test_bulk_complete_creates_history_and_reschedules(self):
+        completed = timezone.now() - timedelta(days=1)
+        payload = [
+            {'task': self.task.id, 'completed_date': completed.isoformat(), 'duration': 90},
+            {'task': self.other_task.id, 'parts_used': 'Fuel filter x2'},
+        ]
+
+        response = self.client.post(self.url, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['completed'], 2)
+        self.assertEqual(response.data['errors'], [])
+        self.assertEqual(MaintenanceHistory.objects.count(), 2)
+
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.last_completed_date, completed)
+        self.assertEqual(self.task.next_due_date, self.task.calculate_next_due_date())
+        self.assertEqual(self.task.status, 'scheduled')
+
+    def test_bulk_complete_reports_errors_per_item(self):
+        payload = [
+            {'task': self.task.id},
+            {'task': 999999},
+            {'duration': 10},
+        ]
+
+        response = self.client.post(self.url, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['completed'], 1)
+        self.assertEqual([error['index'] for error in response.data['errors']], [1, 2])
+        self.assertEqual(MaintenanceHistory.objects.count(), 1)
+
+    def test_bulk_complete_keeps_latest_completion_per_task(self):
+        latest = timezone.now() - timedelta(hours=2)
+        payload = [
+            {'task': self.task.id, 'completed_date': latest.isoformat()},
+            {'task': self.task.id, 'completed_date': (latest - timedelta(days=10)).isoformat()},
+        ]
+
+        response = self.client.post(self.url, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.last_completed_date, latest)
+        self.assertEqual(self.task.history.count(), 2)
+
+    def test_bulk_complete_rejects_all_invalid_batch(self):
+        response = self.client.post(self.url, [{'task': 999999}], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(MaintenanceHistory.objects.count(), 0)
+
+
+class QueryPlanTests(PMSTestDataMixin, TestCase):
+    """
+    Regression check for the PMS hot queries: each one must be served by an
+    index on a seeded dataset instead of falling back to a sequential scan.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.vessels = [cls.create_vessel(f'Tug {i}', f'90000{i:02d}') for i in range(5)]
+        Equipment.objects.bulk_create([
+            Equipment(
+                vessel=vessel,
+                name=f'Equipment {n}',
+                model='Model',
+                serial_number=f'SN-{vessel.pk}-{n}',
+                manufacturer='Maker',
+                installation_date=date(2015, 1, 1),
+                location='Engine Room',
+            )
+            for vessel in cls.vessels for n in range(400)
+        ])
+        equipment = list(Equipment.objects.all())
+        cls.equipment = equipment[0]
+
+        now = timezone.now()
+        statuses = ['completed'] * 6 + ['cancelled', 'scheduled', 'in_progress', 'overdue']
+        tasks = MaintenanceTask.objects.bulk_create([
+            MaintenanceTask(
+                equipment=equipment[n % len(equipment)],
+                task_name=f'Task {n}',
+                description='Routine',
+                interval_type='monthly',
+                interval_value=1,
+                next_due_date=now + timedelta(days=(n % 730) - 365),
+                status=statuses[n % len(statuses)],
+                responsible_role='Chief Engineer',
+                instructions='Follow manual',
+            )
+            for n in range(20000)
+        ])
+        cls.task = tasks[0]
+        MaintenanceHistory.objects.bulk_create([
+            MaintenanceHistory(
+                task=task,
+                equipment_id=task.equipment_id,
+                completed_date=now - timedelta(days=n % 1825),
+            )
+            for n, task in enumerate(tasks)
+        ])
+
+        with connection.cursor() as cursor:
+            for model in (Equipment, MaintenanceTask, MaintenanceHistory):
+                cursor.execute(f'ANALYZE {model._meta.db_table}')
+
+    def assertNoSeqScan(self, queryset):
+        plan = queryset.explain()
+        for model in (Equipment, MaintenanceTask, MaintenanceHistory):
+            self.assertNotIn(f'Seq Scan on {model._meta.db_table}', plan, plan)
+
+    def test_task_queries_use_indexes(self):
+        now = timezone.now()
+        self.assertNoSeqScan(MaintenanceTask.objects.overdue())
+        self.assertNoSeqScan(MaintenanceTask.objects.due_soon())
+        self.assertNoSeqScan(MaintenanceTask.objects.filter(
+            next_due_date__lte=now + timedelta(days=7),
+            status__in=['scheduled', 'overdue']
+        ))
+        self.assertNoSeqScan(MaintenanceTask.objects.by_status('in_progress'))
+        self.assertNoSeqScan(MaintenanceTask.objects.by_equipment(self.equipment.pk))
+
+    def test_vessel_scoped_task_query_uses_indexes(self):
+        self.assertNoSeqScan(MaintenanceTask.objects.filter(
+            equipment__vessel=self.vessels[0],
+            equipment__status='operational',
+            status__in=['scheduled', 'in_progress', 'overdue'],
+        ))
+
+    def test_history_queries_use_indexes(self):
+        now = timezone.now()
+        self.assertNoSeqScan(MaintenanceHistory.objects.recent())
+        self.assertNoSeqScan(MaintenanceHistory.objects.by_equipment(self.equipment.pk))
+        self.assertNoSeqScan(MaintenanceHistory.objects.by_task(self.task.pk))
+        self.assertNoSeqScan(MaintenanceHistory.objects.filter(
+            equipment=self.equipment,
+            completed_date__gte=now - timedelta(days=365),
+            completed_date__lte=now,
+        ))
+
+
+class EquipmentHierarchyTests(PMSTestDataMixin, APITestCase):
+    def setUp(self):
+        self.vessel = self.create_vessel()
+        import_equipment_tree(self.vessel, [
+            {'code': '411', 'name': 'Radar system'},
+            {'code': '411.001.001', 'name': 'Radar'},
+            {'code': '411.001.002', 'name': 'Radar'},
+            {'code': 421002, 'name': 'VHF'},
+            {'code': '', 'name': 'No code'},
+        ])
+        self.radar_system = Equipment.objects.get(sfi_code='411')
+        self.radar = Equipment.objects.get(sfi_code='411.001.001')
+        self.create_task(self.radar, next_due_date=timezone.now() - timedelta(days=2))
+        self.create_task(Equipment.objects.get(sfi_code='421.002'))
+
+    def test_normalize_sfi_code(self):
+        self.assertEqual(normalize_sfi_code(823001), '823.001')
+        self.assertEqual(normalize_sfi_code('411.1.1'), '411.001.001')
+        self.assertEqual(normalize_sfi_code('41'), '41')
+        self.assertEqual(normalize_sfi_code(float('nan')), '')
+        with self.assertRaises(ValueError):
+            normalize_sfi_code('411.1234')
+        self.assertEqual(sfi_ancestors('411.001.001'), ['411.001', '411', '41', '4'])
+
+    def test_subtree_queries(self):
+        self.assertEqual(
+            sorted(self.radar_system.get_descendants().values_list('sfi_code', flat=True)),
+            ['411.001.001', '411.001.002']
+        )
+        self.assertEqual(list(self.radar.get_ancestors()), [self.radar_system])
+
+    def test_subtree_rollup(self):
+        rollup = {row['node']: row for row in subtree_rollup(self.vessel.pk, level=2)}
+
+        self.assertEqual(set(rollup), {'41', '42'})
+        self.assertEqual(rollup['41']['equipment_count'], 3)
+        self.assertEqual(rollup['41']['task_count'], 1)
+        self.assertEqual(rollup['41']['overdue_task_count'], 1)
+        self.assertEqual(rollup['42']['overdue_task_count'], 0)
+
+    def test_subtree_tasks_endpoint_queries_do_not_grow_with_tasks(self):
+        self.client.force_authenticate(user=User.objects.create_user(username='engineer', password='testpass123'))
+        url = reverse('equipment-subtree-tasks', args=[self.radar_system.pk])
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        for _ in range(3):
+            self.create_task(Equipment.objects.get(sfi_code='411.001.002'))
+
+        with CaptureQueriesContext(connection) as more_queries:
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 4)
+        self.assertEqual(len(more_queries), len(queries))
+
+        response = self.client.get(url, {'overdue': 'true'})
+        self.assertEqual([row['is_overdue'] for row in response.data], [True])
+
+    def test_tree_rollup_endpoint_validates_parameters(self):
+        self.client.force_authenticate(user=User.objects.create_user(username='engineer', password='testpass123'))
+        url = reverse('equipment-tree-rollup')
+
+        response = self.client.get(url, {'vessel': self.vessel.pk, 'level': 2, 'code': '4'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['node'] for row in response.data], ['41', '42'])
+        for params in ({'vessel': 'abc'}, {'vessel': self.vessel.pk, 'code': '411.0011'}):
+            self.assertEqual(self.client.get(url, params).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_malformed_codes_are_skipped_on_import(self):
+        result = import_equipment_tree(self.vessel, [{'code': '4111.1', 'name': 'Typo'}])
+
+        self.assertEqual(result, {'created': 0, 'updated': 0, 'skipped': 1})
+
+    def test_import_updates_existing_nodes(self):
+        result = import_equipment_tree(self.vessel, [
+            {'code': '411.001.001', 'name': 'Radar FURUNO', 'manufacturer': 'FURUNO'},
+        ])
+
+        self.assertEqual(result, {'created': 0, 'updated': 1, 'skipped': 0})
+        self.radar.refresh_from_db()
+        self.assertEqual(self.radar.name, 'Radar FURUNO')
+        self.assertEqual(self.radar.manufacturer, 'FURUNO')
+
+
+class RemorqueurImporterTests(PMSTestDataMixin, TestCase):
+    def setUp(self):
+        self.vessel = self.create_vessel()
+        self.component_jobs = pd.DataFrame({
+            'Component No.': [411001, None, 421002, None],
+            'Name': ['Radar', None, 'VHF', None],
+            'Job Code': ['RAD-01', 'RAD-02', 'VHF-01', ''],
+            'Job Description': ['Clean antenna', 'Check magnetron', 'Test radio', 'No code'],
+            'Frequency': ['3 Month(s)', '1 Year(s)', 'weekly', '1 Week(s)'],
+        })
+
+    def test_parse_periodicity(self):
+        self.assertEqual(parse_periodicity('500 H/ 6 mois'), ('monthly', 6))
+        self.assertEqual(parse_periodicity('20000 H/20 ans'), ('annual', 20))
+        self.assertEqual(parse_periodicity('Hebdomadaire'), ('weekly', 1))
+        self.assertIsNone(parse_periodicity('Conditionnelle'))
+
+    def test_component_jobs_import_is_idempotent(self):
+        report = RemorqueurImporter(self.vessel).run(component_jobs=self.component_jobs)
+
+        self.assertEqual(report.counts['component jobs']['created'], 2)
+        self.assertEqual(sorted(error['row'] for error in report.errors), [4, 5])
+        task = MaintenanceTask.objects.get(job_code='RAD-02')
+        self.assertEqual(task.equipment.sfi_code, '411.001')
+        self.assertEqual((task.interval_type, task.interval_value), ('annual', 1))
+
+        report = RemorqueurImporter(self.vessel).run(component_jobs=self.component_jobs)
+
+        self.assertEqual(report.counts['component jobs']['unchanged'], 2)
+        self.assertEqual(MaintenanceTask.objects.count(), 2)
+
+    def test_malformed_component_numbers_are_rejected(self):
+        component_jobs = self.component_jobs.assign(**{'Component No.': ['411.0001', None, 421002, None]})
+
+        report = RemorqueurImporter(self.vessel).run(component_jobs=component_jobs)
+
+        # Job rows continue the component above, so both radar jobs go
+        self.assertEqual(
+            [(error['row'], error['message']) for error in report.errors if error['row'] < 4],
+            [(2, MALFORMED_SFI_CODE), (3, MALFORMED_SFI_CODE)]
+        )
+        self.assertFalse(Equipment.objects.filter(sfi_code__startswith='411').exists())
+
+    def test_plan_sections_slugifying_alike_get_distinct_serials(self):
+        plan = pd.DataFrame([
+            ['PERIODICITE', None, 'DESIGNATION DES TRAVAUX'],
+            ['Hebdomadaire', '500 H/ 6 mois', None],
+            [None, None, 'Deck - Hull'],
+            ['x', None, 'Inspect plating'],
+            [None, None, 'Deck Hull'],
+            [None, 'x', 'Paint deck'],
+        ])
+
+        report = RemorqueurImporter(self.vessel).run(plan=plan)
+
+        self.assertEqual(report.errors, [])
+        serials = dict(Equipment.objects.values_list('name', 'serial_number'))
+        self.assertEqual(serials['Deck - Hull'], '9000001-deck-hull')
+        self.assertRegex(serials['Deck Hull'], r'^9000001-deck-hull-[0-9a-f]{8}$')
+        self.assertEqual(MaintenanceTask.objects.count(), 2)
+
+        # Imported again, the sections are found by name
+        RemorqueurImporter(self.vessel).run(plan=plan)
+        self.assertEqual(dict(Equipment.objects.values_list('name', 'serial_number')), serials)
+
+    def test_dry_run_rolls_back(self):
+        report = RemorqueurImporter(self.vessel, dry_run=True).run(component_jobs=self.component_jobs)
+
+        self.assertIn('+ component jobs', ' '.join(report.diff))
+        self.assertFalse(Equipment.objects.exists())
+        self.assertFalse(MaintenanceTask.objects.exists())
+
+
+class JobTemplateTests(PMSTestDataMixin, APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='engineer', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.vessels = [self.create_vessel(f'Tug {i}', f'900000{i}') for i in range(3)]
+        self.engines = [
+            self.create_equipment(vessel, serial_number=f'ME-{vessel.pk}', model='CAT 3516')
+            for vessel in self.vessels
+        ]
+        self.create_equipment(self.vessels[0], serial_number='GEN-1', name='Generator', model='C18')
+        self.template = JobTemplate.objects.create(
+            name='Replace fuel filters',
+            job_code='ME-FF',
+            equipment_model='cat 3516',
+            description='Replace primary and secondary fuel filters',
+            instructions='Isolate fuel supply, replace filters, prime and check for leaks',
+            interval_type='monthly',
+            interval_value=3,
+            responsible_role='Chief Engineer',
+        )
+
+    def test_apply_creates_one_task_per_matching_equipment(self):
+        response = self.client.post(reverse('jobtemplate-apply', args=[self.template.pk]), {}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'created': 3, 'linked': 0, 'skipped': 0, 'conflicts': []})
+        task = MaintenanceTask.objects.get(equipment=self.engines[0])
+        self.assertEqual(task.instructions, '')
+        self.assertEqual(task.effective_instructions, self.template.instructions)
+
+        # Applying again is a no-op
+        self.assertEqual(apply_job_template(self.template)['created'], 0)
+        self.assertEqual(MaintenanceTask.objects.count(), 3)
+
+    def test_apply_links_existing_tasks_with_same_job_code(self):
+        existing = self.create_task(
+            self.engines[1], job_code='ME-FF', description=self.template.description, instructions='Ship specific'
+        )
+
+        result = apply_job_template(self.template, vessel_ids=[self.vessels[1].pk, self.vessels[2].pk])
+
+        self.assertEqual(result, {'created': 1, 'linked': 1, 'skipped': 0, 'conflicts': []})
+        existing.refresh_from_db()
+        self.assertEqual(existing.template, self.template)
+        self.assertEqual(existing.description, '')
+        self.assertEqual(existing.instructions, 'Ship specific')
+
+    def test_apply_reports_job_codes_taken_by_another_template(self):
+        other = JobTemplate.objects.create(
+            name='Fuel filter service', job_code='ME-FF', equipment_model='cat 3516',
+            interval_type='monthly', interval_value=6,
+        )
+        apply_job_template(other, vessel_ids=[self.vessels[0].pk])
+
+        result = apply_job_template(self.template)
+
+        self.assertEqual(result, {'created': 2, 'linked': 0, 'skipped': 0, 'conflicts': [self.engines[0].pk]})
+        self.assertEqual(MaintenanceTask.objects.get(equipment=self.engines[0]).template, other)
+
+    def test_template_edits_propagate_to_open_tasks(self):
+        apply_job_template(self.template)
+        MaintenanceTask.objects.filter(equipment=self.engines[2]).update(status='cancelled')
+
+        self.template.interval_value = 6
+        self.template.instructions = 'Updated procedure'
+        self.template.save()
+
+        tasks = MaintenanceTask.objects.select_related('template').order_by('equipment_id')
+        self.assertEqual([task.interval_value for task in tasks], [6, 6, 3])
+        self.assertEqual(tasks[2].effective_instructions, 'Updated procedure')
+
+
+class ReliabilityTests(PMSTestDataMixin, APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='engineer', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.vessel = self.create_vessel()
+        self.engine = self.create_equipment(self.vessel, installation_date=date(2020, 1, 1))
+        self.pump = self.create_equipment(self.vessel, serial_number='P-1', name='Pump', manufacturer='Alfa')
+        self.task = self.create_task(self.engine, interval_type='custom_days', interval_value=30)
+
+        start = timezone.now() - timedelta(days=200)
+        # Completed 2 days late, then 4 days early against a 30-day interval
+        for offset, due in ((0, None), (32, 30), (58, 62)):
+            MaintenanceHistory.objects.create(
+                task=self.task,
+                equipment=self.engine,
+                completed_date=start + timedelta(days=offset),
+                due_date=start + timedelta(days=due) if due is not None else None,
+            )
+        # Two failures, repaired in 10 and 20 hours
+        for days, hours in ((100, 10), (150, 20)):
+            failed = start + timedelta(days=days)
+            EquipmentStatusChange.objects.create(equipment=self.engine, to_status='faulty', changed_at=failed)
+            EquipmentStatusChange.objects.create(
+                equipment=self.engine, to_status='operational', changed_at=failed + timedelta(hours=hours)
+            )
+
+    def test_status_transitions_are_logged(self):
+        self.pump.status = 'faulty'
+        self.pump.save()
+        Equipment.objects.get(pk=self.pump.pk).save()
+
+        self.assertEqual(
+            list(self.pump.status_changes.order_by('changed_at').values_list('from_status', 'to_status')),
+            [('', 'operational'), ('operational', 'faulty')]
+        )
+
+    def test_refresh_computes_mtbf_mttr_and_lag(self):
+        self.assertEqual(refresh_reliability_metrics(), 2)
+
+        metrics = EquipmentReliability.objects.get(equipment=self.engine)
+        self.assertEqual(metrics.failure_count, 2)
+        self.assertAlmostEqual(metrics.mttr_hours, 15)
+        self.assertAlmostEqual(metrics.mtbf_hours, metrics.operating_hours / 2)
+        self.assertEqual(metrics.interval_count, 2)
+        self.assertAlmostEqual(metrics.mean_interval_drift_days, -1)
+        self.assertAlmostEqual(metrics.mean_lag_days, -1)
+        self.assertAlmostEqual(metrics.max_lag_days, 2)
+        self.assertIsNone(EquipmentReliability.objects.get(equipment=self.pump).mtbf_hours)
+
+    def test_incremental_refresh_only_touches_changed_equipment(self):
+        refresh_reliability_metrics()
+        yesterday = timezone.now() - timedelta(days=1)
+        EquipmentReliability.objects.update(computed_at=yesterday)
+        MaintenanceHistory.objects.update(created_at=yesterday - timedelta(hours=1))
+        EquipmentStatusChange.objects.filter(changed_at__gt=yesterday).update(
+            changed_at=yesterday - timedelta(hours=1)
+        )
+
+        EquipmentStatusChange.objects.create(equipment=self.pump, to_status='faulty')
+
+        self.assertEqual(refresh_reliability_metrics(), 1)
+        self.assertEqual(EquipmentReliability.objects.get(equipment=self.pump).failure_count, 1)
+
+    def test_summary_endpoint_groups_by_manufacturer(self):
+        refresh_reliability_metrics()
+
+        response = self.client.get(reverse('equipmentreliability-summary'), {'group_by': 'manufacturer'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        groups = {row['group']: row for row in response.data}
+        self.assertEqual(groups['Caterpillar']['total_failures'], 2)
+        self.assertAlmostEqual(groups['Caterpillar']['avg_mttr_hours'], 15)
+        self.assertEqual(groups['Alfa']['equipment_count'], 1)
+        self.assertEqual(reliability_summary(group_by='equipment__vessel')[0]['equipment_count'], 2)
+
+
+class WorkloadPlannerTests(PMSTestDataMixin, APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='engineer', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.planner = WorkloadPlanner(weeks=8, window_weeks=2, capacity={'Chief Engineer': 10})
+        self.monday = self.planner.start
+
+    def job(self, task, due_week, hours, equipment=1, role='Chief Engineer'):
+        return {
+            'task': task, 'vessel': 1, 'role': role, 'equipment': equipment, 'equipment_name': 'Engine',
+            'due_date': self.monday + timedelta(weeks=due_week, days=4), 'hours': hours,
+        }
+
+    def test_jobs_on_same_equipment_are_packaged(self):
+        plan = self.planner.plan([self.job(1, 3, 2), self.job(2, 3, 3), self.job(3, 3, 1, equipment=2)])
+
+        packages = {package['equipment']: package for package in plan['packages']}
+        self.assertEqual(len(packages), 2)
+        self.assertEqual(packages[1]['tasks'], [1, 2])
+        self.assertEqual(packages[1]['hours'], 5)
+
+    def test_peak_week_is_levelled_within_due_windows(self):
+        jobs = [self.job(n, 4, 8, equipment=n) for n in range(3)]
+
+        plan = self.planner.plan(jobs)
+
+        self.assertEqual(sorted(package['week'] for package in plan['packages']), [2, 3, 4])
+        self.assertEqual(plan['load'][0]['hours'][2:5], [8, 8, 8])
+        self.assertEqual(plan['overloaded'], [])
+
+    def test_overload_is_reported_when_window_is_full(self):
+        jobs = [self.job(n, 0, 6, equipment=n) for n in range(2)]
+
+        plan = self.planner.plan(jobs)
+
+        self.assertEqual(len(plan['overloaded']), 1)
+        self.assertEqual(plan['overloaded'][0]['hours'], 12)
+
+    def test_fleet_year_plan_places_every_job_within_its_window(self):
+        planner = WorkloadPlanner(weeks=52)
+        roles = ['Chief Engineer', 'Second Engineer', 'Master', 'Bosun']
+        jobs = [
+            {
+                'task': n, 'vessel': n % 10, 'role': roles[n % 4], 'equipment': n % 2000,
+                'equipment_name': 'Equipment', 'hours': 1 + n % 5,
+                'due_date': planner.start + timedelta(days=n % 364),
+            }
+            for n in range(30000)
+        ]
+
+        plan = planner.plan(jobs)
+
+        self.assertEqual(sum(len(package['tasks']) for package in plan['packages']), 30000)
+        # Jobs sharing equipment, role and week become one package
+        self.assertEqual(len(plan['packages']), len({
+            (job['vessel'], job['role'], job['equipment'], planner.week_of(job['due_date'])) for job in jobs
+        }))
+        for package in plan['packages']:
+            due_week = min(planner.week_of(package['due_date']), planner.weeks - 1)
+            self.assertTrue(due_week - planner.window_weeks <= package['week'] <= due_week)
+        self.assertEqual(len(plan['load']), len({(job['vessel'], job['role']) for job in jobs}))
+        self.assertAlmostEqual(
+            sum(sum(row['hours']) for row in plan['load']), sum(job['hours'] for job in jobs), places=2
+        )
+
+    def test_load_jobs_bounds_the_horizon_at_local_midnight(self):
+        equipment = self.create_equipment(self.create_vessel())
+        end = timezone.make_aware(datetime.combine(self.planner.end, datetime.min.time()))
+        inside = self.create_task(equipment, interval_type='yearly', next_due_date=end - timedelta(minutes=1))
+        self.create_task(equipment, interval_type='yearly', next_due_date=end)
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', RuntimeWarning)
+            jobs = self.planner.load_jobs()
+
+        self.assertEqual([job['task'] for job in jobs], [inside.pk])
+
+    def test_plan_endpoint_expands_recurring_tasks(self):
+        vessel = self.create_vessel()
+        equipment = self.create_equipment(vessel)
+        task = self.create_task(equipment, interval_type='weekly', interval_value=1)
+        MaintenanceHistory.objects.create(task=task, equipment=equipment, duration=120)
+
+        response = self.client.post(
+            reverse('maintenancetask-plan-workload'), {'vessel': vessel.pk, 'weeks': 4}, format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertGreaterEqual(len(response.data['packages']), 4)
+        self.assertTrue(all(package['hours'] == 2 for package in response.data['packages']))
+
+
+class PartConsumptionTests(PMSTestDataMixin, APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='engineer', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.vessels = [self.create_vessel(f'Tug {i}', f'900000{i}') for i in range(2)]
+        self.tasks = [
+            self.create_task(self.create_equipment(vessel, serial_number=f'ME-{vessel.pk}'))
+            for vessel in self.vessels
+        ]
+
+    def add_history(self, task, parts_used, completed_date):
+        return MaintenanceHistory.objects.create(
+            task=task, equipment_id=task.equipment_id, parts_used=parts_used, completed_date=completed_date
+        )
+
+    def test_parse_parts_used(self):
+        self.assertEqual(
+            parse_parts_used('2 x Oil filter, fuel filter x3; O-ring (4) and gasket'),
+            [('Oil filter', 2.0), ('fuel filter', 3.0), ('O-ring', 4.0), ('gasket', 1.0)]
+        )
+        self.assertEqual(parse_parts_used(''), [])
+
+    def test_backfill_builds_catalogue_lines_and_rollups(self):
+        march = timezone.make_aware(datetime(2024, 3, 10))
+        self.add_history(self.tasks[0], 'Oil filter x2, Air filter', march)
+        self.add_history(self.tasks[0], '1 oil filters', march + timedelta(days=5))
+        self.add_history(self.tasks[1], 'Oil filter', march + timedelta(days=30))
+        self.add_history(self.tasks[1], '', march)
+
+        result = backfill_part_consumption(batch_size=2)
+
+        self.assertEqual(result, {'scanned': 3, 'created': 4})
+        self.assertEqual(SparePart.objects.count(), 2)
+        rollup = PartConsumptionRollup.objects.get(part__code='oil-filter', vessel=self.vessels[0])
+        self.assertEqual((rollup.period, rollup.quantity, rollup.line_count), (date(2024, 3, 1), 3, 2))
+
+        # Resuming does not duplicate lines
+        self.assertEqual(backfill_part_consumption()['scanned'], 0)
+        self.assertEqual(PartConsumption.objects.count(), 4)
+
+    def test_completion_records_consumption(self):
+        response = self.client.post(
+            reverse('maintenancetask-bulk-complete'),
+            [{'task': self.tasks[1].id, 'parts_used': 'Impeller x1'}],
+            format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        line = PartConsumption.objects.get()
+        self.assertEqual((line.part.code, line.vessel_id), ('impeller', self.vessels[1].pk))
+
+    def test_consumption_endpoint_aggregates_fleet_by_period(self):
+        start = timezone.now() - timedelta(days=60)
+        for task in self.tasks:
+            self.add_history(task, 'Oil filter x2', start)
+        backfill_part_consumption()
+
+        response = self.client.get(reverse('sparepart-consumption'), {
+            'group_by': 'part', 'start': (start - timedelta(days=1)).date().isoformat()
+        })
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]['quantity'], 4)
+        self.assertEqual(response.data[0]['line_count'], 2)
+        self.assertEqual(
+            self.client.get(reverse('sparepart-consumption'), {'group_by': 'nope'}).status_code,
+            status.HTTP_400_BAD_REQUEST
+        )
+        self.assertEqual(
+            self.client.get(reverse('sparepart-consumption'), {'start': '2024-02-30'}).status_code,
+            status.HTTP_400_BAD_REQUEST
+        )
+
+
+class InventoryForecastTests(PMSTestDataMixin, APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='engineer', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.vessel = self.create_vessel()
+        self.equipment = self.create_equipment(self.vessel)
+        self.filter = SparePart.objects.create(code='oil-filter', name='Oil filter', lead_time_days=60)
+        self.gasket = SparePart.objects.create(code='gasket', name='Gasket', lead_time_days=30)
+
+    def receive(self, part, quantity, location='Store'):
+        record_stock_movements([StockMovement(
+            vessel=self.vessel, part=part, location=location, quantity=quantity, movement_type='receipt'
+        )])
+
+    def test_movements_update_stock_levels(self):
+        self.receive(self.filter, 5)
+        self.receive(self.filter, 3)
+        self.receive(self.filter, 1, location='Engine room')
+
+        response = self.client.post(reverse('stockmovement-list'), {
+            'vessel': self.vessel.pk, 'part': self.filter.pk, 'location': 'Store',
+            'quantity': '-2', 'movement_type': 'adjustment',
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(StockLevel.objects.get(location='Store').quantity, 6)
+        self.assertEqual(StockMovement.objects.count(), 4)
+
+    def test_completion_books_parts_out_of_largest_location(self):
+        self.receive(self.filter, 1, location='Engine room')
+        self.receive(self.filter, 4)
+        task = self.create_task(self.equipment)
+
+        self.client.post(
+            reverse('maintenancetask-bulk-complete'), [{'task': task.id, 'parts_used': 'Oil filter x2'}], format='json'
+        )
+
+        self.assertEqual(StockLevel.objects.get(location='Store').quantity, 2)
+        movement = StockMovement.objects.get(movement_type='consumption')
+        self.assertEqual(movement.quantity, -2)
+        self.assertIsNotNone(movement.consumption)
+
+    def test_history_edits_rewrite_consumption_and_stock(self):
+        self.receive(self.filter, 4)
+        task = self.create_task(self.equipment)
+        self.client.post(
+            reverse('maintenancetask-bulk-complete'), [{'task': task.id, 'parts_used': 'Oil filter x2'}], format='json'
+        )
+        history = MaintenanceHistory.objects.get(task=task)
+        url = reverse('maintenancehistory-detail', args=[history.pk])
+
+        response = self.client.patch(url, {'parts_used': 'Oil filter x1, gasket'}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            sorted(history.part_lines.values_list('part__code', 'quantity')), [('gasket', 1), ('oil-filter', 1)]
+        )
+        self.assertEqual(StockLevel.objects.get(part=self.filter, location='Store').quantity, 3)
+        rollup = PartConsumptionRollup.objects.get(part=self.filter)
+        self.assertEqual((rollup.quantity, rollup.line_count), (1, 1))
+
+        response = self.client.delete(url)
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(PartConsumption.objects.exists())
+        self.assertEqual(StockLevel.objects.get(part=self.filter, location='Store').quantity, 4)
+        self.assertEqual(StockLevel.objects.get(part=self.gasket).quantity, 0)
+        self.assertFalse(PartConsumptionRollup.objects.exclude(quantity=0).exists())
+
+    def test_editing_backfilled_history_leaves_stock_alone(self):
+        self.receive(self.filter, 4)
+        history = MaintenanceHistory.objects.create(
+            task=self.create_task(self.equipment), equipment=self.equipment, parts_used='Oil filter x2'
+        )
+        backfill_part_consumption()
+
+        self.client.patch(
+            reverse('maintenancehistory-detail', args=[history.pk]), {'parts_used': 'Oil filter x3'}, format='json'
+        )
+
+        self.assertEqual(history.part_lines.get().quantity, 3)
+        self.assertEqual(StockLevel.objects.get(part=self.filter).quantity, 4)
+
+    def test_forecast_combines_schedule_and_history(self):
+        # Scheduled: a monthly job needing 2 filters, ~2 occurrences within the 60 day lead time
+        template = JobTemplate.objects.create(
+            name='Oil change', manufacturer='Caterpillar', description='Change oil', instructions='Drain',
+            interval_type='monthly', interval_value=1, responsible_role='Chief Engineer',
+        )
+        JobTemplatePart.objects.create(template=template, part=self.filter, quantity=2)
+        self.create_task(self.equipment, template=template, next_due_date=timezone.now() + timedelta(days=10))
+        # History: 3 gaskets a month for a year on another task
+        task = self.create_task(self.equipment)
+        first_month = timezone.localdate().replace(day=1)
+        for months in range(1, 13):
+            MaintenanceHistory.objects.create(
+                task=task, equipment=self.equipment, parts_used='3 gasket',
+                completed_date=timezone.make_aware(datetime.combine(
+                    first_month - relativedelta(months=months, days=-14), datetime.min.time()
+                )),
+            )
+        backfill_part_consumption()
+        self.receive(self.gasket, 2)
+        self.receive(self.filter, 10)
+
+        self.assertEqual(forecast_part_demand(), 2)
+
+        filters = PartForecast.objects.get(part=self.filter)
+        self.assertEqual(filters.scheduled_demand, 4)
+        self.assertEqual(filters.reorder_point, 4)
+        self.assertFalse(filters.below_reorder_point)
+        gaskets = PartForecast.objects.get(part=self.gasket)
+        self.assertAlmostEqual(gaskets.daily_usage, 36 / 365.25)
+        self.assertAlmostEqual(gaskets.safety_stock, 0)
+        self.assertAlmostEqual(gaskets.lead_time_demand, gaskets.daily_usage * 30)
+        self.assertTrue(gaskets.below_reorder_point)
+
+        response = self.client.get(reverse('stocklevel-low-stock'), {'vessel': self.vessel.pk})
+        self.assertEqual([alert['part'] for alert in response.data], [self.gasket.pk])
+
+
+class ConditionMonitoringTests(PMSTestDataMixin, APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='engineer', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.vessel = self.create_vessel()
+        self.equipment = self.create_equipment(self.vessel)
+        self.parameter = MonitoringParameter.objects.create(
+            equipment=self.equipment, name='Exhaust temperature', unit='degC',
+            warning_limit=480, alarm_limit=520, rolling_window=10,
+        )
+        self.start = timezone.now() - timedelta(hours=1)
+
+    def record(self, values, offset=0):
+        EquipmentReading.objects.bulk_create(
+            EquipmentReading(parameter=self.parameter, recorded_at=self.start + timedelta(minutes=offset + n), value=value)
+            for n, value in enumerate(values)
+        )
+
+    def test_ingest_reports_invalid_rows(self):
+        response = self.client.post(reverse('monitoringparameter-ingest'), [
+            {'parameter': self.parameter.pk, 'recorded_at': '2026-01-01T10:00:00Z', 'value': 410.5},
+            {'parameter': self.parameter.pk, 'recorded_at': 'yesterday', 'value': 411},
+            {'parameter': 0, 'recorded_at': '2026-01-01T10:01:00Z', 'value': 412},
+            {'parameter': self.parameter.pk, 'recorded_at': '2026-01-01T10:02:00Z', 'value': 'hot'},
+        ], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['ingested'], 1)
+        self.assertEqual([error['index'] for error in response.data['errors']], [1, 2, 3])
+        self.assertEqual(EquipmentReading.objects.get().value, 410.5)
+
+    def test_alarm_limit_raises_task_and_faults_equipment(self):
+        self.record([400, 405, 530, 540])
+
+        result = evaluate_readings()
+
+        self.assertEqual(result, {'readings': 4, 'alerts': 1, 'tasks': 1, 'faulty': 1})
+        alert = ConditionAlert.objects.get()
+        self.assertEqual((alert.level, alert.reading_count, alert.value), ('alarm', 2, 540))
+        self.assertEqual(alert.task.job_code, f'CM-{self.parameter.pk}')
+        self.equipment.refresh_from_db()
+        self.assertEqual(self.equipment.status, 'faulty')
+        self.assertTrue(EquipmentStatusChange.objects.filter(equipment=self.equipment, to_status='faulty').exists())
+
+    def test_drift_from_rolling_statistics_is_an_anomaly(self):
+        self.record([400, 401, 399, 400, 402, 398, 400, 401, 460])
+
+        evaluate_readings()
+
+        alert = ConditionAlert.objects.get()
+        self.assertEqual(alert.level, 'anomaly')
+        self.assertEqual(alert.value, 460)
+        self.assertAlmostEqual(alert.rolling_mean, 400.125)
+        self.equipment.refresh_from_db()
+        self.assertEqual(self.equipment.status, 'operational')
+
+    def test_evaluation_is_incremental_and_reuses_task(self):
+        self.record([400, 401, 399, 400, 490])
+        evaluate_readings()
+        task = MaintenanceTask.objects.get(job_code=f'CM-{self.parameter.pk}')
+        task.status = 'completed'
+        task.save()
+
+        self.assertEqual(evaluate_readings()['readings'], 0)
+
+        # Earlier readings still feed the rolling window of the new ones
+        self.record([400, 401, 399, 400, 402, 400, 495], offset=10)
+        result = evaluate_readings()
+
+        self.assertEqual(result['readings'], 7)
+        self.assertEqual(result['tasks'], 1)
+        self.assertEqual(MaintenanceTask.objects.filter(job_code__startswith='CM-').count(), 1)
+        task.refresh_from_db()
+        self.assertEqual(task.status, 'scheduled')
+        self.assertEqual(ConditionAlert.objects.filter(level='warning').count(), 2)
+
+    def test_late_uploads_are_evaluated(self):
+        self.record([400, 401, 399, 400, 402, 398, 400, 401], offset=10)
+        evaluate_readings()
+
+        # Buffered readings uploaded after the evaluation, recorded before the evaluated ones
+        self.record([400, 401, 399, 400, 530])
+        result = evaluate_readings()
+
+        self.assertEqual(result['readings'], 5)
+        self.assertEqual(ConditionAlert.objects.get().level, 'alarm')
+        self.assertEqual(evaluate_readings()['readings'], 0)
+
+    def test_context_readings_are_limited_per_parameter(self):
+        other = MonitoringParameter.objects.create(
+            equipment=self.equipment, name='Vibration', unit='mm/s', rolling_window=3,
+        )
+        self.record([400 + n % 3 for n in range(30)])
+        EquipmentReading.objects.bulk_create(
+            EquipmentReading(parameter=other, recorded_at=self.start + timedelta(minutes=n), value=2 + n % 2 / 10)
+            for n in range(30)
+        )
+        evaluate_readings()
+        self.record([401, 400], offset=40)
+        EquipmentReading.objects.create(parameter=other, recorded_at=self.start + timedelta(minutes=40), value=2)
+
+        parameters = {parameter.pk: parameter for parameter in MonitoringParameter.objects.all()}
+        with CaptureQueriesContext(connection) as queries:
+            frame = load_readings(parameters)
+
+        self.assertEqual(len(queries), 3)
+        self.assertEqual(sum('LIMIT' in query['sql'] for query in queries), 1)
+        counts = frame.groupby(['parameter_id', 'is_new']).size().to_dict()
+        self.assertEqual(counts, {
+            (self.parameter.pk, False): 10, (self.parameter.pk, True): 2, (other.pk, False): 3, (other.pk, True): 1,
+        })
+
+    def test_readings_endpoint_validates_bounds(self):
+        self.record([400, 401, 402])
+        url = reverse('monitoringparameter-readings', args=[self.parameter.pk])
+
+        start = timezone.localtime(self.start).replace(tzinfo=None)
+        response = self.client.get(url, {'start': (start + timedelta(minutes=1)).isoformat(timespec='seconds')})
+        self.assertEqual([reading['value'] for reading in response.data], [402, 401])
+        self.assertEqual(self.client.get(url, {'end': '2024-02-30T00:00'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(url, {'start': 'yesterday'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_alerts_can_be_acknowledged(self):
+        self.record([400, 401, 530])
+        evaluate_readings()
+        alert = ConditionAlert.objects.get()
+
+        response = self.client.post(reverse('conditionalert-acknowledge', args=[alert.pk]))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(reverse('conditionalert-list'), {'acknowledged': False})
+        self.assertEqual(response.data['count'], 0)
+
+
+class DeferralRiskTests(PMSTestDataMixin, APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='engineer', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.vessel = self.create_vessel()
+        now = timezone.now()
+        # Wears out every ~100 days: 9 failures, each repaired the next day, last repair 90 days ago
+        installed = timezone.localdate(now) - timedelta(days=1000)
+        self.engine = self.create_equipment(self.vessel, installation_date=installed)
+        self.engine.status_changes.all().delete()
+        for failure in range(1, 10):
+            failed = now - timedelta(days=1000 - 101 * failure)
+            EquipmentStatusChange.objects.create(
+                equipment=self.engine, from_status='operational', to_status='faulty', changed_at=failed
+            )
+            EquipmentStatusChange.objects.create(
+                equipment=self.engine, from_status='faulty', to_status='operational',
+                changed_at=failed + timedelta(days=1)
+            )
+        # Overhaul due in 3 days, then yearly
+        self.create_task(self.engine, interval_type='annual')
+        self.pump = self.create_equipment(self.vessel, serial_number='FP-001', name='Fire pump')
+
+    def test_failure_models_are_fitted_from_history(self):
+        models = fit_failure_models(Equipment.objects.all())
+
+        engine = models.loc[self.engine.pk].to_dict()
+        self.assertEqual(engine['failures'], 9)
+        self.assertGreater(engine['shape'], DEFAULT_SHAPE)
+        self.assertTrue(95 < engine['scale'] < 115)
+        self.assertAlmostEqual(engine['age'], 90, places=0)
+        self.assertAlmostEqual(engine['due_in'], 3, places=0)
+        self.assertEqual(models.loc[self.pump.pk, 'failures'], 0)
+        self.assertEqual(models.loc[self.pump.pk, 'interval'], float('inf'))
+
+    def test_deferring_the_overhaul_raises_failure_risk(self):
+        result = simulate_deferral_risk(defer_weeks=[4, 0], horizon_weeks=8, trials=500)
+
+        self.assertEqual([scenario['defer_weeks'] for scenario in result['scenarios']], [0, 4])
+        on_time, deferred = (
+            {row['equipment']: row['failure_probability'] for row in scenario['equipment']}
+            for scenario in result['scenarios']
+        )
+        self.assertLess(on_time[self.engine.pk][-1], 0.25)
+        self.assertGreater(deferred[self.engine.pk][-1], 0.7)
+        for curve in (on_time[self.engine.pk], deferred[self.engine.pk]):
+            self.assertEqual(len(curve), 8)
+            self.assertEqual(curve, sorted(curve))
+        fleet = result['scenarios'][1]['fleet_failure_probability']
+        self.assertGreaterEqual(fleet[-1], deferred[self.engine.pk][-1])
+
+    def test_results_are_cached_per_scenario(self):
+        first = simulate_deferral_risk(defer_weeks=[2], trials=200)
+
+        with mock.patch('vessel_pms.risk.fit_failure_models', side_effect=AssertionError):
+            self.assertEqual(simulate_deferral_risk(defer_weeks=[2], trials=200), first)
+            with self.assertRaises(AssertionError):
+                simulate_deferral_risk(defer_weeks=[2], trials=300)
+
+    def test_deferral_risk_endpoint(self):
+        url = reverse('equipment-deferral-risk')
+
+        response = self.client.post(url, {
+            'vessel': self.vessel.pk, 'equipment': [self.engine.pk], 'defer_weeks': [0, 2], 'trials': 200,
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['equipment_count'], 1)
+        self.assertEqual(len(response.data['scenarios']), 2)
+        self.assertEqual(len(response.data['scenarios'][0]['fleet_failure_probability']), 26)
+
+        response = self.client.post(url, {'defer_weeks': [-1]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class KpiSnapshotTests(PMSTestDataMixin, APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='engineer', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.vessel = self.create_vessel()
+        self.other_vessel = self.create_vessel(name='Bab Assalam', imo_number='9000002')
+        self.equipment = self.create_equipment(self.vessel)
+        self.now = timezone.now()
+        for days in (3, 20, 45, 120):
+            self.create_task(self.equipment, next_due_date=self.now - timedelta(days=days))
+        self.create_task(self.equipment)
+        # Learned duration of 2 hours for one overdue task, others fall back to the default hour
+        self.task = MaintenanceTask.objects.order_by('id').first()
+        self.week = week_start(timezone.localdate(self.now))
+        monday = timezone.make_aware(datetime.combine(self.week, datetime.min.time()))
+        for due_days, completed_days in ((0, 0), (-10, 0)):
+            MaintenanceHistory.objects.create(
+                task=self.task, equipment=self.equipment, duration=120,
+                due_date=monday + timedelta(days=due_days), completed_date=monday + timedelta(days=completed_days),
+            )
+        MaintenanceHistory.objects.create(task=self.task, equipment=self.equipment, completed_date=monday)
+
+    def test_refresh_computes_backlog_ageing_and_compliance(self):
+        self.assertEqual(refresh_kpi_snapshots(self.now), 2)
+
+        snapshot = VesselKpiSnapshot.objects.get(vessel=self.vessel, week_start=self.week)
+        self.assertEqual(snapshot.open_jobs, 5)
+        self.assertEqual(snapshot.overdue_jobs, 4)
+        self.assertAlmostEqual(snapshot.backlog_hours, 2 + 3 * 1.0)
+        self.assertEqual(
+            [snapshot.overdue_1_7_days, snapshot.overdue_8_30_days, snapshot.overdue_31_90_days,
+             snapshot.overdue_over_90_days],
+            [1, 1, 1, 1],
+        )
+        self.assertEqual(snapshot.completed_jobs, 3)
+        self.assertEqual(snapshot.scheduled_completions, 2)
+        self.assertEqual(snapshot.completed_in_window, 1)
+        self.assertEqual(snapshot.schedule_compliance, 50)
+        self.assertEqual(VesselKpiSnapshot.objects.get(vessel=self.other_vessel).open_jobs, 0)
+
+    def test_refresh_updates_current_week_in_place(self):
+        refresh_kpi_snapshots(self.now)
+        MaintenanceTask.objects.update(status='completed')
+
+        refresh_kpi_snapshots(self.now)
+
+        snapshot = VesselKpiSnapshot.objects.get(vessel=self.vessel)
+        self.assertEqual((snapshot.open_jobs, snapshot.backlog_hours), (0, 0))
+
+    def test_weekly_fleet_values_in_one_query(self):
+        for weeks_ago in range(60):
+            VesselKpiSnapshot.objects.bulk_create([
+                VesselKpiSnapshot(
+                    vessel=vessel, week_start=self.week - timedelta(weeks=weeks_ago), overdue_jobs=weeks_ago,
+                    scheduled_completions=4, completed_in_window=3, refreshed_at=self.now,
+                )
+                for vessel in (self.vessel, self.other_vessel)
+            ])
+
+        with self.assertNumQueries(1):
+            fleet = weekly_kpis(by_vessel=False)
+
+        self.assertEqual(len(fleet), 52)
+        self.assertEqual(fleet[-1]['week_start'], self.week)
+        self.assertEqual(fleet[0]['overdue_jobs'], 2 * 51)
+        self.assertEqual(fleet[0]['schedule_compliance'], 75)
+
+        response = self.client.get(reverse('vesselkpisnapshot-weekly'), {'vessel': self.vessel.pk, 'weeks': 4})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['overdue_jobs'] for row in response.data], [3, 2, 1, 0])
+        self.assertEqual(response.data[0]['vessel__name'], self.vessel.name)
+
+
+class TaskListPaginationTests(PMSTestDataMixin, APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='engineer', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.vessel = self.create_vessel()
+        self.engine = self.create_equipment(self.vessel)
+        self.pump = self.create_equipment(self.vessel, serial_number='FP-001', name='Fire pump')
+        now = timezone.now()
+        # Three due dates shared by many tasks, so pages split ties
+        MaintenanceTask.objects.bulk_create([
+            MaintenanceTask(
+                equipment=self.engine if n % 2 else self.pump, task_name=f'Job {n}', description='Check',
+                instructions='Check', interval_type='monthly', interval_value=1, responsible_role='Chief Engineer',
+                next_due_date=now + timedelta(days=(n % 3) * 10 - 5),
+            )
+            for n in range(25)
+        ])
+        self.ordered = list(MaintenanceTask.objects.order_by('next_due_date', 'id').values_list('id', flat=True))
+
+    def walk(self, url, params=None):
+        pages = []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append(response.data)
+            if not response.data['next']:
+                return pages
+            response = self.client.get(response.data['next'])
+
+    def test_list_pages_through_ties_in_due_date_order(self):
+        pages = self.walk(reverse('maintenancetask-list'), {'page_size': 4})
+
+        self.assertEqual(len(pages), 7)
+        self.assertEqual([task['id'] for page in pages for task in page['results']], self.ordered)
+        self.assertIsNone(pages[0]['previous'])
+
+        previous = self.client.get(pages[3]['previous'])
+        self.assertEqual(previous.data['results'], pages[2]['results'])
+        self.assertEqual(self.client.get(previous.data['previous']).data['results'], pages[1]['results'])
+
+    def test_list_fields_are_annotated_in_one_query(self):
+        url = reverse('maintenancetask-list')
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {'page_size': 25})
+
+        tasks = {task.id: task for task in MaintenanceTask.objects.all()}
+        for row in response.data['results']:
+            task = tasks[row['id']]
+            self.assertEqual(row['days_until_due'], task.days_until_due())
+            self.assertEqual(row['is_overdue'], task.is_overdue())
+            self.assertEqual(row['equipment_name'], task.equipment.name)
+            self.assertEqual(row['vessel_name'], self.vessel.name)
+
+    def test_equipment_tasks_and_history_are_paginated(self):
+        pages = self.walk(reverse('equipment-maintenance-tasks', args=[self.engine.pk]))
+
+        self.assertEqual([len(page['results']) for page in pages], [10, 2])
+        self.assertEqual(
+            [task['id'] for page in pages for task in page['results']],
+            [pk for pk in self.ordered if MaintenanceTask.objects.get(pk=pk).equipment_id == self.engine.pk],
+        )
+
+        task = MaintenanceTask.objects.filter(equipment=self.engine).first()
+        MaintenanceHistory.objects.bulk_create([
+            MaintenanceHistory(task=task, equipment=self.engine, completed_date=timezone.now() - timedelta(days=n))
+            for n in range(15)
+        ])
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('equipment-maintenance-history', args=[self.engine.pk]))
+        self.assertEqual(len(response.data['results']), 10)
+        dates = [row['completed_date'] for row in response.data['results']]
+        self.assertEqual(dates, sorted(dates, reverse=True))
+        self.assertEqual(len(self.client.get(response.data['next']).data['results']), 5)
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(reverse('maintenancetask-list'), {'cursor': 'garbage'})
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class JobCardTests(PMSTestDataMixin, APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='engineer', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.vessel = self.create_vessel()
+        self.engine = self.create_equipment(self.vessel, sfi_code='601.001')
+        template = JobTemplate.objects.create(
+            name='Oil change', manufacturer='Caterpillar', description='Change oil', instructions='Drain & refill <hot>',
+            interval_type='monthly', interval_value=1, responsible_role='Chief Engineer',
+        )
+        JobTemplatePart.objects.create(
+            template=template, part=SparePart.objects.create(code='oil-filter', name='Oil filter'), quantity=2
+        )
+        self.today = timezone.localdate()
+        self.tasks = [
+            self.create_task(self.engine, template=template, description='', instructions='', task_name=f'Job {n}',
+                             next_due_date=timezone.now() + timedelta(days=n))
+            for n in range(-2, 10)
+        ]
+        MaintenanceHistory.objects.bulk_create([
+            MaintenanceHistory(task=task, equipment=self.engine, completed_by=self.user, remarks='Done',
+                               completed_date=timezone.now() - timedelta(days=30 * n))
+            for task in self.tasks for n in range(1, 6)
+        ])
+
+    def page_count(self, pdf):
+        return int(re.search(rb'/Count (\d+)', pdf).group(1))
+
+    def test_cards_load_in_constant_queries(self):
+        end = self.today + timedelta(days=6)
+        with self.assertNumQueries(3):
+            tasks = list(job_card_tasks(self.vessel, self.today, end))
+
+        self.assertEqual(len(tasks), 9)
+        self.assertTrue(all(len(task.recent_history) == HISTORY_ENTRIES for task in tasks))
+        dates = [entry.completed_date for entry in tasks[0].recent_history]
+        self.assertEqual(dates, sorted(dates, reverse=True))
+        self.assertEqual(len(list(job_card_tasks(self.vessel, self.today, end, include_overdue=False))), 7)
+
+    def test_pack_has_a_page_per_card(self):
+        pdf = generate_job_card_pack(self.vessel.pk, self.today, self.today + timedelta(days=6))
+
+        self.assertTrue(pdf.startswith(b'%PDF'))
+        self.assertEqual(self.page_count(pdf), 9)
+
+    def test_job_cards_endpoint_downloads_pdf(self):
+        url = reverse('maintenancetask-job-cards')
+
+        response = self.client.get(url, {'vessel': self.vessel.pk, 'start': self.today.isoformat()})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertIn('attachment', response['Content-Disposition'])
+        self.assertTrue(response.content.startswith(b'%PDF'))
+
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(url, {'vessel': self.vessel.pk, 'end': 'soon'}).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(url, {'vessel': self.vessel.pk, 'end': '2024-02-30'}).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(url, {'vessel': 'abc'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_job_cards_endpoint_queues_large_packs(self):
+        with mock.patch('vessel_pms.views.generate_job_cards.delay') as delay:
+            delay.return_value.id = 'task-1'
+            response = self.client.get(reverse('maintenancetask-job-cards'), {'vessel': self.vessel.pk, 'async': 'true'})
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['task_id'], 'task-1')
+        file_name = delay.call_args.args[1]
+        self.assertTrue(response.data['url'].endswith(file_name))
+
+
+class HistoryArchiveTests(PMSTestDataMixin, APITestCase):
+    def setUp(self):
+        batch_rows.cache_clear()
+        self.user = User.objects.create_user(username='engineer', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.vessels = [self.create_vessel(f'Tug {i}', f'900000{i}') for i in range(2)]
+        self.engines = [self.create_equipment(vessel, serial_number=f'ME-{vessel.pk}') for vessel in self.vessels]
+        self.tasks = [self.create_task(engine) for engine in self.engines]
+        self.this_year = timezone.localdate().year
+        # One entry per quarter over four years, on both vessels
+        self.entries = MaintenanceHistory.objects.bulk_create([
+            MaintenanceHistory(
+                task=task, equipment=task.equipment, completed_by=self.user,
+                completed_date=timezone.make_aware(datetime(year, month, 15)),
+                remarks=f'{task.equipment.vessel.name} Q{(month + 2) // 3} {year}',
+                parts_used='Oil filter x2' if month == 1 else '',
+            )
+            for task in self.tasks
+            for year in range(self.this_year - 3, self.this_year + 1)
+            for month in (1, 4, 7, 10)
+        ])
+        backfill_part_consumption()
+
+    def test_closed_years_move_to_compressed_batches(self):
+        before = list(MaintenanceHistory.objects.filter(
+            completed_date__year__lt=self.this_year - 1
+        ).order_by('completed_date', 'id').values())
+
+        result = archive_history(keep_years=2)
+
+        self.assertEqual((result['batches'], result['rows']), (4, 16))
+        self.assertLess(result['compressed_bytes'], result['raw_bytes'])
+        self.assertEqual(MaintenanceHistory.objects.count(), 16)
+        self.assertFalse(MaintenanceHistory.objects.filter(completed_date__year__lt=self.this_year - 1).exists())
+        batch = MaintenanceHistoryArchive.objects.get(vessel=self.vessels[0], year=self.this_year - 3)
+        self.assertEqual(batch.row_count, 4)
+
+        # Archived entries read back unchanged; consumption lines are kept unlinked
+        restored = archived_history()
+        self.assertEqual(
+            sorted([{f.attname: getattr(entry, f.attname) for f in MaintenanceHistory._meta.concrete_fields}
+                    for entry in restored], key=lambda row: (row['completed_date'], row['id'])),
+            before
+        )
+        self.assertEqual(PartConsumption.objects.count(), 8)
+        self.assertEqual(PartConsumption.objects.filter(history__isnull=True).count(), 4)
+
+        # Nothing left to archive on a second run
+        self.assertEqual(archive_history(keep_years=2)['batches'], 0)
+
+    def test_dry_run_moves_nothing(self):
+        result = archive_history(keep_years=2, dry_run=True)
+
+        self.assertEqual(result['rows'], 16)
+        self.assertEqual(MaintenanceHistory.objects.count(), 32)
+        self.assertFalse(MaintenanceHistoryArchive.objects.exists())
+
+    def test_history_list_merges_hot_and_archived_entries(self):
+        archive_history(keep_years=2)
+        url = reverse('maintenancehistory-list')
+
+        pages = [self.client.get(url, {'page': page}).data for page in range(1, 5)]
+
+        self.assertEqual(pages[0]['count'], 32)
+        # Pages cross the boundary between hot and archived entries
+        results = [entry for page in pages for entry in page['results']]
+        self.assertEqual(len({entry['id'] for entry in results}), 32)
+        dates = [entry['completed_date'] for entry in results]
+        self.assertEqual(dates, sorted(dates, reverse=True))
+        self.assertEqual(results[-1]['task_name'], 'Oil change')
+        self.assertIsNone(pages[-1]['next'])
+
+        response = self.client.get(url, {
+            'equipment': self.engines[1].pk,
+            'start_date': f'{self.this_year - 2}-03-01',
+            'end_date': f'{self.this_year - 1}-05-01',
+            'ordering': 'completed_date',
+        })
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual(
+            [entry['remarks'] for entry in response.data['results']],
+            [f'Tug 1 Q{q} {self.this_year - 2}' for q in (2, 3, 4)] + [f'Tug 1 Q{q} {self.this_year - 1}' for q in (1, 2)]
+        )
+
+        response = self.client.get(url, {'search': f'Q3 {self.this_year - 3}'})
+        self.assertEqual(response.data['count'], 2)
+
+    def test_first_page_does_not_decompress_archive(self):
+        archive_history(keep_years=2)
+        batch_rows.cache_clear()
+        url = reverse('maintenancehistory-list')
+
+        with mock.patch('vessel_pms.archive.batch_rows', wraps=batch_rows) as rows:
+            response = self.client.get(url)
+            self.assertEqual(response.data['count'], 32)
+            self.assertEqual(len(response.data['results']), 10)
+            rows.assert_not_called()
+
+            # Pages past the hot entries load the archive
+            response = self.client.get(url, {'page': 4})
+            self.assertEqual(response.data['results'][-1]['remarks'], f'Tug 0 Q1 {self.this_year - 3}')
+            self.assertTrue(rows.called)
+
+        # A range cutting into a batch counts its entries exactly
+        response = self.client.get(url, {'end_date': f'{self.this_year - 3}-05-01'})
+        self.assertEqual(response.data['count'], 4)
+
+    def test_hot_range_does_not_read_archive(self):
+        archive_history(keep_years=2)
+
+        with mock.patch('vessel_pms.views.archived_history') as archived:
+            response = self.client.get(reverse('maintenancehistory-list'), {'start_date': f'{self.this_year - 1}-01-01'})
+
+        self.assertEqual(response.data['count'], 16)
+        archived.assert_not_called()
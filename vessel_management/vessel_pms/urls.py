@@ -6,6 +6,14 @@ router = DefaultRouter()
 router.register(r'equipment', views.EquipmentViewSet)
 router.register(r'tasks', views.MaintenanceTaskViewSet)
 router.register(r'history', views.MaintenanceHistoryViewSet)
+router.register(r'templates', views.JobTemplateViewSet)
+router.register(r'reliability', views.EquipmentReliabilityViewSet)
+router.register(r'parts', views.SparePartViewSet)
+router.register(r'stock', views.StockLevelViewSet)
+router.register(r'stock-movements', views.StockMovementViewSet)
+router.register(r'monitoring-parameters', views.MonitoringParameterViewSet)
+router.register(r'condition-alerts', views.ConditionAlertViewSet)
+router.register(r'kpis', views.VesselKpiSnapshotViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -1,3 +1,4 @@
+import re
 from django.utils import timezone
 from datetime import timedelta
 
@@ -89,4 +90,194 @@ def generate_notifications():
             'message': f"Maintenance task '{task.task_name}' for '{task.equipment.name}' is {days_overdue} days overdue"
         })
     
-    return notifications
\ No newline at end of file
+    return notifications
+
+
+def normalize_sfi_code(value):
+    """
+    Normalize an SFI-style code into the dotted form used as materialized path.
+
+    The first segment keeps the SFI group digits (1 to 3 of them), every
+    following segment is zero padded to 3 digits:
+        823001        -> '823.001'
+        '411.1.1'     -> '411.001.001'
+        '41'          -> '41'
+    Returns an empty string for blank values. Raises ValueError when a
+    dotted code has a segment longer than 3 digits, as padding could not
+    keep the segments fixed width.
+    """
+    if value is None:
+        return ''
+    if isinstance(value, float):
+        if value != value:  # NaN coming from pandas
+            return ''
+        value = int(value)
+    text = re.sub(r'[^0-9.]', '', str(value).strip())
+    if not text:
+        return ''
+
+    if '.' in text:
+        head, *tail = [segment for segment in text.split('.') if segment]
+        if any(len(segment) > 3 for segment in [head] + tail):
+            raise ValueError(f'Invalid SFI code {value!r}: segments have at most 3 digits')
+    else:
+        head, rest = text[:3], text[3:]
+        tail = [rest[i:i + 3] for i in range(0, len(rest), 3)]
+    return '.'.join([head] + [segment.zfill(3) for segment in tail])
+
+
+def sfi_code_or_none(value):
+    """normalize_sfi_code() for bulk imports: None instead of an error for a malformed code"""
+    try:
+        return normalize_sfi_code(value)
+    except ValueError:
+        return None
+
+
+def sfi_level(code):
+    """Depth of a normalized SFI code: '4' -> 1, '411' -> 3, '411.001.001' -> 5"""
+    if not code:
+        return 0
+    head, *tail = code.split('.')
+    return len(head) + len(tail)
+
+
+def sfi_prefix_length(level):
+    """Length of the path prefix identifying a node at the given level"""
+    if level <= 3:
+        return level
+    return 3 + 4 * (level - 3)
+
+
+def sfi_ancestors(code):
+    """All ancestor codes of a normalized SFI code, closest first"""
+    level = sfi_level(code)
+    return [code[:sfi_prefix_length(parent_level)] for parent_level in range(level - 1, 0, -1)]
+
+
+PART_SEPARATORS = re.compile(r'[,;\n+]|\s+(?:and|et)\s+', re.IGNORECASE)
+QUANTITY = r'(?P<quantity>\d+(?:[.,]\d+)?)'
+UNIT = r'(?:(?:pcs?|pieces?|units?|ea)\.?)'
+PART_PATTERNS = [
+    # "2 x oil filter", "2 pcs oil filter", "2 oil filters"
+    re.compile(rf'^{QUANTITY}\s*(?:x|×|\*|{UNIT})?\s+(?P<name>.+)$', re.IGNORECASE),
+    # "oil filter x2", "oil filter * 2", "oil filter (2)", "oil filter: 2 pcs"
+    re.compile(rf'^(?P<name>.+?)\s*(?:x|×|\*|:|-|\()\s*{QUANTITY}\s*{UNIT}?\)?$', re.IGNORECASE),
+    # "joint 3 pcs"
+    re.compile(rf'^(?P<name>.+?)\s+{QUANTITY}\s*{UNIT}$', re.IGNORECASE),
+]
+
+
+def normalize_part_name(name):
+    """Catalogue key of a free-text part name: 'Oil  Filters.' -> 'oil-filter'"""
+    words = re.sub(r'[^\w\s-]', ' ', str(name).lower()).split()
+    if words and len(words[-1]) > 3 and words[-1].endswith('s') and not words[-1].endswith('ss'):
+        words[-1] = words[-1][:-1]
+    return '-'.join(words)[:100]
+
+
+def parse_parts_used(text):
+    """
+    Split the free-text `parts_used` of a history entry into (name, quantity) pairs.
+
+    Items are separated by commas, semicolons, newlines, '+' or 'and'; the
+    quantity may lead ("2 x oil filter") or trail ("oil filter x2",
+    "oil filter (2)") and defaults to 1. Items without letters are dropped.
+    """
+    items = []
+    for chunk in PART_SEPARATORS.split(text or ''):
+        chunk = chunk.strip(' .-\t')
+        if not re.search(r'[^\W\d_]', chunk):
+            continue
+        name, quantity = chunk, 1.0
+        for pattern in PART_PATTERNS:
+            match = pattern.match(chunk)
+            if match:
+                name = match.group('name').strip(' .-')
+                quantity = float(match.group('quantity').replace(',', '.'))
+                break
+        if normalize_part_name(name) and quantity > 0:
+            items.append((name, quantity))
+    return items
+
+
+class ImportReport:
+    """Counts, row errors and diff lines collected while importing data"""
+    
+    def __init__(self):
+        self.counts = {}
+        self.errors = []
+        self.diff = []
+    
+    def count(self, label, outcome, amount=1):
+        counts = self.counts.setdefault(label, {'created': 0, 'updated': 0, 'unchanged': 0})
+        counts[outcome] += amount
+    
+    def add_error(self, source, row, message):
+        self.errors.append({'source': source, 'row': row, 'message': message})
+
+
+def bulk_upsert(model, existing, records, key_fields, update_fields, report, label,
+                chunk_size=500, progress=None):
+    """
+    Create or update `records` (dicts of field values) with bulk queries.
+    
+    `existing` holds the rows already stored for these keys, resolved by the
+    caller with a single keyed query. Blank values never overwrite stored
+    data. Writes are chunked; `progress(label, done, total)` is called after
+    each chunk. Returns the key -> instance index, including created rows.
+    """
+    index = {tuple(getattr(obj, field) for field in key_fields): obj for obj in existing}
+    to_create = []
+    to_update = {}
+    unchanged = set()
+    for values in records:
+        key = tuple(values[field] for field in key_fields)
+        obj = index.get(key)
+        if obj is None:
+            obj = model(**values)
+            index[key] = obj
+            to_create.append(obj)
+            report.diff.append(f"+ {label} {'/'.join(map(str, key))}")
+            continue
+        
+        changes = [
+            (field, getattr(obj, field), values[field])
+            for field in update_fields
+            if values.get(field) not in (None, '') and getattr(obj, field) != values[field]
+        ]
+        for field, old, new in changes:
+            setattr(obj, field, new)
+            report.diff.append(f"~ {label} {'/'.join(map(str, key))}: {field} {old!r} -> {new!r}")
+        if obj.pk is None:
+            continue
+        if changes:
+            to_update[obj.pk] = obj
+            unchanged.discard(obj.pk)
+        elif obj.pk not in to_update:
+            unchanged.add(obj.pk)
+    
+    total = len(to_create) + len(to_update)
+    done = 0
+    for start in range(0, len(to_create), chunk_size):
+        chunk = to_create[start:start + chunk_size]
+        model.objects.bulk_create(chunk)
+        done += len(chunk)
+        if progress:
+            progress(label, done, total)
+    
+    updated = list(to_update.values())
+    now = timezone.now()
+    for obj in updated:
+        obj.updated_at = now
+    for start in range(0, len(updated), chunk_size):
+        chunk = updated[start:start + chunk_size]
+        model.objects.bulk_update(chunk, list(update_fields) + ['updated_at'])
+        done += len(chunk)
+        if progress:
+            progress(label, done, total)
+    
+    report.count(label, 'created', len(to_create))
+    report.count(label, 'updated', len(updated))
+    report.count(label, 'unchanged', len(unchanged))
+    return index
@@ -2,15 +2,52 @@ from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import Equipment, MaintenanceTask, MaintenanceHistory
+from django.db import transaction
+from django.db.models import Count
+from core.models import Vessel
+from .models import (
+    Equipment, MaintenanceTask, MaintenanceHistory, JobTemplate, EquipmentReliability, SparePart,
+    PartConsumptionRollup, StockLevel, StockMovement, MonitoringParameter, ConditionAlert, VesselKpiSnapshot,
+    OPEN_TASK_STATUSES
+)
 from .serializers import (
     EquipmentSerializer, 
     MaintenanceTaskSerializer, 
     MaintenanceHistorySerializer,
-    MaintenanceTaskListSerializer
+    MaintenanceTaskListSerializer,
+    JobTemplateSerializer,
+    EquipmentReliabilitySerializer,
+    WorkloadPlanSerializer,
+    DeferralRiskSerializer,
+    SparePartSerializer,
+    StockLevelSerializer,
+    StockMovementSerializer,
+    PartForecastSerializer,
+    MonitoringParameterSerializer,
+    EquipmentReadingSerializer,
+    ConditionAlertSerializer,
+    VesselKpiSnapshotSerializer
 )
 from .utils import calculate_due_date, generate_notifications
+from .services import bulk_complete_tasks, apply_job_template
+from .hierarchy import subtree_filter, subtree_rollup
+from .reliability import reliability_summary
+from .planner import plan_workload
+from .parts import consumption_summary, remove_part_consumption
+from .inventory import record_stock_movements, low_stock_alerts
+from .monitoring import ingest_readings, evaluate_readings
+from .risk import simulate_deferral_risk
+from .kpis import weekly_kpis
+from .pagination import MaintenanceTaskCursorPagination, MaintenanceHistoryCursorPagination
+from .job_cards import generate_job_card_pack
+from .tasks import generate_job_cards
+from .archive import archive_boundary, archived_count, archived_history, parse_bound, HistoryTimeline
+import uuid
+from django.core.files.storage import default_storage
+from django.http import HttpResponse
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.core.exceptions import ValidationError
 from datetime import timedelta
 
 
@@ -21,26 +58,97 @@ class EquipmentViewSet(viewsets.ModelViewSet):
     queryset = Equipment.objects.all()
     serializer_class = EquipmentSerializer
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ['status', 'manufacturer', 'location']
-    search_fields = ['name', 'model', 'serial_number']
-    ordering_fields = ['name', 'installation_date', 'status']
+    filterset_fields = ['status', 'manufacturer', 'location', 'vessel']
+    search_fields = ['name', 'model', 'serial_number', 'sfi_code']
+    ordering_fields = ['name', 'installation_date', 'status', 'sfi_code']
     
     @action(detail=True, methods=['get'])
     def maintenance_tasks(self, request, pk=None):
-        """Get all maintenance tasks for specific equipment"""
+        """Get the maintenance tasks of specific equipment, paginated by due date"""
         equipment = self.get_object()
-        tasks = MaintenanceTask.objects.filter(equipment=equipment)
-        serializer = MaintenanceTaskListSerializer(tasks, many=True)
-        return Response(serializer.data)
+        tasks = MaintenanceTask.objects.with_due_info().filter(equipment=equipment)
+        paginator = MaintenanceTaskCursorPagination()
+        page = paginator.paginate_queryset(tasks, request, view=self)
+        serializer = MaintenanceTaskListSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
     
     @action(detail=True, methods=['get'])
     def maintenance_history(self, request, pk=None):
-        """Get maintenance history for specific equipment"""
+        """Get the maintenance history of specific equipment, latest first"""
         equipment = self.get_object()
-        history = MaintenanceHistory.objects.filter(equipment=equipment)
-        serializer = MaintenanceHistorySerializer(history, many=True)
+        history = MaintenanceHistory.objects.filter(equipment=equipment) \
+            .select_related('task', 'equipment', 'completed_by')
+        paginator = MaintenanceHistoryCursorPagination()
+        page = paginator.paginate_queryset(history, request, view=self)
+        serializer = MaintenanceHistorySerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+    
+    @action(detail=True, methods=['get'])
+    def subtree(self, request, pk=None):
+        """Get the equipment below this one in the SFI tree"""
+        equipment = self.get_object()
+        descendants = equipment.get_descendants().order_by('sfi_code')
+        serializer = EquipmentSerializer(descendants, many=True)
         return Response(serializer.data)
-
+    
+    @action(detail=True, methods=['get'])
+    def subtree_tasks(self, request, pk=None):
+        """Get maintenance tasks for this equipment and everything below it"""
+        equipment = self.get_object()
+        now = timezone.now()
+        tasks = MaintenanceTask.objects.with_due_info(now)
+        if equipment.sfi_code:
+            tasks = tasks.filter(
+                subtree_filter(equipment.sfi_code, prefix='equipment__'),
+                equipment__vessel_id=equipment.vessel_id
+            )
+        else:
+            tasks = tasks.filter(equipment=equipment)
+        
+        if request.query_params.get('overdue') == 'true':
+            tasks = tasks.filter(
+                next_due_date__lt=now,
+                status__in=OPEN_TASK_STATUSES
+            )
+        serializer = MaintenanceTaskListSerializer(tasks, many=True)
+        return Response(serializer.data)
+    
+    @action(detail=False, methods=['get'])
+    def tree_rollup(self, request):
+        """Get equipment and task counts per SFI subtree for a vessel"""
+        vessel_id = request.query_params.get('vessel')
+        if not vessel_id:
+            return Response({'error': 'vessel parameter is required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            vessel_id = int(vessel_id)
+        except ValueError:
+            return Response({'error': 'vessel must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            level = int(request.query_params.get('level', 3))
+        except ValueError:
+            return Response({'error': 'level must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            rollup = subtree_rollup(vessel_id, level, request.query_params.get('code', ''))
+        except ValueError:
+            return Response({'error': 'code segments have at most 3 digits'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(rollup)
+    
+    @action(detail=False, methods=['post'])
+    def deferral_risk(self, request):
+        """Simulate the probability of failure if PMS jobs are deferred by N weeks"""
+        serializer = DeferralRiskSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        options = dict(serializer.validated_data)
+    
+        equipment = Equipment.objects.all()
+        vessel = options.pop('vessel', None)
+        if vessel:
+            equipment = equipment.filter(vessel_id=vessel)
+        equipment_ids = options.pop('equipment', None)
+        if equipment_ids:
+            equipment = equipment.filter(id__in=equipment_ids)
+        return Response(simulate_deferral_risk(equipment, **options))
 
 class MaintenanceTaskViewSet(viewsets.ModelViewSet):
     """
@@ -48,10 +156,17 @@ class MaintenanceTaskViewSet(viewsets.ModelViewSet):
     """
     queryset = MaintenanceTask.objects.all()
     serializer_class = MaintenanceTaskSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    # Lists are keyset-paginated on (next_due_date, id), which fixes their order
+    pagination_class = MaintenanceTaskCursorPagination
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     filterset_fields = ['status', 'equipment', 'responsible_role', 'interval_type']
     search_fields = ['task_name', 'description']
-    ordering_fields = ['next_due_date', 'last_completed_date', 'status']
+    
+    def get_queryset(self):
+        # Annotations would go stale on tasks that the action modifies
+        if self.action in ('list', 'retrieve'):
+            return MaintenanceTask.objects.with_due_info()
+        return MaintenanceTask.objects.select_related('equipment__vessel')
     
     def get_serializer_class(self):
         if self.action == 'list':
@@ -62,7 +177,7 @@ class MaintenanceTaskViewSet(viewsets.ModelViewSet):
     def due_soon(self, request):
         """Get tasks due within the next 7 days"""
         due_date = timezone.now() + timedelta(days=7)
-        tasks = MaintenanceTask.objects.filter(
+        tasks = MaintenanceTask.objects.with_due_info().filter(
             next_due_date__lte=due_date,
             status__in=['scheduled', 'overdue']
         )
@@ -73,7 +188,7 @@ class MaintenanceTaskViewSet(viewsets.ModelViewSet):
     def overdue(self, request):
         """Get overdue maintenance tasks"""
         now = timezone.now()
-        tasks = MaintenanceTask.objects.filter(
+        tasks = MaintenanceTask.objects.with_due_info(now).filter(
             next_due_date__lt=now,
             status__in=['scheduled', 'in_progress']
         )
@@ -131,6 +246,77 @@ class MaintenanceTaskViewSet(viewsets.ModelViewSet):
             })
         return Response(history_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
+    @action(detail=False, methods=['post'])
+    def bulk_complete(self, request):
+        """Complete a batch of maintenance tasks uploaded as an array of job cards"""
+        completions = request.data if isinstance(request.data, list) else request.data.get('completions')
+        if not isinstance(completions, list) or not completions:
+            return Response(
+                {'error': 'Expected a non-empty list of completions'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        result = bulk_complete_tasks(completions, request.user)
+        if result['completed'] == 0:
+            return Response(result, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result)
+    
+    @action(detail=False, methods=['post'])
+    def plan_workload(self, request):
+        """Level open tasks over the coming weeks against per-role weekly capacity"""
+        serializer = WorkloadPlanSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        options = dict(serializer.validated_data)
+        
+        tasks = MaintenanceTask.objects.all()
+        vessel = options.pop('vessel', None)
+        if vessel:
+            tasks = tasks.filter(equipment__vessel_id=vessel)
+        return Response(plan_workload(tasks, **options))
+    
+    @action(detail=False, methods=['get'])
+    def job_cards(self, request):
+        """
+        Download the job cards of a vessel's open tasks due between start and end
+        (the coming week by default) as one PDF; with async=true the pack is
+        rendered by a Celery worker and its future URL returned
+        """
+        vessel_id = request.query_params.get('vessel')
+        if not vessel_id:
+            return Response({'error': 'vessel parameter is required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            vessel_id = int(vessel_id)
+        except ValueError:
+            return Response({'error': 'vessel must be a vessel id'}, status=status.HTTP_400_BAD_REQUEST)
+        if not Vessel.objects.filter(pk=vessel_id).exists():
+            return Response({'error': 'Vessel not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        start = request.query_params.get('start')
+        end = request.query_params.get('end')
+        try:
+            dates = [parse_date(value) if value else None for value in (start, end)]
+        except ValueError:
+            dates = [None, None]
+        if any(value and date is None for value, date in zip((start, end), dates)):
+            return Response({'error': 'Dates must use the YYYY-MM-DD format'}, status=status.HTTP_400_BAD_REQUEST)
+        include_overdue = request.query_params.get('include_overdue', 'true') != 'false'
+        
+        if request.query_params.get('async') == 'true':
+            file_name = f'job_cards_{vessel_id}_{uuid.uuid4().hex}.pdf'
+            result = generate_job_cards.delay(vessel_id, file_name, start, end, include_overdue)
+            return Response(
+                {'task_id': result.id, 'url': default_storage.url(f'job_cards/{file_name}')},
+                status=status.HTTP_202_ACCEPTED
+            )
+        
+        start, end = dates
+        pdf = generate_job_card_pack(vessel_id, start, end, include_overdue)
+        response = HttpResponse(pdf, content_type='application/pdf')
+        response['Content-Disposition'] = (
+            f'attachment; filename="job_cards_{vessel_id}_{timezone.localdate():%Y%m%d}.pdf"'
+        )
+        return response
+    
     @action(detail=False, methods=['get'])
     def generate_notifications(self, request):
         """Generate notifications for upcoming and overdue tasks"""
@@ -150,11 +336,44 @@ class MaintenanceTaskViewSet(viewsets.ModelViewSet):
     def history(self, request, pk=None):
         """Get maintenance history for specific task"""
         task = self.get_object()
-        history = MaintenanceHistory.objects.filter(task=task)
+        history = MaintenanceHistory.objects.filter(task=task).select_related('task', 'equipment', 'completed_by')
         serializer = MaintenanceHistorySerializer(history, many=True)
         return Response(serializer.data)
 
 
+class JobTemplateViewSet(viewsets.ModelViewSet):
+    """
+    API endpoint for maintenance job templates shared across sister vessels
+    """
+    queryset = JobTemplate.objects.annotate(task_count=Count('tasks')).prefetch_related('parts__part')
+    serializer_class = JobTemplateSerializer
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filterset_fields = ['equipment_model', 'manufacturer', 'interval_type', 'responsible_role', 'is_active']
+    search_fields = ['name', 'job_code', 'equipment_model', 'manufacturer']
+    ordering_fields = ['name', 'created_at']
+    
+    @action(detail=True, methods=['get'])
+    def matching_equipment(self, request, pk=None):
+        """Get the fleet equipment this template applies to"""
+        template = self.get_object()
+        serializer = EquipmentSerializer(template.matching_equipment(), many=True)
+        return Response(serializer.data)
+    
+    @action(detail=True, methods=['post'])
+    def apply(self, request, pk=None):
+        """Instantiate the template on matching equipment, optionally limited to some vessels"""
+        template = self.get_object()
+        if not template.is_active:
+            return Response({'error': 'Inactive templates cannot be applied'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        vessel_ids = request.data.get('vessels') or None
+        if vessel_ids is not None and not isinstance(vessel_ids, list):
+            return Response({'error': 'vessels must be a list of vessel ids'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        result = apply_job_template(template, vessel_ids=vessel_ids)
+        return Response(result)
+
+
 class MaintenanceHistoryViewSet(viewsets.ModelViewSet):
     """
     API endpoint for maintenance history
@@ -167,7 +386,7 @@ class MaintenanceHistoryViewSet(viewsets.ModelViewSet):
     ordering_fields = ['completed_date']
     
     def get_queryset(self):
-        queryset = MaintenanceHistory.objects.all()
+        queryset = MaintenanceHistory.objects.select_related('task', 'equipment', 'completed_by')
         
         # Filter by date range if provided
         start_date = self.request.query_params.get('start_date', None)
@@ -178,4 +397,271 @@ class MaintenanceHistoryViewSet(viewsets.ModelViewSet):
         if end_date:
             queryset = queryset.filter(completed_date__lte=end_date)
         
-        return queryset
\ No newline at end of file
+        return queryset
+    
+    def perform_destroy(self, instance):
+        # Deleted entries give back their parts; archiving keeps them (SET_NULL)
+        with transaction.atomic():
+            remove_part_consumption([instance.pk], user=self.request.user)
+            instance.delete()
+    
+    def list(self, request, *args, **kwargs):
+        """
+        List history, merging in archived years when the date range reaches
+        before the archive boundary (see vessel_pms.archive)
+        """
+        params = request.query_params
+        try:
+            start = parse_bound(params.get('start_date'))
+            end = parse_bound(params.get('end_date'))
+        except ValidationError:
+            return Response(
+                {'error': 'start_date and end_date must be dates or datetimes'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        boundary = archive_boundary()
+        if boundary is None or (start and start >= boundary):
+            return super().list(request, *args, **kwargs)
+        
+        queryset = self.filter_queryset(self.get_queryset())
+        vessel_ids = None
+        if params.get('equipment'):
+            vessel_ids = Equipment.objects.filter(pk=params['equipment']).values_list('vessel_id', flat=True)
+        elif params.get('task'):
+            vessel_ids = MaintenanceTask.objects.filter(pk=params['task']).values_list('equipment__vessel_id', flat=True)
+        filters = {
+            'task': params.get('task'), 'equipment': params.get('equipment'),
+            'completed_by': params.get('completed_by'), 'search': params.get('search'),
+        }
+        
+        descending = params.get('ordering') != 'completed_date'
+        direction = '-' if descending else ''
+        recent = queryset.filter(completed_date__gte=boundary).order_by(f'{direction}completed_date', f'{direction}id')
+        timeline = HistoryTimeline(
+            recent,
+            queryset.filter(completed_date__lt=boundary),
+            lambda: archived_history(vessel_ids, start, end, **filters),
+            archived_count(vessel_ids, start, end, **filters),
+            descending,
+        )
+        page = self.paginate_queryset(timeline)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+
+class EquipmentReliabilityViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    API endpoint for precomputed equipment reliability metrics (MTBF/MTTR)
+    """
+    queryset = EquipmentReliability.objects.select_related('equipment')
+    serializer_class = EquipmentReliabilitySerializer
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_fields = ['equipment', 'equipment__vessel', 'equipment__manufacturer', 'equipment__model']
+    ordering_fields = ['mtbf_hours', 'mttr_hours', 'failure_count', 'mean_lag_days', 'mean_interval_drift_days']
+    ordering = ['equipment_id']
+    
+    GROUPINGS = {
+        'manufacturer': 'equipment__manufacturer',
+        'model': 'equipment__model',
+        'vessel': 'equipment__vessel',
+    }
+    
+    @action(detail=False, methods=['get'])
+    def summary(self, request):
+        """Get reliability aggregated per manufacturer, model or vessel"""
+        group_by = request.query_params.get('group_by', 'manufacturer')
+        if group_by not in self.GROUPINGS:
+            return Response(
+                {'error': f"group_by must be one of {', '.join(self.GROUPINGS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        queryset = self.filter_queryset(self.get_queryset()).order_by()
+        return Response(reliability_summary(queryset, self.GROUPINGS[group_by]))
+
+
+
+class SparePartViewSet(viewsets.ModelViewSet):
+    """
+    API endpoint for the spare parts catalogue and its consumption
+    """
+    queryset = SparePart.objects.all()
+    serializer_class = SparePartSerializer
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filterset_fields = ['manufacturer', 'unit']
+    search_fields = ['name', 'code', 'part_number']
+    ordering_fields = ['name', 'code']
+    
+    CONSUMPTION_GROUPS = ('part', 'vessel', 'period')
+    
+    @action(detail=False, methods=['get'])
+    def consumption(self, request):
+        """
+        Get consumption totals from the monthly rollups
+        Query params: start, end (YYYY-MM-DD), vessel, part, group_by (comma separated part,vessel,period)
+        """
+        group_by = [group for group in request.query_params.get('group_by', 'part').split(',') if group]
+        if not group_by or any(group not in self.CONSUMPTION_GROUPS for group in group_by):
+            return Response(
+                {'error': f"group_by must be a combination of {', '.join(self.CONSUMPTION_GROUPS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        dates = {}
+        for param in ('start', 'end'):
+            value = request.query_params.get(param)
+            try:
+                dates[param] = parse_date(value) if value else None
+            except ValueError:
+                dates[param] = None
+            if value and dates[param] is None:
+                return Response({'error': f'{param} must be a date (YYYY-MM-DD)'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        rollups = PartConsumptionRollup.objects.all()
+        if request.query_params.get('vessel'):
+            rollups = rollups.filter(vessel_id=request.query_params['vessel'])
+        if request.query_params.get('part'):
+            rollups = rollups.filter(part_id=request.query_params['part'])
+        return Response(consumption_summary(rollups, group_by, **dates))
+
+
+
+class StockLevelViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    API endpoint for on-board stock levels, maintained from the movements ledger
+    """
+    queryset = StockLevel.objects.select_related('part')
+    serializer_class = StockLevelSerializer
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filterset_fields = ['vessel', 'part', 'location']
+    search_fields = ['part__name', 'part__code', 'location']
+    ordering_fields = ['quantity', 'updated_at']
+    
+    @action(detail=False, methods=['get'])
+    def low_stock(self, request):
+        """Get parts at or below their forecast reorder point"""
+        alerts = low_stock_alerts(request.query_params.get('vessel'))
+        serializer = PartForecastSerializer(alerts, many=True)
+        return Response(serializer.data)
+
+
+class StockMovementViewSet(viewsets.ModelViewSet):
+    """
+    API endpoint for the stock movements ledger; entries are append-only
+    """
+    queryset = StockMovement.objects.select_related('part')
+    serializer_class = StockMovementSerializer
+    http_method_names = ['get', 'post', 'head', 'options']
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_fields = ['vessel', 'part', 'location', 'movement_type']
+    ordering_fields = ['created_at']
+    
+    def perform_create(self, serializer):
+        movement = StockMovement(**serializer.validated_data, created_by=self.request.user)
+        serializer.instance = record_stock_movements([movement])[0]
+
+
+
+class MonitoringParameterViewSet(viewsets.ModelViewSet):
+    """
+    API endpoint for condition-monitoring parameters and their readings
+    """
+    queryset = MonitoringParameter.objects.select_related('equipment')
+    serializer_class = MonitoringParameterSerializer
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    filterset_fields = ['equipment', 'equipment__vessel', 'name', 'is_active']
+    search_fields = ['name', 'equipment__name']
+    
+    MAX_READINGS = 10000
+    
+    @action(detail=False, methods=['post'])
+    def ingest(self, request):
+        """Bulk insert readings: a list of {parameter, recorded_at, value}"""
+        readings = request.data if isinstance(request.data, list) else request.data.get('readings')
+        if not isinstance(readings, list) or not readings:
+            return Response({'error': 'Expected a non-empty list of readings'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        result = ingest_readings(readings)
+        if result['ingested'] == 0:
+            return Response(result, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result, status=status.HTTP_201_CREATED)
+    
+    @action(detail=True, methods=['get'])
+    def readings(self, request, pk=None):
+        """
+        Get readings of a parameter between start and end (ISO timestamps, last 7 days by default)
+        Results are capped at MAX_READINGS, most recent first
+        """
+        parameter = self.get_object()
+        bounds = {}
+        for param in ('start', 'end'):
+            value = request.query_params.get(param)
+            try:
+                bounds[param] = parse_datetime(value) if value else None
+            except ValueError:
+                bounds[param] = None
+            if value and bounds[param] is None:
+                return Response({'error': f'{param} must be an ISO timestamp'}, status=status.HTTP_400_BAD_REQUEST)
+            if bounds[param] and timezone.is_naive(bounds[param]):
+                bounds[param] = timezone.make_aware(bounds[param])
+        end = bounds['end'] or timezone.now()
+        start = bounds['start'] or end - timedelta(days=7)
+        readings = parameter.readings.filter(recorded_at__gte=start, recorded_at__lte=end) \
+            .order_by('-recorded_at')[:self.MAX_READINGS]
+        serializer = EquipmentReadingSerializer(readings, many=True)
+        return Response(serializer.data)
+    
+    @action(detail=False, methods=['post'])
+    def evaluate(self, request):
+        """Evaluate the readings received since the last run"""
+        parameter_ids = request.data.get('parameters') if isinstance(request.data, dict) else None
+        return Response(evaluate_readings(parameter_ids))
+
+
+class ConditionAlertViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    API endpoint for condition-monitoring alerts
+    """
+    queryset = ConditionAlert.objects.select_related('parameter')
+    serializer_class = ConditionAlertSerializer
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_fields = ['parameter', 'parameter__equipment', 'level', 'acknowledged']
+    ordering_fields = ['created_at', 'recorded_at']
+    
+    @action(detail=True, methods=['post'])
+    def acknowledge(self, request, pk=None):
+        """Mark an alert as acknowledged"""
+        alert = self.get_object()
+        alert.acknowledged = True
+        alert.save(update_fields=['acknowledged'])
+        serializer = ConditionAlertSerializer(alert)
+        return Response(serializer.data)
+
+
+
+class VesselKpiSnapshotViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    API endpoint for weekly PMS KPIs (backlog, schedule compliance, overdue ageing)
+    """
+    queryset = VesselKpiSnapshot.objects.select_related('vessel')
+    serializer_class = VesselKpiSnapshotSerializer
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_fields = ['vessel', 'week_start']
+    ordering_fields = ['week_start', 'backlog_hours', 'overdue_jobs']
+    
+    @action(detail=False, methods=['get'])
+    def weekly(self, request):
+        """Weekly KPI values per vessel, or for the whole fleet with group=fleet"""
+        try:
+            weeks = int(request.query_params.get('weeks', 52))
+        except ValueError:
+            return Response({'error': 'weeks must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= weeks <= 104:
+            return Response({'error': 'weeks must be between 1 and 104'}, status=status.HTTP_400_BAD_REQUEST)
+        group = request.query_params.get('group', 'vessel')
+        if group not in ('vessel', 'fleet'):
+            return Response({'error': 'group must be vessel or fleet'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        snapshots = VesselKpiSnapshot.objects.all()
+        vessel_id = request.query_params.get('vessel')
+        if vessel_id:
+            snapshots = snapshots.filter(vessel_id=vessel_id)
+        return Response(weekly_kpis(snapshots, weeks, by_vessel=group == 'vessel'))